@@ -1,15 +1,42 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any, Union
-from src.retriever.vector_search import VectorRetriever
-from src.utils.helpers import format_retrieval_results
+from typing import List, Optional, Dict, Any, Union, Literal, Tuple
+from pathlib import Path
+from src.config import Config
+from src.retriever.factory import create_retriever
+from src.vectorstore.collection_manager import (
+    CollectionNotFoundError, DocumentNotFoundError, InvalidCollectionNameError, CandidateNotFoundError, StaleCandidateError
+)
+from src.utils.helpers import format_retrieval_results, dedupe_documents
 from src.rag.pipeline import RAGPipeline
-from src.llm.openai import OpenAILLM
+from src.rag.prompt import PromptTemplate
+from src.llm.factory import create_llm
+from src.utils.tracing import start_trace, span, metrics_payload
+from src.ingest.jobs import IngestJobManager, IngestJobNotFoundError, IngestConflictError
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import base64
+import binascii
+import hashlib
+import hmac
+import json
 import logging
+import threading
+
+# brotli-asgi 为可选依赖，未安装时只使用 gzip 压缩
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # pragma: no cover
+    BrotliMiddleware = None
 
 logger = logging.getLogger(__name__)
 
+config = Config()
+
 app = FastAPI(
     title="法律文档检索系统",
     description="基于向量检索的法律文档检索系统API",
@@ -25,10 +52,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 流式接口（text/event-stream），不经过压缩
+STREAM_PATHS = {"/api/ask/stream"}
+
+
+class SkipStreamCompression:
+    """压缩中间件包装：流式接口直接交给应用
+
+    gzip/brotli 中间件按块压缩，压缩器攒满缓冲区才输出，SSE 事件会被扣住直到响应结束。
+    """
+
+    def __init__(self, app, middleware, **options):
+        self.app = app
+        self.compressed = middleware(app, **options)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in STREAM_PATHS:
+            await self.app(scope, receive, send)
+        else:
+            await self.compressed(scope, receive, send)
+
+
+# 压缩较大的响应（批量检索结果、全文）
+if BrotliMiddleware is not None:
+    app.add_middleware(SkipStreamCompression, middleware=BrotliMiddleware,
+                       minimum_size=config.COMPRESSION_MIN_SIZE, gzip_fallback=True)
+else:
+    app.add_middleware(SkipStreamCompression, middleware=GZipMiddleware, minimum_size=config.COMPRESSION_MIN_SIZE)
+
 # 初始化检索器和RAG系统
 retriever = None
 rag_pipeline = None
 llm = None
+ingest_jobs = IngestJobManager(config)
+# 流式问答中与 RAG 回答并行生成直接 LLM 回答
+direct_executor = ThreadPoolExecutor(max_workers=config.LLM_MAX_CONCURRENCY, thread_name_prefix="direct-llm")
+
+ResponseMode = Literal["full", "snippet", "ids"]
 
 class SearchQuery(BaseModel):
     """搜索查询模型"""
@@ -36,6 +96,12 @@ class SearchQuery(BaseModel):
     top_k: Optional[int] = None
     min_score: Optional[float] = None
     include_metadata: Optional[bool] = False
+    include_timings: Optional[bool] = False
+    collection: Optional[str] = None  # 集合名称，为空时使用默认集合
+    response_mode: ResponseMode = "full"  # full 全文；snippet 摘要；ids 只返回文档下标和相似度
+    page_size: Optional[int] = None  # 分页大小，设置后按页返回并附带 next_cursor
+    cursor: Optional[str] = None  # 上一页返回的 next_cursor
+    mmr_lambda: Optional[float] = None  # 设置时按 MMR 多样性重排（0-1，越小越多样），为空时使用配置
 
 class BatchSearchQuery(BaseModel):
     """批量搜索查询模型"""
@@ -43,20 +109,25 @@ class BatchSearchQuery(BaseModel):
     top_k: Optional[int] = None
     min_score: Optional[float] = None
     include_metadata: Optional[bool] = False
+    collection: Optional[str] = None
+    response_mode: ResponseMode = "full"
+    dedupe: bool = False  # 为True时文本只在 documents 表中出现一次，结果中只保留 id
+    mmr_lambda: Optional[float] = None
 
 @app.on_event("startup")
 async def startup_event():
     """应用启动时初始化检索器和RAG系统"""
     global retriever, rag_pipeline, llm
     try:
-        retriever = VectorRetriever()
+        retriever = create_retriever()
         logger.info("检索器初始化成功")
 
-        rag_pipeline = RAGPipeline()
-        logger.info("RAG系统初始化成功")
-
-        llm = OpenAILLM()
+        llm = create_llm()
         logger.info("LLM初始化成功")
+
+        # 与检索接口共用同一个检索器，避免重复加载模型和索引
+        rag_pipeline = RAGPipeline(llm=llm, retriever=retriever)
+        logger.info("RAG系统初始化成功")
     except Exception as e:
         logger.error(f"初始化失败: {str(e)}")
         raise
@@ -66,69 +137,238 @@ async def api_root():
     """API根路径"""
     return {"message": "欢迎使用法律文档检索系统API"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标（各阶段耗时直方图）"""
+    try:
+        content, content_type = metrics_payload()
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return Response(content=content, media_type=content_type)
+
+def _collection_error(e: Exception) -> HTTPException:
+    """集合不存在返回 404，名称不合法返回 400"""
+    if isinstance(e, CollectionNotFoundError):
+        return HTTPException(status_code=404, detail=f"集合不存在：{e.args[0]}")
+    return HTTPException(status_code=400, detail=str(e))
+
+@app.get("/collections")
+async def collections():
+    """可用集合列表及驻留状态"""
+    if not retriever:
+        raise HTTPException(status_code=500, detail="检索器未初始化")
+    try:
+        return retriever.describe_collections()
+    except Exception as e:
+        logger.error(f"获取集合状态失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _check_mmr_lambda(mmr_lambda: Optional[float]):
+    if mmr_lambda is not None and not 0 <= mmr_lambda <= 1:
+        raise HTTPException(status_code=400, detail="mmr_lambda 必须在 0 到 1 之间")
+
+def _query_fingerprint(query: SearchQuery) -> str:
+    """决定结果集的查询参数摘要，用于校验游标属于同一查询"""
+    key = json.dumps([query.query, query.top_k, query.min_score, query.collection, query.mmr_lambda], ensure_ascii=False)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+def _encode_cursor(offset: int, page_size: int, fingerprint: str) -> str:
+    data = json.dumps({"o": offset, "n": page_size, "f": fingerprint}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor: str, fingerprint: str) -> Tuple[int, int]:
+    """解析游标，返回 (偏移量, 分页大小)；游标无效或与查询不匹配时返回 400"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset, page_size = int(data["o"]), int(data["n"])
+        valid = data["f"] == fingerprint and offset >= 0 and page_size > 0
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        valid = False
+    if not valid:
+        raise HTTPException(status_code=400, detail="游标无效或与当前查询不匹配")
+    return offset, page_size
+
+# 检索、生成等同步调用会阻塞事件循环，这些接口定义为普通函数，由 FastAPI 放到线程池执行
 @app.post("/search")
-async def search(query: SearchQuery):
+def search(query: SearchQuery):
     """单条查询接口
 
     Args:
         query: 搜索查询参数
 
     Returns:
-        检索结果列表
+        检索结果列表；分页时附带 total 和 next_cursor（最后一页为 null）
     """
     if not retriever:
         raise HTTPException(status_code=500, detail="检索器未初始化")
+    if query.page_size is not None and query.page_size < 1:
+        raise HTTPException(status_code=400, detail="page_size 必须大于 0")
+    _check_mmr_lambda(query.mmr_lambda)
+
+    # 每页都检索完整的 top_k 再切片，保证翻页期间排序一致；检索开销由索引扫描决定，与 top_k 关系不大
+    paginate = query.page_size is not None or query.cursor is not None
+    offset, page_size = 0, query.page_size
+    if query.cursor:
+        offset, cursor_page_size = _decode_cursor(query.cursor, _query_fingerprint(query))
+        page_size = page_size or cursor_page_size
 
     try:
-        results = retriever.retrieve(
-            query=query.query,
-            top_k=query.top_k,
-            min_score=query.min_score
-        )
-        formatted_results = format_retrieval_results(
-            results=results,
-            include_metadata=query.include_metadata
-        )
-        return {"results": formatted_results}
+        with start_trace() as trace:
+            with span("api_search"):
+                results = retriever.retrieve(
+                    query=query.query,
+                    top_k=query.top_k,
+                    min_score=query.min_score,
+                    collection=query.collection,
+                    include_texts=query.response_mode != "ids",
+                    mmr_lambda=query.mmr_lambda
+                )
+                page = results[offset:offset + page_size] if paginate else results
+                formatted_results = format_retrieval_results(
+                    results=page,
+                    include_metadata=query.include_metadata,
+                    mode=query.response_mode,
+                    snippet_chars=config.SNIPPET_CHARS,
+                    start_rank=offset + 1
+                )
+        response = {"results": formatted_results}
+        if paginate:
+            next_offset = offset + page_size
+            response["total"] = len(results)
+            response["next_cursor"] = (
+                _encode_cursor(next_offset, page_size, _query_fingerprint(query))
+                if next_offset < len(results) else None
+            )
+        if query.include_timings:
+            response["timings"] = trace.as_dict()
+        return response
+    except (CollectionNotFoundError, InvalidCollectionNameError) as e:
+        raise _collection_error(e)
     except Exception as e:
         logger.error(f"搜索失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/batch-search")
-async def batch_search(query: BatchSearchQuery):
+def batch_search(query: BatchSearchQuery):
     """批量查询接口
 
     Args:
         query: 批量搜索查询参数
 
     Returns:
-        每个查询的检索结果列表
+        每个查询的检索结果列表；dedupe 为True时文本放在共享的 documents 表中（键为文档 id）
     """
     if not retriever:
         raise HTTPException(status_code=500, detail="检索器未初始化")
+    _check_mmr_lambda(query.mmr_lambda)
 
     try:
         all_results = retriever.batch_retrieve(
             queries=query.queries,
             top_k=query.top_k,
-            min_score=query.min_score
+            min_score=query.min_score,
+            collection=query.collection,
+            include_texts=query.response_mode != "ids",
+            mmr_lambda=query.mmr_lambda
         )
         formatted_results = [
-            format_retrieval_results(results, query.include_metadata)
+            format_retrieval_results(results, query.include_metadata, query.response_mode, config.SNIPPET_CHARS)
             for results in all_results
         ]
-        return {"results": formatted_results}
+        response = {"results": formatted_results}
+        if query.dedupe and query.response_mode != "ids":
+            response["documents"] = dedupe_documents(formatted_results)
+        return response
+    except (CollectionNotFoundError, InvalidCollectionNameError) as e:
+        raise _collection_error(e)
     except Exception as e:
         logger.error(f"批量搜索失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # 弱比较：忽略 W/ 前缀（压缩中间件可能把强 ETag 改为弱 ETag）
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+@app.get("/documents/{doc_id}")
+def get_document(doc_id: int, request: Request, collection: Optional[str] = None):
+    """按 id 获取文档全文，配合 response_mode=ids/snippet 的检索结果使用
+
+    响应带 ETag（文本内容摘要）和 Cache-Control，客户端凭 If-None-Match 重新验证时未变化的文档返回 304。
+
+    Args:
+        doc_id: 检索结果中的文档 id
+        collection: 集合名称，为空时使用默认集合
+    """
+    if not retriever:
+        raise HTTPException(status_code=500, detail="检索器未初始化")
+
+    try:
+        document = retriever.get_documents([doc_id], collection)[0]
+    except DocumentNotFoundError:
+        raise HTTPException(status_code=404, detail=f"文档不存在：{doc_id}")
+    except (CollectionNotFoundError, InvalidCollectionNameError) as e:
+        raise _collection_error(e)
+    except Exception as e:
+        logger.error(f"获取文档失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    etag = '"' + hashlib.sha1(document["text"].encode("utf-8")).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={config.DOCUMENT_CACHE_MAX_AGE}"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    content = {"id": document["index"], "text": document["text"]}
+    if "tokens" in document:
+        content["tokens"] = document["tokens"]
+    return JSONResponse(content=content, headers=headers)
+
 class AskQuery(BaseModel):
     """问答查询模型"""
     query: str
     compare: bool = True
+    include_timings: bool = False
+    collection: Optional[str] = None
+
+def _references(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{"text": doc["text"], "score": doc["score"]} for doc in documents]
+
+def _answer(query: AskQuery) -> Dict[str, Any]:
+    """生成问答响应（RAG 回答及可选的直接 LLM 回答）"""
+    # 使用RAG系统回答
+    logger.info(f"处理问题: {query.query}")
+    rag_result = rag_pipeline.process(query.query, collection=query.collection)
+
+    response = {
+        "rag_response": {
+            "query": rag_result["query"],
+            "answer": rag_result["answer"],
+            "references": _references(rag_result["retrieved_documents"]),
+            # 为 True 时回答是知识库中的已审核回答，未调用 LLM
+            "precomputed": "precomputed" in rag_result
+        }
+    }
+    if "precomputed" in rag_result:
+        response["rag_response"]["precomputed_match"] = rag_result["precomputed"]
+
+    # 如果需要对比，添加直接LLM回答
+    if query.compare:
+        if rag_result["metadata"].get("no_context"):
+            # 自适应检索没有找到相关文档时 RAG 回答即直接回答，提示词相同，不再重复调用
+            direct_answer = rag_result["answer"]
+        else:
+            logger.info("生成直接LLM回答进行对比")
+            direct_answer = llm.generate(PromptTemplate.direct_prompt(query.query))
+
+        response["direct_response"] = {
+            "answer": direct_answer
+        }
+
+    return response
 
 @app.post("/api/ask")
-async def ask(query: AskQuery):
+def ask(query: AskQuery):
     """问答接口，支持RAG和直接LLM对比
 
     Args:
@@ -141,40 +381,290 @@ async def ask(query: AskQuery):
         raise HTTPException(status_code=500, detail="系统未初始化")
 
     try:
-        # 使用RAG系统回答
-        logger.info(f"处理问题: {query.query}")
-        rag_result = rag_pipeline.process(query.query)
-
-        response = {
-            "rag_response": {
-                "query": rag_result["query"],
-                "answer": rag_result["answer"],
-                "references": [
-                    {
-                        "text": doc["text"],
-                        "score": doc["score"]
-                    }
-                    for doc in rag_result["retrieved_documents"]
-                ]
-            }
-        }
+        with start_trace() as trace, span("api_ask"):
+            response = _answer(query)
+        if query.include_timings:
+            # 各阶段耗时（毫秒）
+            response["timings"] = trace.as_dict()
+        return response
 
-        # 如果需要对比，添加直接LLM回答
-        if query.compare:
-            logger.info("生成直接LLM回答进行对比")
-            direct_prompt = f"""你是一个专业的法律顾问。请回答用户的问题。如果不确定答案，请明确说明。请不要编造信息。
+    except (CollectionNotFoundError, InvalidCollectionNameError) as e:
+        raise _collection_error(e)
+    except Exception as e:
+        logger.error(f"问答失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-用户问题：{query.query}
+def _sse(event: str, data: Any) -> str:
+    """一条 Server-Sent Events 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-请给出专业、准确的回答："""
-            direct_answer = llm.generate(direct_prompt)
+class _StoppableStream:
+    """在线程池中逐个读取的同步生成器，stop 可在其他线程调用
 
-            response["direct_response"] = {
-                "answer": direct_answer
-            }
+    正在读取时不能关闭生成器，由读取线程读完当前元素后关闭；关闭 RAG 流即关闭上游 LLM 连接。
+    """
 
-        return response
+    def __init__(self, iterator):
+        self._iterator = iterator
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._closed = False
+
+    def next(self):
+        """下一个元素，结束或已停止时返回 None"""
+        with self._lock:
+            item = None if self._stopped else next(self._iterator, None)
+        if self._stopped:
+            self.stop()
+        return item
+
+    def stop(self):
+        self._stopped = True
+        if self._lock.acquire(blocking=False):
+            try:
+                if not self._closed:
+                    self._closed = True
+                    self._iterator.close()
+            finally:
+                self._lock.release()
 
+def _direct_answer(question: str, stop: threading.Event) -> Optional[str]:
+    """对比模式的直接 LLM 回答；流式生成，请求中止后在下一个片段处关闭流（上游连接随之关闭）"""
+    chunks = llm.stream(PromptTemplate.direct_prompt(question))
+    parts = []
+    try:
+        for chunk in chunks:
+            if stop.is_set():
+                return None
+            parts.append(chunk)
+    finally:
+        chunks.close()
+    return "".join(parts).strip()
+
+@app.post("/api/ask/stream")
+def ask_stream(query: AskQuery):
+    """流式问答接口（text/event-stream）
+
+    检索完成后立即推送参考文档，随后逐段推送 RAG 回答；对比模式的直接 LLM 回答与 RAG 回答并行生成，
+    在 RAG 回答结束后推送。客户端断开时关闭 RAG 回答和直接回答的 LLM 流式请求，不再继续生成。
+
+    事件::
+
+        references  {"query": 问题, "references": [{"text", "score"}]}
+        token       {"text": 回答片段}
+        done        {"answer": 完整回答, "metadata": token 用量等, "precomputed": 匹配的问题等（仅命中预计算回答时）}
+        direct      {"answer": 直接 LLM 回答}（仅对比模式；没有相关文档时与 RAG 回答相同）
+        error       {"detail": 错误信息}
+    """
+    if not rag_pipeline or not llm:
+        raise HTTPException(status_code=500, detail="系统未初始化")
+
+    logger.info(f"处理问题: {query.query}")
+    events = rag_pipeline.stream(query.query, collection=query.collection)
+    # 检索在开始响应前完成，集合错误仍以状态码返回
+    try:
+        first = next(events)
+    except (CollectionNotFoundError, InvalidCollectionNameError) as e:
+        raise _collection_error(e)
     except Exception as e:
         logger.error(f"问答失败: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    # 自适应检索没有相关文档时 RAG 回答即直接回答，对比模式不再单独生成
+    no_context = rag_pipeline.is_no_context(first[1])
+    direct = None
+    stop_direct = threading.Event()
+    if query.compare and not no_context:
+        direct = direct_executor.submit(_direct_answer, query.query, stop_direct)
+    stream = _StoppableStream(events)
+
+    # 异步生成器：客户端断开时等待中的读取被取消，finally 随即停止两路生成（同步生成器要等到被回收）
+    async def body():
+        try:
+            yield _sse("references", {"query": query.query, "references": _references(first[1])})
+            while True:
+                item = await run_in_threadpool(stream.next)
+                if item is None:
+                    break
+                event, data = item
+                yield _sse(event, {"text": data} if event == "token" else data)
+                if event == "done" and query.compare and no_context:
+                    yield _sse("direct", {"answer": data["answer"]})
+            if direct is not None:
+                yield _sse("direct", {"answer": await asyncio.wrap_future(direct)})
+        except Exception as e:
+            logger.error(f"流式问答失败: {str(e)}")
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            stream.stop()
+            if direct is not None:
+                stop_direct.set()
+                direct.cancel()
+
+    # 禁止代理缓冲，保证逐段送达
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _check_admin(token: Optional[str]):
+    """管理接口鉴权：请求头 X-Admin-Token 与 ADMIN_TOKEN 一致；未配置 ADMIN_TOKEN 时拒绝所有请求"""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="管理接口未启用（未设置 ADMIN_TOKEN）")
+    if not token or not hmac.compare_digest(token.encode("utf-8"), config.ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="管理令牌无效")
+
+async def _save_upload(request: Request) -> str:
+    """把请求体流式写入上传文件，超过 INGEST_MAX_UPLOAD_MB 时返回 413"""
+    path = ingest_jobs.upload_path()
+    limit = config.INGEST_MAX_UPLOAD_MB * 2**20
+    size = 0
+    try:
+        with open(path, "wb") as f:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPException(status_code=413, detail=f"上传文件超过 {config.INGEST_MAX_UPLOAD_MB}MB")
+                f.write(chunk)
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+    if size == 0:
+        path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="请上传 JSONL 文件或指定 path")
+    return str(path)
+
+@app.post("/admin/ingest", status_code=202)
+async def submit_ingest(
+    request: Request,
+    collection: Optional[str] = None,
+    mode: Literal["replace", "append"] = "replace",
+    shards: int = 1,
+    dedup: bool = True,
+    path: Optional[str] = None,
+    x_admin_token: Optional[str] = Header(None)
+):
+    """提交后台入库任务，立即返回任务状态
+
+    知识库 JSONL 作为请求体上传，或用 path 指定服务器上的文件。任务在独立进程中构建新版本索引，
+    完成后原子切换为集合的当前版本，检索服务随后加载新版本，构建期间查询不受影响。
+
+    Args:
+        collection: 集合名称，为空时写入默认集合
+        mode: replace 用输入重建集合；append 追加到当前版本
+        shards: 分片数
+        dedup: 是否做近重复去重
+        path: 服务器上的 JSONL 文件路径，为空时读取请求体
+    """
+    _check_admin(x_admin_token)
+    upload = None
+    if path is None:
+        upload = await _save_upload(request)
+    try:
+        return ingest_jobs.submit(
+            collection, path or upload, mode=mode, shards=shards, dedup=dedup, remove_input=upload is not None
+        )
+    except (CollectionNotFoundError, InvalidCollectionNameError) as e:
+        error = _collection_error(e)
+    except IngestConflictError as e:
+        error = HTTPException(status_code=409, detail=str(e))
+    except (ValueError, FileNotFoundError) as e:
+        error = HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"提交入库任务失败: {str(e)}")
+        error = HTTPException(status_code=500, detail=str(e))
+    if upload is not None:
+        Path(upload).unlink(missing_ok=True)
+    raise error
+
+@app.get("/admin/ingest")
+async def list_ingest(x_admin_token: Optional[str] = Header(None)):
+    """最近的入库任务"""
+    _check_admin(x_admin_token)
+    return {"jobs": ingest_jobs.list()}
+
+@app.get("/admin/ingest/{job_id}")
+async def ingest_status(job_id: str, x_admin_token: Optional[str] = Header(None)):
+    """入库任务状态：state（queued/running/succeeded/failed）、stage、processed/total、
+    docs_per_second、eta_seconds，完成后附带 result（新版本 id、记录数等）或 error
+    """
+    _check_admin(x_admin_token)
+    try:
+        return ingest_jobs.status(job_id)
+    except IngestJobNotFoundError:
+        raise HTTPException(status_code=404, detail=f"入库任务不存在：{job_id}")
+
+def _embedding_collections():
+    """本进程的集合管理器；使用远程检索时只读写磁盘上的版本指针，检索服务按 CURRENT 加载新版本"""
+    return getattr(retriever, "collections", None) or ingest_jobs.collections
+
+@app.get("/admin/embedding")
+def embedding_status(collection: Optional[str] = None, x_admin_token: Optional[str] = Header(None)):
+    """集合当前版本与候选版本的向量模型和维度，以及影子比较结果（开启 EMBEDDING_SHADOW 且使用本地检索时）"""
+    _check_admin(x_admin_token)
+    manager = _embedding_collections()
+    try:
+        status = manager.embedding_status(collection)
+    except (CollectionNotFoundError, InvalidCollectionNameError) as e:
+        raise _collection_error(e)
+    shadow = getattr(retriever, "shadow", None)
+    status["shadow"] = shadow.stats(status["collection"]) if shadow is not None else None
+    return status
+
+@app.post("/admin/embedding/reembed", status_code=202)
+def submit_reembed(model: str, collection: Optional[str] = None, x_admin_token: Optional[str] = Header(None)):
+    """提交重新向量化任务：用新的向量模型在后台重建集合当前版本的向量，完成后登记为候选版本（不切换），
+    任务状态通过 /admin/ingest/{job_id} 查询
+
+    Args:
+        model: 新的向量模型名称
+        collection: 集合名称，为空时使用默认集合
+    """
+    _check_admin(x_admin_token)
+    try:
+        return ingest_jobs.submit_reembed(collection, model)
+    except (CollectionNotFoundError, InvalidCollectionNameError) as e:
+        raise _collection_error(e)
+    except IngestConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/admin/embedding/cutover")
+def embedding_cutover(collection: Optional[str] = None, x_admin_token: Optional[str] = Header(None)):
+    """把候选版本切换为集合的当前版本，之后的查询使用新的向量模型编码；集合有进行中的入库任务时拒绝切换"""
+    _check_admin(x_admin_token)
+    manager = _embedding_collections()
+    name = collection or config.DEFAULT_COLLECTION
+    try:
+        job = ingest_jobs.active(name)
+        if job is not None:
+            raise HTTPException(status_code=409, detail=f"集合 {name} 有进行中的入库任务：{job['job_id']}")
+        result = manager.cutover(name)
+    except (CollectionNotFoundError, InvalidCollectionNameError) as e:
+        raise _collection_error(e)
+    except CandidateNotFoundError:
+        raise HTTPException(status_code=404, detail=f"集合 {name} 没有候选版本")
+    except StaleCandidateError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    shadow = getattr(retriever, "shadow", None)
+    if shadow is not None:
+        shadow.reset(name)
+    return result
+
+@app.delete("/admin/embedding/candidate")
+def discard_candidate(collection: Optional[str] = None, x_admin_token: Optional[str] = Header(None)):
+    """取消并删除集合的候选版本"""
+    _check_admin(x_admin_token)
+    manager = _embedding_collections()
+    name = collection or config.DEFAULT_COLLECTION
+    try:
+        version = manager.discard_candidate(name)
+    except InvalidCollectionNameError as e:
+        raise _collection_error(e)
+    except CandidateNotFoundError:
+        raise HTTPException(status_code=404, detail=f"集合 {name} 没有候选版本")
+    shadow = getattr(retriever, "shadow", None)
+    if shadow is not None:
+        shadow.reset(name)
+    return {"collection": name, "discarded": version}
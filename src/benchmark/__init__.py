@@ -0,0 +1,3 @@
+"""
+This module provides benchmark scripts for the RAG system.
+"""
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""自适应检索深度基准
+
+用法::
+
+    python -m src.benchmark.adaptive --encoder model
+    python -m src.benchmark.adaptive --encoder model --fetch-k 8 --high-score 0.9 --gap 0.08 --margin 0.15
+
+用知识库问题（来源记录已知）和若干与法律无关的问题检索，比较固定 TOP_K 与自适应深度：
+每个问题使用的文档数分布、上下文 token 数、来源记录在所用文档中的比例、不带参考文档直接回答的比例，
+以及两种方式的检索延迟。哈希编码器的相似度没有语义，仅用于检查流程，质量指标应使用 --encoder model。
+结果保存为 JSON（EVAL_OUTPUT_DIR/benchmarks）。
+"""
+import argparse
+import random
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from src.config import Config
+from src.rag.precomputed import extract_question
+from src.rag.prompt import PromptTemplate
+from src.retriever.adaptive import select_adaptive
+from src.benchmark.common import load_corpus, scale_corpus, latency_summary, environment_info, save_benchmark
+from src.benchmark.rag import build_store
+
+# 与知识库无关的问题，理想情况下没有文档超过相似度阈值
+OFF_TOPIC_QUERIES = [
+    "今天天气怎么样？",
+    "推荐几部好看的科幻电影",
+    "如何做一道红烧肉？",
+    "Python 中列表和元组有什么区别？",
+    "马拉松比赛前一周应该怎么训练？",
+    "太阳系有几颗行星？",
+]
+
+
+def measure(store, queries, sources, k: int, min_score: float, select=None):
+    """检索并统计文档数、上下文 token 数和来源记录命中率"""
+    for query in queries[:5]:
+        store.search(query, k=k, min_score=min_score)
+    latencies, depths, tokens, hits = [], [], [], 0
+    for query, source in zip(queries, sources):
+        start = time.perf_counter()
+        results = store.search(query, k=k, min_score=min_score)
+        if select is not None:
+            results = select(results)
+        latencies.append(time.perf_counter() - start)
+        depths.append(len(results))
+        tokens.append(sum(PromptTemplate.document_tokens(doc) + PromptTemplate.DOC_HEADER_TOKENS for doc in results))
+        if source is not None and any(doc["index"] == source for doc in results):
+            hits += 1
+    answerable = sum(1 for source in sources if source is not None)
+    summary = {
+        **latency_summary(latencies),
+        "depth_distribution": {str(depth): count for depth, count in sorted(Counter(depths).items())},
+        "mean_documents": round(float(np.mean(depths)), 3),
+        "mean_context_tokens": round(float(np.mean(tokens)), 1),
+        "source_recall": round(hits / answerable, 4) if answerable else None,
+        "no_context_rate": round(depths.count(0) / len(depths), 4),
+    }
+    off_topic = [depth for depth, source in zip(depths, sources) if source is None]
+    if off_topic:
+        summary["off_topic_no_context_rate"] = round(off_topic.count(0) / len(off_topic), 4)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自适应检索深度基准")
+    parser.add_argument("--corpus", type=Path, default=Config.BASE_DIR / "part.jsonl", help="知识库 JSONL 文件")
+    parser.add_argument("--size", type=int, default=0, help="将语料扩展到指定条数（0 表示不扩展）")
+    parser.add_argument("--encoder", choices=["model", "hash"], default="model")
+    parser.add_argument("--dim", type=int, default=768, help="哈希编码器的向量维度")
+    parser.add_argument("--queries", type=int, default=500, help="知识库问题条数")
+    parser.add_argument("--top-k", type=int, default=Config.TOP_K, help="固定深度")
+    parser.add_argument("--min-score", type=float, default=Config.MIN_SIMILARITY_SCORE)
+    parser.add_argument("--fetch-k", type=int, default=Config.ADAPTIVE_FETCH_K)
+    parser.add_argument("--max-k", type=int, default=Config.ADAPTIVE_MAX_K)
+    parser.add_argument("--high-score", type=float, default=Config.ADAPTIVE_HIGH_SCORE)
+    parser.add_argument("--gap", type=float, default=Config.ADAPTIVE_SCORE_GAP)
+    parser.add_argument("--margin", type=float, default=Config.ADAPTIVE_SCORE_MARGIN)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", type=Path, default=None)
+    args = parser.parse_args()
+
+    config = Config()
+    config.ADAPTIVE_MAX_K = args.max_k
+    config.ADAPTIVE_HIGH_SCORE = args.high_score
+    config.ADAPTIVE_SCORE_GAP = args.gap
+    config.ADAPTIVE_SCORE_MARGIN = args.margin
+
+    texts, questions = load_corpus(args.corpus)
+    if args.size:
+        texts, questions = scale_corpus(texts, questions, args.size)
+    store = build_store(texts, args.encoder, config, args.dim)
+    store.create_index(texts)
+
+    rows = random.Random(args.seed).sample(range(len(questions)), min(args.queries, len(questions)))
+    queries = [extract_question(questions[row]) for row in rows] + OFF_TOPIC_QUERIES
+    sources = rows + [None] * len(OFF_TOPIC_QUERIES)
+
+    fixed = measure(store, queries, sources, args.top_k, args.min_score)
+    adaptive = measure(store, queries, sources, args.fetch_k, args.min_score,
+                       select=lambda results: select_adaptive(results, config))
+    for name, summary in (("固定深度", fixed), ("自适应", adaptive)):
+        print(f"{name:<6} 平均文档 {summary['mean_documents']}  上下文 token {summary['mean_context_tokens']}  "
+              f"来源命中 {summary['source_recall']:.2%}  直接回答 {summary['no_context_rate']:.2%}  "
+              f"p50 {summary['p50_ms']}ms  文档数分布 {summary['depth_distribution']}")
+
+    result = {
+        "benchmark": "adaptive",
+        "environment": environment_info(),
+        "parameters": {
+            "corpus": str(args.corpus),
+            "size": len(texts),
+            "encoder": args.encoder if args.encoder == "hash" else config.EMBEDDING_MODEL,
+            "queries": len(rows),
+            "off_topic_queries": len(OFF_TOPIC_QUERIES),
+            "top_k": args.top_k,
+            "min_score": args.min_score,
+            "fetch_k": args.fetch_k,
+            "max_k": args.max_k,
+            "high_score": args.high_score,
+            "gap": args.gap,
+            "margin": args.margin,
+            "seed": args.seed,
+        },
+        "fixed": fixed,
+        "adaptive": adaptive,
+        "context_token_reduction": round(1 - adaptive["mean_context_tokens"] / fixed["mean_context_tokens"], 4)
+        if fixed["mean_context_tokens"] else None,
+    }
+    path = save_benchmark(result, "adaptive", args.output_dir)
+    print(f"结果已保存到: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""法条引用快速通道基准
+
+用法::
+
+    python -m src.benchmark.citation --size 20000 --encoder hash
+    python -m src.benchmark.citation --encoder model
+
+从语料法律依据中收录的法条生成引用查询（中文数字 / 阿拉伯数字条号、带或不带书名号、
+「中华人民共和国」前缀、「的规定」后缀），分别测量查表（快速通道）与向量检索的延迟，
+并统计第一条结果的法律依据是否包含被查询法条（向量检索的该指标仅在 --encoder model 时有意义）。
+另测量入库时解析法条引用的耗时和非引用查询的识别开销。结果保存为 JSON（EVAL_OUTPUT_DIR/benchmarks）。
+"""
+import argparse
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.config import Config
+from src.document_processor.citations import build_citation_keys, extract_citations
+from src.benchmark.common import load_corpus, scale_corpus, latency_summary, environment_info, save_benchmark
+from src.benchmark.rag import build_store
+
+_CHINESE_DIGITS = "零一二三四五六七八九"
+
+
+def chinese_number(number: int) -> str:
+    """条号写成中文数字（小于一万），如 973 → 九百七十三、105 → 一百零五、15 → 十五"""
+    parts = []
+    pending_zero = False
+    for unit, name in ((1000, "千"), (100, "百"), (10, "十"), (1, "")):
+        digit = number // unit % 10
+        if digit:
+            if pending_zero and parts:
+                parts.append("零")
+            parts.append(_CHINESE_DIGITS[digit] + name)
+            pending_zero = False
+        else:
+            pending_zero = True
+    text = "".join(parts)
+    return text[1:] if text.startswith("一十") else text
+
+
+def citation_queries(citations, count: int, rng: random.Random):
+    """随机选取法条并生成不同写法的引用查询，返回 [(查询, 法条)]"""
+    queries = []
+    for _ in range(count):
+        law, article, sub = rng.choice(citations)
+        number = chinese_number(article) if rng.random() < 0.7 else str(article)
+        name = "中华人民共和国" + law if rng.random() < 0.2 else law
+        name = f"《{name}》" if rng.random() < 0.5 else name
+        query = f"{name}第{number}条" + (f"之{chinese_number(sub)}" if sub else "")
+        query += rng.choice(["", "", "的规定", "是什么", "？"])
+        queries.append((query, (law, article, sub)))
+    return queries
+
+
+def measure(store, queries, top_k: int):
+    """逐条检索的延迟，以及第一条结果的法律依据包含被查询法条的比例"""
+    for query, _ in queries[:5]:
+        store.search(query, k=top_k, min_score=-1.0)
+    latencies, hits = [], 0
+    for query, citation in queries:
+        start = time.perf_counter()
+        results = store.search(query, k=top_k, min_score=-1.0)
+        latencies.append(time.perf_counter() - start)
+        if results and citation in extract_citations(results[0]["text"]):
+            hits += 1
+    summary = latency_summary(latencies)
+    summary["p50_us"] = round(summary["p50_ms"] * 1000, 1)
+    return summary, round(hits / len(queries), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="法条引用快速通道基准")
+    parser.add_argument("--corpus", type=Path, default=Config.BASE_DIR / "part.jsonl", help="知识库 JSONL 文件")
+    parser.add_argument("--size", type=int, default=20000, help="将语料扩展到指定条数")
+    parser.add_argument("--encoder", choices=["model", "hash"], default="hash")
+    parser.add_argument("--dim", type=int, default=768, help="哈希编码器的向量维度")
+    parser.add_argument("--queries", type=int, default=500, help="引用查询条数")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", type=Path, default=None)
+    args = parser.parse_args()
+
+    config = Config()
+    rng = random.Random(args.seed)
+    texts, questions = load_corpus(args.corpus)
+    texts, questions = scale_corpus(texts, questions, args.size)
+
+    start = time.perf_counter()
+    keys, metadata = build_citation_keys(texts)
+    build_seconds = time.perf_counter() - start
+    citations = sorted({citation for text in set(texts) for citation in extract_citations(text)})
+    print(f"语料 {len(texts)} 条，收录法条 {len(citations)} 个，引用 {metadata['count']} 条，解析耗时 {build_seconds:.3f}s")
+
+    store = build_store(texts, args.encoder, config, args.dim)
+    store.create_index(texts)
+    queries = citation_queries(citations, args.queries, rng)
+
+    store.citation_fast_path = True
+    fast, fast_hit_rate = measure(store, queries, args.top_k)
+    store.citation_fast_path = False
+    dense, dense_hit_rate = measure(store, queries, args.top_k)
+    store.citation_fast_path = True
+    print(f"查表      p50 {fast['p50_us']}µs  p95 {fast['p95_ms']}ms  首条命中率 {fast_hit_rate:.2%}")
+    print(f"向量检索  p50 {dense['p50_ms']}ms  p95 {dense['p95_ms']}ms  首条命中率 {dense_hit_rate:.2%}")
+
+    # 非引用查询只多一次正则匹配
+    detection = []
+    for question in rng.sample(questions, min(len(questions), args.queries)):
+        query = question.split("<问题>：")[-1].strip()
+        start = time.perf_counter()
+        store.match_citation(query)
+        detection.append(time.perf_counter() - start)
+    detection = {
+        "count": len(detection),
+        "p50_us": round(float(np.percentile(detection, 50)) * 1e6, 2),
+        "p99_us": round(float(np.percentile(detection, 99)) * 1e6, 2),
+    }
+    print(f"非引用查询的识别开销 p50 {detection['p50_us']}µs  p99 {detection['p99_us']}µs")
+
+    result = {
+        "benchmark": "citation",
+        "environment": environment_info(),
+        "parameters": {
+            "corpus": str(args.corpus),
+            "size": len(texts),
+            "encoder": args.encoder if args.encoder == "hash" else config.EMBEDDING_MODEL,
+            "queries": len(queries),
+            "top_k": args.top_k,
+            "seed": args.seed,
+        },
+        "index": {
+            "laws": len(metadata["laws"]),
+            "articles": len(citations),
+            "citations": metadata["count"],
+            "build_seconds": round(build_seconds, 3),
+        },
+        "fast_path": {**fast, "top1_hit_rate": fast_hit_rate},
+        "dense": {**dense, "top1_hit_rate": dense_hit_rate},
+        "speedup_p50": round(dense["p50_ms"] / fast["p50_ms"], 1) if fast["p50_ms"] else None,
+        "non_citation_detection": detection,
+    }
+    path = save_benchmark(result, "citation", args.output_dir)
+    print(f"结果已保存到: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""基准测试公共工具：内存统计、分位数、合成语料、确定性编码器和结果保存"""
+from typing import List, Dict, Any, Optional, Sequence
+from datetime import datetime
+from pathlib import Path
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+
+import numpy as np
+
+from src.config import Config
+from src.document_processor.loader import DocumentLoader
+
+
+def _proc_status_mb(field: str) -> Optional[float]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB）
+
+    优先读取 /proc/self/status 中的 VmHWM：ru_maxrss 会在 fork/exec 时继承父进程的值，
+    对子进程测量不准确。
+    """
+    peak = _proc_status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    # Linux 下 ru_maxrss 单位为 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def anon_rss_mb() -> float:
+    """当前匿名内存（MB）。内存映射的文件页可被内核回收，不计入此项"""
+    return _proc_status_mb("RssAnon") or 0.0
+
+
+def latency_summary(seconds: Sequence[float]) -> Dict[str, float]:
+    """延迟分布统计（毫秒）"""
+    if not seconds:
+        return {"count": 0}
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    return {
+        "count": int(len(ms)),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def git_commit() -> str:
+    """当前 git 提交（短哈希），不在仓库中时返回 unknown"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Config.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def environment_info() -> Dict[str, Any]:
+    """运行环境信息，便于跨机器比较结果"""
+    import faiss
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "faiss": getattr(faiss, "__version__", "unknown"),
+        "git_commit": git_commit(),
+    }
+
+
+def save_benchmark(result: Dict[str, Any], name: str, output_dir: Optional[Path] = None) -> Path:
+    """保存基准结果为 JSON，文件名包含时间戳和 git 提交"""
+    output_dir = Path(output_dir or Config.EVAL_OUTPUT_DIR / "benchmarks")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = output_dir / f"{name}_{timestamp}_{result.get('environment', {}).get('git_commit', 'unknown')}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_corpus(path: Path):
+    """加载知识库文件，返回 (文本列表, 问题列表)"""
+    loader = DocumentLoader(path)
+    documents = loader.load_documents()
+    return loader.get_texts(), [doc.input for doc in documents]
+
+
+def scale_corpus(texts: List[str], questions: List[str], size: int):
+    """将语料按原样循环扩展到 size 条，每条追加编号保证文本互不相同"""
+    if size <= len(texts):
+        return texts[:size], questions[:size]
+    scaled_texts, scaled_questions = [], []
+    for i in range(size):
+        j = i % len(texts)
+        suffix = f"（样本 {i // len(texts)}）" if i >= len(texts) else ""
+        scaled_texts.append(texts[j] + suffix)
+        scaled_questions.append(questions[j])
+    return scaled_texts, scaled_questions
+
+
+class HashingEncoder:
+    """确定性的字符二元组哈希编码器
+
+    提供与 SentenceTransformer.encode 相同的接口，不依赖模型文件和网络，
+    用于在大规模合成语料上测量索引和检索本身的性能（检索质量没有参考意义）。
+    """
+
+    def __init__(self, dimension: int = 768):
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def _encode_one(self, text: str) -> np.ndarray:
+        codepoints = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        if len(codepoints) < 2:
+            codepoints = np.concatenate([codepoints, np.zeros(2, dtype=np.uint64)])
+        buckets = (codepoints[:-1] * np.uint64(1000003) + codepoints[1:]) % np.uint64(self.dimension)
+        return np.bincount(buckets.astype(np.int64), minlength=self.dimension).astype(np.float32)
+
+    def encode(self, texts, normalize_embeddings: bool = False, batch_size: int = 32, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        vectors = np.vstack([self._encode_one(text) for text in texts]) if len(texts) else \
+            np.zeros((0, self.dimension), dtype=np.float32)
+        if normalize_embeddings and len(texts):
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.maximum(norms, 1e-12)
+        return vectors
@@ -0,0 +1,68 @@
+"""批量生成吞吐基准：在本地模拟服务上测量不同并发数下 batch_generate 的吞吐
+
+用法::
+
+    python -m src.benchmark.llm_batch --prompts 64 --latency 0.2 --workers 1 2 4 8 16
+    python -m src.benchmark.llm_batch --backend openai_compatible
+"""
+import argparse
+import json
+import time
+
+from src.config import Config
+from src.llm.factory import create_llm
+from src.llm.mock_server import start_mock_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量生成吞吐基准（本地模拟服务，无需网络）")
+    parser.add_argument("--backend", choices=["openai", "openai_compatible"], default="openai")
+    parser.add_argument("--prompts", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.2, help="模拟服务每个请求的延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="模拟 429 错误的概率")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--rpm", type=int, default=0, help="每分钟请求数上限")
+    parser.add_argument("--tpm", type=int, default=0, help="每分钟 token 数上限")
+    parser.add_argument("--output", default=None, help="结果 JSON 文件路径")
+    args = parser.parse_args()
+
+    server, api_base = start_mock_server(latency=args.latency, error_rate=args.error_rate)
+    prompts = [f"第 {i} 个问题：合伙人退伙后能否追偿？" for i in range(args.prompts)]
+
+    results = []
+    for workers in args.workers:
+        config = Config()
+        config.LLM_BACKEND = args.backend
+        config.OPENAI_API_KEY = config.OPENAI_API_KEY or "mock"
+        config.OPENAI_API_BASE = api_base
+        config.LLM_API_BASE = api_base
+        config.LLM_POOL_SIZE = workers
+        config.LLM_MAX_CONCURRENCY = workers
+        config.LLM_REQUESTS_PER_MINUTE = args.rpm
+        config.LLM_TOKENS_PER_MINUTE = args.tpm
+        config.LLM_RETRY_BASE_DELAY = 0.05
+        llm = create_llm(config)
+
+        start = time.perf_counter()
+        answers = llm.batch_generate(prompts)
+        elapsed = time.perf_counter() - start
+
+        # 结果顺序必须与输入一致
+        assert all(prompt[-20:] in answer for prompt, answer in zip(prompts, answers))
+        results.append({
+            "backend": args.backend,
+            "workers": workers,
+            "prompts": len(prompts),
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(len(prompts) / elapsed, 2),
+        })
+        print(f"并发 {workers:>3}: {elapsed:.2f}s, {len(prompts) / elapsed:.1f} req/s")
+
+    server.shutdown()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""API 压测工具：异步客户端，支持闭环（固定并发）和开环（固定到达率）两种模式
+
+先以模拟 LLM 启动服务（不调用真实 LLM，延迟可配置）::
+
+    python src/main.py --mock-llm --mock-llm-latency 0.8
+
+再逐级提高并发压测::
+
+    python -m src.benchmark.loadtest --endpoint search ask --mode closed --concurrency 1 4 16 64
+    python -m src.benchmark.loadtest --endpoint ask --mode open --rate 1 2 5 10 --duration 30
+
+每一级输出吞吐、延迟分位数和错误率，结果保存到 EVAL_OUTPUT_DIR/benchmarks。
+"""
+import argparse
+import asyncio
+import random
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+from src.config import Config
+from src.benchmark.common import load_corpus, latency_summary, environment_info, save_benchmark
+
+ENDPOINTS = {
+    "search": "/search",
+    "batch-search": "/batch-search",
+    "ask": "/api/ask",
+}
+
+
+def make_payload_factory(endpoint: str, questions: List[str], batch_size: int, seed: int) -> Callable[[], Dict[str, Any]]:
+    """按接口类型生成请求体"""
+    rng = random.Random(seed)
+    if endpoint == "search":
+        return lambda: {"query": rng.choice(questions)}
+    if endpoint == "batch-search":
+        return lambda: {"queries": [rng.choice(questions) for _ in range(batch_size)]}
+    return lambda: {"query": rng.choice(questions), "compare": False}
+
+
+class StepStats:
+    """一级压测的统计"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.sent = 0
+
+    def record(self, latency: float, error: str = None):
+        if error:
+            self.errors[error] = self.errors.get(error, 0) + 1
+        else:
+            self.latencies.append(latency)
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        failed = sum(self.errors.values())
+        completed = len(self.latencies)
+        return {
+            "sent": self.sent,
+            "completed": completed,
+            "failed": failed,
+            "error_rate": round(failed / self.sent, 4) if self.sent else 0.0,
+            "throughput_rps": round(completed / duration, 2),
+            "latency": latency_summary(self.latencies),
+            "errors": self.errors,
+        }
+
+
+async def send(client: httpx.AsyncClient, path: str, payload: Dict[str, Any], stats: StepStats):
+    stats.sent += 1
+    start = time.perf_counter()
+    try:
+        response = await client.post(path, json=payload)
+        latency = time.perf_counter() - start
+        if response.status_code >= 400:
+            stats.record(latency, f"http_{response.status_code}")
+        else:
+            stats.record(latency)
+    except httpx.TimeoutException:
+        stats.record(time.perf_counter() - start, "timeout")
+    except httpx.HTTPError as e:
+        stats.record(time.perf_counter() - start, type(e).__name__)
+
+
+async def run_closed_loop(client, path, make_payload, concurrency: int, duration: float) -> StepStats:
+    """闭环：concurrency 个虚拟用户，每个收到响应后立即发送下一个请求"""
+    stats = StepStats()
+    deadline = time.perf_counter() + duration
+
+    async def user():
+        while time.perf_counter() < deadline:
+            await send(client, path, make_payload(), stats)
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return stats
+
+
+async def run_open_loop(client, path, make_payload, rate: float, duration: float, max_outstanding: int, seed: int) -> StepStats:
+    """开环：按泊松过程以 rate 请求/秒到达，不等待前一个请求完成
+
+    在途请求超过 max_outstanding 时新到达的请求记为 dropped，避免客户端自身过载。
+    """
+    stats = StepStats()
+    rng = random.Random(seed)
+    tasks = set()
+    start = time.perf_counter()
+    next_arrival = start
+    while next_arrival < start + duration:
+        await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+        if len(tasks) >= max_outstanding:
+            stats.sent += 1
+            stats.record(0.0, "dropped")
+        else:
+            task = asyncio.create_task(send(client, path, make_payload(), stats))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        next_arrival += rng.expovariate(rate)
+    if tasks:
+        await asyncio.gather(*tasks)
+    return stats
+
+
+async def run(args) -> Dict[str, Any]:
+    _, questions = load_corpus(args.queries)
+    levels = args.concurrency if args.mode == "closed" else args.rate
+    max_connections = max(int(l) for l in levels) if args.mode == "closed" else args.max_outstanding
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+    steps = []
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        for endpoint in args.endpoint:
+            path = ENDPOINTS[endpoint]
+            make_payload = make_payload_factory(endpoint, questions, args.batch_size, args.seed)
+            for level in levels:
+                if args.warmup:
+                    await run_closed_loop(client, path, make_payload, 1, args.warmup)
+                started = time.perf_counter()
+                if args.mode == "closed":
+                    stats = await run_closed_loop(client, path, make_payload, int(level), args.duration)
+                else:
+                    stats = await run_open_loop(client, path, make_payload, level, args.duration,
+                                                args.max_outstanding, args.seed)
+                elapsed = time.perf_counter() - started
+                step = {"endpoint": endpoint, "mode": args.mode, "level": level, **stats.summary(elapsed)}
+                steps.append(step)
+                lat = step["latency"]
+                print(f"{endpoint:<13} {args.mode} {level:>6}: {step['throughput_rps']:>8.2f} rps  "
+                      f"p50 {lat.get('p50_ms', 0):>9.1f}ms  p95 {lat.get('p95_ms', 0):>9.1f}ms  "
+                      f"p99 {lat.get('p99_ms', 0):>9.1f}ms  错误率 {step['error_rate']:.2%}")
+    return {
+        "benchmark": "loadtest",
+        "environment": environment_info(),
+        "parameters": {
+            "base_url": args.base_url,
+            "mode": args.mode,
+            "duration": args.duration,
+            "batch_size": args.batch_size,
+            "seed": args.seed,
+        },
+        "steps": steps,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API 压测工具")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", nargs="+", choices=list(ENDPOINTS), default=["search"])
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="闭环模式的并发用户数")
+    parser.add_argument("--rate", type=float, nargs="+", default=[1, 5, 10, 20], help="开环模式的到达率（请求/秒）")
+    parser.add_argument("--duration", type=float, default=20.0, help="每一级的持续时间（秒）")
+    parser.add_argument("--warmup", type=float, default=2.0, help="每一级之前的预热时间（秒）")
+    parser.add_argument("--max-outstanding", type=int, default=1000, help="开环模式的在途请求上限")
+    parser.add_argument("--batch-size", type=int, default=10, help="batch-search 每个请求的查询数")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--queries", type=Path, default=Config.BASE_DIR / "part.jsonl", help="查询来源（知识库 JSONL 的 input 字段）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", type=Path, default=None)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    path = save_benchmark(result, "loadtest", args.output_dir)
+    print(f"结果已保存到: {path}")
+
+
+if __name__ == "__main__":
+    main()
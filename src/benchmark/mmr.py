@@ -0,0 +1,146 @@
+"""MMR 多样性重排的延迟与多样性基准
+
+用法::
+
+    python -m src.benchmark.mmr --size 20000 --encoder hash --fetch-k 50 100 200 --lambdas 0.3 0.5 0.7
+
+对每个候选数分别测量：按相似度取 top-k（同样的候选数，索引检索开销相同）与 MMR 重排的检索延迟，
+二者之差即 MMR 带来的额外延迟；另统计单独的 mmr_select 耗时，以及选中结果的平均相关度和两两平均相似度（越低越多样）。
+查询向量预先编码，不计入延迟。结果保存为 JSON（EVAL_OUTPUT_DIR/benchmarks）。
+"""
+import argparse
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.config import Config
+from src.vectorstore.mmr import mmr_select
+from src.benchmark.common import load_corpus, scale_corpus, latency_summary, environment_info, save_benchmark
+from src.benchmark.rag import build_store
+
+
+def diversity(store, results) -> dict:
+    """选中结果的平均相关度和两两平均相似度"""
+    relevance, redundancy = [], []
+    for docs in results:
+        if len(docs) < 2:
+            continue
+        vectors = store.get_vectors([doc["index"] for doc in docs])
+        similarity = vectors @ vectors.T
+        mask = ~np.eye(len(docs), dtype=bool)
+        relevance.append(np.mean([doc["score"] for doc in docs]))
+        redundancy.append(similarity[mask].mean())
+    return {
+        "mean_relevance": round(float(np.mean(relevance)), 4) if relevance else None,
+        "mean_pairwise_similarity": round(float(np.mean(redundancy)), 4) if redundancy else None,
+    }
+
+
+def measure(store, query_vectors, k: int, fetch_k: int, mmr_lambda):
+    """逐条检索，返回 (延迟统计, 结果)"""
+    params = dict(k=k, min_score=-1.0, candidate_factor=1, max_candidates=None)
+    if mmr_lambda is None:
+        # 基线：同样取 fetch_k 个候选，按相似度截取前 k 个
+        params["max_candidates"] = fetch_k
+        params["candidate_factor"] = max(fetch_k // k, 1)
+    else:
+        params.update(mmr_lambda=mmr_lambda, mmr_fetch_k=fetch_k)
+    for vector in query_vectors[:5]:
+        store.search_by_vector(vector, **params)
+    latencies, results = [], []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        results.append(store.search_by_vector(vector, **params))
+        latencies.append(time.perf_counter() - start)
+    return latency_summary(latencies), results
+
+
+def measure_select(fetch_k: int, dimension: int, k: int, mmr_lambda: float, repeats: int = 200) -> dict:
+    """单独测量 mmr_select（相似度矩阵 + 贪心选取）的耗时"""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((fetch_k, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    relevance = np.sort(rng.random(fetch_k).astype(np.float32))[::-1]
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        mmr_select(relevance, vectors, k, mmr_lambda)
+        latencies.append(time.perf_counter() - start)
+    return latency_summary(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MMR 重排基准")
+    parser.add_argument("--corpus", type=Path, default=Config.BASE_DIR / "part.jsonl", help="知识库 JSONL 文件")
+    parser.add_argument("--size", type=int, default=20000, help="将语料扩展到指定条数")
+    parser.add_argument("--encoder", choices=["model", "hash"], default="hash")
+    parser.add_argument("--dim", type=int, default=768, help="哈希编码器的向量维度")
+    parser.add_argument("--queries", type=int, default=200, help="回放的查询条数")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--fetch-k", type=int, nargs="+", default=[50, 100, 200], help="MMR 候选数")
+    parser.add_argument("--lambdas", type=float, nargs="+", default=[0.5], help="MMR 相关度权重")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", type=Path, default=None)
+    args = parser.parse_args()
+
+    config = Config()
+    rng = random.Random(args.seed)
+    texts, questions = load_corpus(args.corpus)
+    texts, questions = scale_corpus(texts, questions, args.size)
+    store = build_store(texts, args.encoder, config, args.dim)
+    store.create_index(texts)
+    queries = [rng.choice(questions) for _ in range(args.queries)]
+    query_vectors = store.encode_queries(queries)
+    print(f"语料 {len(texts)} 条，查询 {len(queries)} 条，top_k {args.top_k}")
+
+    runs = []
+    for fetch_k in args.fetch_k:
+        baseline, baseline_results = measure(store, query_vectors, args.top_k, fetch_k, None)
+        runs.append({
+            "fetch_k": fetch_k,
+            "mmr_lambda": None,
+            "search": baseline,
+            **diversity(store, baseline_results),
+        })
+        print(f"候选 {fetch_k:>4}  按相似度  p50 {baseline['p50_ms']}ms  p95 {baseline['p95_ms']}ms")
+        for mmr_lambda in args.lambdas:
+            search, results = measure(store, query_vectors, args.top_k, fetch_k, mmr_lambda)
+            select = measure_select(fetch_k, store.index.d, args.top_k, mmr_lambda)
+            run = {
+                "fetch_k": fetch_k,
+                "mmr_lambda": mmr_lambda,
+                "search": search,
+                "added_p50_ms": round(search["p50_ms"] - baseline["p50_ms"], 3),
+                "added_p95_ms": round(search["p95_ms"] - baseline["p95_ms"], 3),
+                "mmr_select": select,
+                **diversity(store, results),
+            }
+            runs.append(run)
+            print(
+                f"候选 {fetch_k:>4}  MMR λ={mmr_lambda}  p50 {search['p50_ms']}ms (+{run['added_p50_ms']})  "
+                f"p95 {search['p95_ms']}ms (+{run['added_p95_ms']})  mmr_select p50 {select['p50_ms']}ms  "
+                f"两两相似度 {run['mean_pairwise_similarity']}"
+            )
+
+    result = {
+        "benchmark": "mmr",
+        "environment": environment_info(),
+        "parameters": {
+            "corpus": str(args.corpus),
+            "size": len(texts),
+            "encoder": args.encoder if args.encoder == "hash" else config.EMBEDDING_MODEL,
+            "dimension": int(store.index.d),
+            "queries": len(queries),
+            "top_k": args.top_k,
+            "seed": args.seed,
+        },
+        "runs": runs,
+    }
+    path = save_benchmark(result, "mmr", args.output_dir)
+    print(f"结果已保存到: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""查询规范化的开销与重复率基准
+
+用法::
+
+    python -m src.benchmark.normalize --logs "logs/*.log" --queries eval_queries.jsonl
+    python -m src.benchmark.normalize --synthetic 20000
+
+查询来源：服务日志中的问答请求（"处理问题: ..." 行）、查询文件（JSONL 的 query/input 字段或纯文本每行一条），
+或由知识库问题生成的合成变体（随机全角化、繁体化、增删空白和句末问号，问题按 Zipf 分布重复）。
+
+分别统计原始字符串、原有预处理（preprocess_text）和规范化（不转简体 / 转简体）之后的重复率，
+以及按规范形式做 LRU 缓存（QUERY_CACHE_SIZE 条）时的命中率；另测量每条查询的规范化耗时（微秒）。
+结果保存为 JSON（EVAL_OUTPUT_DIR/benchmarks）。
+"""
+from typing import Callable, Dict, List
+from collections import OrderedDict
+from pathlib import Path
+import argparse
+import glob
+import json
+import random
+import re
+import time
+
+import numpy as np
+
+from src.config import Config
+from src.document_processor.loader import DocumentLoader
+from src.document_processor.normalizer import QueryNormalizer
+from src.document_processor.t2s import TRADITIONAL_TO_SIMPLIFIED
+from src.benchmark.common import load_corpus, environment_info, save_benchmark
+
+_LOG_QUERY = re.compile(r"处理问题: (.+)$")
+
+
+def read_log_queries(pattern: str) -> List[str]:
+    """从服务日志中提取问答请求的问题"""
+    queries = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                match = _LOG_QUERY.search(line.rstrip("\n"))
+                if match:
+                    queries.append(match.group(1))
+    return queries
+
+
+def read_query_file(path: Path) -> List[str]:
+    """读取查询文件：JSONL（query 或 input 字段）或纯文本每行一条"""
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            if line.lstrip().startswith("{"):
+                item = json.loads(line)
+                line = item.get("query") or item.get("input") or ""
+            queries.append(line)
+    return queries
+
+
+def synthetic_queries(questions: List[str], count: int, rng: random.Random) -> List[str]:
+    """按 Zipf 分布重复抽取问题，并随机施加只改变写法、不改变语义的变换"""
+    simplified_to_traditional = {s: t for t, s in TRADITIONAL_TO_SIMPLIFIED.items()}
+    weights = 1 / np.arange(1, len(questions) + 1)
+    picks = rng.choices(questions, weights=weights.tolist(), k=count)
+    queries = []
+    for question in picks:
+        # 知识库的 input 字段是「法条 <问题>： 问题」，只取问题部分作为用户查询
+        query = question.split("<问题>：")[-1].strip().rstrip("？?")
+        if rng.random() < 0.5:
+            query += rng.choice(["？", "?", "？？", "", " ？"])
+        if rng.random() < 0.2:
+            query = "".join(simplified_to_traditional.get(char, char) for char in query)
+        if rng.random() < 0.2:
+            query = "".join(chr(ord(char) + 0xFEE0) if "!" <= char <= "~" else char for char in query)
+        if rng.random() < 0.2:
+            position = rng.randrange(len(query) + 1)
+            query = query[:position] + rng.choice([" ", "　", "  "]) + query[position:]
+        if rng.random() < 0.1:
+            query = " " + query + " "
+        queries.append(query)
+    return queries
+
+
+def duplicate_stats(queries: List[str], key: Callable[[str], str], cache_size: int) -> Dict[str, float]:
+    """重复率（1 - 不同键数 / 总数）与 LRU 缓存命中率"""
+    keys = [key(query) for query in queries]
+    cache: "OrderedDict[str, None]" = OrderedDict()
+    hits = 0
+    for k in keys:
+        if k in cache:
+            hits += 1
+            cache.move_to_end(k)
+        else:
+            cache[k] = None
+            if len(cache) > cache_size:
+                cache.popitem(last=False)
+    unique = len(set(keys))
+    return {
+        "unique": unique,
+        "duplicate_rate": round(1 - unique / len(keys), 4),
+        "cache_hit_rate": round(hits / len(keys), 4),
+    }
+
+
+def measure_latency(normalize: Callable[[str], str], queries: List[str], repeat: int) -> Dict[str, float]:
+    """每条查询的规范化耗时分布（微秒，取 repeat 次的平均值）"""
+    per_query = []
+    for query in queries:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            normalize(query)
+        per_query.append((time.perf_counter() - start) / repeat)
+    us = np.asarray(per_query) * 1e6
+    return {
+        "count": len(us),
+        "mean_us": round(float(us.mean()), 3),
+        "p50_us": round(float(np.percentile(us, 50)), 3),
+        "p95_us": round(float(np.percentile(us, 95)), 3),
+        "p99_us": round(float(np.percentile(us, 99)), 3),
+        "max_us": round(float(us.max()), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询规范化基准")
+    parser.add_argument("--logs", default=str(Config.BASE_DIR / "logs" / "*.log"), help="服务日志文件（glob）")
+    parser.add_argument("--queries", type=Path, nargs="*", default=[], help="查询文件（JSONL 或纯文本）")
+    parser.add_argument("--synthetic", type=int, default=0, help="追加的合成查询条数")
+    parser.add_argument("--corpus", type=Path, default=Config.BASE_DIR / "part.jsonl", help="合成查询使用的知识库")
+    parser.add_argument("--cache-size", type=int, default=Config.QUERY_CACHE_SIZE, help="模拟的查询缓存条数")
+    parser.add_argument("--repeat", type=int, default=20, help="测量耗时时每条查询的重复次数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", type=Path, default=None)
+    args = parser.parse_args()
+
+    sources = {"logs": read_log_queries(args.logs)}
+    for path in args.queries:
+        sources[str(path)] = read_query_file(path)
+    if args.synthetic:
+        _, questions = load_corpus(args.corpus)
+        sources["synthetic"] = synthetic_queries(questions, args.synthetic, random.Random(args.seed))
+    queries = [query for source in sources.values() for query in source]
+    if not queries:
+        parser.error("没有读到查询：请指定 --logs、--queries 或 --synthetic")
+    print("查询来源：" + "，".join(f"{name} {len(items)} 条" for name, items in sources.items()))
+
+    variants = {
+        "raw": lambda query: query,
+        "preprocess_text": DocumentLoader.preprocess_text,
+        "normalized": QueryNormalizer(to_simplified=False),
+        "normalized_simplified": QueryNormalizer(to_simplified=True),
+    }
+    duplicates = {}
+    for name, key in variants.items():
+        duplicates[name] = duplicate_stats(queries, key, args.cache_size)
+        print(
+            f"{name:<22} 不同查询 {duplicates[name]['unique']:>7}  重复率 {duplicates[name]['duplicate_rate']:.2%}  "
+            f"缓存命中率 {duplicates[name]['cache_hit_rate']:.2%}"
+        )
+
+    latency = {name: measure_latency(variants[name], queries, args.repeat)
+               for name in ("preprocess_text", "normalized_simplified")}
+    for name, stats in latency.items():
+        print(f"{name:<22} 耗时 p50 {stats['p50_us']}µs  p95 {stats['p95_us']}µs  p99 {stats['p99_us']}µs")
+
+    result = {
+        "benchmark": "normalize",
+        "environment": environment_info(),
+        "parameters": {
+            "sources": {name: len(items) for name, items in sources.items()},
+            "queries": len(queries),
+            "cache_size": args.cache_size,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "duplicates": duplicates,
+        "duplicate_rate_gain": round(
+            duplicates["normalized_simplified"]["duplicate_rate"] - duplicates["preprocess_text"]["duplicate_rate"], 4
+        ),
+        "latency": latency,
+    }
+    path = save_benchmark(result, "normalize", args.output_dir)
+    print(f"结果已保存到: {path}")
+
+
+if __name__ == "__main__":
+    main()
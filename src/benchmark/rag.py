@@ -0,0 +1,231 @@
+"""可复现的离线检索与端到端 RAG 基准
+
+用法::
+
+    # 使用 part.jsonl 和真实向量模型
+    python -m src.benchmark.rag --corpus part.jsonl --encoder model
+
+    # 合成语料扩展到 10 万条，使用确定性哈希编码器（无需模型文件和网络）
+    python -m src.benchmark.rag --size 100000 --encoder hash --concurrency 1 4 8
+
+    # 分片索引：4 个分片进程并发检索，协调器合并结果
+    python -m src.benchmark.rag --size 100000 --encoder hash --shards 4
+
+    # 比较两次运行
+    python -m src.benchmark.rag --compare old.json new.json
+
+统计指标：入库吞吐（docs/sec）、检索延迟 p50/p95/p99、不同并发下的 QPS、
+端到端 RAG 延迟（生成阶段使用确定性桩 LLM）以及峰值常驻内存。
+结果保存为 JSON（EVAL_OUTPUT_DIR/benchmarks），文件名包含 git 提交，便于跨提交比较。
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from src.config import Config
+from src.vectorstore.embeddings import VectorStore
+from src.retriever.vector_search import VectorRetriever
+from src.rag.pipeline import RAGPipeline
+from src.llm.stub import StubLLM
+from src.benchmark.common import (
+    HashingEncoder, load_corpus, scale_corpus, latency_summary,
+    peak_rss_mb, environment_info, save_benchmark,
+)
+
+
+def build_store(texts, encoder_name: str, config: Config, dimension: int) -> VectorStore:
+    if encoder_name == "hash":
+        return VectorStore("hashing-encoder", model=HashingEncoder(dimension))
+    return VectorStore(config.EMBEDDING_MODEL)
+
+
+def measure_ingestion(store: VectorStore, texts) -> dict:
+    # 与入库脚本一致地预计算 token 数（桩 LLM 按字符计数）
+    token_counts = np.fromiter((len(text) for text in texts), dtype=np.uint32, count=len(texts))
+    start = time.perf_counter()
+    store.create_index(texts, token_counts=token_counts)
+    elapsed = time.perf_counter() - start
+    return {
+        "documents": len(texts),
+        "seconds": round(elapsed, 3),
+        "docs_per_second": round(len(texts) / elapsed, 2),
+    }
+
+
+def measure_search(store: VectorStore, queries, top_k: int, min_score: float) -> dict:
+    # 预热，避免首次调用的初始化开销计入
+    for query in queries[:5]:
+        store.search(query, k=top_k, min_score=min_score)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        store.search(query, k=top_k, min_score=min_score)
+        latencies.append(time.perf_counter() - start)
+    return latency_summary(latencies)
+
+
+def measure_qps(fn, queries, concurrency: int) -> dict:
+    latencies = []
+
+    def timed(query):
+        start = time.perf_counter()
+        fn(query)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, queries))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "qps": round(len(queries) / elapsed, 2),
+        "latency": latency_summary(latencies),
+    }
+
+
+def compare(old_path: Path, new_path: Path):
+    """打印两次运行的主要指标对比"""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    def row(name, a, b):
+        change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+        print(f"{name:<32}{a:>14.3f}{b:>14.3f}{change:>10}")
+
+    print(f"{'指标':<30}{old['environment']['git_commit']:>14}{new['environment']['git_commit']:>14}")
+    row("ingestion docs/sec", old["ingestion"]["docs_per_second"], new["ingestion"]["docs_per_second"])
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        row(f"search {key}", old["search"][key], new["search"][key])
+    old_qps = {r["concurrency"]: r["qps"] for r in old["search_qps"]}
+    for r in new["search_qps"]:
+        if r["concurrency"] in old_qps:
+            row(f"search qps @{r['concurrency']}", old_qps[r["concurrency"]], r["qps"])
+    for key in ("p50_ms", "p95_ms"):
+        row(f"rag {key}", old["rag"][key], new["rag"][key])
+    row("peak rss MB", old["peak_rss_mb"], new["peak_rss_mb"])
+
+
+def measure_serving(store, queries, config, args):
+    """检索延迟、并发检索 QPS 和端到端 RAG 延迟"""
+    print("2. 检索延迟...")
+    search = measure_search(store, queries, config.TOP_K, config.MIN_SIMILARITY_SCORE)
+    print(f"   p50 {search['p50_ms']}ms  p95 {search['p95_ms']}ms  p99 {search['p99_ms']}ms")
+
+    print("3. 并发检索 QPS...")
+    search_qps = []
+    for concurrency in args.concurrency:
+        r = measure_qps(
+            lambda q: store.search(q, k=config.TOP_K, min_score=config.MIN_SIMILARITY_SCORE),
+            queries, concurrency
+        )
+        search_qps.append(r)
+        print(f"   并发 {concurrency}: {r['qps']} QPS")
+
+    print("4. 端到端 RAG（桩 LLM）...")
+    pipeline = RAGPipeline(
+        config,
+        llm=StubLLM(config, latency=args.llm_latency),
+        retriever=VectorRetriever(config, vector_store=store),
+        precomputed=False
+    )
+    rag_queries = queries[:args.rag_queries]
+    rag_latencies = []
+    for query in rag_queries:
+        start = time.perf_counter()
+        pipeline.process(query)
+        rag_latencies.append(time.perf_counter() - start)
+    rag = latency_summary(rag_latencies)
+    print(f"   p50 {rag['p50_ms']}ms  p95 {rag['p95_ms']}ms")
+
+    return {
+        "dimension": int(store.index.d),
+        "search": search,
+        "search_qps": search_qps,
+        "rag": rag,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线检索与端到端 RAG 基准")
+    parser.add_argument("--corpus", type=Path, default=Config.BASE_DIR / "part.jsonl", help="知识库 JSONL 文件")
+    parser.add_argument("--size", type=int, default=None, help="将语料扩展到指定条数（如 10000/100000/1000000）")
+    parser.add_argument("--encoder", choices=["model", "hash"], default="hash",
+                        help="model 使用 EMBEDDING_MODEL；hash 使用确定性哈希编码器")
+    parser.add_argument("--dim", type=int, default=768, help="哈希编码器的向量维度")
+    parser.add_argument("--queries", type=int, default=500, help="回放的查询条数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--rag-queries", type=int, default=100, help="端到端 RAG 回放条数")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="桩 LLM 的模拟延迟（秒）")
+    parser.add_argument("--shards", type=int, default=1, help="分片数，大于 1 时检索使用本机分片子进程")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, nargs=2, metavar=("OLD", "NEW"), help="比较两次运行结果")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    config = Config()
+    rng = random.Random(args.seed)
+
+    texts, questions = load_corpus(args.corpus)
+    if args.size:
+        texts, questions = scale_corpus(texts, questions, args.size)
+    queries = [rng.choice(questions) for _ in range(args.queries)]
+    print(f"语料 {len(texts)} 条，查询 {len(queries)} 条，编码器 {args.encoder}")
+
+    store = build_store(texts, args.encoder, config, args.dim)
+
+    print("1. 入库...")
+    ingestion = measure_ingestion(store, texts)
+    print(f"   {ingestion['docs_per_second']} docs/sec")
+
+    if args.shards > 1:
+        # 分片索引写入临时目录，结束后关闭分片进程并删除
+        with tempfile.TemporaryDirectory(prefix="rag-bench-shards-") as shard_dir:
+            store.save(Path(shard_dir), num_shards=args.shards)
+            sharded = VectorStore(store.model_name, model=store.model)
+            sharded.load(Path(shard_dir))
+            try:
+                measured = measure_serving(sharded, queries, config, args)
+            finally:
+                sharded.close()
+    else:
+        measured = measure_serving(store, queries, config, args)
+
+    result = {
+        "benchmark": "rag",
+        "environment": environment_info(),
+        "parameters": {
+            "corpus": str(args.corpus),
+            "size": len(texts),
+            "encoder": args.encoder if args.encoder == "hash" else config.EMBEDDING_MODEL,
+            "dimension": measured["dimension"],
+            "shards": args.shards,
+            "queries": len(queries),
+            "seed": args.seed,
+            "top_k": config.TOP_K,
+            "min_score": config.MIN_SIMILARITY_SCORE,
+            "llm_latency": args.llm_latency,
+        },
+        "ingestion": ingestion,
+        "search": measured["search"],
+        "search_qps": measured["search_qps"],
+        "rag": measured["rag"],
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+    path = save_benchmark(result, "rag", args.output_dir)
+    print(f"峰值内存 {result['peak_rss_mb']}MB，结果已保存到: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""索引包加载性能基准：二进制索引包 vs 旧的 pickle 格式
+
+用法::
+
+    python -m src.benchmark.storage --records 100000 --dim 768
+
+每种格式在独立子进程中加载，分别统计加载耗时和峰值常驻内存（ru_maxrss）。索引包的加载（内存映射，
+可选校验和）与构建 FAISS 索引（把向量复制进索引）分开计时和统计内存：前者与记录数无关地很快，
+后者的耗时和一份向量大小的内存增量是服务启动的主要开销。
+"""
+import argparse
+import json
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from src.config import Config
+from src.vectorstore import storage
+from src.benchmark.common import peak_rss_mb, anon_rss_mb
+
+
+def synthetic_texts(n: int, seed: int = 0):
+    """生成与知识库格式相近的合成文本"""
+    rng = np.random.default_rng(seed)
+    alphabet = np.array(list("合伙人债务承担连带责任清偿超过自己应当份额有权向其他追偿民法典条款规定公司设备安全管理维护检验"))
+    texts = []
+    for i in range(n):
+        body = "".join(rng.choice(alphabet, size=int(rng.integers(200, 800))))
+        texts.append(f"问题：第{i}个问题\n\n答案：{body}\n\n法律依据：\n1. 《民法典》第{i % 1260 + 1}条")
+    return texts
+
+
+def load_once(fmt: str, path: Path, verify: bool) -> dict:
+    """在当前进程中加载一次并返回统计结果"""
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if fmt == "pickle":
+        # 旧格式的向量在 index.faiss 中，读取即得到索引
+        index = faiss.read_index(str(path / storage.LEGACY_INDEX_FILE))
+        with open(path / storage.LEGACY_TEXTS_FILE, "rb") as f:
+            texts = pickle.load(f)
+        vectors = None
+    else:
+        bundle = storage.load_bundle(path, verify=verify)
+        vectors, texts = bundle.vectors, bundle.texts
+    elapsed = time.perf_counter() - start
+    # 访问一条文本，确认数据可用
+    _ = texts[len(texts) // 2]
+    loaded_rss = peak_rss_mb()
+
+    # 构建 FAISS 索引会把向量复制进索引，单独计时
+    build_seconds = 0.0
+    if vectors is not None:
+        start = time.perf_counter()
+        index = faiss.IndexFlatIP(vectors.shape[1])
+        index.add(vectors)
+        build_seconds = time.perf_counter() - start
+    return {
+        "format": fmt,
+        "verify": verify,
+        "records": len(texts),
+        "load_seconds": round(elapsed, 4),
+        "index_build_seconds": round(build_seconds, 4),
+        "load_rss_increase_mb": round(loaded_rss - baseline, 1),
+        "index_build_rss_increase_mb": round(peak_rss_mb() - loaded_rss, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "rss_increase_mb": round(peak_rss_mb() - baseline, 1),
+        "anon_rss_mb": round(anon_rss_mb(), 1),
+    }
+
+
+def run_in_subprocess(fmt: str, path: Path, verify: bool) -> dict:
+    cmd = [sys.executable, "-m", "src.benchmark.storage", "--load-only", fmt, "--path", str(path)]
+    if not verify:
+        cmd.append("--no-verify")
+    output = subprocess.run(cmd, check=True, capture_output=True, text=True, cwd=Config.BASE_DIR).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="索引包加载性能基准")
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--workdir", type=Path, default=None)
+    parser.add_argument("--output", type=Path, default=Config.EVAL_OUTPUT_DIR / "storage_benchmark.json")
+    parser.add_argument("--load-only", choices=["pickle", "bundle"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--no-verify", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.load_only:
+        print(json.dumps(load_once(args.load_only, args.path, not args.no_verify)))
+        return
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="storage_bench_"))
+    legacy_dir, bundle_dir = workdir / "legacy", workdir / "bundle"
+    legacy_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"生成 {args.records} 条合成记录，维度 {args.dim} ...")
+    texts = synthetic_texts(args.records)
+    vectors = np.random.default_rng(1).standard_normal((args.records, args.dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    index = faiss.IndexFlatIP(args.dim)
+    index.add(vectors)
+    faiss.write_index(index, str(legacy_dir / storage.LEGACY_INDEX_FILE))
+    with open(legacy_dir / storage.LEGACY_TEXTS_FILE, "wb") as f:
+        pickle.dump(texts, f)
+    storage.save_bundle(bundle_dir, vectors, texts)
+    del texts, vectors, index
+
+    results = [
+        run_in_subprocess("pickle", legacy_dir, verify=False),
+        run_in_subprocess("bundle", bundle_dir, verify=True),
+        run_in_subprocess("bundle", bundle_dir, verify=False),
+    ]
+    for r in results:
+        print(f"{r['format']:>6} verify={r['verify']!s:<5} 加载 {r['load_seconds']:.3f}s "
+              f"(+{r['load_rss_increase_mb']:.1f}MB)  构建索引 {r['index_build_seconds']:.3f}s "
+              f"(+{r['index_build_rss_increase_mb']:.1f}MB)  峰值内存 {r['peak_rss_mb']:.1f}MB  "
+              f"匿名内存 {r['anon_rss_mb']:.1f}MB")
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"records": args.records, "dim": args.dim, "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
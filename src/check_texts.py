@@ -1,19 +1,30 @@
-import pickle
+import sys
 from pathlib import Path
 
+# 添加项目根目录到Python路径
+current_dir = Path(__file__).parent.parent
+sys.path.append(str(current_dir))
+
+from src.vectorstore.storage import load_bundle, is_bundle, resolve_version
+
 def check_texts():
     # 加载保存的文本数据
-    texts_file = Path("data/vectors/faiss_index/texts.pkl")
-    print(f"正在读取文件: {texts_file}")
+    bundle_dir = resolve_version(Path("data/vectors/faiss_index"))
+    print(f"正在读取索引包: {bundle_dir}")
+    
+    if not is_bundle(bundle_dir):
+        print("未找到新格式索引包，如为旧格式 (texts.pkl) 请先运行 python src/convert_index.py")
+        return
     
-    with open(texts_file, "rb") as f:
-        texts = pickle.load(f)
+    bundle = load_bundle(bundle_dir, verify=True)
+    texts = bundle.texts
     
     print(f"\n总共加载了 {len(texts)} 条文本")
+    print(f"格式版本: {bundle.manifest['format_version']}，向量维度: {bundle.manifest['dimension']}")
     print("\n前两条文本的内容:")
     for i, text in enumerate(texts[:2]):
         print(f"\n--- 文本 {i+1} ---")
         print(text)
 
 if __name__ == "__main__":
-    check_texts() 
\ No newline at end of file
+    check_texts() 
@@ -19,19 +19,115 @@ class Config:
     CHUNK_OVERLAP = 200
     
     # 向量存储配置
-    EMBEDDING_MODEL = "moka-ai/m3e-base"  # 更换为专门的中文模型
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "moka-ai/m3e-base")  # 新建索引使用的向量模型；已有索引按其记录的模型加载
     VECTOR_DB_PATH = VECTOR_DIR / "faiss_index"
+    COLLECTIONS_DIR = VECTOR_DIR / "collections"  # 其他集合的索引目录，每个集合一个子目录
+    DEFAULT_COLLECTION = "default"  # 默认集合名称，对应 VECTOR_DB_PATH
+    COLLECTION_MEMORY_BUDGET_MB = int(os.getenv("COLLECTION_MEMORY_BUDGET_MB", "4096"))  # 常驻集合的内存预算，超出时按 LRU 淘汰
+    VERIFY_INDEX = os.getenv("VERIFY_INDEX", "false").lower() == "true"  # 服务加载索引时是否校验各文件的 sha256
+    ALLOW_LEGACY_INDEX = os.getenv("ALLOW_LEGACY_INDEX", "false").lower() == "true"  # 是否加载未转换的旧格式（pickle）索引
+    INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")  # 索引类型：flat（精确）、hnsw 或 ivf（近似）
+    HNSW_M = 32  # HNSW 每个节点的邻居数
+    HNSW_EF_SEARCH = 64  # HNSW 检索时的候选队列长度
+    IVF_NLIST = 0  # IVF 聚类中心数，0 表示按 4*sqrt(N) 自动选择
+    IVF_NPROBE = 8  # IVF 检索时访问的聚类数
+    
+    # 近重复折叠配置（入库时 MinHash + LSH 去重，检索时折叠候选结果）
+    DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))  # 估算的 Jaccard 相似度不低于该值视为近重复
+    DEDUP_NUM_PERM = 64  # MinHash 签名长度
+    DEDUP_BANDS = 8  # LSH 分段数
+    DEDUP_SHINGLE_SIZE = 5  # 字符 n-gram 长度
+    COLLAPSE_DUPLICATES = os.getenv("COLLAPSE_DUPLICATES", "true").lower() == "true"  # 检索结果中是否折叠近重复文本
+    
+    # 查询规范化与缓存配置
+    QUERY_TO_SIMPLIFIED = os.getenv("QUERY_TO_SIMPLIFIED", "true").lower() == "true"  # 查询规范化时是否繁体转简体
+    QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))  # 查询向量缓存条数（按规范化查询），0 表示不缓存
+    CITATION_FAST_PATH = os.getenv("CITATION_FAST_PATH", "true").lower() == "true"  # 法条引用查询（如「民法典第九百七十三条」）是否直接查引用索引
+
+    # 分片索引配置（process_documents.py --shards N 生成）
+    SHARD_TIMEOUT = float(os.getenv("SHARD_TIMEOUT", "0.5"))  # 单个分片的检索超时（秒），超时的分片本次结果跳过
+    SHARD_START_TIMEOUT = 120  # 分片进程加载索引的最长等待时间（秒）
+    SHARD_THREADS = 1  # 每个分片进程的 FAISS 检索线程数
+    SHARD_CONNECTIONS = 8  # 协调器到每个分片的最大并发连接数
+    
+    # 检索服务配置
+    RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "local")  # local：本进程检索；remote：访问独立的检索服务
+    RETRIEVAL_SOCKET = os.getenv("RETRIEVAL_SOCKET", "/tmp/rag-retrieval.sock")  # 检索服务的 Unix 套接字路径
+    RETRIEVAL_POOL_SIZE = 16  # 客户端连接池大小
+    RETRIEVAL_TIMEOUT = float(os.getenv("RETRIEVAL_TIMEOUT", "10"))  # 客户端读写超时（秒）
+    
+    # API 响应配置
+    SNIPPET_CHARS = 120  # snippet 模式下每条结果的摘要字符数
+    DOCUMENT_CACHE_MAX_AGE = 300  # /documents/{id} 响应的浏览器缓存时间（秒），过期后凭 ETag 重新验证
+    COMPRESSION_MIN_SIZE = 1000  # 响应体超过该字节数时压缩（gzip，安装 brotli-asgi 后优先 brotli）
+
+    # 后台入库任务配置（/admin/ingest）
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # 管理接口的访问令牌（请求头 X-Admin-Token），未设置时管理接口不可用
+    INGEST_JOBS_DIR = BASE_DIR / "data/ingest_jobs"  # 任务状态、日志和上传文件目录
+    INGEST_MAX_UPLOAD_MB = int(os.getenv("INGEST_MAX_UPLOAD_MB", "1024"))  # 上传的 JSONL 文件大小上限
+    INGEST_NICE = 10  # 入库进程的 nice 值，调度上让位于检索服务
+    INGEST_THREADS = int(os.getenv("INGEST_THREADS", "1"))  # 入库进程的计算线程数（OMP/MKL/torch）
+    INGEST_KEEP_VERSIONS = 2  # 每个集合保留的索引版本数（含当前版本）
+    COLLECTION_RELOAD_INTERVAL = 2.0  # 常驻集合检查 CURRENT 版本指针的最短间隔（秒）
+    
+    # 向量模型切换配置（/admin/embedding）
+    EMBEDDING_SHADOW = os.getenv("EMBEDDING_SHADOW", "false").lower() == "true"  # 是否在后台用候选版本重复线上检索并比较结果
+    EMBEDDING_SHADOW_SAMPLE_RATE = float(os.getenv("EMBEDDING_SHADOW_SAMPLE_RATE", "1.0"))  # 参与影子比较的检索请求比例
+    EMBEDDING_SHADOW_QUEUE = 64  # 等待比较的请求上限，超出时丢弃，不拖慢线上检索
     
     # LLM 配置
+    LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")  # LLM 后端：openai、openai_compatible 或 stub（离线桩）
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # 从环境变量获取
+    OPENAI_API_BASE = os.getenv("OPENAI_API_BASE")  # 可选，覆盖 API 地址（如本地模拟服务）
     LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")  # 从环境变量获取，默认为 gpt-3.5-turbo
     MAX_TOKENS = 2000  # 最大生成 token 数
     TEMPERATURE = 0.7  # 温度参数
+    LLM_CONTEXT_WINDOW = int(os.getenv("LLM_CONTEXT_WINDOW", "4096"))  # 模型上下文窗口大小（token）
+    
+    # LLM 并发与限速配置
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))  # 批量生成的最大并发数
+    LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))  # 每分钟请求数上限，0 表示不限制
+    LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))  # 每分钟 token 数上限，0 表示不限制
+    LLM_MAX_RETRIES = 5  # 429/5xx 错误的最大重试次数
+    LLM_RETRY_BASE_DELAY = 1.0  # 指数退避的基准等待时间（秒）
+    
+    # OpenAI 兼容后端配置（LLM_BACKEND=openai_compatible，如 vLLM、llama.cpp server）
+    LLM_API_BASE = os.getenv("LLM_API_BASE", "http://127.0.0.1:8001/v1")  # 接口地址
+    LLM_API_KEY = os.getenv("LLM_API_KEY")  # 可选，Bearer token
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))  # 读写超时（秒）
+    LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))  # 连接超时（秒）
+    LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))  # 连接池大小，同时也是同时在途请求数上限
+    LLM_KEEPALIVE_EXPIRY = 30.0  # 空闲 keep-alive 连接的保留时间（秒）
+    
+    # 桩 LLM 配置（LLM_BACKEND=stub，用于离线基准测试和压测）
+    STUB_LLM_LATENCY = float(os.getenv("STUB_LLM_LATENCY", "0"))  # 每次生成的模拟延迟（秒）
     
     # RAG 配置
     TOP_K = 2  # 检索时返回的相关文档数量
     MIN_SIMILARITY_SCORE = 0.5  # 最小相似度阈值
+    CANDIDATE_FACTOR = 3  # 索引检索的候选数为 TOP_K 的倍数，用于阈值过滤前的后处理
+    MAX_CANDIDATES = 10  # 候选数上限
+    MMR_LAMBDA = float(os.getenv("MMR_LAMBDA")) if os.getenv("MMR_LAMBDA") else None  # MMR 多样性重排的相关度权重（0-1），未设置时不重排
+    MMR_FETCH_K = 50  # MMR 重排的候选数
+    MIN_TRUNCATED_DOC_TOKENS = 64  # 文档截断后至少保留的 token 数，不足则直接丢弃
+    
+    # 自适应检索深度配置（RAG 问答按相似度分布决定参考文档数，见 src/retriever/adaptive.py）
+    ADAPTIVE_RETRIEVAL = os.getenv("ADAPTIVE_RETRIEVAL", "false").lower() == "true"  # 是否启用；启用后没有文档超过阈值时不带参考文档直接回答
+    ADAPTIVE_FETCH_K = 8  # 一次检索的候选数
+    ADAPTIVE_MAX_K = 5  # 最多交给生成阶段的文档数
+    ADAPTIVE_HIGH_SCORE = 0.9  # 最高分不低于该值且领先第二名至少 ADAPTIVE_SCORE_GAP 时只用一条文档
+    ADAPTIVE_SCORE_GAP = 0.08  # 视为分数断层的最小分差，在最大的断层处截断
+    ADAPTIVE_SCORE_MARGIN = 0.15  # 与最高分相差超过该值的文档不使用
+    
+    # 预计算回答配置（python -m src.rag.precomputed 生成）
+    PRECOMPUTED_ANSWERS = os.getenv("PRECOMPUTED_ANSWERS", "false").lower() == "true"  # 查询与知识库问题匹配时是否直接返回已审核的回答（不调用 LLM）
+    PRECOMPUTED_ANSWERS_PATH = VECTOR_DIR / "precomputed_answers"  # 问题索引目录
+    PRECOMPUTED_MIN_SCORE = float(os.getenv("PRECOMPUTED_MIN_SCORE", "0.95"))  # 向量匹配的最低相似度（严格阈值），规范形式完全相同时总是命中
+    
+    # 上下文压缩配置
+    ENABLE_CONTEXT_COMPRESSION = os.getenv("ENABLE_CONTEXT_COMPRESSION", "false").lower() == "true"  # 是否在生成前抽取相关片段
+    COMPRESSION_TOKEN_BUDGET = 800  # 压缩后参考文档的 token 预算
     
     # 评估配置
-    METRICS_MODEL = "moka-ai/m3e-base"  # 用于评估的语义相似度模型
+    METRICS_MODEL = os.getenv("METRICS_MODEL", "moka-ai/m3e-base")  # 用于评估的语义相似度模型
     EVAL_OUTPUT_DIR = BASE_DIR / "evaluation/results"  # 评估结果保存目录 
\ No newline at end of file
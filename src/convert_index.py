@@ -0,0 +1,28 @@
+import sys
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+current_dir = Path(__file__).parent.parent
+sys.path.append(str(current_dir))
+
+from src.vectorstore.storage import convert_legacy_bundle, load_bundle
+from src.config import Config
+
+def main():
+    parser = argparse.ArgumentParser(description="将旧格式索引 (index.faiss + texts.pkl) 转换为二进制索引包")
+    parser.add_argument("--src", type=Path, default=Config.VECTOR_DB_PATH, help="旧格式索引目录")
+    parser.add_argument("--dst", type=Path, default=None, help="输出目录，默认写回源目录")
+    args = parser.parse_args()
+    
+    print(f"转换 {args.src} ...")
+    manifest = convert_legacy_bundle(args.src, args.dst)
+    
+    # 重新加载并校验
+    bundle = load_bundle(args.dst or args.src, verify=True)
+    assert len(bundle.texts) == manifest["count"]
+    print(f"转换完成：{manifest['count']} 条记录，维度 {manifest['dimension']}")
+    print("确认无误后可以删除旧的 texts.pkl 和 index.faiss")
+
+if __name__ == "__main__":
+    main()
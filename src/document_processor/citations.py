@@ -0,0 +1,188 @@
+"""法条引用索引
+
+入库时从每条记录的「法律依据」中解析《法律名》第X条（含中文数字条号和「之一」等款号），
+编码为整数键作为逐条记录数组随索引保存；加载时按键建立哈希表。查询本身就是法条引用
+（如「民法典第九百七十三条」「《民法典》第973条的规定」）时直接查表返回引用该条的记录，
+不经过向量模型编码和向量检索；其余查询照常走向量检索。
+
+键的编码：(法律编号 << 24) | (条号 << 8) | 款号，法律编号从 1 开始，0 表示空位；
+法律名称表写入索引元数据 citations.laws。
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import re
+import numpy as np
+
+CITATION_ARRAY = "citation_keys"
+
+# 记录文本中法律依据部分的起始标记（见 DocumentLoader.get_texts），没有该标记时解析全文
+REFERENCES_MARKER = "法律依据："
+
+# 法律名称的统一形式去掉该前缀（《中华人民共和国民法典》与《民法典》视为同一部法律）
+LAW_PREFIX = "中华人民共和国"
+
+_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_UNITS = {"十": 10, "百": 100, "千": 1000}
+_NUMBER = r"[零〇一二两三四五六七八九十百千万\d]+"
+
+_REFERENCE_CITATION = re.compile(
+    rf"《([^《》\n]{{1,50}})》\s*第({_NUMBER})条(?:之([一二三四五六七八九十\d]+))?"
+)
+
+# 整条查询只是一个法条引用（可带「的规定」「是什么」等后缀）时才走查表；书名号和「第」可省略
+_QUERY_CITATION = re.compile(
+    rf"(?:请问)?《?(?P<law>[^《》\s第]{{1,50}}?)》?\s*第?(?P<article>{_NUMBER})条"
+    r"(?:之(?P<sub>[一二三四五六七八九十\d]+))?"
+    r"(?:的)?(?:规定|内容|原文|全文|条文|说了什么|讲了什么|是什么|是怎么规定的|怎么规定的?|如何规定)*"
+)
+
+# progress(已处理条数, 总条数)
+ProgressCallback = Callable[[int, int], None]
+
+
+def parse_chinese_number(text: str) -> int:
+    """解析条号中的数字：阿拉伯数字或中文数字（如 九百七十三、一百零五、十五）
+
+    Raises:
+        ValueError: 不是合法的数字
+    """
+    if text.isdigit():
+        return int(text)
+    total, section, digit = 0, 0, None
+    for char in text:
+        if char in _DIGITS:
+            digit = _DIGITS[char]
+        elif char in _UNITS:
+            # 「十五」省略了单位前的「一」
+            section += (1 if digit is None else digit) * _UNITS[char]
+            digit = None
+        elif char == "万":
+            total += (section + (digit or 0)) * 10000
+            section, digit = 0, None
+        else:
+            raise ValueError(f"无法解析的数字：{text}")
+    return total + section + (digit or 0)
+
+
+def normalize_law_name(name: str) -> str:
+    """法律名称的统一形式：去掉空白、书名号和「中华人民共和国」前缀"""
+    name = "".join(name.split()).strip("《》")
+    return name[len(LAW_PREFIX):] if name.startswith(LAW_PREFIX) and len(name) > len(LAW_PREFIX) else name
+
+
+def _article(number: str, sub: Optional[str]) -> Optional[Tuple[int, int]]:
+    try:
+        article = parse_chinese_number(number)
+        sub_number = parse_chinese_number(sub) if sub else 0
+    except ValueError:
+        return None
+    if not 0 < article < 1 << 16 or not 0 <= sub_number < 1 << 8:
+        return None
+    return article, sub_number
+
+
+def extract_citations(text: str) -> List[Tuple[str, int, int]]:
+    """解析记录法律依据部分的法条引用，按出现顺序去重
+
+    Returns:
+        [(法律名称, 条号, 款号)]，没有「之X」时款号为 0
+    """
+    start = text.find(REFERENCES_MARKER)
+    if start >= 0:
+        text = text[start + len(REFERENCES_MARKER):]
+    citations = {}
+    for match in _REFERENCE_CITATION.finditer(text):
+        article = _article(match.group(2), match.group(3))
+        if article is not None:
+            citations[(normalize_law_name(match.group(1)),) + article] = None
+    return list(citations)
+
+
+def parse_citation_query(query: str) -> Optional[Tuple[str, int, int]]:
+    """整条查询是法条引用时返回 (法律名称, 条号, 款号)，否则返回 None"""
+    if "条" not in query:
+        return None
+    match = _QUERY_CITATION.fullmatch(query.strip())
+    if match is None:
+        return None
+    article = _article(match.group("article"), match.group("sub"))
+    if article is None:
+        return None
+    return (normalize_law_name(match.group("law")),) + article
+
+
+def citation_key(law_id: int, article: int, sub: int = 0) -> int:
+    return (law_id << 24) | (article << 8) | sub
+
+
+def build_citation_keys(
+    texts: Sequence[str],
+    progress: Optional[ProgressCallback] = None,
+    batch_size: int = 10000
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """为每条记录计算法条引用键
+
+    Returns:
+        keys: (记录数, 每条记录的最大引用数) 的 int64 数组，按引用在法律依据中的顺序排列，空位为 0
+        metadata: 写入索引元数据 citations 的内容（法律名称表、引用总数）
+    """
+    laws: Dict[str, int] = {}
+    per_record = []
+    for i, text in enumerate(texts):
+        keys = []
+        for law, article, sub in extract_citations(text):
+            law_id = laws.setdefault(law, len(laws) + 1)
+            keys.append(citation_key(law_id, article, sub))
+        per_record.append(keys)
+        if progress is not None and ((i + 1) % batch_size == 0 or i + 1 == len(texts)):
+            progress(i + 1, len(texts))
+    width = max((len(keys) for keys in per_record), default=0)
+    result = np.zeros((len(per_record), max(width, 1)), dtype=np.int64)
+    for row, keys in enumerate(per_record):
+        result[row, :len(keys)] = keys
+    metadata = {"laws": list(laws), "count": sum(len(keys) for keys in per_record)}
+    return result, metadata
+
+
+class CitationIndex:
+    """法条引用到记录下标的哈希表"""
+
+    def __init__(self, keys: np.ndarray, laws: List[str]):
+        """初始化
+
+        Args:
+            keys: build_citation_keys 计算的逐条记录引用键
+            laws: 法律名称表，第 i 项的法律编号为 i + 1
+        """
+        self.laws = {law: law_id for law_id, law in enumerate(laws, start=1)}
+        keys = np.asarray(keys, dtype=np.int64).reshape(len(keys), -1)
+        # 按列展开：同一法条先列出把它作为第一条依据的记录，再列出作为第二条依据的记录，依此类推
+        flat = keys.T.ravel()
+        rows = np.tile(np.arange(len(keys), dtype=np.int64), keys.shape[1])
+        mask = flat > 0
+        flat, rows = flat[mask], rows[mask]
+        order = np.argsort(flat, kind="stable")
+        flat, self._rows = flat[order], rows[order]
+        unique, starts = np.unique(flat, return_index=True)
+        ends = np.append(starts[1:], len(flat))
+        self._ranges: Dict[int, Tuple[int, int]] = dict(zip(unique.tolist(), zip(starts.tolist(), ends.tolist())))
+
+    def __len__(self) -> int:
+        """不同法条的数量"""
+        return len(self._ranges)
+
+    def lookup(self, law: str, article: int, sub: int = 0) -> Optional[np.ndarray]:
+        """引用该法条的记录下标，没有记录引用时返回 None"""
+        law_id = self.laws.get(normalize_law_name(law))
+        if law_id is None:
+            return None
+        bounds = self._ranges.get(citation_key(law_id, article, sub))
+        if bounds is None:
+            return None
+        return self._rows[bounds[0]:bounds[1]]
+
+    def match(self, query: str) -> Optional[np.ndarray]:
+        """查询是已收录法条的引用时返回引用该条的记录下标，否则返回 None"""
+        citation = parse_citation_query(query)
+        if citation is None:
+            return None
+        return self.lookup(*citation)
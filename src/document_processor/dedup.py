@@ -0,0 +1,175 @@
+"""近重复文本检测与折叠（MinHash + LSH）
+
+入库时对预处理后的文本按字符 n-gram 计算 MinHash 签名，签名按 band 切分后分桶（LSH），
+只在同桶文本之间估算 Jaccard 相似度，整体耗时近似线性。每个近重复簇保留第一条作为代表写入索引，
+其余条目作为别名记录在索引元数据中；签名作为逐条记录数组保存，检索时用于折叠候选结果中的近重复项。
+"""
+from typing import Any, Dict, Optional, Sequence
+import numpy as np
+from tqdm import tqdm
+from src.document_processor.loader import DocumentLoader
+
+SIGNATURE_ARRAY = "minhash"
+SOURCE_INDEX_ARRAY = "source_index"
+
+# n-gram 滚动哈希的乘数（64 位，溢出即取模）
+_ROLLING_PRIME = np.uint64(0x100000001B3)
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 终混，打散滚动哈希的低熵位"""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+class MinHasher:
+    """MinHash 签名计算与近重复聚类"""
+
+    def __init__(self, num_perm: int = 64, bands: int = 8, shingle_size: int = 5, threshold: float = 0.8, seed: int = 1):
+        """初始化
+
+        Args:
+            num_perm: 签名长度（哈希函数个数），须能被 bands 整除
+            bands: LSH 分段数，每段 num_perm // bands 行；段数越多召回越高、候选越多
+            shingle_size: 字符 n-gram 长度
+            threshold: 估算的 Jaccard 相似度不低于该值视为近重复
+            seed: 哈希函数的随机种子，同一索引的入库和检索必须一致
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) 须能被 bands ({bands}) 整除")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        # 乘移位哈希族：h_i(x) = (a_i * x + b_i) >> 32，a_i 为奇数
+        self._a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        """写入索引元数据的参数"""
+        return {
+            "method": "minhash",
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "shingle_size": self.shingle_size,
+            "threshold": self.threshold,
+            "seed": self.seed
+        }
+
+    def shingles(self, text: str) -> np.ndarray:
+        """预处理后的文本的字符 n-gram 哈希集合"""
+        codes = np.frombuffer(DocumentLoader.preprocess_text(text).encode("utf-32-le"), dtype="<u4").astype(np.uint64)
+        n = min(self.shingle_size, len(codes))
+        if n == 0:
+            return np.zeros(1, dtype=np.uint64)
+        count = len(codes) - n + 1
+        hashes = np.zeros(count, dtype=np.uint64)
+        for offset in range(n):
+            hashes = hashes * _ROLLING_PRIME + codes[offset:offset + count]
+        return np.unique(_mix(hashes))
+
+    def signature(self, text: str) -> np.ndarray:
+        """单条文本的 MinHash 签名 (num_perm,) uint32"""
+        hashes = self.shingles(text)
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+    def signatures(self, texts: Sequence[str], show_progress: bool = False) -> np.ndarray:
+        """批量计算签名，返回 (n, num_perm) uint32"""
+        result = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for i, text in enumerate(tqdm(texts, desc="计算 MinHash 签名", disable=not show_progress)):
+            result[i] = self.signature(text)
+        return result
+
+    def cluster(self, signatures: np.ndarray) -> np.ndarray:
+        """LSH 分桶后合并近重复簇
+
+        同一个桶内只把各成员与桶内第一条比较（星形比较），避免大桶退化为两两比较。
+
+        Returns:
+            (n,) 每条记录所在簇的代表下标（簇内最小下标）
+        """
+        count = len(signatures)
+        parent = np.arange(count)
+
+        def find(i: int) -> int:
+            root = i
+            while parent[root] != root:
+                root = parent[root]
+            while parent[i] != root:
+                parent[i], i = root, parent[i]
+            return root
+
+        rows = self.num_perm // self.bands
+        for band in range(self.bands):
+            keys = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+            keys = keys.view(np.dtype((np.void, keys.dtype.itemsize * rows))).ravel()
+            # 稳定排序后相同键连续排列，桶内第一条即最小下标
+            order = np.argsort(keys, kind="stable")
+            boundaries = np.flatnonzero(keys[order][1:] != keys[order][:-1]) + 1
+            for bucket in np.split(order, boundaries):
+                if len(bucket) < 2:
+                    continue
+                head, members = bucket[0], bucket[1:]
+                similar = members[self.similarity(signatures[members], signatures[head]) >= self.threshold]
+                for member in similar:
+                    a, b = find(int(head)), find(int(member))
+                    if a != b:
+                        parent[max(a, b)] = min(a, b)
+        return np.fromiter((find(i) for i in range(count)), dtype=np.int64, count=count)
+
+    @staticmethod
+    def similarity(signatures: np.ndarray, other: np.ndarray) -> np.ndarray:
+        """签名一致的比例，即 Jaccard 相似度的估计"""
+        return (signatures == other).mean(axis=-1)
+
+    def collapse(self, signatures: np.ndarray) -> np.ndarray:
+        """检索结果折叠：按顺序（相似度降序）保留与已保留结果都不近重复的条目
+
+        Args:
+            signatures: (m, num_perm) 候选结果的签名，按排序顺序排列
+
+        Returns:
+            (m,) 布尔数组，True 表示保留
+        """
+        pairwise = (signatures[:, None, :] == signatures[None, :, :]).mean(axis=-1) >= self.threshold
+        keep = np.zeros(len(signatures), dtype=bool)
+        for i in range(len(signatures)):
+            keep[i] = not pairwise[i, :i][keep[:i]].any()
+        return keep
+
+    @classmethod
+    def from_metadata(cls, params: Dict[str, Any]) -> "MinHasher":
+        """按索引元数据中记录的参数重建"""
+        return cls(
+            num_perm=params["num_perm"],
+            bands=params["bands"],
+            shingle_size=params["shingle_size"],
+            threshold=params["threshold"],
+            seed=params["seed"]
+        )
+
+
+def source_rows(metadata: Dict[str, Any], source_index: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    """知识库位置到索引下标的映射（被折叠的条目映射到其代表）
+
+    Args:
+        metadata: 索引元数据
+        source_index: 索引中每条记录对应的知识库位置（SOURCE_INDEX_ARRAY）
+
+    Returns:
+        长度为知识库条数的下标数组；索引未经去重时返回 None
+    """
+    dedup = metadata.get("dedup")
+    if not dedup or source_index is None:
+        return None
+    rows = np.full(dedup["source_count"], -1, dtype=np.int64)
+    rows[np.asarray(source_index, dtype=np.int64)] = np.arange(len(source_index))
+    for row, positions in dedup["aliases"].items():
+        rows[positions] = int(row)
+    return rows
@@ -0,0 +1,71 @@
+"""查询规范化
+
+把同一问题的不同写法（全角/半角、中英文标点、繁简体、多余空白、句末问号）映射为同一个规范形式，
+编码前对每条查询执行一次，规范形式同时作为查询向量缓存和批内去重的键。变换是确定性的，
+对已规范的文本幂等。
+"""
+import re
+import unicodedata
+from src.document_processor.t2s import TRADITIONAL_TO_SIMPLIFIED
+
+# NFKC 之后仍保留的中文标点折叠为 ASCII（书名号保留，法条引用依赖它）
+PUNCTUATION_FOLDING = {
+    "“": '"', "”": '"', "„": '"', "‟": '"', "「": '"', "」": '"', "『": '"', "』": '"',
+    "‘": "'", "’": "'", "‛": "'",
+    "【": "[", "】": "]", "〔": "[", "〕": "]", "〖": "[", "〗": "]",
+    "、": ",", "。": ".", "〜": "~",
+    "—": "-", "–": "-", "―": "-", "‐": "-",
+}
+
+# 句末的标点和空白不影响语义
+TRAILING_CHARS = "?!.,;:~ "
+
+# 与中日韩字符相邻的空格（中文不以空格分词）；以空格开头便于正则引擎按字面量快速定位
+_CJK_SPACE = re.compile(r" (?:(?=[⺀-鿿])|(?<=[⺀-鿿] ))")
+
+
+class QueryNormalizer:
+    """查询规范化：全角转半角与 NFKC → 标点折叠（可选繁转简）→ 空白整理 → 去掉句末标点 → 小写"""
+
+    def __init__(self, to_simplified: bool = True, strip_trailing: bool = True, lowercase: bool = True):
+        """初始化
+
+        Args:
+            to_simplified: 是否按内置对照表把繁体字转换为简体
+            strip_trailing: 是否去掉句末的问号、句号等标点
+            lowercase: 是否把拉丁字母转为小写
+        """
+        self.to_simplified = to_simplified
+        self.strip_trailing = strip_trailing
+        self.lowercase = lowercase
+        # 全角 ASCII 和全角空格直接查表（与 NFKC 结果相同），避免对整条查询做 NFKC
+        mapping = {chr(code): chr(code - 0xFEE0) for code in range(0xFF01, 0xFF5F)}
+        mapping["\u3000"] = " "
+        mapping.update(PUNCTUATION_FOLDING)
+        if to_simplified:
+            mapping.update(TRADITIONAL_TO_SIMPLIFIED)
+        self._mapping = mapping
+        self._pattern = re.compile("[" + "".join(re.escape(char) for char in mapping) + "]")
+
+    def _replace(self, match: "re.Match") -> str:
+        return self._mapping[match.group()]
+
+    def _fold(self, query: str) -> str:
+        return self._pattern.sub(self._replace, query) if self._pattern.search(query) else query
+
+    def normalize(self, query: str) -> str:
+        """返回查询的规范形式"""
+        if not query.isascii():
+            query = self._fold(query)
+            # 查表未覆盖的兼容字符（如带圈数字、兼容汉字）才需要完整的 NFKC
+            if not unicodedata.is_normalized("NFKC", query):
+                query = self._fold(unicodedata.normalize("NFKC", query))
+        # 连续空白合并为一个空格并去掉首尾空白
+        query = " ".join(query.split())
+        if " " in query:
+            query = _CJK_SPACE.sub("", query)
+        if self.strip_trailing:
+            query = query.rstrip(TRAILING_CHARS)
+        return query.lower() if self.lowercase else query
+
+    __call__ = normalize
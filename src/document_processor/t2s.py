@@ -0,0 +1,58 @@
+"""繁体到简体的字符对照表（查询归一化使用）
+
+只收录对应唯一简体字、且繁体字形在简体中文里不作为规范字单独使用的常用字（法律文本高频字优先），
+因此对简体文本是恒等变换。"乾""著""藉""瞭""覆"等在简体中仍有独立用法的字不收录。
+每项为「繁体字 + 简体字」两个字符，以空白分隔。
+"""
+
+_PAIRS = """
+說说 話话 語语 請请 讓让 論论 認认 識识 議议 設设 許许 訴诉 訟讼 證证 評评 詞词 試试 詢询 該该 詳详
+誤误 誠诚 課课 調调 談谈 謂谓 講讲 謝谢 讀读 變变 譯译 護护 譽誉 讚赞 計计 記记 訂订 訊讯 討讨 訓训
+託托 詐诈 詩诗 誌志 諾诺 謀谋 謊谎 諮咨 諸诸 譜谱 讞谳 誣诬 誹诽 謗谤 詆诋 訛讹 諒谅 謹谨 譴谴 誰谁
+誘诱 諭谕 謙谦 訪访 詰诘 訖讫 註注 訝讶 詠咏 誇夸 誕诞 諧谐 謎谜 謠谣 譏讥 辯辩 辭辞 錢钱 銀银 鐵铁
+銷销 鋼钢 錯错 錄录 鎮镇 鍵键 鏈链 鐘钟 鍾钟 針针 釘钉 鈔钞 銅铜 鋪铺 鑑鉴 鑒鉴 鏡镜 鑰钥 鎖锁 銳锐
+鍋锅 鈍钝 鑄铸 錦锦 銜衔 鋒锋 釣钓 鈴铃 鉛铅 鑽钻 鋁铝 錫锡 鈉钠 鉀钾 銘铭 鋸锯 錘锤 鍛锻 鏟铲 鑼锣
+門门 們们 問问 間间 開开 關关 閉闭 閱阅 闡阐 閣阁 閒闲 闖闯 闊阔 閃闪 闆板 聞闻 閘闸 闕阙 閥阀 閨闺
+闌阑 貝贝 財财 責责 貨货 販贩 貧贫 購购 貸贷 費费 資资 賠赔 償偿 賣卖 買买 賬账 賦赋 賭赌 賂赂 賄贿
+贈赠 贊赞 賽赛 賴赖 質质 貿贸 貴贵 賀贺 貢贡 賊贼 賃赁 賜赐 賞赏 賢贤 賤贱 贏赢 負负 貪贪 貫贯 貶贬
+賓宾 贖赎 贍赡 贓赃 貞贞 約约 級级 紀纪 納纳 紙纸 純纯 組组 細细 終终 經经 結结 給给 統统 絕绝 絡络
+維维 綱纲 網网 緊紧 線线 練练 編编 緣缘 縣县 總总 績绩 繼继 續续 繳缴 織织 紛纷 紋纹 紅红 縮缩 緒绪
+綜综 紹绍 絲丝 縱纵 緩缓 締缔 緝缉 繪绘 纏缠 纖纤 綁绑 紮扎 紐纽 糾纠 紳绅 絨绒 綠绿 綿绵 緯纬 縫缝
+繩绳 繹绎 車车 軍军 轉转 輕轻 載载 較较 輸输 輛辆 輪轮 輔辅 轄辖 軟软 輯辑 轟轰 軌轨 軒轩 輩辈 轎轿
+辦办 連连 運运 遠远 還还 進进 過过 達达 選选 邊边 適适 遞递 遲迟 遺遗 違违 週周 遊游 這这 遷迁 遜逊
+遙遥 邁迈 迴回 馬马 駕驾 駛驶 驗验 騙骗 驅驱 驚惊 騎骑 驟骤 駐驻 駁驳 騷骚 驕骄 飯饭 飲饮 館馆 飼饲
+餘余 飽饱 饒饶 餓饿 飢饥 饑饥 餅饼 饞馋 養养 頁页 項项 順顺 須须 預预 領领 頭头 題题 額额 顧顾 類类
+願愿 顯显 頒颁 頻频 頓顿 顏颜 頂顶 頗颇 頰颊 顆颗 顫颤 國国 東东 書书 會会 個个 來来 時时 對对 為为
+後后 發发 髮发 現现 機机 權权 條条 產产 實实 務务 義义 於于 與与 動动 員员 報报 處处 將将 體体 當当
+應应 樣样 無无 從从 長长 學学 點点 業业 親亲 戰战 區区 歷历 曆历 萬万 幾几 種种 稅税 稱称 積积 穩稳
+導导 專专 屬属 層层 際际 陽阳 陰阴 險险 隊队 陳陈 陸陆 隨随 隱隐 雙双 難难 離离 雜杂 雖虽 電电 靈灵
+韓韩 風风 飛飞 魚鱼 鳥鸟 麗丽 黨党 齊齐 齡龄 龍龙 龜龟 鬥斗 衛卫 衝冲 補补 製制 複复 襲袭 規规 視视
+覺觉 覽览 觀观 觸触 豐丰 豬猪 貓猫 趕赶 趨趋 蹤踪 躍跃 鄉乡 鄰邻 鄭郑 醫医 釋释 鬧闹 傳传 債债 傷伤
+價价 億亿 儀仪 僅仅 優优 僱雇 偽伪 僞伪 倫伦 倉仓 側侧 偵侦 傭佣 儘尽 盡尽 備备 傑杰 僕仆 兒儿 兇凶
+內内 兩两 冊册 凍冻 劃划 劇剧 劉刘 則则 剛刚 創创 剝剥 劑剂 勞劳 勢势 勵励 勸劝 勝胜 協协 單单 卻却
+厲厉 厭厌 參参 叢丛 吳吴 啟启 喪丧 嗎吗 嚴严 囑嘱 圍围 圖图 團团 園园 圓圆 執执 堅坚 場场 塊块 塗涂
+壓压 壞坏 壟垄 壇坛 壽寿 夠够 夢梦 奪夺 奮奋 婦妇 媽妈 孫孙 寧宁 審审 寫写 寬宽 寶宝 尋寻 屆届 屍尸
+嶺岭 島岛 帥帅 師师 帳帐 帶带 幫帮 幹干 廣广 廳厅 廢废 廠厂 庫库 彈弹 彌弥 歸归 徑径 復复 徹彻 恆恒
+悅悦 惡恶 愛爱 態态 慘惨 慣惯 憂忧 憲宪 憑凭 懲惩 懷怀 懸悬 戀恋 戲戏 戶户 拋抛 挾挟 捨舍 掃扫 掛挂
+採采 揚扬 換换 損损 搶抢 撥拨 擁拥 擇择 擊击 擋挡 據据 擔担 擬拟 擴扩 擾扰 攝摄 攤摊 敗败 敵敌 數数
+斃毙 斷断 晉晋 晝昼 暫暂 曉晓 楊杨 極极 構构 槍枪 標标 樓楼 樂乐 樹树 橋桥 檔档 檢检 櫃柜 歐欧 歲岁
+殘残 殺杀 殼壳 毀毁 氣气 漢汉 湯汤 滅灭 滿满 漁渔 潔洁 潛潜 澤泽 濟济 濕湿 瀏浏 灣湾 災灾 烏乌 煙烟
+煩烦 熱热 營营 燈灯 爭争 爺爷 爾尔 牆墙 狀状 獨独 獄狱 獎奖 獲获 獸兽 環环 畢毕 畫画 異异 療疗 癢痒
+盜盗 盤盘 監监 確确 礙碍 禮礼 禍祸 禦御 穀谷 窮穷 竊窃 競竞 筆笔 節节 範范 築筑 簡简 簽签 籌筹 籃篮
+糧粮 罰罚 罷罢 羅罗 習习 聖圣 聯联 聲声 聰聪 聽听 職职 肅肃 脅胁 腦脑 膠胶 臨临 舉举 舊旧 艱艰 莊庄
+華华 葉叶 蓋盖 蔣蒋 薦荐 藍蓝 藝艺 藥药 蘇苏 號号 蟲虫 蠶蚕 術术 裝装 裡里 裏里 褲裤 見见 豈岂 豎竖
+趙赵 跡迹 踐践 軀躯 農农 郵邮 醜丑 閩闽 陣阵 隸隶 雞鸡 雲云 霧雾 靜静 響响 飄飘 髒脏 魯鲁 鮮鲜 鳳凤
+鹽盐 麥麦 黃黄 齒齿 憶忆 憐怜 懇恳 撫抚 撲扑 擠挤 擺摆 攔拦 攜携 敘叙 斂敛 曬晒 殲歼 氫氢 沒没 況况
+滬沪 漲涨 潤润 澀涩 濃浓 濱滨 瀕濒 燒烧 燭烛 爐炉 犧牺 猶犹 獅狮 瑣琐 璽玺 畝亩 瘋疯 癥症 皺皱 盞盏
+睜睁 矯矫 碩硕 磚砖 礦矿 禪禅 稟禀 窩窝 窯窑 筍笋 篩筛 籤签 羨羡 翹翘 聳耸 脈脉 脫脱 腎肾 膚肤 膽胆
+臉脸 臟脏 艙舱 艦舰 蒼苍 蓮莲 蔥葱 蕭萧 薑姜 薩萨 蘭兰 虛虚 虜虏 蝦虾 蠟蜡 襪袜 覓觅 豔艳 躪躏 辮辫
+醞酝 釀酿 隕陨 雛雏 靂雳 韌韧 韻韵 颱台 臺台 檯台 颳刮 驢驴 骯肮 鬆松 鬍胡 鬚须 鯨鲸 鱷鳄 鴨鸭 鴻鸿
+鵝鹅 鶴鹤 鷹鹰 鹹咸 麵面 黴霉 齣出 龐庞 麼么 準准 佈布 徵征 羈羁 滯滞 濫滥 瀆渎 汙污 卹恤
+夥伙 係系 繫系 傢家 眾众 衆众 啓启 彙汇 匯汇 鬱郁 隻只 佔占 併并 並并 倆俩 傘伞 僑侨 儲储 兌兑 刪删
+劍剑 勻匀 啞哑 喚唤 嘆叹 嚇吓 噴喷 嘗尝 壩坝 夾夹 奧奥 妝妆 嬰婴 寢寝 弔吊 彆别 搖摇 摯挚 擄掳 攏拢
+樞枢 棄弃 決决 涼凉 淚泪 淺浅 減减 測测 溝沟 漿浆 潑泼 澆浇 濁浊 濾滤 灑洒 灘滩 煉炼 燉炖 爛烂 獵猎
+瑪玛 甦苏 疊叠 瘡疮 癒愈 盧卢 碼码 礎础 禱祷 窺窥 篤笃 糞粪 紡纺 縛缚 罵骂 聾聋 腫肿 興兴 艷艳 蘆芦
+諺谚 譚谭 軸轴 輿舆 轍辙 邏逻 醬酱 鈕钮 陝陕 隴陇 韋韦 頸颈 顛颠 餵喂 驛驿 鳴鸣 齋斋 強强 嶽岳 鍊炼
+"""
+
+TRADITIONAL_TO_SIMPLIFIED = {pair[0]: pair[1] for pair in _PAIRS.split()}
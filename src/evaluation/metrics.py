@@ -1,20 +1,48 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Union, Set, Optional
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from sentence_transformers import SentenceTransformer
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 相关文档可以用文档下标（检索结果的 index 字段）或文档全文表示
+RelevantDocs = Union[List[str], List[int], Set[str], Set[int]]
+
 class RetrievalMetrics:
-    """检索评估指标"""
+    """检索评估指标
+    
+    相关文档转为集合后按哈希匹配：元素为整数时与检索结果的 index 字段比较，否则与 text 字段比较。
+    """
+    
+    @staticmethod
+    def relevance_hits(relevant_docs: RelevantDocs, retrieved_docs: List[Dict[str, Any]], k: int) -> np.ndarray:
+        """计算前 k 个检索结果是否相关
+        
+        Args:
+            relevant_docs: 相关文档（下标或文本）
+            retrieved_docs: 检索到的文档列表
+            k: 截断位置
+        
+        Returns:
+            长度为 min(k, len(retrieved_docs)) 的布尔数组
+        """
+        relevant = relevant_docs if isinstance(relevant_docs, (set, frozenset)) else set(relevant_docs)
+        if not relevant or k <= 0:
+            return np.zeros(0, dtype=bool)
+        by_index = isinstance(next(iter(relevant)), (int, np.integer))
+        key = "index" if by_index else "text"
+        return np.fromiter(
+            (doc.get(key) in relevant for doc in retrieved_docs[:k]),
+            dtype=bool,
+            count=min(k, len(retrieved_docs))
+        )
     
     @staticmethod
-    def precision_at_k(relevant_docs: List[str], retrieved_docs: List[Dict[str, Any]], k: int) -> float:
+    def precision_at_k(relevant_docs: RelevantDocs, retrieved_docs: List[Dict[str, Any]], k: int) -> float:
         """计算 P@K
         
         Args:
-            relevant_docs: 相关文档列表
+            relevant_docs: 相关文档（下标或文本）
             retrieved_docs: 检索到的文档列表
             k: 截断位置
         
@@ -24,16 +52,15 @@ class RetrievalMetrics:
         if not retrieved_docs or k <= 0:
             return 0.0
         
-        retrieved_texts = [doc["text"] for doc in retrieved_docs[:k]]
-        relevant_count = sum(1 for text in retrieved_texts if text in relevant_docs)
-        return relevant_count / k
+        hits = RetrievalMetrics.relevance_hits(relevant_docs, retrieved_docs, k)
+        return float(hits.sum()) / k
 
     @staticmethod
-    def recall_at_k(relevant_docs: List[str], retrieved_docs: List[Dict[str, Any]], k: int) -> float:
+    def recall_at_k(relevant_docs: RelevantDocs, retrieved_docs: List[Dict[str, Any]], k: int) -> float:
         """计算 R@K
         
         Args:
-            relevant_docs: 相关文档列表
+            relevant_docs: 相关文档（下标或文本）
             retrieved_docs: 检索到的文档列表
             k: 截断位置
         
@@ -43,22 +70,88 @@ class RetrievalMetrics:
         if not relevant_docs or not retrieved_docs or k <= 0:
             return 0.0
         
-        retrieved_texts = [doc["text"] for doc in retrieved_docs[:k]]
-        relevant_count = sum(1 for text in retrieved_texts if text in relevant_docs)
-        return relevant_count / len(relevant_docs)
+        hits = RetrievalMetrics.relevance_hits(relevant_docs, retrieved_docs, k)
+        return float(hits.sum()) / len(set(relevant_docs))
+    
+    @staticmethod
+    def reciprocal_rank(relevant_docs: RelevantDocs, retrieved_docs: List[Dict[str, Any]]) -> float:
+        """计算倒数排名（第一个相关结果排名的倒数，MRR 为其平均值）
+        
+        Args:
+            relevant_docs: 相关文档（下标或文本）
+            retrieved_docs: 检索到的文档列表
+        
+        Returns:
+            倒数排名，没有相关结果时为 0
+        """
+        hits = RetrievalMetrics.relevance_hits(relevant_docs, retrieved_docs, len(retrieved_docs))
+        positions = np.flatnonzero(hits)
+        return 1.0 / (positions[0] + 1) if len(positions) else 0.0
+    
+    @staticmethod
+    def ndcg_at_k(relevant_docs: RelevantDocs, retrieved_docs: List[Dict[str, Any]], k: int) -> float:
+        """计算 nDCG@K（二元相关性）
+        
+        Args:
+            relevant_docs: 相关文档（下标或文本）
+            retrieved_docs: 检索到的文档列表
+            k: 截断位置
+        
+        Returns:
+            nDCG@K 值
+        """
+        if not relevant_docs or not retrieved_docs or k <= 0:
+            return 0.0
+        hits = RetrievalMetrics.relevance_hits(relevant_docs, retrieved_docs, k)
+        discounts = 1.0 / np.log2(np.arange(2, k + 2))
+        dcg = float(discounts[:len(hits)][hits].sum())
+        idcg = float(discounts[:min(len(set(relevant_docs)), k)].sum())
+        return dcg / idcg if idcg else 0.0
 
 class GenerationMetrics:
     """生成评估指标"""
     
-    def __init__(self, model_name: str = "moka-ai/m3e-base"):
+    def __init__(self, model_name: str = "moka-ai/m3e-base", model: Optional[Any] = None):
         """初始化评估器
         
         Args:
             model_name: 用于计算语义相似度的模型名称
+            model: 已加载的模型，如果为None则按名称加载
         """
-        self.model = SentenceTransformer(model_name)
+        self.model = model or SentenceTransformer(model_name)
         logger.info(f"加载语义相似度模型：{model_name}")
     
+    def batch_semantic_similarity(self, texts1: List[str], texts2: List[str], batch_size: int = 64) -> np.ndarray:
+        """批量计算逐对语义相似度
+        
+        两组文本在一次 encode 调用中编码，相似度为归一化向量的逐行点积。
+        
+        Args:
+            texts1: 第一组文本
+            texts2: 第二组文本，与 texts1 一一对应
+            batch_size: 编码批大小
+        
+        Returns:
+            相似度数组，长度与输入一致
+        """
+        if len(texts1) != len(texts2):
+            raise ValueError("两组文本数量不一致")
+        if not texts1:
+            return np.zeros(0, dtype=np.float32)
+        
+        try:
+            embeddings = self.model.encode(
+                list(texts1) + list(texts2),
+                batch_size=batch_size,
+                normalize_embeddings=True
+            )
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            n = len(texts1)
+            return np.einsum("ij,ij->i", embeddings[:n], embeddings[n:])
+        except Exception as e:
+            logger.error(f"计算语义相似度失败：{str(e)}")
+            raise
+    
     def semantic_similarity(self, text1: str, text2: str) -> float:
         """计算语义相似度
         
@@ -69,30 +162,52 @@ class GenerationMetrics:
         Returns:
             相似度分数
         """
-        try:
-            # 编码文本
-            embedding1 = self.model.encode([text1])[0]
-            embedding2 = self.model.encode([text2])[0]
-            
-            # 计算余弦相似度
-            similarity = cosine_similarity(
-                embedding1.reshape(1, -1),
-                embedding2.reshape(1, -1)
-            )[0][0]
-            
-            return float(similarity)
-            
-        except Exception as e:
-            logger.error(f"计算语义相似度失败：{str(e)}")
-            raise
+        return float(self.batch_semantic_similarity([text1], [text2])[0])
 
 class RAGMetrics:
     """RAG 系统评估指标"""
     
-    def __init__(self):
-        """初始化 RAG 评估器"""
+    # 检索指标的截断位置
+    K_VALUES = (1, 3, 5)
+    
+    def __init__(self, model_name: str = "moka-ai/m3e-base", model: Optional[Any] = None):
+        """初始化 RAG 评估器
+        
+        Args:
+            model_name: 语义相似度模型名称
+            model: 已加载的模型，可与检索共用
+        """
         self.retrieval_metrics = RetrievalMetrics()
-        self.generation_metrics = GenerationMetrics()
+        self.generation_metrics = GenerationMetrics(model_name, model=model)
+    
+    def retrieval_scores(self, relevant_docs: RelevantDocs, retrieved_docs: List[Dict[str, Any]]) -> Dict[str, float]:
+        """计算单个查询的检索指标
+        
+        只做一次集合匹配，P@K、R@K、nDCG@K 和倒数排名均由同一个命中数组计算。
+        
+        Args:
+            relevant_docs: 相关文档（下标或文本）
+            retrieved_docs: 检索到的文档列表
+        
+        Returns:
+            {指标名: 值}
+        """
+        relevant = set(relevant_docs)
+        hits = self.retrieval_metrics.relevance_hits(relevant, retrieved_docs, len(retrieved_docs))
+        cumulative = np.cumsum(hits)
+        discounts = 1.0 / np.log2(np.arange(2, max(self.K_VALUES) + 2))
+        
+        scores = {}
+        for k in self.K_VALUES:
+            hit_count = float(cumulative[min(k, len(hits)) - 1]) if len(hits) else 0.0
+            top = hits[:k]
+            idcg = discounts[:min(len(relevant), k)].sum()
+            scores[f"precision@{k}"] = hit_count / k
+            scores[f"recall@{k}"] = hit_count / len(relevant) if relevant else 0.0
+            scores[f"ndcg@{k}"] = float(discounts[:len(top)][top].sum() / idcg) if idcg else 0.0
+        positions = np.flatnonzero(hits)
+        scores["mrr"] = 1.0 / (positions[0] + 1) if len(positions) else 0.0
+        return scores
     
     def evaluate_retrieval(self, query_results: List[Dict[str, Any]], ground_truth: Dict[str, List[str]]) -> Dict[str, Any]:
         """评估检索结果
@@ -104,29 +219,17 @@ class RAGMetrics:
         Returns:
             评估指标字典
         """
-        metrics = {
-            "precision@1": [],
-            "precision@3": [],
-            "precision@5": [],
-            "recall@1": [],
-            "recall@3": [],
-            "recall@5": []
+        metrics: Dict[str, List[float]] = {
+            f"{name}@{k}": [] for name in ("precision", "recall", "ndcg") for k in self.K_VALUES
         }
-        
+        metrics["mrr"] = []
         for result in query_results:
             query = result["query"]
             if query not in ground_truth:
                 continue
-                
-            relevant_docs = ground_truth[query]
-            retrieved_docs = result["retrieved_documents"]
-            
-            # 计算不同 K 值的指标
-            for k in [1, 3, 5]:
-                p_at_k = self.retrieval_metrics.precision_at_k(relevant_docs, retrieved_docs, k)
-                r_at_k = self.retrieval_metrics.recall_at_k(relevant_docs, retrieved_docs, k)
-                metrics[f"precision@{k}"].append(p_at_k)
-                metrics[f"recall@{k}"].append(r_at_k)
+            scores = self.retrieval_scores(ground_truth[query], result["retrieved_documents"])
+            for metric, value in scores.items():
+                metrics[metric].append(value)
         
         # 计算平均值
         return {
@@ -144,25 +247,21 @@ class RAGMetrics:
         Returns:
             评估指标字典
         """
-        similarities = []
+        generated_answers = []
+        reference_answers = []
         
         for result in query_results:
             query = result["query"]
             if query not in ground_truth:
                 continue
-                
-            generated_answer = result["answer"]
-            ground_truth_answer = ground_truth[query]
-            
-            # 计算生成答案与标准答案的语义相似度
-            similarity = self.generation_metrics.semantic_similarity(
-                generated_answer,
-                ground_truth_answer
-            )
-            similarities.append(similarity)
+            generated_answers.append(result["answer"])
+            reference_answers.append(ground_truth[query])
+        
+        # 所有生成答案与标准答案一次性批量编码
+        similarities = self.generation_metrics.batch_semantic_similarity(generated_answers, reference_answers)
         
         return {
-            "semantic_similarity": float(np.mean(similarities)) if similarities else 0.0
+            "semantic_similarity": float(np.mean(similarities)) if len(similarities) else 0.0
         }
     
     def evaluate(self, query_results: List[Dict[str, Any]], retrieval_ground_truth: Dict[str, List[str]], generation_ground_truth: Dict[str, str]) -> Dict[str, Any]:
@@ -201,4 +300,96 @@ class RAGMetrics:
             "retrieval_metrics": retrieval_metrics,
             "generation_metrics": generation_metrics,
             "token_metrics": token_metrics
-        } 
\ No newline at end of file
+        } 
+
+class MetricsAccumulator:
+    """增量汇总 RAGMetrics
+    
+    逐条加入查询结果，只保留各指标的累加和；语义相似度攒满一批后一次性批量编码，
+    内存占用与查询总数无关。汇总结果的结构与 RAGMetrics.evaluate 一致。
+    """
+    
+    def __init__(self, metrics: RAGMetrics, batch_size: int = 64):
+        """初始化累加器
+        
+        Args:
+            metrics: RAG 评估器
+            batch_size: 语义相似度的批大小
+        """
+        self.metrics = metrics
+        self.batch_size = batch_size
+        self.sums: Dict[str, Dict[str, float]] = {"retrieval": {}, "generation": {}, "token": {}}
+        self.counts: Dict[str, int] = {"retrieval": 0, "generation": 0, "token": 0}
+        self._pending: List[tuple] = []
+    
+    def _add(self, group: str, scores: Dict[str, float]):
+        totals = self.sums[group]
+        for metric, value in scores.items():
+            totals[metric] = totals.get(metric, 0.0) + float(value)
+        self.counts[group] += 1
+    
+    def add_scores(self, scores: Dict[str, Dict[str, float]]):
+        """加入已计算好的单条查询指标（如从检查点文件恢复）
+        
+        Args:
+            scores: {"retrieval": {...}, "generation": {...}, "token": {...}}，缺失的分组跳过
+        """
+        for group, values in scores.items():
+            if values:
+                self._add(group, values)
+    
+    def score(self, items: List[Dict[str, Any]]) -> List[Dict[str, Dict[str, float]]]:
+        """计算一批查询的指标并计入汇总
+        
+        Args:
+            items: 每项包含 result（RAG 查询结果），可选 relevant_docs 和 reference_answer
+        
+        Returns:
+            每条查询的指标，顺序与 items 一致
+        """
+        all_scores = []
+        pairs = []
+        for item in items:
+            result = item["result"]
+            metadata = result["metadata"]
+            scores = {
+                "token": {
+                    "prompt_tokens": metadata["prompt_tokens"],
+                    "answer_tokens": metadata["answer_tokens"],
+                    "total_tokens": metadata["total_tokens"]
+                }
+            }
+            if item.get("relevant_docs"):
+                scores["retrieval"] = self.metrics.retrieval_scores(item["relevant_docs"], result["retrieved_documents"])
+            if item.get("reference_answer"):
+                pairs.append((len(all_scores), result["answer"], item["reference_answer"]))
+            all_scores.append(scores)
+        
+        if pairs:
+            similarities = self.metrics.generation_metrics.batch_semantic_similarity(
+                [answer for _, answer, _ in pairs],
+                [reference for _, _, reference in pairs],
+                batch_size=self.batch_size
+            )
+            for (position, _, _), similarity in zip(pairs, similarities):
+                all_scores[position]["generation"] = {"semantic_similarity": float(similarity)}
+        
+        for scores in all_scores:
+            self.add_scores(scores)
+        return all_scores
+    
+    def summary(self) -> Dict[str, Any]:
+        """当前的汇总指标（各指标的平均值）"""
+        def mean(group: str, suffix: str = "") -> Dict[str, float]:
+            count = self.counts[group]
+            return {
+                f"{metric}{suffix}": total / count
+                for metric, total in self.sums[group].items()
+            } if count else {}
+        
+        return {
+            "retrieval_metrics": mean("retrieval"),
+            "generation_metrics": mean("generation"),
+            "token_metrics": mean("token", "_mean"),
+            "queries": self.counts["token"]
+        }
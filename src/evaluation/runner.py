@@ -0,0 +1,235 @@
+"""可断点续跑的并行评估
+
+逐条读取评估集（JSONL，字段 id/input/output，可选 relevant_docs），以有界线程池并发执行
+RAG 流程，完成的结果按批追加写入 JSONL 检查点，并增量汇总 RAGMetrics。
+中断后使用相同的输出文件重新运行，已完成的 id 会被跳过，其指标从检查点恢复::
+
+    python -m src.evaluation.runner --queries part.jsonl --kb-queries --workers 8
+
+--kb-queries 表示评估集就是知识库文件本身，第 i 条查询的相关文档为知识库第 i 条对应的索引记录
+（索引入库时去过重的，被折叠的条目对应其代表记录）。
+"""
+import argparse
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Set
+
+import numpy as np
+
+from src.config import Config
+from src.document_processor.loader import DocumentLoader
+from src.document_processor.dedup import source_rows
+from src.evaluation.metrics import RAGMetrics, MetricsAccumulator
+from src.rag.pipeline import RAGPipeline
+from src.utils.helpers import iter_jsonl, append_jsonl, save_results, truncate_partial_line
+
+logger = logging.getLogger(__name__)
+
+
+class EvaluationRunner:
+    """并行评估执行器"""
+
+    def __init__(
+        self,
+        pipeline: RAGPipeline,
+        metrics: RAGMetrics,
+        max_workers: Optional[int] = None,
+        checkpoint_every: int = 32,
+        scoring: bool = False
+    ):
+        """初始化评估执行器
+
+        Args:
+            pipeline: RAG 流程
+            metrics: RAG 评估器
+            max_workers: 并发查询数，默认为 Config.LLM_MAX_CONCURRENCY
+            checkpoint_every: 每完成多少条写一次检查点（同时是语义相似度的批大小）
+            scoring: 是否需要对文档相关性打分
+        """
+        self.pipeline = pipeline
+        self.max_workers = max_workers or pipeline.config.LLM_MAX_CONCURRENCY
+        self.checkpoint_every = checkpoint_every
+        self.scoring = scoring
+        self.accumulator = MetricsAccumulator(metrics, batch_size=checkpoint_every)
+
+    def load_checkpoint(self, output_file: Path) -> Set[str]:
+        """读取已有检查点：返回已完成的 id，并把其指标计入汇总
+
+        失败的查询不算完成，续跑时会重试。进程中断留下的半行会被截掉。
+        """
+        done: Set[str] = set()
+        if not output_file.exists():
+            return done
+
+        if truncate_partial_line(str(output_file)):
+            logger.warning("检查点末尾有未写完的行，已截断")
+
+        for record in iter_jsonl(output_file):
+            if "error" in record:
+                continue
+            done.add(record["id"])
+            self.accumulator.add_scores(record["scores"])
+        logger.info(f"从检查点恢复 {len(done)} 条已完成的查询")
+        return done
+
+    @staticmethod
+    def iter_queries(query_file: Path, kb_queries: bool = False, rows: Optional[np.ndarray] = None) -> Iterator[Dict[str, Any]]:
+        """逐条读取评估集
+
+        查询和标准答案按知识库的方式预处理，保证与索引中的文本一致。
+
+        Args:
+            query_file: 评估集 JSONL 文件
+            kb_queries: 评估集是否为知识库文件本身
+            rows: 知识库位置到索引下标的映射（见 dedup.source_rows），为None时两者相同
+        """
+        for position, item in enumerate(iter_jsonl(query_file)):
+            relevant_docs = item.get("relevant_docs")
+            if relevant_docs is None and kb_queries:
+                relevant_docs = [int(rows[position]) if rows is not None else position]
+            yield {
+                "id": str(item.get("id") or position),
+                "query": DocumentLoader.preprocess_text(item.get("input", "")),
+                "reference_answer": DocumentLoader.preprocess_text(item.get("output", "")),
+                "relevant_docs": relevant_docs
+            }
+
+    def _kb_rows(self) -> Optional[np.ndarray]:
+        """默认集合去过重时，知识库位置到索引下标的映射"""
+        store = getattr(self.pipeline.retriever, "vector_store", None)
+        if store is None:
+            logger.warning("检索器不在本进程，无法读取去重映射；索引去过重时 --kb-queries 的相关文档标注会错位")
+            return None
+        return source_rows(store.metadata, store.source_index)
+
+    def _run_query(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            result = self.pipeline.process(item["query"], scoring=self.scoring)
+            return {**item, "result": result, "seconds": time.perf_counter() - start}
+        except Exception as e:
+            return {**item, "error": f"{type(e).__name__}: {e}", "seconds": time.perf_counter() - start}
+
+    def _write_batch(self, batch, output_file: Path):
+        succeeded = [item for item in batch if "error" not in item]
+        scores = iter(self.accumulator.score(succeeded))
+
+        records = []
+        for item in batch:
+            record = {"id": item["id"], "query": item["query"], "seconds": round(item["seconds"], 3)}
+            if "error" in item:
+                record["error"] = item["error"]
+            else:
+                result = item["result"]
+                record.update({
+                    "answer": result["answer"],
+                    "retrieved": [
+                        {"index": doc.get("index"), "score": round(float(doc["score"]), 4)}
+                        for doc in result["retrieved_documents"]
+                    ],
+                    "metadata": result["metadata"],
+                    "scores": next(scores)
+                })
+            records.append(record)
+        append_jsonl(records, str(output_file))
+
+    def run(self, query_file: Path, output_file: Path, kb_queries: bool = False, limit: Optional[int] = None) -> Dict[str, Any]:
+        """执行评估
+
+        Args:
+            query_file: 评估集 JSONL 文件
+            output_file: 结果检查点 JSONL 文件（续跑时传入同一个文件）
+            kb_queries: 评估集是否为知识库文件本身
+            limit: 最多评估的查询条数（含已完成的）
+
+        Returns:
+            汇总指标，结构同 RAGMetrics.evaluate，另含 queries/failed/elapsed_seconds
+        """
+        done = self.load_checkpoint(output_file)
+        queries = self.iter_queries(query_file, kb_queries, self._kb_rows() if kb_queries else None)
+        if limit:
+            queries = itertools.islice(queries, limit)
+        pending_items = (item for item in queries if item["id"] not in done)
+
+        failed = 0
+        completed = 0
+        batch = []
+        start = time.perf_counter()
+        # 在途任务数限制为 2 倍并发，评估集不会一次性载入内存
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            in_flight = set()
+            exhausted = False
+            while in_flight or not exhausted:
+                while not exhausted and len(in_flight) < self.max_workers * 2:
+                    item = next(pending_items, None)
+                    if item is None:
+                        exhausted = True
+                    else:
+                        in_flight.add(pool.submit(self._run_query, item))
+                if not in_flight:
+                    break
+
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    item = future.result()
+                    batch.append(item)
+                    if "error" in item:
+                        failed += 1
+                        logger.error(f"查询 {item['id']} 失败：{item['error']}")
+                    completed += 1
+
+                if len(batch) >= self.checkpoint_every:
+                    self._write_batch(batch, output_file)
+                    batch = []
+                    elapsed = time.perf_counter() - start
+                    logger.info(f"已完成 {completed} 条（失败 {failed}），{completed / elapsed:.2f} 条/秒")
+
+        if batch:
+            self._write_batch(batch, output_file)
+
+        elapsed = time.perf_counter() - start
+        summary = self.accumulator.summary()
+        summary.update({
+            "failed": failed,
+            "elapsed_seconds": round(elapsed, 3),
+            "queries_per_second": round(completed / elapsed, 3) if elapsed else 0.0
+        })
+        return summary
+
+
+def main():
+    config = Config()
+    parser = argparse.ArgumentParser(description="可断点续跑的并行评估")
+    parser.add_argument("--queries", type=Path, default=config.BASE_DIR / "part.jsonl", help="评估集 JSONL 文件")
+    parser.add_argument("--output", type=Path, default=config.EVAL_OUTPUT_DIR / "eval_results.jsonl",
+                        help="结果检查点文件，续跑时使用同一个文件")
+    parser.add_argument("--workers", type=int, default=None, help="并发查询数，默认为 LLM_MAX_CONCURRENCY")
+    parser.add_argument("--checkpoint-every", type=int, default=32, help="每完成多少条写一次检查点")
+    parser.add_argument("--kb-queries", action="store_true", help="评估集为知识库文件本身，第 i 条查询的相关文档为第 i 条记录")
+    parser.add_argument("--limit", type=int, default=None, help="最多评估的查询条数")
+    parser.add_argument("--scoring", action="store_true", help="对文档相关性打分")
+    parser.add_argument("--precomputed", action="store_true",
+                        help="启用预计算回答（默认关闭：评估集来自知识库时会直接返回数据集中的回答）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    pipeline = RAGPipeline(config, precomputed=args.precomputed)
+    # 评估模型与检索模型相同时共用，避免重复加载
+    model = pipeline.retriever.model if config.METRICS_MODEL == config.EMBEDDING_MODEL else None
+    metrics = RAGMetrics(config.METRICS_MODEL, model=model)
+
+    runner = EvaluationRunner(pipeline, metrics, max_workers=args.workers,
+                              checkpoint_every=args.checkpoint_every, scoring=args.scoring)
+    summary = runner.run(args.queries, args.output, kb_queries=args.kb_queries, limit=args.limit)
+
+    summary_file = args.output.with_suffix(".summary.json")
+    save_results(summary, str(summary_file))
+    logger.info(f"评估完成：{summary['queries']} 条，失败 {summary['failed']} 条，汇总已保存到 {summary_file}")
+
+
+if __name__ == "__main__":
+    main()
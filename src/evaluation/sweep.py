@@ -0,0 +1,241 @@
+"""检索参数扫描：在带标注的查询集上比较 TOP_K、MIN_SIMILARITY_SCORE、候选倍数和索引类型
+
+每种索引只构建一次，查询只编码一次；每组 (索引, top_k, 候选倍数) 只检索一遍，
+相似度阈值在同一批候选上过滤（与 VectorStore.search 的阈值过滤等价）。
+输出各组合的 P@K、R@K、MRR、检索延迟和索引内存，并标出 (召回率, p95 延迟, 内存) 的帕累托前沿::
+
+    # 使用已入库的索引（VECTOR_DB_PATH）和知识库问题
+    python -m src.evaluation.sweep --queries part.jsonl --kb-queries
+
+    # 从语料构建，使用哈希编码器（无需模型文件），扫描近似索引
+    python -m src.evaluation.sweep --corpus part.jsonl --encoder hash --kb-queries \\
+        --index flat hnsw:M=16,ef_search=32 hnsw:M=32,ef_search=128 ivf:nprobe=4
+
+    # 文档编码前不做规范化，与上一条对比规范化对召回率的影响
+    python -m src.evaluation.sweep --corpus part.jsonl --kb-queries --raw-documents
+
+结果保存为 JSON 和 HTML（EVAL_OUTPUT_DIR/sweeps），文件名包含 git 提交。
+"""
+import argparse
+import html
+import itertools
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import faiss
+import numpy as np
+
+from src.config import Config
+from src.vectorstore.embeddings import VectorStore, build_faiss_index
+from src.document_processor.normalizer import QueryNormalizer
+from src.evaluation.metrics import RetrievalMetrics
+from src.evaluation.runner import EvaluationRunner
+from src.document_processor.dedup import source_rows
+from src.benchmark.common import HashingEncoder, load_corpus, latency_summary, environment_info
+
+
+def parse_index_spec(spec: str) -> Tuple[str, Dict[str, Any]]:
+    """解析索引规格，如 flat、hnsw:M=32,ef_search=64、ivf:nlist=256,nprobe=8"""
+    index_type, _, options = spec.partition(":")
+    params = {}
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        params[key.strip()] = int(value)
+    return index_type, params
+
+
+def pareto_front(rows: List[Dict[str, Any]]) -> None:
+    """标出帕累托最优的组合：召回率越高越好，p95 延迟和索引内存越低越好"""
+    def objectives(row):
+        return (-row["recall"], row["latency"]["p95_ms"], row["index_mb"])
+
+    points = [objectives(row) for row in rows]
+    for row, point in zip(rows, points):
+        row["pareto"] = not any(
+            other != point and all(o <= p for o, p in zip(other, point))
+            for other in points
+        )
+
+
+def evaluate_config(store: VectorStore, query_vectors: np.ndarray, queries: List[Dict[str, Any]],
+                    top_k: int, candidate_factor: int, max_candidates, min_scores: List[float]) -> List[Dict[str, Any]]:
+    """对一组 (top_k, 候选倍数) 检索一遍，再按每个阈值过滤并计算指标"""
+    latencies = []
+    all_results = []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        results = store.search_by_vector(vector, k=top_k * candidate_factor, min_score=-1.0,
+                                         candidate_factor=1, max_candidates=max_candidates)
+        latencies.append(time.perf_counter() - start)
+        all_results.append(results)
+    latency = latency_summary(latencies)
+
+    rows = []
+    for min_score in min_scores:
+        precision, recall, mrr, returned = [], [], [], []
+        for query, results in zip(queries, all_results):
+            retrieved = [doc for doc in results if doc["score"] >= min_score][:top_k]
+            relevant = query["relevant_docs"]
+            precision.append(RetrievalMetrics.precision_at_k(relevant, retrieved, top_k))
+            recall.append(RetrievalMetrics.recall_at_k(relevant, retrieved, top_k))
+            mrr.append(RetrievalMetrics.reciprocal_rank(relevant, retrieved))
+            returned.append(len(retrieved))
+        rows.append({
+            "top_k": top_k,
+            "min_score": min_score,
+            "candidate_factor": candidate_factor,
+            "precision": round(float(np.mean(precision)), 4),
+            "recall": round(float(np.mean(recall)), 4),
+            "mrr": round(float(np.mean(mrr)), 4),
+            "mean_returned": round(float(np.mean(returned)), 3),
+            "latency": latency,
+        })
+    return rows
+
+
+def render_html(report: Dict[str, Any]) -> str:
+    """生成简单的 HTML 报告，帕累托最优的行高亮显示"""
+    columns = ["index", "top_k", "min_score", "candidate_factor", "precision", "recall", "mrr",
+               "mean_returned", "p50_ms", "p95_ms", "index_mb", "build_seconds"]
+    rows = sorted(report["results"], key=lambda row: (-row["recall"], row["latency"]["p95_ms"]))
+    body = []
+    for row in rows:
+        values = {**row, "p50_ms": row["latency"]["p50_ms"], "p95_ms": row["latency"]["p95_ms"]}
+        cells = "".join(f"<td>{html.escape(str(values[column]))}</td>" for column in columns)
+        body.append(f'<tr class="{"pareto" if row["pareto"] else ""}">{cells}</tr>')
+    header = "".join(f"<th>{column}</th>" for column in columns)
+    parameters = html.escape(json.dumps(report["parameters"], ensure_ascii=False))
+    return f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>检索参数扫描 {html.escape(report["environment"]["git_commit"])}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 8px; text-align: right; }}
+tr.pareto {{ background: #e6f4ea; font-weight: bold; }}
+</style>
+</head>
+<body>
+<h1>检索参数扫描</h1>
+<p>查询 {report["parameters"]["queries"]} 条，文档 {report["parameters"]["documents"]} 条。
+加粗行为帕累托最优（召回率、p95 延迟、索引内存）。按召回率降序排列。</p>
+<p><code>{parameters}</code></p>
+<table>
+<tr>{header}</tr>
+{chr(10).join(body)}
+</table>
+</body>
+</html>
+"""
+
+
+def save_report(report: Dict[str, Any], output_dir: Path) -> Path:
+    """保存 JSON 和 HTML 报告，返回 JSON 路径"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = output_dir / f"index_sweep_{timestamp}_{report['environment']['git_commit']}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    with open(path.with_suffix(".html"), "w", encoding="utf-8") as f:
+        f.write(render_html(report))
+    return path
+
+
+def main():
+    config = Config()
+    parser = argparse.ArgumentParser(description="检索参数扫描与帕累托报告")
+    parser.add_argument("--queries", type=Path, default=config.BASE_DIR / "part.jsonl",
+                        help="带标注的查询集 JSONL（字段 input 和 relevant_docs）")
+    parser.add_argument("--kb-queries", action="store_true", help="查询集为知识库文件本身，第 i 条查询的相关文档为第 i 条记录")
+    parser.add_argument("--limit", type=int, default=None, help="最多使用的查询条数")
+    parser.add_argument("--corpus", type=Path, default=None, help="从语料构建索引；不指定时使用 VECTOR_DB_PATH 的已有索引")
+    parser.add_argument("--encoder", choices=["model", "hash"], default="model", help="从语料构建时使用的编码器")
+    parser.add_argument("--dim", type=int, default=768, help="哈希编码器的向量维度")
+    parser.add_argument("--raw-documents", action="store_true",
+                        help="从语料构建时文档编码前不做规范化（与默认的规范化对比召回率）")
+    parser.add_argument("--index", nargs="+", default=["flat", "hnsw", "ivf"],
+                        help="索引规格，如 flat、hnsw:M=32,ef_search=64、ivf:nlist=256,nprobe=8")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[1, 2, 3, 5])
+    parser.add_argument("--min-score", type=float, nargs="+", default=[0.0, 0.3, 0.5, 0.7])
+    parser.add_argument("--candidate-factor", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--max-candidates", type=int, default=None, help="候选数上限，默认不限制")
+    parser.add_argument("--output-dir", type=Path, default=config.EVAL_OUTPUT_DIR / "sweeps")
+    args = parser.parse_args()
+
+    # 构建或复用向量矩阵，所有索引共用
+    if args.corpus:
+        texts, _ = load_corpus(args.corpus)
+        model = HashingEncoder(args.dim) if args.encoder == "hash" else None
+        store = VectorStore(
+            config.EMBEDDING_MODEL if model is None else "hashing-encoder",
+            model=model,
+            query_normalizer=QueryNormalizer(to_simplified=config.QUERY_TO_SIMPLIFIED)
+        )
+        if args.raw_documents:
+            store.use_normalizer(None)
+        store.create_index(texts)
+    else:
+        store = VectorStore(config.EMBEDDING_MODEL)
+        store.load(config.VECTOR_DB_PATH)
+
+    queries = [
+        query for query in EvaluationRunner.iter_queries(args.queries, args.kb_queries, source_rows(store.metadata, store.source_index))
+        if query["relevant_docs"]
+    ][:args.limit]
+    if not queries:
+        parser.error("查询集中没有带 relevant_docs 标注的查询（知识库文件可使用 --kb-queries）")
+
+    # 查询只编码一次，扫描只测量索引检索和后处理
+    start = time.perf_counter()
+    query_vectors = np.asarray(store.model.encode(
+        [store.enhance_query(query["query"]) for query in queries], normalize_embeddings=True
+    ), dtype=np.float32)
+    encode_seconds = time.perf_counter() - start
+    print(f"文档 {len(store.texts)} 条，查询 {len(queries)} 条，编码耗时 {encode_seconds:.2f}s")
+
+    results = []
+    for spec in args.index:
+        index_type, params = parse_index_spec(spec)
+        start = time.perf_counter()
+        store.index = build_faiss_index(store.vectors, index_type, params)
+        build_seconds = time.perf_counter() - start
+        index_mb = faiss.serialize_index(store.index).nbytes / 2**20
+        print(f"索引 {spec}: 构建 {build_seconds:.2f}s，{index_mb:.1f}MB")
+
+        for top_k, candidate_factor in itertools.product(args.top_k, args.candidate_factor):
+            for row in evaluate_config(store, query_vectors, queries, top_k, candidate_factor,
+                                       args.max_candidates, args.min_score):
+                row.update({"index": spec, "index_mb": round(index_mb, 3), "build_seconds": round(build_seconds, 3)})
+                results.append(row)
+
+    pareto_front(results)
+    report = {
+        "benchmark": "index_sweep",
+        "environment": environment_info(),
+        "parameters": {
+            "queries": len(queries),
+            "documents": len(store.texts),
+            "encoder": store.model_name,
+            "document_normalizer": store.normalizer_params(),
+            "query_encode_seconds": round(encode_seconds, 3),
+            "max_candidates": args.max_candidates,
+        },
+        "results": results,
+    }
+    path = save_report(report, args.output_dir)
+
+    print(f"\n帕累托前沿（召回率 / p95 延迟 / 索引内存）：")
+    for row in sorted((row for row in results if row["pareto"]), key=lambda row: -row["recall"]):
+        print(f"  {row['index']:<28} top_k={row['top_k']:<3} min_score={row['min_score']:<5} "
+              f"factor={row['candidate_factor']:<3} P={row['precision']:.3f} R={row['recall']:.3f} "
+              f"MRR={row['mrr']:.3f} p95={row['latency']['p95_ms']:.3f}ms {row['index_mb']:.1f}MB")
+    print(f"结果已保存到: {path} 和 {path.with_suffix('.html')}")
+
+
+if __name__ == "__main__":
+    main()
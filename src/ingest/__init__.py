@@ -0,0 +1,3 @@
+"""
+This module provides index building and background ingestion jobs.
+"""
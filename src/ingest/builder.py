@@ -0,0 +1,329 @@
+"""集合索引构建
+
+从知识库 JSONL 构建集合的一个新版本：去重、预计算 token 数、向量化、解析法条引用，写入 versions/<id>/ 后原子切换 CURRENT。
+replace 模式用输入文件重建集合；append 模式在当前版本之后追加，已有记录的向量不重新计算，
+新文档与已有文档之间同样做近重复去重。
+
+reembed_collection 用另一个向量模型重新计算当前版本全部记录的向量，写入新版本目录并登记为候选版本（不切换 CURRENT），
+供影子比较后再切换。
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pathlib import Path
+import time
+import logging
+import numpy as np
+from src.config import Config
+from src.document_processor.loader import DocumentLoader
+from src.document_processor.dedup import MinHasher, SIGNATURE_ARRAY, SOURCE_INDEX_ARRAY
+from src.document_processor.citations import CITATION_ARRAY
+from src.document_processor.normalizer import QueryNormalizer
+from src.llm.tokenizer import get_encoding, count_tokens_batch
+from src.vectorstore import storage
+
+logger = logging.getLogger(__name__)
+
+BUILD_MODES = ("replace", "append")
+
+# progress(阶段, 已处理条数, 总条数)
+ProgressCallback = Callable[[str, int, int], None]
+
+
+def _read_version(path: Path) -> Tuple[np.ndarray, List[str], Dict[str, np.ndarray], Dict[str, Any]]:
+    """读取一个版本的向量、文本、逐条记录数组和元数据，分片索引按顺序拼接；入库时校验校验和"""
+    if storage.is_sharded(path):
+        manifest = storage.read_shard_manifest(path)
+        bundles = [storage.load_bundle(path / shard["path"], verify=True) for shard in manifest["shards"]]
+        vectors = np.vstack([bundle.vectors for bundle in bundles])
+        texts = [text for bundle in bundles for text in bundle.texts]
+        names = set.intersection(*(set(bundle.arrays) for bundle in bundles))
+        arrays = {name: np.concatenate([bundle.arrays[name] for bundle in bundles]) for name in names}
+        return vectors, texts, arrays, dict(manifest["metadata"])
+    if storage.is_bundle(path):
+        bundle = storage.load_bundle(path, verify=True)
+        metadata = dict(bundle.metadata)
+        metadata.pop("shard", None)
+        return np.asarray(bundle.vectors), list(bundle.texts), dict(bundle.arrays), metadata
+    if storage.is_legacy_bundle(path):
+        raise storage.LegacyIndexError(path)
+    raise FileNotFoundError(f"{path} 中没有可追加的向量索引")
+
+
+def _dedup_append(
+    hasher: MinHasher,
+    existing: np.ndarray,
+    new: np.ndarray,
+    collapse: bool
+) -> Tuple[np.ndarray, Dict[str, List[int]]]:
+    """新文档与已有记录一起聚类；已有记录全部保留，新文档中的近重复项折叠到簇代表
+
+    Returns:
+        keep: 保留的新文档下标（升序）
+        aliases: {索引下标: [被折叠的新文档下标]}，索引下标按已有记录在前、保留的新文档在后计算
+    """
+    count = len(existing)
+    positions = np.arange(len(new))
+    if not collapse or len(new) == 0:
+        return positions, {}
+    roots = hasher.cluster(np.vstack([existing, new]))[count:]
+    # 簇代表为簇内最小下标：有已有记录的簇代表必为已有记录，否则为簇内第一条新文档
+    keep = positions[roots == positions + count]
+    row_of = {int(position) + count: row for row, position in enumerate(keep.tolist(), start=count)}
+    aliases: Dict[str, List[int]] = {}
+    for position in positions[roots != positions + count].tolist():
+        root = int(roots[position])
+        row = root if root < count else row_of[root]
+        aliases.setdefault(str(row), []).append(position)
+    return keep, aliases
+
+
+def _signatures(hasher: MinHasher, texts: List[str], report: ProgressCallback, batch_size: int = 1000) -> np.ndarray:
+    """分批计算签名并上报进度"""
+    result = np.empty((len(texts), hasher.num_perm), dtype=np.uint32)
+    for i in range(0, len(texts), batch_size):
+        result[i:i + batch_size] = hasher.signatures(texts[i:i + batch_size])
+        report("dedup", min(i + batch_size, len(texts)), len(texts))
+    return result
+
+
+def build_collection(
+    input_file: Path,
+    collection_dir: Path,
+    config: Optional[Config] = None,
+    mode: str = "replace",
+    shards: int = 1,
+    dedup: bool = True,
+    progress: Optional[ProgressCallback] = None,
+    model: Optional[Any] = None
+) -> Dict[str, Any]:
+    """构建集合的新版本并切换为当前版本
+
+    Args:
+        input_file: 知识库 JSONL 文件
+        collection_dir: 集合目录
+        config: 配置对象，如果为None则创建新的配置对象
+        mode: replace 重建集合；append 追加到当前版本
+        shards: 分片数，大于 1 时保存为分片索引
+        dedup: 是否做近重复去重；append 到已去重的集合时新文档仍会计算签名
+        progress: 进度回调 progress(阶段, 已处理条数, 总条数)
+        model: 已加载的向量模型，为None时按 EMBEDDING_MODEL 加载（append 模式使用当前版本记录的模型）
+
+    Returns:
+        构建摘要：版本 id、记录数、新增条数、折叠条数、分片数、各阶段耗时
+    """
+    # 向量模型相关依赖按需导入
+    from src.vectorstore.embeddings import VectorStore, EMBEDDING_METADATA, NORMALIZER_METADATA
+
+    if mode not in BUILD_MODES:
+        raise ValueError(f"未知的构建模式：{mode}，可选 {', '.join(BUILD_MODES)}")
+    config = config or Config()
+    collection_dir = Path(collection_dir)
+    report = progress or (lambda stage, processed, total: None)
+    timings: Dict[str, float] = {}
+
+    start = time.perf_counter()
+    report("loading", 0, 0)
+    texts = DocumentLoader(input_file).get_texts()
+    logger.info(f"从 {input_file} 加载了 {len(texts)} 个文档")
+
+    vectors = np.empty((0, 0), dtype=np.float32)
+    existing_texts: List[str] = []
+    arrays: Dict[str, np.ndarray] = {}
+    metadata: Dict[str, Any] = {}
+    if mode == "append":
+        source = storage.resolve_version(collection_dir)
+        vectors, existing_texts, arrays, metadata = _read_version(source)
+        logger.info(f"追加到 {source}，已有 {len(existing_texts)} 条记录")
+    count = len(existing_texts)
+    loaded = len(texts)
+    timings["load_s"] = time.perf_counter() - start
+
+    # 近重复去重：已去重的集合按其入库参数继续计算签名，保证检索时折叠一致
+    start = time.perf_counter()
+    previous = metadata.get("dedup")
+    hasher = None
+    if previous:
+        hasher = MinHasher.from_metadata(previous)
+    elif dedup:
+        hasher = MinHasher(
+            num_perm=config.DEDUP_NUM_PERM,
+            bands=config.DEDUP_BANDS,
+            shingle_size=config.DEDUP_SHINGLE_SIZE,
+            threshold=config.DEDUP_THRESHOLD
+        )
+    keep = np.arange(len(texts))
+    dedup_metadata = None
+    signatures = None
+    if hasher is not None:
+        existing_signatures = arrays.get(SIGNATURE_ARRAY)
+        existing_source = arrays.get(SOURCE_INDEX_ARRAY)
+        if existing_signatures is None or not previous:
+            # 已有记录未去重：补算签名，知识库位置即记录下标
+            existing_signatures = _signatures(hasher, existing_texts, report)
+            existing_source = np.arange(count)
+            previous = {**hasher.params, "source_count": count, "removed": 0, "aliases": {}}
+        new_signatures = _signatures(hasher, texts, report)
+        keep, aliases = _dedup_append(hasher, np.asarray(existing_signatures), new_signatures, collapse=dedup)
+
+        offset = previous["source_count"]
+        merged = {row: list(positions) for row, positions in previous["aliases"].items()}
+        for row, positions in aliases.items():
+            merged.setdefault(row, []).extend(offset + position for position in positions)
+        dedup_metadata = {
+            **hasher.params,
+            "source_count": offset + len(texts),
+            "removed": previous["removed"] + len(texts) - len(keep),
+            "aliases": merged
+        }
+        signatures = np.concatenate([np.asarray(existing_signatures, dtype=np.uint32), new_signatures[keep]])
+        arrays[SOURCE_INDEX_ARRAY] = np.concatenate([
+            np.asarray(existing_source, dtype=np.int64), offset + keep
+        ])
+        logger.info(f"近重复去重：折叠 {len(texts) - len(keep)} 个文档，新增 {len(keep)} 个")
+    texts = [texts[i] for i in keep]
+    timings["dedup_s"] = time.perf_counter() - start
+
+    # 预计算 token 数，提示词组装时不再对语料分词
+    start = time.perf_counter()
+    report("tokenizing", 0, len(texts))
+    encoding = get_encoding(config.LLM_MODEL)
+    token_counts = count_tokens_batch(texts, encoding)
+    if count:
+        existing_counts = arrays.get("token_counts")
+        if existing_counts is None or metadata.get("tokenizer") != encoding.name:
+            existing_counts = count_tokens_batch(existing_texts, encoding)
+        token_counts = np.concatenate([np.asarray(existing_counts, dtype=np.uint32), token_counts])
+    timings["tokenize_s"] = time.perf_counter() - start
+
+    # 只对新增文本向量化；追加时沿用当前版本的向量模型，避免同一索引混用两个模型的向量
+    start = time.perf_counter()
+    model_name = config.EMBEDDING_MODEL
+    recorded = (metadata.get(EMBEDDING_METADATA) or {}).get("model")
+    if count and recorded and recorded != model_name:
+        logger.info(f"当前版本由向量模型 {recorded} 构建，追加的文档使用同一模型")
+        model_name, model = recorded, None
+    store = VectorStore(model_name, model=model, query_normalizer=QueryNormalizer(to_simplified=config.QUERY_TO_SIMPLIFIED))
+    if count:
+        # 追加的文档按当前版本的文档规范化参数编码；旧版本未做规范化时同样保持原样
+        store.use_normalizer(metadata.get(NORMALIZER_METADATA))
+        if store.document_normalizer is None:
+            logger.info("当前版本的文档编码前未做规范化，追加的文档保持一致；replace 重新入库后统一规范化")
+    report("embedding", 0, len(texts))
+    new_vectors = store.encode_texts(texts, progress=lambda done: report("embedding", done, len(texts))).astype("float32")
+    if count:
+        if vectors.shape[1] != new_vectors.shape[1]:
+            raise ValueError(f"向量维度 ({new_vectors.shape[1]}) 与已有索引 ({vectors.shape[1]}) 不一致")
+        new_vectors = np.vstack([vectors, new_vectors])
+    timings["embed_s"] = time.perf_counter() - start
+
+    # 法条引用索引覆盖全部记录（含已有记录），追加后法律名称表保持一致
+    start = time.perf_counter()
+    store.texts = existing_texts + texts
+    store.index_citations(progress=lambda done, total: report("citations", done, total))
+    logger.info(f"法条引用索引：{len(store.citations)} 个法条，{store.metadata['citations']['count']} 条引用")
+    timings["citations_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    report("saving", 0, 0)
+    store.vectors = new_vectors
+    store.token_counts = token_counts
+    store.metadata = {**metadata, "tokenizer": encoding.name, "citations": store.metadata["citations"]}
+    store.metadata.pop("dedup", None)
+    store.metadata.pop("reembedded_from", None)
+    if dedup_metadata is not None:
+        store.metadata["dedup"] = dedup_metadata
+        store.signatures = signatures
+        store.source_index = arrays[SOURCE_INDEX_ARRAY]
+    version_dir = storage.new_version_dir(collection_dir)
+    store.save(version_dir, num_shards=shards)
+    report("publishing", 0, 0)
+    version = storage.publish_version(version_dir, keep=config.INGEST_KEEP_VERSIONS)
+    timings["save_s"] = time.perf_counter() - start
+
+    return {
+        "version": version,
+        "path": str(version_dir),
+        "mode": mode,
+        "documents": len(store.texts),
+        "added": len(texts),
+        "collapsed": loaded - len(texts),
+        "shards": shards,
+        "timings": {name: round(value, 3) for name, value in timings.items()}
+    }
+
+
+def reembed_collection(
+    collection_dir: Path,
+    model_name: str,
+    config: Optional[Config] = None,
+    progress: Optional[ProgressCallback] = None,
+    model: Optional[Any] = None
+) -> Dict[str, Any]:
+    """用新的向量模型重新计算当前版本全部记录的向量，写入新版本并登记为候选版本
+
+    文本、token 数、去重签名和法条引用键原样沿用，只替换向量；候选版本记录来源版本，
+    集合之后又有入库时不能直接切换。
+
+    Args:
+        collection_dir: 集合目录
+        model_name: 新的向量模型名称
+        config: 配置对象，如果为None则创建新的配置对象
+        progress: 进度回调 progress(阶段, 已处理条数, 总条数)
+        model: 已加载的新向量模型，为None时按 model_name 加载
+
+    Returns:
+        构建摘要：候选版本 id、来源版本、新旧向量模型、维度、记录数、各阶段耗时
+    """
+    from src.vectorstore.embeddings import VectorStore, EMBEDDING_METADATA
+
+    config = config or Config()
+    collection_dir = Path(collection_dir)
+    report = progress or (lambda stage, processed, total: None)
+    timings: Dict[str, float] = {}
+
+    start = time.perf_counter()
+    report("loading", 0, 0)
+    source_version = storage.current_version(collection_dir)
+    source = storage.resolve_version(collection_dir)
+    _, texts, arrays, metadata = _read_version(source)
+    shards = storage.read_shard_manifest(source)["num_shards"] if storage.is_sharded(source) else 1
+    previous = (metadata.get(EMBEDDING_METADATA) or {}).get("model")
+    if previous == model_name:
+        raise ValueError(f"集合当前版本已使用向量模型 {model_name}")
+    logger.info(f"重新向量化 {source}：{len(texts)} 条记录，{previous or '未记录的模型'} -> {model_name}")
+    timings["load_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # 全部记录重新编码，按当前配置做文档规范化
+    store = VectorStore(model_name, model=model, query_normalizer=QueryNormalizer(to_simplified=config.QUERY_TO_SIMPLIFIED))
+    report("embedding", 0, len(texts))
+    store.vectors = store.encode_texts(texts, progress=lambda done: report("embedding", done, len(texts))).astype("float32")
+    timings["embed_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store.texts = texts
+    store.metadata = {**metadata, "reembedded_from": {"version": source_version, "model": previous}}
+    store.token_counts = arrays.get("token_counts")
+    store.signatures = arrays.get(SIGNATURE_ARRAY)
+    store.source_index = arrays.get(SOURCE_INDEX_ARRAY)
+    store.citation_keys = arrays.get(CITATION_ARRAY)
+    if store.citation_keys is None or "citations" not in metadata:
+        store.index_citations(progress=lambda done, total: report("citations", done, total))
+    report("saving", 0, 0)
+    version_dir = storage.new_version_dir(collection_dir)
+    store.save(version_dir, num_shards=shards)
+    version = storage.set_candidate(version_dir)
+    timings["save_s"] = time.perf_counter() - start
+    logger.info(f"候选版本 {version} 已写入，影子比较后可切换")
+
+    return {
+        "version": version,
+        "path": str(version_dir),
+        "mode": "reembed",
+        "source_version": source_version,
+        "model": model_name,
+        "previous_model": previous,
+        "dimension": int(store.vectors.shape[1]),
+        "documents": len(texts),
+        "shards": shards,
+        "timings": {name: round(value, 3) for name, value in timings.items()}
+    }
@@ -0,0 +1,350 @@
+"""后台入库任务
+
+每个任务在独立进程中运行 build_collection（降低调度优先级、限制计算线程），不占用服务进程的 CPU 和 GIL；
+构建完成后原子切换集合的 CURRENT 指针，常驻该集合的服务进程在后台加载新版本后替换。
+重新向量化任务（mode 为 reembed）运行 reembed_collection，只登记候选版本，不切换 CURRENT。
+
+任务目录 INGEST_JOBS_DIR/<job_id>/::
+
+    job.json       任务参数
+    status.json    任务状态（由任务进程原子写入）：阶段、进度、速度、预计剩余时间、结果或错误
+    ingest.log     任务进程的日志
+
+任务进程入口::
+
+    python -m src.ingest.jobs --job-dir data/ingest_jobs/<job_id>
+"""
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from pathlib import Path
+import argparse
+import fcntl
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from src.config import Config
+from src.vectorstore.collection_manager import CollectionManager, CollectionNotFoundError
+
+logger = logging.getLogger(__name__)
+
+JOB_FILE = "job.json"
+STATUS_FILE = "status.json"
+LOG_FILE = "ingest.log"
+UPLOADS_DIR = "uploads"
+LOCK_FILE = ".ingest.lock"
+
+ACTIVE_STATES = ("queued", "running")
+
+# 状态文件的最短写入间隔（秒），阶段变化时立即写入
+_STATUS_INTERVAL = 0.5
+
+
+class IngestJobNotFoundError(KeyError):
+    """入库任务不存在"""
+
+class IngestConflictError(RuntimeError):
+    """同一集合已有进行中的入库任务"""
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _write_json(path: Path, payload: Dict[str, Any]):
+    """先写临时文件再改名，读取方不会看到写了一半的状态"""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path) -> Dict[str, Any]:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class IngestJobManager:
+    """提交和查询入库任务（服务进程侧）"""
+
+    def __init__(self, config: Optional[Config] = None):
+        """初始化任务管理器
+
+        Args:
+            config: 配置对象，如果为None则创建新的配置对象
+        """
+        self.config = config or Config()
+        self.jobs_dir = Path(self.config.INGEST_JOBS_DIR)
+        self.collections = CollectionManager(self.config)
+        self._processes: Dict[str, subprocess.Popen] = {}
+        self._lock = threading.Lock()
+
+    def upload_path(self) -> Path:
+        """为上传的 JSONL 文件分配路径（任务结束后由任务进程删除）"""
+        uploads = self.jobs_dir / UPLOADS_DIR
+        uploads.mkdir(parents=True, exist_ok=True)
+        return uploads / f"{os.urandom(8).hex()}.jsonl"
+
+    def submit(
+        self,
+        collection: Optional[str],
+        input_path: Path,
+        mode: str = "replace",
+        shards: int = 1,
+        dedup: bool = True,
+        remove_input: bool = False
+    ) -> Dict[str, Any]:
+        """提交入库任务并启动任务进程
+
+        Args:
+            collection: 集合名称，为None时写入默认集合
+            input_path: 知识库 JSONL 文件
+            mode: replace 重建集合；append 追加到当前版本
+            shards: 分片数
+            dedup: 是否做近重复去重
+            remove_input: 任务结束后是否删除输入文件（上传文件）
+
+        Returns:
+            任务状态
+
+        Raises:
+            InvalidCollectionNameError: 集合名称不合法
+            CollectionNotFoundError: append 模式下集合不存在
+            IngestConflictError: 该集合已有进行中的任务
+            ValueError: 参数不合法
+            FileNotFoundError: 输入文件不存在
+        """
+        from src.ingest.builder import BUILD_MODES
+
+        collection = collection or self.config.DEFAULT_COLLECTION
+        collection_dir = self.collections.path_for(collection)
+        if mode not in BUILD_MODES:
+            raise ValueError(f"未知的构建模式：{mode}，可选 {', '.join(BUILD_MODES)}")
+        if shards < 1:
+            raise ValueError("shards 必须大于 0")
+        input_path = Path(input_path).resolve()
+        if not input_path.is_file():
+            raise FileNotFoundError(f"输入文件不存在：{input_path}")
+        if mode == "append" and not self.collections.exists(collection):
+            raise CollectionNotFoundError(collection)
+        return self._start(collection, {
+            "collection_dir": str(collection_dir),
+            "input": str(input_path),
+            "remove_input": remove_input,
+            "mode": mode,
+            "shards": shards,
+            "dedup": dedup
+        })
+
+    def submit_reembed(self, collection: Optional[str], model: str) -> Dict[str, Any]:
+        """提交重新向量化任务：用新的向量模型重新计算集合当前版本的向量，完成后登记为候选版本
+
+        Args:
+            collection: 集合名称，为None时使用默认集合
+            model: 新的向量模型名称
+
+        Returns:
+            任务状态
+
+        Raises:
+            InvalidCollectionNameError: 集合名称不合法
+            CollectionNotFoundError: 集合不存在
+            IngestConflictError: 该集合已有进行中的任务
+            ValueError: 模型名称为空
+        """
+        collection = collection or self.config.DEFAULT_COLLECTION
+        collection_dir = self.collections.path_for(collection)
+        if not model:
+            raise ValueError("请指定新的向量模型")
+        if not self.collections.exists(collection):
+            raise CollectionNotFoundError(collection)
+        return self._start(collection, {"collection_dir": str(collection_dir), "mode": "reembed", "model": model})
+
+    def active(self, collection: str) -> Optional[Dict[str, Any]]:
+        """集合进行中的任务，没有时返回 None"""
+        for job in self.list():
+            if job["collection"] == collection and job["state"] in ACTIVE_STATES:
+                return job
+        return None
+
+    def _start(self, collection: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """登记任务并启动任务进程（同一集合同时只有一个进行中的任务）"""
+        with self._lock:
+            job = self.active(collection)
+            if job is not None:
+                raise IngestConflictError(f"集合 {collection} 已有进行中的入库任务：{job['job_id']}")
+
+            job_id = datetime.now().strftime("%Y%m%d%H%M%S") + "-" + os.urandom(4).hex()
+            job_dir = self.jobs_dir / job_id
+            job_dir.mkdir(parents=True)
+            job = {"job_id": job_id, "collection": collection, **fields, "created_at": _now()}
+            _write_json(job_dir / JOB_FILE, job)
+            _write_json(job_dir / STATUS_FILE, {**job, "state": "queued", "stage": None})
+
+            env = dict(os.environ)
+            for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+                env[name] = str(self.config.INGEST_THREADS)
+            env["TOKENIZERS_PARALLELISM"] = "false"
+            with open(job_dir / LOG_FILE, "ab") as log:
+                process = subprocess.Popen(
+                    [sys.executable, "-m", "src.ingest.jobs", "--job-dir", str(job_dir)],
+                    cwd=str(self.config.BASE_DIR),
+                    env=env,
+                    stdin=subprocess.DEVNULL,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                    start_new_session=True
+                )
+            self._processes[job_id] = process
+            job["pid"] = process.pid
+            _write_json(job_dir / JOB_FILE, job)
+        logger.info(f"已提交入库任务 {job_id}：{collection} ({job['mode']})，进程 {process.pid}")
+        return self.status(job_id)
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        """任务状态；任务进程已退出而状态未结束时标记为失败
+
+        Raises:
+            IngestJobNotFoundError: 任务不存在
+        """
+        job_dir = self.jobs_dir / job_id
+        if not job_id or Path(job_id).name != job_id or not (job_dir / STATUS_FILE).is_file():
+            raise IngestJobNotFoundError(job_id)
+        status = _read_json(job_dir / STATUS_FILE)
+        if status["state"] in ACTIVE_STATES and not self._alive(job_id, job_dir):
+            # 进程结束后再读一次，避免与最后一次状态写入竞争
+            status = _read_json(job_dir / STATUS_FILE)
+            if status["state"] in ACTIVE_STATES:
+                status.update(state="failed", error="任务进程意外退出，详见日志", finished_at=_now())
+                _write_json(job_dir / STATUS_FILE, status)
+        return status
+
+    def _alive(self, job_id: str, job_dir: Path) -> bool:
+        process = self._processes.get(job_id)
+        if process is not None:
+            if process.poll() is None:
+                return True
+            del self._processes[job_id]
+            return False
+        # 其他服务进程提交的任务：按进程号判断，进程号尚未写入时视为刚启动
+        pid = _read_json(job_dir / JOB_FILE).get("pid")
+        return pid is None or _pid_alive(pid)
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """最近的任务状态，按提交时间倒序"""
+        if not self.jobs_dir.is_dir():
+            return []
+        job_ids = sorted(
+            (path.name for path in self.jobs_dir.iterdir() if (path / STATUS_FILE).is_file()),
+            reverse=True
+        )
+        return [self.status(job_id) for job_id in job_ids[:limit]]
+
+
+class _StatusReporter:
+    """任务进程侧的状态写入：按阶段统计处理速度和预计剩余时间"""
+
+    def __init__(self, path: Path, status: Dict[str, Any]):
+        self.path = path
+        self.status = status
+        self._stage = None
+        self._stage_started = 0.0
+        self._written = 0.0
+
+    def write(self, **fields):
+        self.status.update(fields)
+        self.status["updated_at"] = _now()
+        _write_json(self.path, self.status)
+        self._written = time.monotonic()
+
+    def __call__(self, stage: str, processed: int, total: int):
+        now = time.monotonic()
+        changed = stage != self._stage
+        if changed:
+            self._stage = stage
+            self._stage_started = now
+        elapsed = now - self._stage_started
+        rate = processed / elapsed if processed and elapsed > 0 else None
+        eta = (total - processed) / rate if rate and total else None
+        self.status.update(
+            stage=stage,
+            processed=processed,
+            total=total,
+            docs_per_second=round(rate, 1) if rate else None,
+            eta_seconds=round(eta, 1) if eta is not None else None
+        )
+        if changed or processed == total or now - self._written >= _STATUS_INTERVAL:
+            self.write()
+
+
+def run_job(job_dir: Path, config: Optional[Config] = None) -> Dict[str, Any]:
+    """在当前进程执行任务，状态写入 status.json"""
+    from src.ingest.builder import build_collection, reembed_collection
+
+    config = config or Config()
+    job_dir = Path(job_dir)
+    job = _read_json(job_dir / JOB_FILE)
+    reporter = _StatusReporter(job_dir / STATUS_FILE, {**job, "state": "running", "stage": None})
+    reporter.write(started_at=_now(), pid=os.getpid())
+    collection_dir = Path(job["collection_dir"])
+    collection_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        # 跨进程互斥：同一集合同时只有一个任务写入版本目录
+        with open(collection_dir / LOCK_FILE, "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise IngestConflictError(f"集合 {job['collection']} 正在被其他任务写入")
+            if job["mode"] == "reembed":
+                result = reembed_collection(collection_dir, job["model"], config, progress=reporter)
+            else:
+                result = build_collection(
+                    Path(job["input"]),
+                    collection_dir,
+                    config,
+                    mode=job["mode"],
+                    shards=job["shards"],
+                    dedup=job["dedup"],
+                    progress=reporter
+                )
+    except Exception as e:
+        logger.error(f"入库任务 {job['job_id']} 失败：{e}\n{traceback.format_exc()}")
+        reporter.write(state="failed", error=str(e), finished_at=_now(), eta_seconds=None)
+        return reporter.status
+    finally:
+        if job.get("remove_input"):
+            Path(job["input"]).unlink(missing_ok=True)
+    logger.info(f"入库任务 {job['job_id']} 完成：版本 {result['version']}，共 {result['documents']} 条记录")
+    reporter.write(state="succeeded", stage="done", result=result, finished_at=_now(), eta_seconds=None)
+    return reporter.status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="执行后台入库任务")
+    parser.add_argument("--job-dir", type=Path, required=True, help="任务目录")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    config = Config()
+    # 降低调度优先级，检索服务的查询优先获得 CPU
+    os.nice(config.INGEST_NICE)
+    status = run_job(args.job_dir, config)
+    sys.exit(0 if status["state"] == "succeeded" else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 
 class BaseLLM(ABC):
     """LLM 基础接口类"""
@@ -17,6 +17,39 @@ class BaseLLM(ABC):
         """
         pass
     
+    def generate_with_usage(self, prompt: str, **kwargs) -> Tuple[str, Dict[str, int]]:
+        """生成回复并返回 token 用量
+        
+        默认实现在本地重新计数；能从接口拿到用量的子类应覆盖此方法。
+        
+        Args:
+            prompt: 提示词
+            **kwargs: 其他参数
+        
+        Returns:
+            (回复文本, {"prompt_tokens": ..., "completion_tokens": ...})
+        """
+        reply = self.generate(prompt, **kwargs)
+        return reply, {
+            "prompt_tokens": self.count_tokens(prompt),
+            "completion_tokens": self.count_tokens(reply),
+        }
+    
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """流式生成回复，按生成顺序逐段产出文本
+        
+        默认实现一次生成后整体产出；支持流式接口的子类应覆盖此方法。
+        调用方提前停止迭代（如客户端断开）时，子类应关闭底层连接以停止生成。
+        
+        Args:
+            prompt: 提示词
+            **kwargs: 其他参数，同 generate
+        
+        Yields:
+            回复文本片段
+        """
+        yield self.generate(prompt, **kwargs)
+    
     @abstractmethod
     def batch_generate(self, prompts: List[str], **kwargs) -> List[str]:
         """批量生成回复
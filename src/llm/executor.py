@@ -0,0 +1,161 @@
+from typing import List, Callable, Optional, Iterable, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+import random
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+class RateLimiter:
+    """每分钟请求数（RPM）和 token 数（TPM）限速器
+
+    两个令牌桶分别按每秒 limit / 60 的速度补充，容量为一分钟的额度。
+    limit 为 None 或 0 表示不限制。线程安全。
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        """初始化限速器
+
+        Args:
+            requests_per_minute: 每分钟请求数上限
+            tokens_per_minute: 每分钟 token 数上限
+        """
+        self.rpm = requests_per_minute or None
+        self.tpm = tokens_per_minute or None
+        self._requests = float(self.rpm or 0)
+        self._tokens = float(self.tpm or 0)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens: int = 0):
+        """阻塞直到额度足够，然后扣除一次请求和 tokens 个 token
+
+        Args:
+            tokens: 本次请求预计消耗的 token 数（提示词 + 最大生成长度）
+        """
+        if not self.rpm and not self.tpm:
+            return
+        # 单个请求超过整分钟额度时按满额度计算，避免永远等待
+        tokens = min(tokens, self.tpm) if self.tpm else 0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                wait = 0.0
+                if self.rpm and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60 / self.rpm)
+                if self.tpm and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60 / self.tpm)
+                if wait == 0.0:
+                    if self.rpm:
+                        self._requests -= 1
+                    if self.tpm:
+                        self._tokens -= tokens
+                    return
+            time.sleep(wait)
+
+def error_status(exc: BaseException) -> Optional[int]:
+    """从异常中提取 HTTP 状态码（兼容 openai 0.28 和 httpx 的异常）"""
+    for attr in ("http_status", "status_code"):
+        status = getattr(exc, attr, None)
+        if isinstance(status, int):
+            return status
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+def is_retryable(exc: BaseException) -> bool:
+    """是否为可重试的错误：429、5xx、超时和连接错误"""
+    status = error_status(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    name = type(exc).__name__
+    return any(key in name for key in ("Timeout", "RateLimit", "ServiceUnavailable", "APIConnection", "ConnectError"))
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """读取 Retry-After 响应头（秒）"""
+    headers = getattr(exc, "headers", None) or getattr(getattr(exc, "response", None), "headers", None)
+    try:
+        value = headers.get("retry-after") if headers else None
+        return float(value) if value is not None else None
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+def retry_with_backoff(
+    fn: Callable[[], R],
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0,
+) -> R:
+    """调用 fn，遇到可重试错误时按指数退避（full jitter）重试
+
+    Args:
+        fn: 无参调用
+        max_retries: 最大重试次数
+        base_delay: 首次重试的基准等待时间（秒）
+        max_delay: 单次等待时间上限（秒）
+
+    Returns:
+        fn 的返回值
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            retry_after = _retry_after(e)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, max_delay))
+            logger.warning(f"请求失败（{type(e).__name__}: {error_status(e)}），{delay:.2f} 秒后第 {attempt + 1} 次重试")
+            time.sleep(delay)
+
+class BatchExecutor:
+    """有界并发的批量执行器，结果顺序与输入一致"""
+
+    def __init__(self, max_workers: int = 4):
+        """初始化批量执行器
+
+        Args:
+            max_workers: 最大并发数
+        """
+        self.max_workers = max(1, max_workers)
+
+    def map(self, fn: Callable[[T], R], items: Iterable[T]) -> List[R]:
+        """并发执行 fn(item)，按输入顺序返回结果
+
+        任一调用失败时取消尚未开始的任务并抛出该异常。
+
+        Args:
+            fn: 处理单个元素的函数
+            items: 输入元素
+
+        Returns:
+            与 items 顺序一致的结果列表
+        """
+        items = list(items)
+        if self.max_workers == 1 or len(items) <= 1:
+            return [fn(item) for item in items]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as pool:
+            futures = [pool.submit(fn, item) for item in items]
+            try:
+                return [future.result() for future in futures]
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
@@ -0,0 +1,34 @@
+from typing import Optional
+from src.llm.base import BaseLLM
+from src.config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+def create_llm(config: Optional[Config] = None) -> BaseLLM:
+    """根据 Config.LLM_BACKEND 创建 LLM 实例
+
+    Args:
+        config: 配置对象，如果为None则创建新的配置对象
+
+    Returns:
+        LLM 实例
+
+    Raises:
+        ValueError: 未知的后端名称
+    """
+    config = config or Config()
+    backend = config.LLM_BACKEND
+    logger.info(f"使用 LLM 后端：{backend}")
+
+    # 延迟导入，未使用的后端不要求安装对应依赖
+    if backend == "openai":
+        from src.llm.openai import OpenAILLM
+        return OpenAILLM(config)
+    if backend == "openai_compatible":
+        from src.llm.openai_compatible import OpenAICompatibleLLM
+        return OpenAICompatibleLLM(config)
+    if backend == "stub":
+        from src.llm.stub import StubLLM
+        return StubLLM(config)
+    raise ValueError(f"未知的 LLM 后端：{backend}，可选值：openai、openai_compatible、stub")
@@ -0,0 +1,165 @@
+"""本地 OpenAI 兼容模拟服务，用于离线测试并发、限速和重试逻辑
+
+用法::
+
+    python -m src.llm.mock_server --port 8001 --latency 0.5 --error-rate 0.05
+
+然后设置 OPENAI_API_BASE=http://127.0.0.1:8001/v1 和任意 OPENAI_API_KEY 即可。
+"""
+from typing import Optional, Tuple
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import argparse
+import json
+import random
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """处理 /v1/chat/completions 请求，返回确定性的回答（"stream": true 时按 SSE 分段返回）"""
+
+    # 支持 keep-alive，便于测试客户端连接池
+    protocol_version = "HTTP/1.1"
+
+    # 由 create_mock_server 设置
+    latency = 0.0
+    error_rate = 0.0
+    error_status = 429
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if random.random() < self.error_rate:
+            self._send_json(
+                self.error_status,
+                {"error": {"message": "mock error", "type": "rate_limit_error"}},
+                headers={"Retry-After": "0"}
+            )
+            return
+
+        prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+        answer = f"模拟回答：{prompt[-50:]}"
+        if request.get("stream"):
+            self._send_stream(request, answer)
+            return
+
+        time.sleep(self.latency)
+        self._send_json(200, {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop",
+            }],
+            # 按字符数近似 token 用量
+            "usage": {
+                "prompt_tokens": len(prompt),
+                "completion_tokens": len(answer),
+                "total_tokens": len(prompt) + len(answer),
+            },
+        })
+
+    def _send_stream(self, request: dict, answer: str, chunk_chars: int = 4):
+        """按 SSE 逐段返回回答，模拟延迟平均分摊到各片段；响应结束后关闭连接"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        chunks = [answer[i:i + chunk_chars] for i in range(0, len(answer), chunk_chars)]
+        try:
+            for chunk in chunks:
+                time.sleep(self.latency / len(chunks))
+                event = {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": request.get("model", "mock"),
+                    "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前断开，停止生成
+            logger.debug("流式响应被客户端中断")
+
+def create_mock_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    error_status: int = 429,
+) -> ThreadingHTTPServer:
+    """创建模拟服务（未启动）
+
+    Args:
+        host: 监听地址
+        port: 端口，0 表示随机分配
+        latency: 每个请求的模拟延迟（秒）
+        error_rate: 返回错误的概率
+        error_status: 错误响应的状态码
+
+    Returns:
+        HTTP 服务对象，server.server_address 为实际监听地址
+    """
+    handler = type("ConfiguredMockLLMHandler", (MockLLMHandler,), {
+        "latency": latency,
+        "error_rate": error_rate,
+        "error_status": error_status,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def start_mock_server(**kwargs) -> Tuple[ThreadingHTTPServer, str]:
+    """在后台线程启动模拟服务
+
+    Returns:
+        (服务对象, API 地址，形如 http://127.0.0.1:port/v1)
+    """
+    server = create_mock_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.5, help="每个请求的模拟延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误的概率")
+    parser.add_argument("--error-status", type=int, default=429)
+    args = parser.parse_args()
+
+    server = create_mock_server(args.host, args.port, args.latency, args.error_rate, args.error_status)
+    print(f"模拟 LLM 服务运行在 http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
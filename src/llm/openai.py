@@ -1,8 +1,10 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 import openai
 from src.llm.base import BaseLLM
+from src.llm.tokenizer import get_encoding
+from src.llm.executor import RateLimiter, BatchExecutor, retry_with_backoff
+from src.utils.tracing import span
 from src.config import Config
-import tiktoken
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,20 +21,23 @@ class OpenAILLM(BaseLLM):
         self.config = config or Config()
         self.model = self.config.LLM_MODEL
         
-        # 尝试获取模型对应的编码器
-        try:
-            self.encoding = tiktoken.encoding_for_model(self.model)
-            logger.info(f"成功加载模型 {self.model} 的编码器")
-        except KeyError:
-            # 如果模型不被支持，使用 cl100k_base 编码器（GPT-4 和 GPT-3.5-turbo 使用的编码器）
-            logger.warning(f"模型 {self.model} 没有对应的编码器，使用默认编码器 cl100k_base")
-            self.encoding = tiktoken.get_encoding("cl100k_base")
+        # 获取模型对应的编码器
+        self.encoding = get_encoding(self.model)
         
         # 设置 OpenAI API Key
         openai.api_key = self.config.OPENAI_API_KEY
         if not openai.api_key:
             logger.error("未设置 OPENAI_API_KEY 环境变量")
             raise ValueError("未设置 OPENAI_API_KEY 环境变量，请在 .env 文件中设置")
+        if self.config.OPENAI_API_BASE:
+            openai.api_base = self.config.OPENAI_API_BASE
+        
+        # 所有调用共享的限速器，以及批量生成使用的并发执行器
+        self.rate_limiter = RateLimiter(
+            requests_per_minute=self.config.LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=self.config.LLM_TOKENS_PER_MINUTE
+        )
+        self.executor = BatchExecutor(max_workers=self.config.LLM_MAX_CONCURRENCY)
     
     def generate(self, prompt: str, **kwargs) -> str:
         """生成回复
@@ -47,44 +52,119 @@ class OpenAILLM(BaseLLM):
         Returns:
             生成的回复文本
         """
+        return self.generate_with_usage(prompt, **kwargs)[0]
+    
+    def generate_with_usage(self, prompt: str, **kwargs) -> Tuple[str, Dict[str, int]]:
+        """生成回复，并返回 API 统计的 token 用量
+        
+        Args:
+            prompt: 提示词
+            **kwargs: 同 generate，另可传入 prompt_tokens（已知的提示词 token 数，用于限速计费）
+        
+        Returns:
+            (回复文本, {"prompt_tokens": ..., "completion_tokens": ...})
+        """
         try:
-            # 设置默认参数
-            params = {
-                "model": self.model,
-                "temperature": kwargs.get("temperature", self.config.TEMPERATURE),
-                "max_tokens": kwargs.get("max_tokens", self.config.MAX_TOKENS),
-            }
+            params, cost = self._request_params(prompt, kwargs)
             
-            # 添加可选参数
-            if "stop" in kwargs:
-                params["stop"] = kwargs["stop"]
+            def call():
+                self.rate_limiter.acquire(cost)
+                return openai.ChatCompletion.create(
+                    messages=[{"role": "user", "content": prompt}],
+                    **params
+                )
             
-            # 调用 API
-            response = openai.ChatCompletion.create(
-                messages=[{"role": "user", "content": prompt}],
-                **params
-            )
+            # 调用 API，429/5xx 时指数退避重试
+            with span("llm_generate"):
+                response = retry_with_backoff(
+                    call,
+                    max_retries=self.config.LLM_MAX_RETRIES,
+                    base_delay=self.config.LLM_RETRY_BASE_DELAY
+                )
             
             # 提取回复文本
             reply = response.choices[0].message.content.strip()
             logger.info(f"生成回复成功，长度：{len(reply)}")
-            return reply
+            
+            # 使用 API 返回的用量，避免重新编码提示词和回答
+            usage = response.get("usage") or {}
+            return reply, {
+                "prompt_tokens": int(usage.get("prompt_tokens", 0)),
+                "completion_tokens": int(usage.get("completion_tokens", 0)),
+            }
             
         except Exception as e:
             logger.error(f"生成回复失败：{str(e)}")
             raise
     
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """流式生成回复（stream=True），逐段产出文本
+        
+        只在建立请求时按 429/5xx 重试，开始产出后出错直接抛出。
+        
+        Args:
+            prompt: 提示词
+            **kwargs: 同 generate_with_usage
+        
+        Yields:
+            回复文本片段
+        """
+        params, cost = self._request_params(prompt, kwargs)
+        
+        def call():
+            self.rate_limiter.acquire(cost)
+            return openai.ChatCompletion.create(
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+                **params
+            )
+        
+        with span("llm_generate"):
+            response = retry_with_backoff(
+                call,
+                max_retries=self.config.LLM_MAX_RETRIES,
+                base_delay=self.config.LLM_RETRY_BASE_DELAY
+            )
+            try:
+                for chunk in response:
+                    content = chunk.choices[0].delta.get("content") if chunk.choices else None
+                    if content:
+                        yield content
+            finally:
+                # 提前停止迭代时关闭连接，服务端随之停止生成
+                if hasattr(response, "close"):
+                    response.close()
+    
+    def _request_params(self, prompt: str, kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+        """请求参数，以及按提示词 + 最大生成长度计入 TPM 额度的 token 数"""
+        prompt_tokens = kwargs.get("prompt_tokens")
+        
+        # 设置默认参数
+        params = {
+            "model": self.model,
+            "temperature": kwargs.get("temperature", self.config.TEMPERATURE),
+            "max_tokens": kwargs.get("max_tokens", self.config.MAX_TOKENS),
+        }
+        
+        # 添加可选参数
+        if "stop" in kwargs:
+            params["stop"] = kwargs["stop"]
+        
+        if self.rate_limiter.tpm and prompt_tokens is None:
+            prompt_tokens = self.count_tokens(prompt)
+        return params, (prompt_tokens or 0) + params["max_tokens"]
+    
     def batch_generate(self, prompts: List[str], **kwargs) -> List[str]:
-        """批量生成回复
+        """批量生成回复（并发执行，受 RPM/TPM 限速）
         
         Args:
             prompts: 提示词列表
             **kwargs: 其他参数
         
         Returns:
-            生成的回复文本列表
+            生成的回复文本列表，顺序与 prompts 一致
         """
-        return [self.generate(prompt, **kwargs) for prompt in prompts]
+        return self.executor.map(lambda prompt: self.generate(prompt, **kwargs), prompts)
     
     def count_tokens(self, text: str) -> int:
         """计算文本的 token 数量
@@ -95,4 +175,5 @@ class OpenAILLM(BaseLLM):
         Returns:
             token 数量
         """
-        return len(self.encoding.encode(text)) 
\ No newline at end of file
+        with span("count_tokens"):
+            return len(self.encoding.encode(text)) 
\ No newline at end of file
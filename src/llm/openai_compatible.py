@@ -0,0 +1,198 @@
+from typing import Any, List, Dict, Optional, Tuple, Iterator
+import json
+import threading
+import httpx
+from src.llm.base import BaseLLM
+from src.llm.tokenizer import get_encoding
+from src.llm.executor import RateLimiter, BatchExecutor, retry_with_backoff
+from src.utils.tracing import span
+from src.config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+class OpenAICompatibleLLM(BaseLLM):
+    """OpenAI 兼容接口的 LLM 实现（vLLM、llama.cpp server、本地模拟服务等）
+
+    使用带连接池和 keep-alive 的 httpx 客户端，不修改 openai 模块的全局状态。
+    """
+
+    def __init__(self, config: Optional[Config] = None):
+        """初始化 OpenAI 兼容 LLM
+
+        Args:
+            config: 配置对象，如果为None则创建新的配置对象
+        """
+        self.config = config or Config()
+        self.model = self.config.LLM_MODEL
+        self.encoding = get_encoding(self.model)
+
+        headers = {"Content-Type": "application/json"}
+        if self.config.LLM_API_KEY:
+            headers["Authorization"] = f"Bearer {self.config.LLM_API_KEY}"
+
+        # 连接池：复用 keep-alive 连接，连接数上限与并发上限一致
+        self.client = httpx.Client(
+            base_url=self.config.LLM_API_BASE.rstrip("/"),
+            headers=headers,
+            timeout=httpx.Timeout(self.config.LLM_TIMEOUT, connect=self.config.LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=self.config.LLM_POOL_SIZE,
+                max_keepalive_connections=self.config.LLM_POOL_SIZE,
+                keepalive_expiry=self.config.LLM_KEEPALIVE_EXPIRY
+            )
+        )
+        self._in_flight = threading.BoundedSemaphore(self.config.LLM_POOL_SIZE)
+
+        self.rate_limiter = RateLimiter(
+            requests_per_minute=self.config.LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=self.config.LLM_TOKENS_PER_MINUTE
+        )
+        self.executor = BatchExecutor(max_workers=self.config.LLM_MAX_CONCURRENCY)
+        logger.info(f"OpenAI 兼容 LLM 初始化完成：{self.config.LLM_API_BASE}，模型 {self.model}")
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        """生成回复
+
+        Args:
+            prompt: 提示词
+            **kwargs: 其他参数，可以包括：
+                temperature: 温度参数
+                max_tokens: 最大生成 token 数
+                stop: 停止生成的标记
+
+        Returns:
+            生成的回复文本
+        """
+        return self.generate_with_usage(prompt, **kwargs)[0]
+
+    def generate_with_usage(self, prompt: str, **kwargs) -> Tuple[str, Dict[str, int]]:
+        """生成回复，并返回接口统计的 token 用量
+
+        Args:
+            prompt: 提示词
+            **kwargs: 同 generate，另可传入 prompt_tokens（已知的提示词 token 数，用于限速计费）
+
+        Returns:
+            (回复文本, {"prompt_tokens": ..., "completion_tokens": ...})
+        """
+        try:
+            payload, cost = self._payload(prompt, kwargs)
+
+            def call():
+                self.rate_limiter.acquire(cost)
+                with self._in_flight:
+                    response = self.client.post("/chat/completions", json=payload)
+                response.raise_for_status()
+                return response.json()
+
+            # 429/5xx、超时和连接错误时指数退避重试
+            with span("llm_generate"):
+                data = retry_with_backoff(
+                    call,
+                    max_retries=self.config.LLM_MAX_RETRIES,
+                    base_delay=self.config.LLM_RETRY_BASE_DELAY
+                )
+
+            reply = data["choices"][0]["message"]["content"].strip()
+            logger.info(f"生成回复成功，长度：{len(reply)}")
+
+            usage = data.get("usage") or {}
+            return reply, {
+                "prompt_tokens": int(usage.get("prompt_tokens", 0)),
+                "completion_tokens": int(usage.get("completion_tokens", 0)),
+            }
+
+        except Exception as e:
+            logger.error(f"生成回复失败：{str(e)}")
+            raise
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """流式生成回复（"stream": true，服务端按 SSE 逐段返回），逐段产出文本
+
+        只在建立请求时按 429/5xx、超时和连接错误重试，开始产出后出错直接抛出。
+        调用方提前停止迭代时关闭连接，服务端随之停止生成。
+
+        Args:
+            prompt: 提示词
+            **kwargs: 同 generate_with_usage
+
+        Yields:
+            回复文本片段
+        """
+        payload, cost = self._payload(prompt, kwargs)
+        payload["stream"] = True
+
+        def call():
+            self.rate_limiter.acquire(cost)
+            response = self.client.send(self.client.build_request("POST", "/chat/completions", json=payload), stream=True)
+            if response.is_error:
+                response.read()
+                response.close()
+                response.raise_for_status()
+            return response
+
+        # 流式响应在整个生成期间占用一个连接
+        with self._in_flight, span("llm_generate"):
+            response = retry_with_backoff(
+                call,
+                max_retries=self.config.LLM_MAX_RETRIES,
+                base_delay=self.config.LLM_RETRY_BASE_DELAY
+            )
+            try:
+                for line in response.iter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or [{}]
+                    content = (choices[0].get("delta") or {}).get("content")
+                    if content:
+                        yield content
+            finally:
+                response.close()
+
+    def _payload(self, prompt: str, kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+        """请求体，以及按提示词 + 最大生成长度计入 TPM 额度的 token 数"""
+        prompt_tokens = kwargs.get("prompt_tokens")
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": kwargs.get("temperature", self.config.TEMPERATURE),
+            "max_tokens": kwargs.get("max_tokens", self.config.MAX_TOKENS),
+        }
+        if "stop" in kwargs:
+            payload["stop"] = kwargs["stop"]
+
+        if self.rate_limiter.tpm and prompt_tokens is None:
+            prompt_tokens = self.count_tokens(prompt)
+        return payload, (prompt_tokens or 0) + payload["max_tokens"]
+
+    def batch_generate(self, prompts: List[str], **kwargs) -> List[str]:
+        """批量生成回复（并发执行，受 RPM/TPM 限速）
+
+        Args:
+            prompts: 提示词列表
+            **kwargs: 其他参数
+
+        Returns:
+            生成的回复文本列表，顺序与 prompts 一致
+        """
+        return self.executor.map(lambda prompt: self.generate(prompt, **kwargs), prompts)
+
+    def count_tokens(self, text: str) -> int:
+        """计算文本的 token 数量
+
+        Args:
+            text: 输入文本
+
+        Returns:
+            token 数量
+        """
+        with span("count_tokens"):
+            return len(self.encoding.encode(text))
+
+    def close(self):
+        """关闭连接池"""
+        self.client.close()
@@ -0,0 +1,116 @@
+from typing import List, Dict, Optional, Tuple, Iterator
+import hashlib
+import time
+from src.llm.base import BaseLLM
+from src.llm.executor import BatchExecutor, RateLimiter
+from src.utils.tracing import span
+from src.config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+class StubLLM(BaseLLM):
+    """确定性的桩 LLM，不访问网络
+
+    回答由提示词的哈希决定，相同提示词总是得到相同回答；token 数按字符数计算。
+    用于离线基准测试和压测，可配置固定延迟模拟真实 LLM 的响应时间；RPM/TPM 限速与真实后端一样生效。
+    """
+    
+    STREAM_CHUNK_CHARS = 4
+    
+    def __init__(self, config: Optional[Config] = None, latency: Optional[float] = None):
+        """初始化桩 LLM
+        
+        Args:
+            config: 配置对象，如果为None则创建新的配置对象
+            latency: 每次生成的模拟延迟（秒），如果为None则使用 Config.STUB_LLM_LATENCY
+        """
+        self.config = config or Config()
+        self.latency = self.config.STUB_LLM_LATENCY if latency is None else latency
+        self.rate_limiter = RateLimiter(
+            requests_per_minute=self.config.LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=self.config.LLM_TOKENS_PER_MINUTE
+        )
+        self.executor = BatchExecutor(max_workers=self.config.LLM_MAX_CONCURRENCY)
+        logger.info(f"使用桩 LLM，模拟延迟 {self.latency} 秒")
+    
+    def generate(self, prompt: str, **kwargs) -> str:
+        """生成确定性的回复
+        
+        Args:
+            prompt: 提示词
+            **kwargs: 其他参数（忽略）
+        
+        Returns:
+            回复文本
+        """
+        return self.generate_with_usage(prompt, **kwargs)[0]
+    
+    def generate_with_usage(self, prompt: str, **kwargs) -> Tuple[str, Dict[str, int]]:
+        """生成确定性的回复并返回 token 用量
+        
+        Args:
+            prompt: 提示词
+            **kwargs: 可传入 prompt_tokens（已知的提示词 token 数）和 max_tokens，用于限速计费，其他参数忽略
+        
+        Returns:
+            (回复文本, {"prompt_tokens": ..., "completion_tokens": ...})
+        """
+        prompt_tokens = kwargs.get("prompt_tokens") or self.count_tokens(prompt)
+        self.rate_limiter.acquire(prompt_tokens + kwargs.get("max_tokens", self.config.MAX_TOKENS))
+        with span("llm_generate"):
+            if self.latency > 0:
+                time.sleep(self.latency)
+            reply = self._reply(prompt)
+        return reply, {
+            "prompt_tokens": self.count_tokens(prompt),
+            "completion_tokens": self.count_tokens(reply),
+        }
+    
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """逐段产出确定性的回复，模拟延迟平均分摊到各片段
+        
+        Args:
+            prompt: 提示词
+            **kwargs: 其他参数（prompt_tokens、max_tokens 用于限流）
+        
+        Yields:
+            回复文本片段（每段 STREAM_CHUNK_CHARS 个字符）
+        """
+        prompt_tokens = kwargs.get("prompt_tokens") or self.count_tokens(prompt)
+        self.rate_limiter.acquire(prompt_tokens + kwargs.get("max_tokens", self.config.MAX_TOKENS))
+        reply = self._reply(prompt)
+        chunks = [reply[i:i + self.STREAM_CHUNK_CHARS] for i in range(0, len(reply), self.STREAM_CHUNK_CHARS)]
+        with span("llm_generate"):
+            for chunk in chunks:
+                if self.latency > 0:
+                    time.sleep(self.latency / len(chunks))
+                yield chunk
+    
+    @staticmethod
+    def _reply(prompt: str) -> str:
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+        return f"【模拟回答 {digest}】根据参考文档，该问题的答案需结合相关法律条款具体分析。"
+    
+    def batch_generate(self, prompts: List[str], **kwargs) -> List[str]:
+        """批量生成回复
+        
+        Args:
+            prompts: 提示词列表
+            **kwargs: 其他参数
+        
+        Returns:
+            回复文本列表，顺序与 prompts 一致
+        """
+        return self.executor.map(lambda prompt: self.generate(prompt, **kwargs), prompts)
+    
+    def count_tokens(self, text: str) -> int:
+        """按字符数近似 token 数量
+        
+        Args:
+            text: 输入文本
+        
+        Returns:
+            token 数量
+        """
+        return len(text)
@@ -0,0 +1,41 @@
+from typing import List, Sequence
+import numpy as np
+import tiktoken
+import logging
+
+logger = logging.getLogger(__name__)
+
+def get_encoding(model: str) -> "tiktoken.Encoding":
+    """获取模型对应的 tiktoken 编码器
+    
+    Args:
+        model: 模型名称
+    
+    Returns:
+        编码器，模型不被支持时使用 cl100k_base
+    """
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+        logger.info(f"成功加载模型 {model} 的编码器")
+    except KeyError:
+        # 如果模型不被支持，使用 cl100k_base 编码器（GPT-4 和 GPT-3.5-turbo 使用的编码器）
+        logger.warning(f"模型 {model} 没有对应的编码器，使用默认编码器 cl100k_base")
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return encoding
+
+def count_tokens_batch(texts: Sequence[str], encoding: "tiktoken.Encoding", batch_size: int = 1000) -> np.ndarray:
+    """批量计算文本的 token 数量（用于入库时预计算）
+    
+    Args:
+        texts: 文本列表
+        encoding: tiktoken 编码器
+        batch_size: 每批文本数量
+    
+    Returns:
+        uint32 数组，与 texts 一一对应
+    """
+    counts: List[int] = []
+    for i in range(0, len(texts), batch_size):
+        batch = list(texts[i:i + batch_size])
+        counts.extend(len(tokens) for tokens in encoding.encode_ordinary_batch(batch))
+    return np.asarray(counts, dtype=np.uint32)
@@ -1,4 +1,5 @@
 import sys
+import argparse
 from pathlib import Path
 import uvicorn
 from fastapi.staticfiles import StaticFiles
@@ -9,11 +10,30 @@ current_dir = Path(__file__).parent.parent
 sys.path.append(str(current_dir))
 
 from src.utils.helpers import setup_logging
+from src.config import Config
 from src.api.routes import app
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="法律文档检索系统服务")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--mock-llm", action="store_true",
+                        help="使用模拟 LLM 代替真实 LLM（压测用，不产生 API 调用）")
+    parser.add_argument("--mock-llm-latency", type=float, default=None,
+                        help="模拟 LLM 每次生成的延迟（秒），默认使用 STUB_LLM_LATENCY")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    
     # 设置日志
     setup_logging()
+    
+    # 压测模式：在应用启动前替换 LLM 后端
+    if args.mock_llm:
+        Config.LLM_BACKEND = "stub"
+        if args.mock_llm_latency is not None:
+            Config.STUB_LLM_LATENCY = args.mock_llm_latency
 
     # 配置静态文件
     static_dir = Path(__file__).parent.parent / "static"
@@ -27,8 +47,8 @@ def main():
     # 运行服务器
     uvicorn.run(
         app,
-        host="0.0.0.0",
-        port=8000,
+        host=args.host,
+        port=args.port,
         log_level="info"
     )
 
@@ -1,23 +1,63 @@
 import sys
+import argparse
 from pathlib import Path
-import os
 
 # 添加src目录到Python路径
 current_dir = Path(__file__).parent.parent
 sys.path.append(str(current_dir))
 
-from src.document_processor.loader import DocumentLoader
+from src.ingest.builder import build_collection, reembed_collection
 from src.vectorstore.embeddings import VectorStore
+from src.vectorstore.collection_manager import CollectionManager
 from src.config import Config
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="文档向量化与索引构建")
+    parser.add_argument("--input", type=Path, default=None, help="知识库 JSONL 文件，默认为 KNOWLEDGE_BASE")
+    parser.add_argument("--collection", default=None,
+                        help="写入的集合名称（保存到 COLLECTIONS_DIR/<名称>），默认写入 VECTOR_DB_PATH")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="分片数，大于 1 时保存为分片索引，服务启动时每个分片由独立进程检索")
+    parser.add_argument("--no-dedup", action="store_true", help="不做近重复去重，所有文档都写入索引")
+    parser.add_argument("--append", action="store_true",
+                        help="追加到集合的当前版本（只对新文档向量化），默认用输入重建集合")
+    parser.add_argument("--reembed", metavar="MODEL", default=None,
+                        help="用指定的向量模型重新计算集合当前版本的向量，登记为候选版本（不切换，不读取 --input）")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    
     # 初始化配置
     config = Config()
+    collection = args.collection or config.DEFAULT_COLLECTION
+    output_dir = CollectionManager(config).path_for(collection)
+    
+    if args.reembed:
+        # 候选版本与当前版本并存，影子比较后通过 /admin/embedding/cutover 切换
+        result = reembed_collection(output_dir, args.reembed, config)
+        print(f"候选版本 {result['version']} 已写入：{result['documents']} 条记录，"
+              f"{result['previous_model']} -> {result['model']}（维度 {result['dimension']}）")
+        return
+    
+    # 构建新版本（去重、token 数、向量化），完成后原子切换 CURRENT，运行中的服务随后加载新版本
+    print("1. 构建向量索引...")
+    vector_store = VectorStore(config.EMBEDDING_MODEL)
+    result = build_collection(
+        args.input or config.KNOWLEDGE_BASE,
+        output_dir,
+        config,
+        mode="append" if args.append else "replace",
+        shards=args.shards,
+        dedup=not args.no_dedup,
+        model=vector_store.model
+    )
+    print(f"新增 {result['added']} 个文档，折叠近重复 {result['collapsed']} 个，共 {result['documents']} 条记录")
+    print(f"向量索引已保存到: {result['path']}（版本 {result['version']}）")
     
-    print("1. 加载文档...")
-    loader = DocumentLoader(config.KNOWLEDGE_BASE)
-    texts = loader.get_texts()
-    print(f"加载了 {len(texts)} 个文档")
+    # 按索引记录的向量模型加载（追加到已切换模型的集合时与 EMBEDDING_MODEL 不同）
+    vector_store = CollectionManager(config, model=vector_store.model).get(collection)
+    texts = vector_store.texts
     
     # 打印前两个文档的内容作为示例
     print("\n示例文档内容:")
@@ -25,17 +65,8 @@ def main():
         print(f"\n--- 文档 {i+1} ---")
         print(text[:500] + "..." if len(text) > 500 else text)
     
-    print("\n2. 创建向量索引...")
-    vector_store = VectorStore(config.EMBEDDING_MODEL)
-    vector_store.create_index(texts)
-    
-    print("\n3. 保存向量索引...")
-    os.makedirs(config.VECTOR_DB_PATH, exist_ok=True)
-    vector_store.save(config.VECTOR_DB_PATH)
-    print(f"向量索引已保存到: {config.VECTOR_DB_PATH}")
-    
     # 测试搜索
-    print("\n4. 测试搜索...")
+    print("\n2. 测试搜索...")
     test_queries = [
         "什么是民事诉讼？",
         "行政诉讼中被告的举证责任是什么？",
@@ -50,6 +81,8 @@ def main():
         for i, result in enumerate(results, 1):
             print(f"\n结果 {i} (相似度得分: {result['score']:.4f}):")
             print(result['text'][:500] + "..." if len(result['text']) > 500 else result['text'])
+    
+    vector_store.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,354 @@
+"""大批量问题的离线 RAG 作业
+
+逐行读取问题文件（JSONL，问题取 query / question / input 字段，可选 id），按批处理::
+
+    python -m src.rag.batch --input audit.jsonl --output answers.jsonl
+    python -m src.rag.batch --input audit.jsonl --output answers.jsonl --llm stub  # 完全离线
+
+每批（--batch-size 条）先批量匹配预计算回答，其余查询一次批量编码和检索；组装提示词后，
+提示词完全相同的问题只生成一次（在途请求和最近 answer_cache_size 个成功回答范围内去重，
+生成失败的提示词不缓存，之后的相同问题重新生成），生成请求由有界线程池并发发出，
+受 LLM 后端的 RPM/TPM 限速和重试约束。检索下一批与生成上一批同时进行，在途的生成请求
+超过并发数的若干倍时暂停读取，问题文件不会一次性载入内存。
+
+结果按完成顺序追加写入 JSONL（每条带 id），中断后用同一个 --output 重新运行即跳过已完成的 id；
+生成失败的问题写入 error 字段，续跑时重试。结束时打印吞吐统计，并保存到 <output>.summary.json。
+"""
+import argparse
+import hashlib
+import itertools
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from src.config import Config
+from src.rag.pipeline import RAGPipeline
+from src.utils.helpers import iter_jsonl, append_jsonl, save_results, truncate_partial_line
+
+logger = logging.getLogger(__name__)
+
+QUESTION_FIELDS = ("query", "question", "input")
+
+
+def iter_questions(input_file: Path) -> Iterator[Dict[str, str]]:
+    """逐条读取问题文件，没有 id 的问题以行号（从 0 开始）作为 id"""
+    for position, item in enumerate(iter_jsonl(str(input_file))):
+        query = next((item[field] for field in QUESTION_FIELDS if item.get(field)), "")
+        yield {"id": str(item.get("id") or position), "query": query}
+
+
+class BatchRunner:
+    """离线批量问答执行器"""
+
+    def __init__(
+        self,
+        pipeline: RAGPipeline,
+        max_workers: Optional[int] = None,
+        batch_size: int = 256,
+        flush_every: int = 64,
+        collection: Optional[str] = None,
+        scoring: bool = False,
+        answer_cache_size: int = 10000
+    ):
+        """初始化
+
+        Args:
+            pipeline: RAG 流程（使用其检索器、LLM 和预计算回答）
+            max_workers: 并发生成请求数，默认为 Config.LLM_MAX_CONCURRENCY
+            batch_size: 每批检索的问题数
+            flush_every: 累计多少条结果写一次输出文件
+            collection: 检索的集合名称，如果为None则使用默认集合
+            scoring: 是否需要对文档相关性打分
+            answer_cache_size: 提示词去重缓存的成功回答条数（LRU），0 表示只在在途请求范围内去重
+        """
+        self.pipeline = pipeline
+        self.max_workers = max_workers or pipeline.config.LLM_MAX_CONCURRENCY
+        self.batch_size = batch_size
+        self.flush_every = flush_every
+        self.collection = collection
+        self.scoring = scoring
+        self.answer_cache_size = answer_cache_size
+        self.stats: Dict[str, Any] = {}
+        self._buffer: List[Dict[str, Any]] = []
+
+    @staticmethod
+    def load_checkpoint(output_file: Path) -> Set[str]:
+        """已成功完成的 id；失败的问题不算完成，续跑时重试。进程中断留下的半行会被截掉"""
+        done: Set[str] = set()
+        if not output_file.exists():
+            return done
+        if truncate_partial_line(str(output_file)):
+            logger.warning("输出文件末尾有未写完的行，已截断")
+        for record in iter_jsonl(str(output_file)):
+            if "error" not in record:
+                done.add(record["id"])
+        logger.info(f"从输出文件恢复 {len(done)} 条已完成的问题")
+        return done
+
+    def _generate(self, prompt: str, prompt_tokens: int):
+        start = time.perf_counter()
+        answer, usage = self.pipeline.llm.generate_with_usage(prompt, prompt_tokens=prompt_tokens)
+        return answer, usage, time.perf_counter() - start
+
+    def _emit(self, record: Dict[str, Any], output_file: Path):
+        self._buffer.append(record)
+        self.stats["failed" if "error" in record else "answered"] += 1
+        if len(self._buffer) >= self.flush_every:
+            self._flush(output_file)
+
+    def _flush(self, output_file: Path):
+        if self._buffer:
+            append_jsonl(self._buffer, str(output_file))
+            self._buffer = []
+            elapsed = time.perf_counter() - self._start
+            processed = self.stats["answered"] + self.stats["failed"]
+            logger.info(f"已完成 {processed} 条（失败 {self.stats['failed']}），{processed / elapsed:.2f} 条/秒")
+
+    def _prepare_batch(self, items: List[Dict[str, str]], output_file: Path) -> List[Dict[str, Any]]:
+        """匹配预计算回答并批量检索、组装提示词；命中预计算回答的问题直接写出，返回需要生成的问题"""
+        queries = [item["query"] for item in items]
+        matches = self.pipeline.match_precomputed_batch(queries, self.collection)
+        pending = []
+        for item, match in zip(items, matches):
+            if match is None:
+                pending.append(item)
+                continue
+            result = self.pipeline.precomputed_result(item["query"], match)
+            self.stats["precomputed"] += 1
+            self._emit(self._record(item, result), output_file)
+        if not pending:
+            return []
+
+        start = time.perf_counter()
+        all_docs = self.pipeline.retriever.batch_retrieve(
+            queries=[item["query"] for item in pending],
+            top_k=self.pipeline.config.TOP_K,
+            min_score=self.pipeline.config.MIN_SIMILARITY_SCORE,
+            collection=self.collection,
+            adaptive=self.pipeline.config.ADAPTIVE_RETRIEVAL
+        )
+        self.stats["retrieval_seconds"] += time.perf_counter() - start
+
+        jobs = []
+        for item, retrieved_docs in zip(pending, all_docs):
+            prompt, context_docs, prompt_tokens, compression_stats = self.pipeline.build_prompt(
+                item["query"], retrieved_docs, self.scoring
+            )
+            jobs.append({
+                **item,
+                "retrieved_documents": retrieved_docs,
+                "prompt": prompt,
+                "prompt_tokens": prompt_tokens,
+                "context_docs": context_docs,
+                "compression_stats": compression_stats,
+            })
+        return jobs
+
+    @staticmethod
+    def _record(item: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        record = {
+            "id": item["id"],
+            "query": item["query"],
+            "answer": result["answer"],
+            # 检索结果只记录文档下标（全文可用 /documents/{id} 获取）；预计算回答的法律依据没有下标，记录原文
+            "references": [
+                {"index": doc["index"], "score": round(float(doc["score"]), 4)} if doc.get("index") is not None
+                else {"text": doc["text"], "score": round(float(doc["score"]), 4)}
+                for doc in result["retrieved_documents"]
+            ],
+            "metadata": result["metadata"],
+        }
+        if "precomputed" in result:
+            record["precomputed"] = result["precomputed"]
+        return record
+
+    def _complete(self, future: Future, jobs: List[Dict[str, Any]], shared: bool, output_file: Path):
+        """写出一个生成请求对应的所有问题（提示词相同的问题共用回答）"""
+        try:
+            answer, usage, seconds = future.result()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            for job in jobs:
+                logger.error(f"问题 {job['id']} 生成失败：{error}")
+                self._emit({"id": job["id"], "query": job["query"], "error": error}, output_file)
+            return
+        prompt_tokens = usage.get("prompt_tokens") or jobs[0]["prompt_tokens"]
+        answer_tokens = usage.get("completion_tokens", 0)
+        if not shared:
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["answer_tokens"] += answer_tokens
+        for position, job in enumerate(jobs):
+            result = {
+                "answer": answer,
+                "retrieved_documents": job["retrieved_documents"],
+                "metadata": RAGPipeline._metadata(prompt_tokens, answer_tokens, job["context_docs"], job["compression_stats"],
+                                                  no_context=self.pipeline.is_no_context(job["retrieved_documents"])),
+            }
+            record = self._record(job, result)
+            record["seconds"] = round(seconds, 3)
+            # 与作业中更早的问题提示词相同，回答复用，未单独调用 LLM
+            if shared or position > 0:
+                record["deduplicated"] = True
+            self._emit(record, output_file)
+
+    def run(self, input_file: Path, output_file: Path, limit: Optional[int] = None) -> Dict[str, Any]:
+        """执行作业
+
+        Args:
+            input_file: 问题文件（JSONL）
+            output_file: 结果文件（JSONL，续跑时传入同一个文件）
+            limit: 最多处理的问题条数（含已完成的）
+
+        Returns:
+            吞吐统计
+        """
+        done = self.load_checkpoint(output_file)
+        questions = iter_questions(input_file)
+        if limit:
+            questions = itertools.islice(questions, limit)
+        skipped = 0
+
+        def pending_questions():
+            nonlocal skipped
+            for item in questions:
+                if item["id"] in done:
+                    skipped += 1
+                else:
+                    yield item
+
+        self.stats = {
+            "answered": 0, "failed": 0, "precomputed": 0, "llm_calls": 0, "deduplicated": 0,
+            "retrieval_seconds": 0.0, "prompt_tokens": 0, "answer_tokens": 0,
+        }
+        self._buffer = []
+        self._start = time.perf_counter()
+        # 提示词去重：提示词摘要 -> 尚未写出的生成请求；写出后成功的回答移入有界的 LRU 缓存
+        generations: Dict[str, Future] = {}
+        answers: "OrderedDict[str, Tuple[str, Dict[str, int], float]]" = OrderedDict()
+        # 尚未写出的生成请求 -> 等待该请求的问题和提示词摘要；shared 标记复用的是更早批次已生成过的回答
+        waiting: Dict[Future, List[Dict[str, Any]]] = {}
+        keys: Dict[Future, str] = {}
+        shared: Dict[Future, bool] = {}
+
+        def drain(block_until: int):
+            while len(waiting) > block_until:
+                finished, _ = wait(list(waiting), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = keys.pop(future)
+                    del generations[key]
+                    # 失败的请求不缓存，之后相同提示词的问题重新生成
+                    if future.exception() is None and self.answer_cache_size > 0:
+                        answers[key] = future.result()
+                        answers.move_to_end(key)
+                        while len(answers) > self.answer_cache_size:
+                            answers.popitem(last=False)
+                    self._complete(future, waiting.pop(future), shared.pop(future), output_file)
+
+        iterator = pending_questions()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="batch-llm") as pool:
+            while True:
+                items = list(itertools.islice(iterator, self.batch_size))
+                if not items:
+                    break
+                for job in self._prepare_batch(items, output_file):
+                    key = hashlib.sha1(job["prompt"].encode("utf-8")).hexdigest()
+                    future = generations.get(key)
+                    if future is not None:
+                        self.stats["deduplicated"] += 1
+                    elif key in answers:
+                        # 更早写出过的回答：包装为已完成的请求，与其他结果一样在 drain 中写出
+                        answers.move_to_end(key)
+                        future = Future()
+                        future.set_result(answers[key])
+                        generations[key] = future
+                        waiting[future], keys[future], shared[future] = [], key, True
+                        self.stats["deduplicated"] += 1
+                    else:
+                        future = pool.submit(self._generate, job["prompt"], job["prompt_tokens"])
+                        generations[key] = future
+                        waiting[future], keys[future], shared[future] = [], key, False
+                        self.stats["llm_calls"] += 1
+                    waiting[future].append(job)
+                # 在途请求足够时先写出已完成的结果，再检索下一批
+                drain(self.max_workers * 4)
+            drain(0)
+        self._flush(output_file)
+
+        elapsed = time.perf_counter() - self._start
+        processed = self.stats["answered"] + self.stats["failed"]
+        summary = {
+            "questions": processed + skipped,
+            "skipped": skipped,
+            **{key: value for key, value in self.stats.items() if key != "retrieval_seconds"},
+            "elapsed_seconds": round(elapsed, 3),
+            "questions_per_second": round(processed / elapsed, 3) if elapsed else 0.0,
+            "llm_calls_per_second": round(self.stats["llm_calls"] / elapsed, 3) if elapsed else 0.0,
+            "retrieval_seconds": round(self.stats["retrieval_seconds"], 3),
+            "retrieval_questions_per_second": (
+                round((processed - self.stats["precomputed"]) / self.stats["retrieval_seconds"], 1)
+                if self.stats["retrieval_seconds"] else None
+            ),
+            "tokens_per_second": (
+                round((self.stats["prompt_tokens"] + self.stats["answer_tokens"]) / elapsed, 1) if elapsed else 0.0
+            ),
+        }
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="大批量问题的离线 RAG 作业")
+    parser.add_argument("--input", type=Path, required=True, help="问题文件（JSONL，query/question/input 字段，可选 id）")
+    parser.add_argument("--output", type=Path, required=True, help="结果文件（JSONL），续跑时使用同一个文件")
+    parser.add_argument("--collection", default=None, help="检索的集合名称，默认为默认集合")
+    parser.add_argument("--batch-size", type=int, default=256, help="每批检索的问题数")
+    parser.add_argument("--workers", type=int, default=None, help="并发生成请求数，默认为 LLM_MAX_CONCURRENCY")
+    parser.add_argument("--rpm", type=int, default=None, help="每分钟请求数上限，默认为 LLM_REQUESTS_PER_MINUTE")
+    parser.add_argument("--tpm", type=int, default=None, help="每分钟 token 数上限，默认为 LLM_TOKENS_PER_MINUTE")
+    parser.add_argument("--limit", type=int, default=None, help="最多处理的问题条数")
+    parser.add_argument("--llm", choices=["openai", "openai_compatible", "stub"], default=None,
+                        help="LLM 后端，默认为 LLM_BACKEND；stub 完全离线")
+    parser.add_argument("--stub-latency", type=float, default=None, help="桩 LLM 每次生成的模拟延迟（秒）")
+    parser.add_argument("--precomputed", action="store_true", help="启用预计算回答，默认按 PRECOMPUTED_ANSWERS")
+    parser.add_argument("--scoring", action="store_true", help="对文档相关性打分")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    logger.setLevel(logging.INFO)
+
+    config = Config()
+    if args.llm:
+        config.LLM_BACKEND = args.llm
+    if args.stub_latency is not None:
+        config.STUB_LLM_LATENCY = args.stub_latency
+    if args.rpm is not None:
+        config.LLM_REQUESTS_PER_MINUTE = args.rpm
+    if args.tpm is not None:
+        config.LLM_TOKENS_PER_MINUTE = args.tpm
+    if args.workers:
+        config.LLM_MAX_CONCURRENCY = args.workers
+    if args.precomputed:
+        config.PRECOMPUTED_ANSWERS = True
+
+    pipeline = RAGPipeline(config)
+    runner = BatchRunner(pipeline, batch_size=args.batch_size, collection=args.collection, scoring=args.scoring)
+    summary = runner.run(args.input, args.output, limit=args.limit)
+
+    summary_file = args.output.with_suffix(".summary.json")
+    save_results(summary, str(summary_file))
+    print(
+        f"完成 {summary['answered']} 条（失败 {summary['failed']}，跳过已完成 {summary['skipped']}），"
+        f"耗时 {summary['elapsed_seconds']}s，{summary['questions_per_second']} 条/秒"
+    )
+    print(
+        f"预计算回答 {summary['precomputed']} 条，LLM 调用 {summary['llm_calls']} 次"
+        f"（提示词去重节省 {summary['deduplicated']} 次），{summary['llm_calls_per_second']} 次/秒，"
+        f"{summary['tokens_per_second']} token/秒"
+    )
+    print(f"检索 {summary['retrieval_seconds']}s（{summary['retrieval_questions_per_second']} 条/秒），统计已保存到: {summary_file}")
+
+
+if __name__ == "__main__":
+    main()
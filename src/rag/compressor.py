@@ -0,0 +1,155 @@
+from typing import List, Dict, Any, Tuple
+import re
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ContextCompressor:
+    """上下文压缩器
+
+    将检索到的文档拆分为句子（答案部分）和法条（法律依据部分），
+    用检索模型一次性批量编码后与问题计算相似度，在 token 预算内保留最相关的片段。
+    """
+
+    # 句子切分：以中英文句末标点结尾
+    SENTENCE_PATTERN = re.compile(r"[^。！？；!?;\n]+[。！？；!?;]?")
+
+    # 缺少预计算 token 数时，按每字符 1.5 个 token 估计（中文）
+    TOKENS_PER_CHAR_ESTIMATE = 1.5
+
+    def __init__(self, model, token_budget: int = 800, batch_size: int = 64):
+        """初始化上下文压缩器
+
+        Args:
+            model: 向量模型（与检索共用已加载的 SentenceTransformer）
+            token_budget: 压缩后上下文的 token 预算
+            batch_size: 编码批大小
+        """
+        self.model = model
+        self.token_budget = token_budget
+        self.batch_size = batch_size
+
+    @classmethod
+    def split_spans(cls, text: str) -> List[Tuple[str, str]]:
+        """将知识库文本拆分为 (所属部分, 片段) 列表
+
+        文本格式见 DocumentLoader.get_texts：问题、答案、法律依据三部分以空行分隔。
+        问题整体作为一个片段，答案按句切分，法律依据按条目切分。
+        """
+        spans = []
+        for section in text.split("\n\n"):
+            section = section.strip()
+            if not section:
+                continue
+            if section.startswith("法律依据："):
+                for line in section[len("法律依据："):].split("\n"):
+                    if line.strip():
+                        spans.append(("法律依据", line.strip()))
+            elif section.startswith("答案："):
+                body = section[len("答案："):]
+                for sentence in cls.SENTENCE_PATTERN.findall(body):
+                    if sentence.strip():
+                        spans.append(("答案", sentence.strip()))
+            elif section.startswith("问题："):
+                spans.append(("问题", section[len("问题："):].strip()))
+            else:
+                spans.append(("", section))
+        return spans
+
+    @staticmethod
+    def join_spans(spans: List[Tuple[str, str]]) -> str:
+        """按原顺序将保留的片段重新组合为知识库文本格式"""
+        questions = [s for label, s in spans if label == "问题"]
+        answers = [s for label, s in spans if label == "答案"]
+        references = [s for label, s in spans if label == "法律依据"]
+        others = [s for label, s in spans if label == ""]
+
+        parts = []
+        if questions:
+            parts.append(f"问题：{''.join(questions)}")
+        if answers:
+            parts.append(f"答案：{''.join(answers)}")
+        if references:
+            parts.append("法律依据：\n" + "\n".join(references))
+        parts.extend(others)
+        return "\n\n".join(parts)
+
+    def _tokens_per_char(self, doc: Dict[str, Any]) -> float:
+        if doc.get("tokens") and doc["text"]:
+            return doc["tokens"] / len(doc["text"])
+        return self.TOKENS_PER_CHAR_ESTIMATE
+
+    def compress(self, query: str, documents: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """压缩检索结果
+
+        Args:
+            query: 用户查询
+            documents: 检索结果列表，每个文档包含 text、score，可选 tokens
+
+        Returns:
+            (压缩后的文档列表, 压缩统计信息)
+        """
+        original_tokens = sum(
+            int(round(len(doc["text"]) * self._tokens_per_char(doc))) for doc in documents
+        )
+        stats = {
+            "original_tokens": original_tokens,
+            "compressed_tokens": original_tokens,
+            "saved_tokens": 0,
+            "spans_total": 0,
+            "spans_kept": 0,
+        }
+        if not documents:
+            return documents, stats
+
+        # 收集所有文档的片段及其估计 token 数
+        doc_spans = [self.split_spans(doc["text"]) for doc in documents]
+        flat = []  # (文档下标, 片段下标, 片段文本, 估计 token 数)
+        for doc_idx, (doc, spans) in enumerate(zip(documents, doc_spans)):
+            ratio = self._tokens_per_char(doc)
+            for span_idx, (_, span) in enumerate(spans):
+                flat.append((doc_idx, span_idx, span, max(1, int(round(len(span) * ratio)))))
+        stats["spans_total"] = len(flat)
+        if not flat:
+            return documents, stats
+
+        # 问题与所有片段一次性批量编码
+        embeddings = self.model.encode(
+            [query] + [item[2] for item in flat],
+            batch_size=self.batch_size,
+            normalize_embeddings=True
+        )
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        scores = embeddings[1:] @ embeddings[0]
+
+        # 按相似度从高到低在预算内选择片段
+        kept = set()
+        used = 0
+        for i in np.argsort(-scores):
+            tokens = flat[i][3]
+            if used + tokens > self.token_budget:
+                continue
+            kept.add((flat[i][0], flat[i][1]))
+            used += tokens
+
+        compressed = []
+        for doc_idx, (doc, spans) in enumerate(zip(documents, doc_spans)):
+            kept_spans = [span for span_idx, span in enumerate(spans) if (doc_idx, span_idx) in kept]
+            if not kept_spans:
+                continue
+            text = self.join_spans(kept_spans)
+            new_doc = dict(doc)
+            new_doc["text"] = text
+            new_doc["tokens"] = int(round(len(text) * self._tokens_per_char(doc)))
+            new_doc["compressed"] = True
+            compressed.append(new_doc)
+
+        compressed_tokens = sum(doc["tokens"] for doc in compressed)
+        stats.update({
+            "compressed_tokens": compressed_tokens,
+            "saved_tokens": original_tokens - compressed_tokens,
+            "spans_kept": len(kept),
+        })
+        logger.info(f"上下文压缩：{original_tokens} -> {compressed_tokens} tokens，保留 {len(kept)}/{len(flat)} 个片段")
+        return compressed, stats
@@ -1,8 +1,14 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from src.config import Config
-from src.retriever.vector_search import VectorRetriever
-from src.llm.openai import OpenAILLM
+from src.retriever.factory import create_retriever
+from src.llm.base import BaseLLM
+from src.llm.factory import create_llm
 from src.rag.prompt import PromptTemplate
+from src.rag.compressor import ContextCompressor
+from src.rag.precomputed import PrecomputedAnswers
+from src.vectorstore import storage
+from src.llm.executor import BatchExecutor
+from src.utils.tracing import span
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,75 +16,258 @@ logger = logging.getLogger(__name__)
 class RAGPipeline:
     """RAG 流程实现"""
     
-    def __init__(self, config: Optional[Config] = None):
+    def __init__(
+        self,
+        config: Optional[Config] = None,
+        llm: Optional[BaseLLM] = None,
+        retriever: Optional[Any] = None,
+        answers: Optional[PrecomputedAnswers] = None,
+        precomputed: Optional[bool] = None
+    ):
         """初始化 RAG 流程
         
         Args:
             config: 配置对象，如果为None则创建新的配置对象
+            llm: LLM 实例，如果为None则按 Config.LLM_BACKEND 创建
+            retriever: 检索器实例（VectorRetriever 或 RemoteRetriever），如果为None则按 Config.RETRIEVAL_BACKEND 创建
+            answers: 预计算回答索引，如果为None则在启用预计算回答且索引存在时加载
+            precomputed: 是否启用预计算回答，如果为None则按 Config.PRECOMPUTED_ANSWERS；为 False 时忽略 answers。
+                评估和基准传 False，避免直接返回数据集中的回答
         """
         self.config = config or Config()
-        self.retriever = VectorRetriever(self.config)
-        self.llm = OpenAILLM(self.config)
+        self.retriever = retriever or create_retriever(self.config)
+        self.llm = llm or create_llm(self.config)
+        
+        self.executor = BatchExecutor(max_workers=self.config.LLM_MAX_CONCURRENCY)
+        
+        # 上下文压缩复用检索器已加载的向量模型
+        self.compressor = None
+        if self.config.ENABLE_CONTEXT_COMPRESSION and self.retriever.model is None:
+            logger.warning("检索器不在本进程（远程检索），上下文压缩不可用")
+        elif self.config.ENABLE_CONTEXT_COMPRESSION:
+            self.compressor = ContextCompressor(
+                self.retriever.model,
+                token_budget=self.config.COMPRESSION_TOKEN_BUDGET
+            )
+        
+        self.answers = answers if precomputed is not False else None
+        if self.answers is None and (self.config.PRECOMPUTED_ANSWERS if precomputed is None else precomputed):
+            self.answers = self._load_answers()
         logger.info("RAG 流程初始化完成")
     
-    def process(self, query: str, scoring: bool = False) -> Dict[str, Any]:
+    def _load_answers(self) -> Optional[PrecomputedAnswers]:
+        """加载预计算回答索引；问题向量的编码与默认集合的检索共用向量模型和查询缓存，远程检索时只做精确匹配"""
+        path = self.config.PRECOMPUTED_ANSWERS_PATH
+        if not storage.is_bundle(storage.resolve_version(path)):
+            return None
+        encode_queries = None
+        if self.retriever.model is not None:
+            encode_queries = self.retriever.encode_queries
+        else:
+            logger.warning("检索器不在本进程（远程检索），预计算回答只做精确匹配")
+        return PrecomputedAnswers.load(
+            path,
+            min_score=self.config.PRECOMPUTED_MIN_SCORE,
+            encode_queries=encode_queries,
+            model_name=self.config.EMBEDDING_MODEL,
+            verify=self.config.VERIFY_INDEX
+        )
+    
+    def match_precomputed(self, query: str, collection: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """查询与预计算回答的问题匹配时返回匹配记录，否则返回 None；只对生成索引时指定的集合生效"""
+        return self.match_precomputed_batch([query], collection)[0]
+    
+    def match_precomputed_batch(self, queries: List[str], collection: Optional[str] = None) -> List[Optional[Dict[str, Any]]]:
+        """批量匹配预计算回答（未精确命中的查询一次批量编码），返回与 queries 一一对应的匹配记录或 None"""
+        if self.answers is None:
+            return [None] * len(queries)
+        if (collection or self.config.DEFAULT_COLLECTION) != self.answers.metadata.get("collection", self.config.DEFAULT_COLLECTION):
+            return [None] * len(queries)
+        if self.answers.encode_queries is not None and self.retriever.embedding_model(collection) != self.answers.metadata.get("model"):
+            # 集合已切换到新的向量模型，问题索引需用新模型重新生成，此前只做精确匹配
+            logger.warning(f"集合的向量模型已切换为 {self.retriever.embedding_model(collection)}，预计算回答只做精确匹配")
+            self.answers.encode_queries = None
+        matches = self.answers.match_batch(queries)
+        for match in matches:
+            if match is not None:
+                logger.info(f"命中预计算回答（{match['match']}，相似度 {match['score']:.4f}）：{match['question']}")
+        return matches
+    
+    def process(self, query: str, scoring: bool = False, collection: Optional[str] = None) -> Dict[str, Any]:
         """处理单个查询
         
         Args:
             query: 用户查询
             scoring: 是否需要对文档相关性打分
+            collection: 检索的集合名称，如果为None则使用默认集合
         
         Returns:
-            包含检索结果和生成回答的字典
+            包含检索结果和生成回答的字典；命中预计算回答时不调用 LLM，附带 precomputed（id、匹配的问题、相似度和匹配方式）
         """
+        with span("rag_process"):
+            match = self.match_precomputed(query, collection)
+            if match is not None:
+                return self.precomputed_result(query, match)
+            return self._process(query, scoring, collection)
+    
+    def _process(self, query: str, scoring: bool, collection: Optional[str]) -> Dict[str, Any]:
         try:
-            # 检索相关文档
-            retrieved_docs = self.retriever.retrieve(
-                query=query,
-                top_k=self.config.TOP_K,
-                min_score=self.config.MIN_SIMILARITY_SCORE
+            retrieved_docs, prompt, context_docs, estimated_prompt_tokens, compression_stats = self._prepare(
+                query, scoring, collection
             )
-            logger.info(f"检索到 {len(retrieved_docs)} 条相关文档")
             
-            # 生成提示词
-            prompt = PromptTemplate.generate_prompt(
-                query=query,
-                documents=retrieved_docs,
-                scoring=scoring
-            )
-            
-            # 计算 token 数量
-            prompt_tokens = self.llm.count_tokens(prompt)
-            logger.info(f"提示词 token 数量：{prompt_tokens}")
-            
-            # 生成回答
-            answer = self.llm.generate(prompt)
-            answer_tokens = self.llm.count_tokens(answer)
-            logger.info(f"回答 token 数量：{answer_tokens}")
+            # 生成回答，token 数量使用接口返回的用量
+            answer, usage = self.llm.generate_with_usage(prompt, prompt_tokens=estimated_prompt_tokens)
+            prompt_tokens = usage.get("prompt_tokens") or estimated_prompt_tokens
+            answer_tokens = usage.get("completion_tokens", 0)
+            logger.info(f"提示词 token 数量：{prompt_tokens}，回答 token 数量：{answer_tokens}")
             
             return {
                 "query": query,
                 "retrieved_documents": retrieved_docs,
                 "answer": answer,
-                "metadata": {
-                    "prompt_tokens": prompt_tokens,
-                    "answer_tokens": answer_tokens,
-                    "total_tokens": prompt_tokens + answer_tokens
-                }
+                "metadata": self._metadata(prompt_tokens, answer_tokens, context_docs, compression_stats,
+                                           no_context=self.is_no_context(retrieved_docs))
             }
             
         except Exception as e:
             logger.error(f"处理查询失败：{str(e)}")
             raise
     
-    def batch_process(self, queries: List[str], scoring: bool = False) -> List[Dict[str, Any]]:
-        """批量处理查询
+    def stream(self, query: str, scoring: bool = False, collection: Optional[str] = None) -> Iterator[Tuple[str, Any]]:
+        """流式处理单个查询：检索完成后先产出参考文档，再逐段产出回答
+        
+        Args:
+            query: 用户查询
+            scoring: 是否需要对文档相关性打分
+            collection: 检索的集合名称，如果为None则使用默认集合
+        
+        Yields:
+            (事件, 数据)：("references", 检索结果列表)、("token", 回答片段)，
+            最后为 ("done", {"answer": 完整回答, "metadata": 元数据})；命中预计算回答时整段回答作为一个片段产出，
+            done 数据附带 precomputed
+        """
+        match = self.match_precomputed(query, collection)
+        if match is not None:
+            result = self.precomputed_result(query, match)
+            yield "references", result["retrieved_documents"]
+            yield "token", result["answer"]
+            yield "done", {key: result[key] for key in ("answer", "metadata", "precomputed")}
+            return
+        
+        retrieved_docs, prompt, context_docs, estimated_prompt_tokens, compression_stats = self._prepare(
+            query, scoring, collection
+        )
+        yield "references", retrieved_docs
+        
+        parts = []
+        chunks = self.llm.stream(prompt, prompt_tokens=estimated_prompt_tokens)
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield "token", chunk
+        finally:
+            # 调用方提前关闭本生成器时同时关闭 LLM 流（关闭上游连接）
+            chunks.close()
+        # 流式接口不返回用量，回答 token 数在本地计数
+        answer = "".join(parts).strip()
+        answer_tokens = self.llm.count_tokens(answer)
+        logger.info(f"流式回答完成，提示词 token 数量：{estimated_prompt_tokens}，回答 token 数量：{answer_tokens}")
+        yield "done", {
+            "answer": answer,
+            "metadata": self._metadata(estimated_prompt_tokens, answer_tokens, context_docs, compression_stats,
+                                       no_context=self.is_no_context(retrieved_docs))
+        }
+    
+    def _prepare(self, query: str, scoring: bool, collection: Optional[str]):
+        """检索相关文档并组装提示词
+        
+        Returns:
+            (检索结果, 提示词, 写入提示词的文档, 估计的提示词 token 数, 上下文压缩统计)
+        """
+        # 检索相关文档（启用自适应检索时文档数由相似度分布决定）
+        retrieved_docs = self.retriever.retrieve(
+            query=query,
+            top_k=self.config.TOP_K,
+            min_score=self.config.MIN_SIMILARITY_SCORE,
+            collection=collection,
+            adaptive=self.config.ADAPTIVE_RETRIEVAL
+        )
+        logger.info(f"检索到 {len(retrieved_docs)} 条相关文档")
+        return (retrieved_docs,) + self.build_prompt(query, retrieved_docs, scoring)
+    
+    def is_no_context(self, retrieved_docs: List[Dict[str, Any]]) -> bool:
+        """自适应检索没有相关文档时不带参考文档直接回答"""
+        return self.config.ADAPTIVE_RETRIEVAL and not retrieved_docs
+    
+    def build_prompt(self, query: str, retrieved_docs: List[Dict[str, Any]], scoring: bool = False):
+        """用已检索的文档组装提示词（可选上下文压缩）
+        
+        Returns:
+            (提示词, 写入提示词的文档, 估计的提示词 token 数, 上下文压缩统计)
+        """
+        if self.is_no_context(retrieved_docs):
+            prompt = PromptTemplate.direct_prompt(query)
+            estimated_prompt_tokens = self.llm.count_tokens(prompt)
+            logger.info(f"没有超过相似度阈值的文档，直接回答，估计 token 数量：{estimated_prompt_tokens}")
+            return prompt, [], estimated_prompt_tokens, None
+        
+        # 可选：抽取与问题相关的句子和法条，减少提示词 token
+        prompt_docs = retrieved_docs
+        compression_stats = None
+        if self.compressor:
+            with span("context_compression"):
+                prompt_docs, compression_stats = self.compressor.compress(query, retrieved_docs)
+        
+        # 在 token 预算内生成提示词（模型上下文窗口减去生成长度）
+        with span("prompt_build"):
+            prompt, context_docs, estimated_prompt_tokens = PromptTemplate.assemble(
+                query=query,
+                documents=prompt_docs,
+                max_prompt_tokens=self.config.LLM_CONTEXT_WINDOW - self.config.MAX_TOKENS,
+                count_tokens=self.llm.count_tokens,
+                scoring=scoring,
+                min_truncated_tokens=self.config.MIN_TRUNCATED_DOC_TOKENS
+            )
+        logger.info(f"提示词使用 {len(context_docs)} 条文档，估计 token 数量：{estimated_prompt_tokens}")
+        return prompt, context_docs, estimated_prompt_tokens, compression_stats
+    
+    def precomputed_result(self, query: str, match: Dict[str, Any]) -> Dict[str, Any]:
+        """预计算回答的处理结果：知识库中的回答和法律依据（法律依据的相关度为问题的匹配相似度）"""
+        return {
+            "query": query,
+            "retrieved_documents": [{"text": reference, "score": match["score"]} for reference in match["references"]],
+            "answer": match["answer"],
+            "metadata": self._metadata(0, 0, [], None),
+            "precomputed": {key: match[key] for key in ("id", "question", "score", "match")}
+        }
+    
+    @staticmethod
+    def _metadata(prompt_tokens: int, answer_tokens: int, context_docs: List[Dict[str, Any]],
+                  compression_stats: Optional[Dict[str, Any]], no_context: bool = False) -> Dict[str, Any]:
+        metadata = {
+            "prompt_tokens": prompt_tokens,
+            "answer_tokens": answer_tokens,
+            "total_tokens": prompt_tokens + answer_tokens,
+            "context_documents": len(context_docs),
+            "truncated_documents": sum(1 for doc in context_docs if doc.get("truncated"))
+        }
+        if compression_stats:
+            metadata["compression"] = compression_stats
+        if no_context:
+            # 未使用参考文档，回答来自模型自身知识
+            metadata["no_context"] = True
+        return metadata
+    
+    def batch_process(self, queries: List[str], scoring: bool = False, collection: Optional[str] = None) -> List[Dict[str, Any]]:
+        """批量处理查询（并发执行，LLM 调用受限速器约束）
         
         Args:
             queries: 查询列表
             scoring: 是否需要对文档相关性打分
+            collection: 检索的集合名称，如果为None则使用默认集合
         
         Returns:
-            每个查询的处理结果列表
+            每个查询的处理结果列表，顺序与 queries 一致
         """
-        return [self.process(query, scoring) for query in queries] 
\ No newline at end of file
+        return self.executor.map(lambda query: self.process(query, scoring, collection), queries) 
\ No newline at end of file
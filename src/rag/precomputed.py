@@ -0,0 +1,312 @@
+"""高频问题的预计算回答
+
+知识库每条记录的 input 字段包含一个问题（「<问题>：」之后的部分），output 字段是经过审核的回答。
+离线任务把所有问题规范化后编码为向量，与回答一起保存为索引包（问题到问题的索引）::
+
+    python -m src.rag.precomputed --input part.jsonl --logs "logs/*.log"
+
+请求时先按规范形式精确匹配（哈希表，不需要编码），再按向量相似度匹配；相似度不低于
+PRECOMPUTED_MIN_SCORE（严格阈值）时直接返回已存储的回答，不调用 LLM。任务结束时重放服务日志中的
+问题（"处理问题: ..." 行），报告命中率。
+
+索引包布局：texts 为每条问题的 JSON（id、问题、回答、法律依据），向量为规范化问题的向量，
+逐条记录数组 question_hash 为规范化问题的 64 位哈希；元数据记录向量模型、规范化参数和对应的集合。
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import logging
+import time
+
+import jsonlines
+import numpy as np
+
+from src.config import Config
+from src.document_processor.normalizer import QueryNormalizer
+from src.vectorstore import storage
+from src.vectorstore.faiss_index import build_faiss_index
+from src.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+HASH_ARRAY = "question_hash"
+
+# 知识库 input 字段中问题部分的起始标记，前面是相关法条
+QUESTION_MARKER = "<问题>："
+
+
+def extract_question(text: str) -> str:
+    """知识库 input 字段中的问题部分，没有标记时返回全文"""
+    return text.split(QUESTION_MARKER)[-1].strip()
+
+
+def question_hash(canonical: str) -> int:
+    """规范化问题的 64 位哈希（按有符号整数存储）"""
+    return int.from_bytes(hashlib.blake2b(canonical.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+class PrecomputedAnswers:
+    """问题到已审核回答的索引：规范形式精确匹配 + 向量相似度匹配"""
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        entries: Sequence[str],
+        hashes: np.ndarray,
+        metadata: Dict[str, Any],
+        min_score: float = 0.95,
+        encode_queries: Optional[Callable[[List[str]], np.ndarray]] = None
+    ):
+        """初始化
+
+        Args:
+            vectors: 规范化问题的归一化向量
+            entries: 每条问题的 JSON 文本（id、question、answer、references）
+            hashes: 规范化问题的哈希
+            metadata: 索引元数据
+            min_score: 向量匹配的最低相似度
+            encode_queries: 查询编码函数（规范化并编码，返回归一化向量），为None时只做精确匹配
+        """
+        self.entries = entries
+        self.metadata = metadata
+        self.min_score = min_score
+        self.encode_queries = encode_queries
+        self.normalizer = QueryNormalizer(**metadata.get("normalizer", {}))
+        # 哈希相同的问题保留第一条
+        self._exact: Dict[int, int] = {}
+        for row, value in enumerate(np.asarray(hashes).tolist()):
+            self._exact.setdefault(value, row)
+        self.index = build_faiss_index(np.ascontiguousarray(vectors, dtype=np.float32)) if len(vectors) else None
+
+    @classmethod
+    def load(
+        cls,
+        path: Path,
+        min_score: float = 0.95,
+        encode_queries: Optional[Callable[[List[str]], np.ndarray]] = None,
+        model_name: Optional[str] = None,
+        verify: bool = False
+    ) -> "PrecomputedAnswers":
+        """加载预计算回答索引（带 CURRENT 指针时加载其指向的版本）
+
+        Args:
+            path: 索引目录
+            min_score: 向量匹配的最低相似度
+            encode_queries: 查询编码函数，为None时只做精确匹配
+            model_name: 查询编码使用的向量模型名称，与索引的模型不一致时只做精确匹配
+            verify: 是否校验索引包文件的校验和
+        """
+        bundle = storage.load_bundle(storage.resolve_version(path), verify=verify)
+        if encode_queries is not None and model_name and bundle.metadata.get("model") != model_name:
+            logger.warning(
+                f"预计算回答索引的向量模型（{bundle.metadata.get('model')}）与当前模型（{model_name}）不一致，只做精确匹配"
+            )
+            encode_queries = None
+        answers = cls(bundle.vectors, bundle.texts, bundle.arrays[HASH_ARRAY], bundle.metadata, min_score, encode_queries)
+        logger.info(f"预计算回答加载完成，共 {len(answers)} 个问题")
+        return answers
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def entry(self, row: int) -> Dict[str, Any]:
+        return json.loads(self.entries[row])
+
+    def lookup(self, query: str) -> Optional[int]:
+        """规范形式与已知问题相同时返回其下标"""
+        return self._exact.get(question_hash(self.normalizer(query)))
+
+    def search(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """每个查询向量最相似的问题：(相似度, 下标)"""
+        scores, rows = self.index.search(np.ascontiguousarray(vectors, dtype=np.float32), 1)
+        return scores[:, 0], rows[:, 0]
+
+    def match(self, query: str) -> Optional[Dict[str, Any]]:
+        """查询与已知问题匹配时返回该问题的记录，附带 score 和 match（exact 或 vector），否则返回 None
+
+        查询带知识库格式的「<问题>：」标记时只匹配问题部分，与构建索引时一致。
+        """
+        return self.match_batch([query])[0]
+
+    def match_batch(self, queries: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """批量匹配，返回与 queries 一一对应的记录或 None；未精确命中的查询一次批量编码"""
+        queries = [extract_question(query) for query in queries]
+        matches: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        with span("precomputed_match"):
+            pending = []
+            for i, query in enumerate(queries):
+                row = self.lookup(query)
+                if row is not None:
+                    matches[i] = {**self.entry(row), "score": 1.0, "match": "exact"}
+                else:
+                    pending.append(i)
+            if not pending or self.encode_queries is None or self.index is None:
+                return matches
+            scores, rows = self.search(self.encode_queries([queries[i] for i in pending]))
+            for i, score, row in zip(pending, scores.tolist(), rows.tolist()):
+                if score >= self.min_score:
+                    matches[i] = {**self.entry(row), "score": score, "match": "vector"}
+        return matches
+
+
+def read_questions(input_file: Path, normalizer: QueryNormalizer) -> Tuple[List[str], List[str]]:
+    """读取知识库中的问题，按规范形式去重
+
+    Returns:
+        (规范化问题, 记录 JSON)，回答保留原文（不做入库预处理，保留换行）
+    """
+    canonicals: Dict[str, str] = {}
+    with jsonlines.open(input_file) as reader:
+        for item in reader:
+            question = extract_question(item.get("input", ""))
+            answer = (item.get("output") or "").strip()
+            canonical = normalizer(question)
+            if not canonical or not answer or canonical in canonicals:
+                continue
+            canonicals[canonical] = json.dumps({
+                "id": item.get("id", ""),
+                "question": question,
+                "answer": answer,
+                "references": item.get("reference", []),
+            }, ensure_ascii=False)
+    return list(canonicals), list(canonicals.values())
+
+
+def build_answers(
+    input_file: Path,
+    output_dir: Path,
+    config: Config,
+    vector_store: Any,
+    collection: Optional[str] = None
+) -> Dict[str, Any]:
+    """构建预计算回答索引的新版本，完成后原子切换 CURRENT
+
+    Args:
+        input_file: 知识库 JSONL 文件
+        output_dir: 索引目录
+        config: 配置对象
+        vector_store: 提供 encode_texts 的向量存储（使用 config.EMBEDDING_MODEL）
+        collection: 回答对应的集合名称，请求该集合时才使用预计算回答
+
+    Returns:
+        构建结果：版本 id、目录、问题数和各阶段耗时
+    """
+    normalizer = QueryNormalizer(to_simplified=config.QUERY_TO_SIMPLIFIED)
+    timings = {}
+
+    start = time.perf_counter()
+    canonicals, entries = read_questions(input_file, normalizer)
+    timings["loading_s"] = round(time.perf_counter() - start, 3)
+    if not canonicals:
+        raise ValueError(f"{input_file} 中没有可用的问题和回答")
+    logger.info(f"读取 {len(canonicals)} 个不同的问题")
+
+    # 与请求时一致：编码规范形式
+    start = time.perf_counter()
+    vectors = vector_store.encode_texts(canonicals).astype(np.float32)
+    timings["embedding_s"] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    version_dir = storage.new_version_dir(output_dir)
+    metadata = {
+        "model": config.EMBEDDING_MODEL,
+        "source": str(input_file),
+        "collection": collection or config.DEFAULT_COLLECTION,
+        "normalizer": {"to_simplified": config.QUERY_TO_SIMPLIFIED},
+    }
+    hashes = np.asarray([question_hash(canonical) for canonical in canonicals], dtype=np.int64)
+    storage.save_bundle(version_dir, vectors, entries, metadata=metadata, arrays={HASH_ARRAY: hashes})
+    version = storage.publish_version(version_dir, keep=config.INGEST_KEEP_VERSIONS)
+    timings["saving_s"] = round(time.perf_counter() - start, 3)
+    return {"version": version, "path": str(version_dir), "questions": len(canonicals), "timings": timings}
+
+
+def replay(answers: PrecomputedAnswers, queries: List[str], batch_size: int = 256) -> Dict[str, Any]:
+    """重放查询，统计命中预计算回答的比例
+
+    精确匹配按规范形式查表；其余查询批量编码后按向量相似度匹配。另统计最高相似度的分布，
+    便于调整 PRECOMPUTED_MIN_SCORE。
+    """
+    queries = [extract_question(query) for query in queries]
+    exact = 0
+    pending = []
+    for query in queries:
+        if answers.lookup(query) is not None:
+            exact += 1
+        else:
+            pending.append(query)
+    vector = 0
+    best = np.empty(0, dtype=np.float32)
+    if pending and answers.encode_queries is not None and answers.index is not None:
+        scores = []
+        for i in range(0, len(pending), batch_size):
+            scores.append(answers.search(answers.encode_queries(pending[i:i + batch_size]))[0])
+        best = np.concatenate(scores)
+        vector = int((best >= answers.min_score).sum())
+    total = len(queries)
+    report = {
+        "queries": total,
+        "unique_queries": len({answers.normalizer(query) for query in queries}),
+        "exact_hits": exact,
+        "vector_hits": vector,
+        "hit_rate": round((exact + vector) / total, 4) if total else 0.0,
+        "min_score": answers.min_score,
+    }
+    if len(best):
+        report["best_score_percentiles"] = {
+            f"p{q}": round(float(np.percentile(best, q)), 4) for q in (50, 90, 95, 99)
+        }
+    return report
+
+
+def main():
+    # 日志读取与基准共用
+    from src.benchmark.normalize import read_log_queries, read_query_file
+    from src.vectorstore.embeddings import VectorStore
+
+    parser = argparse.ArgumentParser(description="高频问题预计算回答")
+    parser.add_argument("--input", type=Path, default=None, help="知识库 JSONL 文件，默认为 KNOWLEDGE_BASE")
+    parser.add_argument("--output", type=Path, default=None, help="索引目录，默认为 PRECOMPUTED_ANSWERS_PATH")
+    parser.add_argument("--collection", default=None, help="回答对应的集合名称，默认为默认集合")
+    parser.add_argument("--logs", default=str(Config.BASE_DIR / "logs" / "*.log"), help="重放的服务日志（glob）")
+    parser.add_argument("--queries", type=Path, nargs="*", default=[], help="重放的查询文件（JSONL 或纯文本）")
+    parser.add_argument("--min-score", type=float, default=None, help="向量匹配的最低相似度，默认为 PRECOMPUTED_MIN_SCORE")
+    parser.add_argument("--replay-only", action="store_true", help="不重新构建，只用当前索引重放")
+    args = parser.parse_args()
+
+    config = Config()
+    output_dir = args.output or config.PRECOMPUTED_ANSWERS_PATH
+    min_score = args.min_score if args.min_score is not None else config.PRECOMPUTED_MIN_SCORE
+    vector_store = VectorStore(
+        config.EMBEDDING_MODEL,
+        query_normalizer=QueryNormalizer(to_simplified=config.QUERY_TO_SIMPLIFIED)
+    )
+
+    if not args.replay_only:
+        result = build_answers(args.input or config.KNOWLEDGE_BASE, output_dir, config, vector_store, args.collection)
+        print(f"已收录 {result['questions']} 个问题，保存到: {result['path']}（版本 {result['version']}）")
+        print("耗时：" + "，".join(f"{name[:-2]} {seconds}s" for name, seconds in result["timings"].items()))
+
+    answers = PrecomputedAnswers.load(
+        output_dir, min_score, vector_store.encode_queries, model_name=config.EMBEDDING_MODEL
+    )
+    queries = read_log_queries(args.logs)
+    for path in args.queries:
+        queries.extend(read_query_file(path))
+    if not queries:
+        print("没有读到可重放的查询（--logs / --queries），跳过命中率统计")
+        return
+    report = replay(answers, queries)
+    print(
+        f"重放 {report['queries']} 条查询（不同 {report['unique_queries']} 条）：精确命中 {report['exact_hits']}，"
+        f"向量命中 {report['vector_hits']}（相似度 ≥ {min_score}），命中率 {report['hit_rate']:.2%}"
+    )
+    if "best_score_percentiles" in report:
+        print("未精确命中查询的最高相似度：" + "  ".join(f"{k} {v}" for k, v in report["best_score_percentiles"].items()))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
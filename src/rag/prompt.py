@@ -1,4 +1,4 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from string import Template
 
 class PromptTemplate:
@@ -26,6 +26,22 @@ ${context}
 
 请先为每个参考文档的相关性打分（0-10分），然后给出专业、准确的回答：""")
     
+    # 不使用参考文档的直接回答提示词（对比模式、自适应检索没有相关文档时）
+    DIRECT_TEMPLATE = Template("""你是一个专业的法律顾问。请回答用户的问题。如果不确定答案，请明确说明。请不要编造信息。
+
+用户问题：${query}
+
+请给出专业、准确的回答：""")
+    
+    # 每个文档标题行 "[1] 相关度 0.1234：" 及换行的估计 token 数
+    DOC_HEADER_TOKENS = 12
+    
+    # 截断文档时追加的省略标记
+    TRUNCATION_MARK = "……"
+    
+    # 缺少预计算 token 数且无计数函数时，按每字符 1.5 个 token 保守估计（中文）
+    TOKENS_PER_CHAR_ESTIMATE = 1.5
+    
     @staticmethod
     def format_context(documents: List[Dict[str, Any]]) -> str:
         """格式化上下文文档
@@ -42,6 +58,106 @@ ${context}
             context_parts.append(f"[{idx}] 相关度 {score}：\n{doc['text']}\n")
         return "\n".join(context_parts)
     
+    @classmethod
+    def document_tokens(cls, doc: Dict[str, Any], count_tokens: Optional[Callable[[str], int]] = None) -> int:
+        """获取文档文本的 token 数
+        
+        优先使用入库时预计算并随检索结果返回的 tokens 字段，请求时不再对语料分词。
+        
+        Args:
+            doc: 文档，包含 text 字段，可选 tokens 字段
+            count_tokens: 缺少 tokens 字段时使用的计数函数
+        
+        Returns:
+            token 数
+        """
+        if doc.get("tokens") is not None:
+            return int(doc["tokens"])
+        if count_tokens is not None:
+            return count_tokens(doc["text"])
+        return int(len(doc["text"]) * cls.TOKENS_PER_CHAR_ESTIMATE)
+    
+    @classmethod
+    def fit_documents(
+        cls,
+        documents: List[Dict[str, Any]],
+        budget: int,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        min_truncated_tokens: int = 64,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """在 token 预算内选择文档
+        
+        按相关度从高到低依次放入；放不下的第一个文档在剩余预算足够时按比例截断，
+        其余相关度更低的文档全部丢弃。截断按字符比例估算，不对文本重新分词。
+        
+        Args:
+            documents: 文档列表
+            budget: 上下文可用的 token 预算
+            count_tokens: 缺少预计算 token 数时使用的计数函数
+            min_truncated_tokens: 截断后至少保留的 token 数
+        
+        Returns:
+            (选中的文档列表, 估计使用的 token 数)
+        """
+        selected = []
+        used = 0
+        for doc in sorted(documents, key=lambda d: d["score"], reverse=True):
+            tokens = cls.document_tokens(doc, count_tokens)
+            remaining = budget - used - cls.DOC_HEADER_TOKENS
+            if tokens <= remaining:
+                selected.append(doc)
+                used += tokens + cls.DOC_HEADER_TOKENS
+                continue
+            
+            if remaining >= min_truncated_tokens and tokens > 0:
+                # 预留省略标记的位置，按字符比例截断
+                keep_chars = int(len(doc["text"]) * (remaining - 2) / tokens)
+                truncated = dict(doc)
+                truncated["text"] = doc["text"][:keep_chars] + cls.TRUNCATION_MARK
+                truncated["tokens"] = remaining
+                truncated["truncated"] = True
+                selected.append(truncated)
+                used += remaining + cls.DOC_HEADER_TOKENS
+            break
+        return selected, used
+    
+    @classmethod
+    def assemble(
+        cls,
+        query: str,
+        documents: List[Dict[str, Any]],
+        max_prompt_tokens: int,
+        count_tokens: Callable[[str], int],
+        scoring: bool = False,
+        min_truncated_tokens: int = 64,
+    ) -> Tuple[str, List[Dict[str, Any]], int]:
+        """在 token 预算内组装提示词
+        
+        上下文预算 = max_prompt_tokens - 模板与问题本身的 token 数。
+        只对模板和问题计数，文档 token 数使用预计算值。
+        
+        Args:
+            query: 用户查询
+            documents: 相关文档列表
+            max_prompt_tokens: 提示词最大 token 数（模型上下文窗口减去 MAX_TOKENS）
+            count_tokens: token 计数函数
+            scoring: 是否需要对文档相关性打分
+            min_truncated_tokens: 截断后至少保留的 token 数
+        
+        Returns:
+            (提示词, 实际放入提示词的文档列表, 估计的提示词 token 数)
+        """
+        template = cls.SCORING_TEMPLATE if scoring else cls.BASE_TEMPLATE
+        overhead = count_tokens(template.substitute(context="", query=query))
+        context_docs, context_tokens = cls.fit_documents(
+            documents,
+            budget=max_prompt_tokens - overhead,
+            count_tokens=count_tokens,
+            min_truncated_tokens=min_truncated_tokens,
+        )
+        prompt = template.substitute(context=cls.format_context(context_docs), query=query)
+        return prompt, context_docs, overhead + context_tokens
+    
     @classmethod
     def generate_prompt(cls, query: str, documents: List[Dict[str, Any]], scoring: bool = False) -> str:
         """生成提示词
@@ -56,4 +172,9 @@ ${context}
         """
         context = cls.format_context(documents)
         template = cls.SCORING_TEMPLATE if scoring else cls.BASE_TEMPLATE
-        return template.substitute(context=context, query=query) 
\ No newline at end of file
+        return template.substitute(context=context, query=query)
+    
+    @classmethod
+    def direct_prompt(cls, query: str) -> str:
+        """生成不带参考文档的直接回答提示词"""
+        return cls.DIRECT_TEMPLATE.substitute(query=query)
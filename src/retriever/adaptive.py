@@ -0,0 +1,63 @@
+"""自适应检索深度
+
+一次多取若干条候选（ADAPTIVE_FETCH_K），按相似度分布决定交给生成阶段的文档数：
+
+1. 没有结果超过相似度阈值：返回空列表，RAG 流程不带参考文档直接回答；
+2. 最高分很高且与第二名拉开差距：一条文档足够；
+3. 否则保留与最高分相差不超过 margin 的结果，并在其中最大的分数断层处截断
+   （断层不小于 gap 时），最多 max_k 条。
+
+分数都接近阈值、彼此差别不大的困难查询因此得到更多上下文，明确的查询只带一条文档。
+"""
+from typing import Any, Dict, List, Sequence
+
+
+def adaptive_depth(
+    scores: Sequence[float],
+    max_k: int = 5,
+    high_score: float = 0.9,
+    gap: float = 0.08,
+    margin: float = 0.15
+) -> int:
+    """根据相似度分布选择文档数
+
+    Args:
+        scores: 超过阈值的候选相似度
+        max_k: 最多保留的文档数
+        high_score: 最高分不低于该值且领先第二名至少 gap 时只保留一条
+        gap: 视为断层的最小分差
+        margin: 与最高分的最大分差，超出的结果不保留
+
+    Returns:
+        保留的文档数，没有候选时为 0
+    """
+    scores = sorted((float(score) for score in scores), reverse=True)[:max(1, max_k)]
+    if not scores:
+        return 0
+    top = scores[0]
+    if top >= high_score and (len(scores) == 1 or top - scores[1] >= gap):
+        return 1
+    depth = 1
+    while depth < len(scores) and top - scores[depth] <= margin:
+        depth += 1
+    gaps = [scores[i] - scores[i + 1] for i in range(depth - 1)]
+    if gaps and max(gaps) >= gap:
+        depth = gaps.index(max(gaps)) + 1
+    return depth
+
+
+def select_adaptive(results: List[Dict[str, Any]], config: Any) -> List[Dict[str, Any]]:
+    """按 adaptive_depth 截取检索结果（保持原有顺序，MMR 重排后的顺序同样保留）
+
+    Args:
+        results: 一个查询的检索结果（已按相似度阈值过滤）
+        config: 配置对象，读取 ADAPTIVE_* 参数
+    """
+    depth = adaptive_depth(
+        [doc["score"] for doc in results],
+        max_k=config.ADAPTIVE_MAX_K,
+        high_score=config.ADAPTIVE_HIGH_SCORE,
+        gap=config.ADAPTIVE_SCORE_GAP,
+        margin=config.ADAPTIVE_SCORE_MARGIN
+    )
+    return results[:depth]
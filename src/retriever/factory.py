@@ -0,0 +1,30 @@
+from typing import Optional
+from src.config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+def create_retriever(config: Optional[Config] = None):
+    """根据 Config.RETRIEVAL_BACKEND 创建检索器
+
+    Args:
+        config: 配置对象，如果为None则创建新的配置对象
+
+    Returns:
+        VectorRetriever（本进程加载模型和索引）或 RemoteRetriever（访问独立的检索服务）
+
+    Raises:
+        ValueError: 未知的后端名称
+    """
+    config = config or Config()
+    backend = config.RETRIEVAL_BACKEND
+    logger.info(f"使用检索后端：{backend}")
+
+    # 延迟导入，使用远程检索时本进程不导入向量模型相关依赖
+    if backend == "local":
+        from src.retriever.vector_search import VectorRetriever
+        return VectorRetriever(config)
+    if backend == "remote":
+        from src.retriever.remote import RemoteRetriever
+        return RemoteRetriever(config)
+    raise ValueError(f"未知的检索后端：{backend}，可选值：local、remote")
@@ -0,0 +1,222 @@
+"""检索服务的二进制协议
+
+每个消息为固定长度的帧头加负载，所有整数和浮点数均为小端序::
+
+    帧头 (12 字节)  magic "RAGR" | version u8 | op u8 | flags u16 | 负载长度 u32
+
+检索请求 (OP_SEARCH) 负载::
+
+    top_k u16 (0 表示使用服务端配置) | min_score f32 (NaN 表示使用服务端配置)
+    mmr_lambda f32 (NaN 表示使用服务端配置) | kind u8 (0 文本 / 1 向量) | 集合名称长度 u16 | 集合名称 UTF-8
+    kind=0: 查询数 u16 | 各查询字节长度 u32[n] | 查询文本 UTF-8 拼接
+    kind=1: 查询数 u16 | 维度 u16 | 归一化向量 f32[n * d]
+
+检索结果 (OP_RESULTS) 负载::
+
+    查询数 u32 | 各查询结果数 u32[n] | 文档下标 u32[m] | 相似度 f32[m] | token 数 u32[m]（未知为 0xFFFFFFFF）
+    flags 含 FLAG_TEXTS 时追加: 各文本字节长度 u32[m] | 文本 UTF-8 拼接
+
+取文档请求 (OP_FETCH) 负载::
+
+    集合名称长度 u16 | 集合名称 UTF-8 | 文档数 u32 | 文档下标 u32[n]
+
+响应为 OP_RESULTS 格式（一个查询，相似度为 0，总是含文本）。
+
+状态请求 (OP_STATUS) 无负载，响应为同 op 的 JSON 负载；错误响应为 OP_ERROR，flags 为错误码，负载为 UTF-8 错误信息。
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import math
+import socket
+import struct
+import numpy as np
+
+MAGIC = b"RAGR"
+VERSION = 2
+HEADER = struct.Struct("<4sBBHI")
+
+OP_SEARCH = 1
+OP_RESULTS = 2
+OP_STATUS = 3
+OP_FETCH = 4
+OP_ERROR = 255
+
+FLAG_TEXTS = 1
+
+KIND_TEXT = 0
+KIND_VECTOR = 1
+
+ERROR_INTERNAL = 1
+ERROR_NOT_FOUND = 2
+ERROR_INVALID_NAME = 3
+ERROR_BAD_REQUEST = 4
+ERROR_DOC_NOT_FOUND = 5
+
+MAX_PAYLOAD = 64 * 2**20
+NO_TOKENS = 0xFFFFFFFF
+
+_SEARCH_PREFIX = struct.Struct("<HffBH")
+
+
+class ProtocolError(Exception):
+    """帧格式错误或连接中断"""
+
+
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ProtocolError("连接已关闭")
+        received += n
+    return bytes(buffer)
+
+
+def send_frame(sock: socket.socket, op: int, payload: bytes = b"", flags: int = 0):
+    sock.sendall(HEADER.pack(MAGIC, VERSION, op, flags, len(payload)) + payload)
+
+
+def recv_frame(sock: socket.socket) -> Tuple[int, int, bytes]:
+    """读取一帧，返回 (op, flags, 负载)"""
+    magic, version, op, flags, length = HEADER.unpack(recv_exact(sock, HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ProtocolError(f"不支持的帧头：{magic!r} v{version}")
+    if length > MAX_PAYLOAD:
+        raise ProtocolError(f"负载过大：{length} 字节")
+    return op, flags, recv_exact(sock, length) if length else b""
+
+
+def _pack_strings(strings: List[bytes]) -> bytes:
+    return np.asarray([len(s) for s in strings], dtype="<u4").tobytes() + b"".join(strings)
+
+
+def _unpack_strings(payload: memoryview, count: int, pos: int) -> Tuple[List[str], int]:
+    lengths = np.frombuffer(payload, dtype="<u4", count=count, offset=pos)
+    pos += 4 * count
+    strings = []
+    for length in lengths.tolist():
+        strings.append(bytes(payload[pos:pos + length]).decode("utf-8"))
+        pos += length
+    return strings, pos
+
+
+def encode_search(
+    queries: Optional[List[str]] = None,
+    vectors: Optional[np.ndarray] = None,
+    top_k: Optional[int] = None,
+    min_score: Optional[float] = None,
+    collection: Optional[str] = None,
+    mmr_lambda: Optional[float] = None
+) -> bytes:
+    """编码检索请求，queries 和 vectors 二选一"""
+    name = (collection or "").encode("utf-8")
+    kind = KIND_TEXT if vectors is None else KIND_VECTOR
+    prefix = _SEARCH_PREFIX.pack(
+        top_k or 0,
+        math.nan if min_score is None else min_score,
+        math.nan if mmr_lambda is None else mmr_lambda,
+        kind,
+        len(name)
+    ) + name
+    if kind == KIND_TEXT:
+        return prefix + struct.pack("<H", len(queries)) + _pack_strings([q.encode("utf-8") for q in queries])
+    vectors = np.ascontiguousarray(vectors, dtype="<f4")
+    return prefix + struct.pack("<HH", vectors.shape[0], vectors.shape[1]) + vectors.tobytes()
+
+
+def decode_search(payload: bytes) -> Dict[str, Any]:
+    """解码检索请求"""
+    view = memoryview(payload)
+    top_k, min_score, mmr_lambda, kind, name_length = _SEARCH_PREFIX.unpack_from(view, 0)
+    pos = _SEARCH_PREFIX.size
+    request = {
+        "top_k": top_k or None,
+        "min_score": None if math.isnan(min_score) else min_score,
+        "mmr_lambda": None if math.isnan(mmr_lambda) else mmr_lambda,
+        "collection": bytes(view[pos:pos + name_length]).decode("utf-8") or None,
+    }
+    pos += name_length
+    if kind == KIND_TEXT:
+        (count,) = struct.unpack_from("<H", view, pos)
+        request["queries"], _ = _unpack_strings(view, count, pos + 2)
+    elif kind == KIND_VECTOR:
+        count, dimension = struct.unpack_from("<HH", view, pos)
+        request["vectors"] = np.frombuffer(view, dtype="<f4", count=count * dimension, offset=pos + 4).reshape(count, dimension)
+    else:
+        raise ProtocolError(f"未知的查询类型：{kind}")
+    return request
+
+
+def encode_fetch(ids: List[int], collection: Optional[str] = None) -> bytes:
+    """编码取文档请求"""
+    name = (collection or "").encode("utf-8")
+    return struct.pack("<H", len(name)) + name + struct.pack("<I", len(ids)) + np.asarray(ids, dtype="<u4").tobytes()
+
+
+def decode_fetch(payload: bytes) -> Dict[str, Any]:
+    """解码取文档请求"""
+    view = memoryview(payload)
+    (name_length,) = struct.unpack_from("<H", view, 0)
+    pos = 2 + name_length
+    (count,) = struct.unpack_from("<I", view, pos)
+    return {
+        "collection": bytes(view[2:pos]).decode("utf-8") or None,
+        "ids": np.frombuffer(view, dtype="<u4", count=count, offset=pos + 4).tolist(),
+    }
+
+
+def encode_results(results: List[List[Dict[str, Any]]], include_texts: bool) -> bytes:
+    """编码每个查询的检索结果"""
+    docs = [doc for per_query in results for doc in per_query]
+    parts = [
+        struct.pack("<I", len(results)),
+        np.asarray([len(per_query) for per_query in results], dtype="<u4").tobytes(),
+        np.asarray([doc["index"] for doc in docs], dtype="<u4").tobytes(),
+        np.asarray([doc["score"] for doc in docs], dtype="<f4").tobytes(),
+        np.asarray([doc.get("tokens", NO_TOKENS) for doc in docs], dtype="<u4").tobytes(),
+    ]
+    if include_texts:
+        parts.append(_pack_strings([doc["text"].encode("utf-8") for doc in docs]))
+    return b"".join(parts)
+
+
+def decode_results(payload: bytes, include_texts: bool) -> List[List[Dict[str, Any]]]:
+    """解码检索结果，格式与 VectorRetriever.retrieve 的返回值相同（未请求文本时不含 text）"""
+    view = memoryview(payload)
+    (count,) = struct.unpack_from("<I", view, 0)
+    pos = 4
+    counts = np.frombuffer(view, dtype="<u4", count=count, offset=pos).tolist()
+    pos += 4 * count
+    total = sum(counts)
+    ids = np.frombuffer(view, dtype="<u4", count=total, offset=pos).tolist()
+    pos += 4 * total
+    scores = np.frombuffer(view, dtype="<f4", count=total, offset=pos).tolist()
+    pos += 4 * total
+    tokens = np.frombuffer(view, dtype="<u4", count=total, offset=pos).tolist()
+    pos += 4 * total
+    texts = _unpack_strings(view, total, pos)[0] if include_texts else None
+
+    results = []
+    position = 0
+    for n in counts:
+        per_query = []
+        for i in range(position, position + n):
+            doc = {"score": scores[i], "index": ids[i]}
+            if texts is not None:
+                doc["text"] = texts[i]
+            if tokens[i] != NO_TOKENS:
+                doc["tokens"] = tokens[i]
+            per_query.append(doc)
+        results.append(per_query)
+        position += n
+    return results
+
+
+def encode_json(data: Dict[str, Any]) -> bytes:
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def decode_json(payload: bytes) -> Dict[str, Any]:
+    return json.loads(payload.decode("utf-8"))
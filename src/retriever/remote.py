@@ -0,0 +1,145 @@
+from typing import List, Dict, Any, Optional
+import queue
+import socket
+import numpy as np
+from src.config import Config
+from src.retriever import protocol
+from src.retriever.adaptive import select_adaptive
+from src.vectorstore.collection_manager import CollectionNotFoundError, DocumentNotFoundError, InvalidCollectionNameError
+from src.utils.tracing import span
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RemoteRetriever:
+    """检索服务客户端，接口与 VectorRetriever 相同
+
+    Web 进程不加载向量模型和索引，检索请求通过带连接池的 Unix 套接字发给 src.retriever.service。
+    """
+
+    def __init__(self, config: Optional[Config] = None, socket_path: Optional[str] = None):
+        """初始化检索服务客户端
+
+        Args:
+            config: 配置对象，如果为None则创建新的配置对象
+            socket_path: 检索服务的 Unix 套接字路径，如果为None则使用 RETRIEVAL_SOCKET
+        """
+        self.config = config or Config()
+        self.socket_path = socket_path or self.config.RETRIEVAL_SOCKET
+        self.timeout = self.config.RETRIEVAL_TIMEOUT
+        self._pool: "queue.LifoQueue[socket.socket]" = queue.LifoQueue(maxsize=self.config.RETRIEVAL_POOL_SIZE)
+        logger.info(f"使用远程检索服务：{self.socket_path}")
+
+    @property
+    def model(self):
+        """向量模型在检索服务进程中，本进程不可用"""
+        return None
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _release(self, sock: socket.socket):
+        try:
+            self._pool.put_nowait(sock)
+        except queue.Full:
+            sock.close()
+
+    def _request(self, op: int, payload: bytes = b"", flags: int = 0):
+        """发送一个请求并读取响应；复用的连接已被服务端关闭时换新连接重试一次"""
+        for attempt in range(2):
+            try:
+                sock = self._pool.get_nowait()
+                reused = True
+            except queue.Empty:
+                sock = self._connect()
+                reused = False
+            try:
+                protocol.send_frame(sock, op, payload, flags)
+                response = protocol.recv_frame(sock)
+            except (protocol.ProtocolError, OSError):
+                sock.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            self._release(sock)
+            break
+
+        response_op, response_flags, response_payload = response
+        if response_op == protocol.OP_ERROR:
+            message = response_payload.decode("utf-8")
+            if response_flags == protocol.ERROR_NOT_FOUND:
+                raise CollectionNotFoundError(message)
+            if response_flags == protocol.ERROR_DOC_NOT_FOUND:
+                raise DocumentNotFoundError(message)
+            if response_flags == protocol.ERROR_INVALID_NAME:
+                raise InvalidCollectionNameError(message)
+            raise RuntimeError(f"检索服务错误：{message}")
+        return response_op, response_flags, response_payload
+
+    def _search(self, payload: bytes, include_texts: bool) -> List[List[Dict[str, Any]]]:
+        flags = protocol.FLAG_TEXTS if include_texts else 0
+        with span("retrieve_remote"):
+            _, _, response = self._request(protocol.OP_SEARCH, payload, flags)
+            return protocol.decode_results(response, include_texts)
+
+    def retrieve(self, query: str, top_k: int = None, min_score: float = None, collection: Optional[str] = None,
+                 include_texts: bool = True, mmr_lambda: Optional[float] = None, adaptive: bool = False) -> List[Dict[str, Any]]:
+        """检索相关文档（参数同 VectorRetriever.retrieve）
+
+        Args:
+            include_texts: 是否返回文档文本，为False时只返回下标、相似度和 token 数
+        """
+        return self.batch_retrieve([query], top_k, min_score, collection, include_texts, mmr_lambda, adaptive)[0]
+
+    def batch_retrieve(self, queries: List[str], top_k: int = None, min_score: float = None, collection: Optional[str] = None,
+                       include_texts: bool = True, mmr_lambda: Optional[float] = None,
+                       adaptive: bool = False) -> List[List[Dict[str, Any]]]:
+        """批量检索相关文档，一次请求完成（参数同 VectorRetriever.batch_retrieve）
+
+        自适应深度在本进程中对检索服务返回的 ADAPTIVE_FETCH_K 个候选做选择，协议不变。
+        """
+        if not queries:
+            return []
+        payload = protocol.encode_search(
+            queries=queries, top_k=self.config.ADAPTIVE_FETCH_K if adaptive else top_k,
+            min_score=min_score, collection=collection, mmr_lambda=mmr_lambda
+        )
+        results = self._search(payload, include_texts)
+        return [select_adaptive(per_query, self.config) for per_query in results] if adaptive else results
+
+    def retrieve_by_vectors(self, query_vectors: np.ndarray, top_k: int = None, min_score: float = None,
+                            collection: Optional[str] = None, include_texts: bool = True,
+                            mmr_lambda: Optional[float] = None) -> List[List[Dict[str, Any]]]:
+        """用已编码的查询向量检索，向量以 float32 原样传输"""
+        payload = protocol.encode_search(
+            vectors=query_vectors, top_k=top_k, min_score=min_score, collection=collection, mmr_lambda=mmr_lambda
+        )
+        return self._search(payload, include_texts)
+
+    def get_documents(self, ids: List[int], collection: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按下标获取文档全文（参数同 VectorRetriever.get_documents）"""
+        if not ids:
+            return []
+        if min(ids) < 0:
+            raise DocumentNotFoundError(f"文档下标越界：{min(ids)}")
+        _, _, response = self._request(protocol.OP_FETCH, protocol.encode_fetch(ids, collection))
+        documents = protocol.decode_results(response, include_texts=True)[0]
+        for doc in documents:
+            doc.pop("score")
+        return documents
+
+    def describe_collections(self) -> Dict[str, Any]:
+        """可用集合列表及驻留状态"""
+        _, _, payload = self._request(protocol.OP_STATUS)
+        return protocol.decode_json(payload)
+
+    def close(self):
+        """关闭连接池中的连接"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
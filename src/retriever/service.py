@@ -0,0 +1,118 @@
+"""独立的检索服务进程
+
+服务进程持有向量模型和所有集合的索引，Web 进程通过 Unix 套接字以二进制协议（见 protocol 模块）
+访问，Web 进程数增加时不再重复加载模型和索引::
+
+    python -m src.retriever.service --socket /tmp/rag-retrieval.sock
+    RETRIEVAL_BACKEND=remote python src/main.py
+"""
+import argparse
+import logging
+import os
+import socket
+import socketserver
+
+from src.config import Config
+from src.retriever import protocol
+from src.retriever.vector_search import VectorRetriever
+from src.vectorstore.collection_manager import CollectionNotFoundError, DocumentNotFoundError, InvalidCollectionNameError
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalRequestHandler(socketserver.BaseRequestHandler):
+    """处理一个长连接上的所有请求"""
+
+    def handle(self):
+        retriever: VectorRetriever = self.server.retriever
+        while True:
+            try:
+                op, flags, payload = protocol.recv_frame(self.request)
+            except (protocol.ProtocolError, OSError):
+                return
+            try:
+                if op == protocol.OP_SEARCH:
+                    response_op, response = protocol.OP_RESULTS, self._search(retriever, payload, flags)
+                elif op == protocol.OP_FETCH:
+                    request = protocol.decode_fetch(payload)
+                    documents = retriever.get_documents(request["ids"], request["collection"])
+                    response_op, response = protocol.OP_RESULTS, protocol.encode_results(
+                        [[{**doc, "score": 0.0} for doc in documents]], include_texts=True
+                    )
+                    flags = protocol.FLAG_TEXTS
+                elif op == protocol.OP_STATUS:
+                    response_op, response = protocol.OP_STATUS, protocol.encode_json(retriever.describe_collections())
+                else:
+                    raise protocol.ProtocolError(f"未知的请求类型：{op}")
+                protocol.send_frame(self.request, response_op, response, flags)
+            except CollectionNotFoundError as e:
+                protocol.send_frame(self.request, protocol.OP_ERROR, str(e.args[0]).encode("utf-8"), protocol.ERROR_NOT_FOUND)
+            except DocumentNotFoundError as e:
+                protocol.send_frame(self.request, protocol.OP_ERROR, str(e.args[0]).encode("utf-8"), protocol.ERROR_DOC_NOT_FOUND)
+            except InvalidCollectionNameError as e:
+                protocol.send_frame(self.request, protocol.OP_ERROR, str(e).encode("utf-8"), protocol.ERROR_INVALID_NAME)
+            except (protocol.ProtocolError, ValueError) as e:
+                protocol.send_frame(self.request, protocol.OP_ERROR, str(e).encode("utf-8"), protocol.ERROR_BAD_REQUEST)
+            except Exception as e:
+                logger.error(f"检索请求失败：{str(e)}")
+                protocol.send_frame(self.request, protocol.OP_ERROR, str(e).encode("utf-8"), protocol.ERROR_INTERNAL)
+
+    @staticmethod
+    def _search(retriever: VectorRetriever, payload: bytes, flags: int) -> bytes:
+        request = protocol.decode_search(payload)
+        if "vectors" in request:
+            results = retriever.retrieve_by_vectors(
+                request["vectors"], request["top_k"], request["min_score"], request["collection"],
+                mmr_lambda=request["mmr_lambda"]
+            )
+        else:
+            results = retriever.batch_retrieve(
+                request["queries"], request["top_k"], request["min_score"], request["collection"],
+                mmr_lambda=request["mmr_lambda"]
+            )
+        return protocol.encode_results(results, include_texts=bool(flags & protocol.FLAG_TEXTS))
+
+
+class RetrievalServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, retriever: VectorRetriever):
+        if os.path.exists(socket_path):
+            # 清理上次异常退出留下的套接字文件；仍有服务在监听时拒绝启动
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(socket_path)
+                raise RuntimeError(f"{socket_path} 上已有检索服务在运行")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(socket_path)
+            finally:
+                probe.close()
+        self.retriever = retriever
+        super().__init__(socket_path, RetrievalRequestHandler)
+        # 只允许同一用户的进程连接
+        os.chmod(socket_path, 0o600)
+
+
+def main():
+    config = Config()
+    parser = argparse.ArgumentParser(description="独立的检索服务")
+    parser.add_argument("--socket", default=config.RETRIEVAL_SOCKET, help="Unix 套接字路径")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    retriever = VectorRetriever(config)
+    server = RetrievalServer(args.socket, retriever)
+    logger.info(f"检索服务已启动：{args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
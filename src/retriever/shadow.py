@@ -0,0 +1,166 @@
+"""影子检索：向量模型切换前在线上查询上比较新旧索引
+
+开启 EMBEDDING_SHADOW 且集合有候选版本（重新向量化任务写入）时，检索器在返回结果后把查询和当前版本的
+结果下标交给后台线程；后台线程用候选版本（新向量模型）重复同样的检索，统计：
+
+- top1_agreement：第一条结果相同的比例（两边都没有结果也算相同）
+- overlap：两边结果下标的交集占较长一方的比例
+- 两边最高相似度的均值、各自没有结果的比例，以及候选版本的检索延迟
+
+比较在单个后台线程中执行，等待比较的请求超过 EMBEDDING_SHADOW_QUEUE 时丢弃，不拖慢线上检索。
+候选版本生成后集合又有入库时，两个版本的记录下标不再一一对应，不做比较。
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import logging
+import random
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 保留的最近不一致查询条数
+RECENT_DISAGREEMENTS = 20
+# 延迟分位数使用的最近比较次数
+LATENCY_WINDOW = 1000
+
+
+def _summary(ids: List[int], scores: List[float]) -> Dict[str, Any]:
+    return {"ids": ids, "top_score": round(scores[0], 4) if scores else None}
+
+
+class ShadowComparator:
+    """在后台用候选版本重复线上检索，按集合累计比较结果"""
+
+    def __init__(self, collections, config):
+        """初始化影子比较
+
+        Args:
+            collections: 集合管理器，提供 candidate 和 loaded_version
+            config: 配置对象，读取 EMBEDDING_SHADOW_* 参数
+        """
+        self.collections = collections
+        self.sample_rate = config.EMBEDDING_SHADOW_SAMPLE_RATE
+        self.max_pending = config.EMBEDDING_SHADOW_QUEUE
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-shadow")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def submit(self, collection: str, queries: List[str], results: List[List[Dict[str, Any]]], params: Dict[str, Any]):
+        """登记一次线上检索；只记录下标和相似度，比较在后台线程中进行
+
+        Args:
+            collection: 集合名称
+            queries: 查询列表
+            results: 当前版本的检索结果（与 queries 一一对应）
+            params: 检索参数（传给 batch_search）
+        """
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        primary = [
+            _summary([int(doc["index"]) for doc in per_query], [float(doc["score"]) for doc in per_query])
+            for per_query in results
+        ]
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._entry(collection)["dropped"] += 1
+                return
+            self._pending += 1
+        self.executor.submit(self._compare, collection, list(queries), primary, dict(params))
+
+    def _entry(self, collection: str, store: Optional[Any] = None) -> Dict[str, Any]:
+        """集合的累计统计；候选版本换了之后重新计数"""
+        entry = self._stats.get(collection)
+        if entry is None or (store is not None and entry["store"] is not store):
+            dropped = entry["dropped"] if entry is not None else 0
+            entry = self._stats[collection] = {
+                "store": store,
+                "model": store.model_name if store is not None else None,
+                "source_version": (store.metadata.get("reembedded_from") or {}).get("version") if store is not None else None,
+                "queries": 0,
+                "dropped": dropped,
+                "top1_agreements": 0,
+                "overlap_sum": 0.0,
+                "primary_empty": 0,
+                "candidate_empty": 0,
+                "primary_top_sum": 0.0,
+                "candidate_top_sum": 0.0,
+                "latencies": deque(maxlen=LATENCY_WINDOW),
+                "disagreements": deque(maxlen=RECENT_DISAGREEMENTS),
+            }
+        return entry
+
+    def _compare(self, collection: str, queries: List[str], primary: List[Dict[str, Any]], params: Dict[str, Any]):
+        try:
+            with self.collections.lease_candidate(collection) as store:
+                if store is None:
+                    return
+                source = (store.metadata.get("reembedded_from") or {}).get("version")
+                if source != self.collections.loaded_version(collection):
+                    return
+                start = time.perf_counter()
+                results = store.batch_search(queries, **params)
+                seconds = time.perf_counter() - start
+            with self._lock:
+                entry = self._entry(collection, store)
+                entry["latencies"].append(seconds / max(1, len(queries)))
+                for query, old, per_query in zip(queries, primary, results):
+                    new = _summary([int(doc["index"]) for doc in per_query], [float(doc["score"]) for doc in per_query])
+                    self._record(entry, query, old, new)
+        except Exception as e:
+            logger.warning(f"集合 {collection} 的影子检索失败：{e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    @staticmethod
+    def _record(entry: Dict[str, Any], query: str, old: Dict[str, Any], new: Dict[str, Any]):
+        entry["queries"] += 1
+        old_ids, new_ids = old["ids"], new["ids"]
+        agree = old_ids[:1] == new_ids[:1]
+        entry["top1_agreements"] += agree
+        longest = max(len(old_ids), len(new_ids))
+        entry["overlap_sum"] += len(set(old_ids) & set(new_ids)) / longest if longest else 1.0
+        entry["primary_empty"] += not old_ids
+        entry["candidate_empty"] += not new_ids
+        entry["primary_top_sum"] += old["top_score"] or 0.0
+        entry["candidate_top_sum"] += new["top_score"] or 0.0
+        if not agree:
+            entry["disagreements"].append({"query": query, "current": old, "candidate": new})
+
+    def stats(self, collection: str) -> Optional[Dict[str, Any]]:
+        """集合的比较结果，没有比较过时返回 None"""
+        with self._lock:
+            entry = self._stats.get(collection)
+            if entry is None:
+                return None
+            queries = entry["queries"]
+            latencies = list(entry["latencies"])
+            primary_hits = queries - entry["primary_empty"]
+            candidate_hits = queries - entry["candidate_empty"]
+            return {
+                "model": entry["model"],
+                "source_version": entry["source_version"],
+                "queries": queries,
+                "dropped": entry["dropped"],
+                "pending": self._pending,
+                "top1_agreement": round(entry["top1_agreements"] / queries, 4) if queries else None,
+                "overlap": round(entry["overlap_sum"] / queries, 4) if queries else None,
+                "current_empty_rate": round(entry["primary_empty"] / queries, 4) if queries else None,
+                "candidate_empty_rate": round(entry["candidate_empty"] / queries, 4) if queries else None,
+                # 最高相似度的均值只统计有结果的查询
+                "current_mean_top_score": round(entry["primary_top_sum"] / primary_hits, 4) if primary_hits else None,
+                "candidate_mean_top_score": round(entry["candidate_top_sum"] / candidate_hits, 4) if candidate_hits else None,
+                "candidate_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3) if latencies else None,
+                "candidate_p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3) if latencies else None,
+                "recent_disagreements": list(entry["disagreements"]),
+            }
+
+    def reset(self, collection: str):
+        """清空集合的比较结果（切换或删除候选版本后）"""
+        with self._lock:
+            self._stats.pop(collection, None)
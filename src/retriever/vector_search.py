@@ -1,6 +1,11 @@
 from typing import List, Dict, Any, Optional
+import numpy as np
 from src.config import Config
 from src.vectorstore.embeddings import VectorStore
+from src.vectorstore.collection_manager import CollectionManager, DocumentNotFoundError
+from src.retriever.adaptive import select_adaptive
+from src.retriever.shadow import ShadowComparator
+from src.utils.tracing import span
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,64 +13,189 @@ logger = logging.getLogger(__name__)
 class VectorRetriever:
     """向量检索器，用于检索相关文档"""
     
-    def __init__(self, config: Optional[Config] = None):
+    def __init__(
+        self,
+        config: Optional[Config] = None,
+        vector_store: Optional[VectorStore] = None,
+        collections: Optional[CollectionManager] = None
+    ):
         """初始化向量检索器
         
         Args:
             config: 配置对象，如果为None则创建新的配置对象
+            vector_store: 已加载的向量存储，作为默认集合使用
+            collections: 集合管理器，如果为None则新建（集合按需加载）
         """
         self.config = config or Config()
-        self.vector_store = None
-        self._initialize_vector_store()
+        self.collections = collections or CollectionManager(
+            self.config,
+            model=vector_store.model if vector_store is not None else None
+        )
+        if vector_store is not None:
+            self.collections.add(self.config.DEFAULT_COLLECTION, vector_store)
+        else:
+            self._initialize_vector_store()
+        # 向量模型切换前的影子比较：候选版本在后台重复线上检索
+        self.shadow = ShadowComparator(self.collections, self.config) if self.config.EMBEDDING_SHADOW else None
     
     def _initialize_vector_store(self):
-        """初始化向量存储"""
+        """初始化向量存储：默认集合存在时在启动阶段加载，其他集合在首次使用时加载"""
         try:
-            self.vector_store = VectorStore(self.config.EMBEDDING_MODEL)
-            self.vector_store.load(self.config.VECTOR_DB_PATH)
-            logger.info("向量存储加载成功")
+            if self.collections.exists(self.config.DEFAULT_COLLECTION):
+                self.collections.get(self.config.DEFAULT_COLLECTION)
+                logger.info("向量存储加载成功")
+            else:
+                logger.warning(f"默认集合不存在：{self.config.VECTOR_DB_PATH}，其他集合将在首次使用时加载")
         except Exception as e:
             logger.error(f"向量存储加载失败: {str(e)}")
             raise
     
-    def retrieve(self, query: str, top_k: int = None, min_score: float = None) -> List[Dict[str, Any]]:
+    @property
+    def vector_store(self) -> VectorStore:
+        """默认集合的向量存储"""
+        return self.collections.get(self.config.DEFAULT_COLLECTION)
+    
+    @property
+    def model(self):
+        """EMBEDDING_MODEL 对应的向量模型"""
+        return self.collections.model
+    
+    def embedding_model(self, collection: Optional[str] = None) -> str:
+        """集合当前版本的向量模型名称"""
+        return self.collections.get(collection).model_name
+    
+    def _search_params(self, top_k: Optional[int], min_score: Optional[float], mmr_lambda: Optional[float]) -> Dict[str, Any]:
+        """检索参数，未指定的使用配置中的值"""
+        return {
+            "k": top_k or self.config.TOP_K,
+            "min_score": min_score or self.config.MIN_SIMILARITY_SCORE,
+            "candidate_factor": self.config.CANDIDATE_FACTOR,
+            "max_candidates": self.config.MAX_CANDIDATES,
+            "mmr_lambda": mmr_lambda if mmr_lambda is not None else self.config.MMR_LAMBDA,
+            "mmr_fetch_k": self.config.MMR_FETCH_K
+        }
+    
+    def retrieve(self, query: str, top_k: int = None, min_score: float = None, collection: Optional[str] = None,
+                 include_texts: bool = True, mmr_lambda: Optional[float] = None, adaptive: bool = False) -> List[Dict[str, Any]]:
         """检索相关文档
         
         Args:
             query: 查询文本
             top_k: 返回的文档数量，如果为None则使用配置中的值
             min_score: 最小相似度阈值，如果为None则使用配置中的值
+            collection: 集合名称，如果为None则使用默认集合
+            include_texts: 是否返回文档文本，为False时只返回下标、相似度和 token 数
+            mmr_lambda: MMR 多样性重排的相关度权重（0-1），如果为None则使用配置中的值
+            adaptive: 是否按相似度分布自适应选择文档数（取 ADAPTIVE_FETCH_K 个候选，top_k 不生效）
         
         Returns:
             包含文档内容和相似度分数的字典列表
         """
-        if not self.vector_store:
-            raise RuntimeError("向量存储未初始化")
-        
-        top_k = top_k or self.config.TOP_K
-        min_score = min_score or self.config.MIN_SIMILARITY_SCORE
-        
         try:
-            results = self.vector_store.search(
-                query=query,
-                k=top_k,
-                min_score=min_score
-            )
+            params = self._search_params(self.config.ADAPTIVE_FETCH_K if adaptive else top_k, min_score, mmr_lambda)
+            with span("retrieve"), self.collections.lease(collection) as store:
+                results = store.search(query=query, **params)
+                self._shadow(collection, [query], [results], params)
+                if adaptive:
+                    results = select_adaptive(results, self.config)
             logger.info(f"检索到 {len(results)} 条相关文档")
-            return results
+            return results if include_texts else self._strip_texts([results])[0]
         except Exception as e:
             logger.error(f"检索失败: {str(e)}")
             raise
     
-    def batch_retrieve(self, queries: List[str], top_k: int = None, min_score: float = None) -> List[List[Dict[str, Any]]]:
-        """批量检索相关文档
+    def batch_retrieve(self, queries: List[str], top_k: int = None, min_score: float = None, collection: Optional[str] = None,
+                       include_texts: bool = True, mmr_lambda: Optional[float] = None,
+                       adaptive: bool = False) -> List[List[Dict[str, Any]]]:
+        """批量检索相关文档（所有查询一次批量编码）
         
         Args:
             queries: 查询文本列表
             top_k: 每个查询返回的文档数量
             min_score: 最小相似度阈值
+            collection: 集合名称，如果为None则使用默认集合
+            include_texts: 是否返回文档文本
+            mmr_lambda: MMR 多样性重排的相关度权重
+            adaptive: 是否按相似度分布自适应选择每个查询的文档数
+        
+        Returns:
+            每个查询对应的检索结果列表
+        """
+        try:
+            params = self._search_params(self.config.ADAPTIVE_FETCH_K if adaptive else top_k, min_score, mmr_lambda)
+            with span("retrieve"), self.collections.lease(collection) as store:
+                results = store.batch_search(queries, **params)
+                self._shadow(collection, queries, results, params)
+                if adaptive:
+                    results = [select_adaptive(per_query, self.config) for per_query in results]
+            return results if include_texts else self._strip_texts(results)
+        except Exception as e:
+            logger.error(f"批量检索失败: {str(e)}")
+            raise
+    
+    def _shadow(self, collection: Optional[str], queries: List[str], results: List[List[Dict[str, Any]]], params: Dict[str, Any]):
+        """开启影子比较时把线上检索交给后台与候选版本比较"""
+        if self.shadow is not None:
+            self.shadow.submit(collection or self.config.DEFAULT_COLLECTION, queries, results, params)
+    
+    def encode_queries(self, queries: List[str], collection: Optional[str] = None) -> np.ndarray:
+        """规范化并编码查询，与该集合的检索共用查询向量缓存
+        
+        Returns:
+            归一化的查询向量矩阵 (n, d)，可传给 retrieve_by_vectors
+        """
+        with self.collections.lease(collection) as store:
+            return store.encode_queries(queries)
+    
+    def retrieve_by_vectors(self, query_vectors: np.ndarray, top_k: int = None, min_score: float = None, collection: Optional[str] = None,
+                            include_texts: bool = True, mmr_lambda: Optional[float] = None) -> List[List[Dict[str, Any]]]:
+        """用已编码的查询向量检索（调用方自行编码，向量需已归一化）
+        
+        Args:
+            query_vectors: 查询向量矩阵 (n, d)
+            top_k: 每个查询返回的文档数量
+            min_score: 最小相似度阈值
+            collection: 集合名称，如果为None则使用默认集合
+            include_texts: 是否返回文档文本
+            mmr_lambda: MMR 多样性重排的相关度权重
         
         Returns:
             每个查询对应的检索结果列表
         """
-        return [self.retrieve(query, top_k, min_score) for query in queries] 
\ No newline at end of file
+        params = self._search_params(top_k, min_score, mmr_lambda)
+        with span("retrieve"), self.collections.lease(collection) as store:
+            results = [
+                store.search_by_vector(vector, **params)
+                for vector in np.asarray(query_vectors, dtype=np.float32).reshape(len(query_vectors), -1)
+            ]
+        return results if include_texts else self._strip_texts(results)
+    
+    def get_documents(self, ids: List[int], collection: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按下标获取文档全文
+        
+        Args:
+            ids: 文档下标列表
+            collection: 集合名称，如果为None则使用默认集合
+        
+        Returns:
+            与 ids 顺序一致的文档列表，每项包含 index、text 及可选的 tokens
+        
+        Raises:
+            DocumentNotFoundError: 下标超出集合范围
+        """
+        with self.collections.lease(collection) as store:
+            try:
+                return [store.get_document(int(idx)) for idx in ids]
+            except IndexError as e:
+                raise DocumentNotFoundError(str(e))
+    
+    @staticmethod
+    def _strip_texts(results: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        return [[{key: value for key, value in doc.items() if key != "text"} for doc in per_query] for per_query in results]
+    
+    def describe_collections(self) -> Dict[str, Any]:
+        """可用集合列表及驻留状态"""
+        return {
+            "collections": self.collections.list_collections(),
+            "status": self.collections.status()
+        }
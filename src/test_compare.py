@@ -1,5 +1,5 @@
 from src.rag.pipeline import RAGPipeline
-from src.llm.openai import OpenAILLM
+from src.llm.factory import create_llm
 from src.utils.helpers import save_results
 import json
 import logging
@@ -25,8 +25,8 @@ def main():
     logger = logging.getLogger(__name__)
     
     # 初始化 RAG 系统和普通 LLM
-    rag_pipeline = RAGPipeline()
-    llm = OpenAILLM()
+    llm = create_llm()
+    rag_pipeline = RAGPipeline(llm=llm)
     
     # 测试查询
     test_queries = [
@@ -46,7 +46,7 @@ def test_search():
         raise FileNotFoundError(f"向量索引目录不存在: {config.VECTOR_DB_PATH}")
     
     # 加载向量索引
-    vector_store.load(config.VECTOR_DB_PATH)
+    vector_store.load(config.VECTOR_DB_PATH, allow_legacy=config.ALLOW_LEGACY_INDEX)
     
     # 测试用例
     test_cases = [
@@ -0,0 +1,80 @@
+"""分片索引测试脚本
+
+用 part.jsonl 和哈希编码器（无需模型文件）构建同一份索引的不分片和分片（num_shards=2）两个版本，检查：
+1. 分片索引的检索结果（下标和相似度）与不分片索引一致
+2. 一个分片在 SHARD_TIMEOUT 内未响应时，本次检索跳过该分片，返回其余分片的结果
+3. close() 结束所有分片进程并删除套接字目录
+
+用法::
+
+    python -m src.test_shards
+"""
+from src.vectorstore.embeddings import VectorStore
+from src.benchmark.common import HashingEncoder, load_corpus
+from src.config import Config
+from pathlib import Path
+import os
+import signal
+import tempfile
+
+NUM_SHARDS = 2
+TOP_K = 5
+
+
+def search_rows(store: VectorStore, query: str, k: int):
+    """检索结果的 (下标, 相似度) 列表"""
+    return [(result["index"], round(result["score"], 5)) for result in store.search(query, k=k, min_score=0.0)]
+
+
+def test_shards():
+    config = Config()
+    texts, questions = load_corpus(config.BASE_DIR / "part.jsonl")
+    encoder = HashingEncoder(64)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_dir = Path(tmp) / "plain"
+        sharded_dir = Path(tmp) / "sharded"
+        store = VectorStore("hashing-encoder", model=encoder, citation_fast_path=False)
+        store.create_index(texts)
+        store.save(plain_dir)
+        store.save(sharded_dir, num_shards=NUM_SHARDS)
+
+        plain = VectorStore("hashing-encoder", model=encoder, citation_fast_path=False)
+        plain.load(plain_dir)
+        sharded = VectorStore("hashing-encoder", model=encoder, citation_fast_path=False)
+        sharded.load(sharded_dir)
+        coordinator = sharded.index
+        try:
+            assert coordinator.num_shards == NUM_SHARDS
+            assert list(sharded.texts) == list(plain.texts)
+
+            # 1. 分片检索与不分片检索一致
+            for question in questions:
+                assert search_rows(sharded, question, TOP_K) == search_rows(plain, question, TOP_K), question
+            print(f"分片检索一致：{len(questions)} 条查询，top_k={TOP_K}")
+
+            # 2. 暂停第二个分片进程，检索只返回第一个分片的记录
+            boundary = int(coordinator._offsets[1])
+            coordinator.timeout = 0.2
+            stopped = coordinator._processes[1]
+            os.kill(stopped.pid, signal.SIGSTOP)
+            try:
+                for question in questions[:3]:
+                    rows = search_rows(sharded, question, TOP_K)
+                    expected = [row for row in search_rows(plain, question, len(plain.texts)) if row[0] < boundary][:TOP_K]
+                    assert rows == expected, question
+            finally:
+                os.kill(stopped.pid, signal.SIGCONT)
+            assert coordinator.stats["timeouts"] == 3, coordinator.stats
+            print(f"分片超时跳过：{coordinator.stats}")
+        finally:
+            # 3. close() 结束分片进程并删除套接字目录
+            sharded.close()
+        for process in coordinator._processes:
+            assert process.poll() is not None
+        assert not os.path.exists(coordinator._socket_dir)
+        print("close() 已结束所有分片进程")
+
+
+if __name__ == "__main__":
+    test_shards()
@@ -1,5 +1,5 @@
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 from datetime import datetime
 import json
 import os
@@ -31,28 +31,69 @@ def setup_logging(log_dir: str = "logs", level: int = logging.INFO):
     
     logger.info(f"日志配置完成，日志文件：{log_file}")
 
-def format_retrieval_results(results: List[Dict[str, Any]], include_metadata: bool = False) -> List[Dict[str, Any]]:
+RESPONSE_MODES = ("full", "snippet", "ids")
+
+def make_snippet(text: str, max_chars: int = 120) -> str:
+    """截取文本开头作为摘要，超长时以省略号结尾"""
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + "…"
+
+def format_retrieval_results(
+    results: List[Dict[str, Any]],
+    include_metadata: bool = False,
+    mode: str = "full",
+    snippet_chars: int = 120,
+    start_rank: int = 1
+) -> List[Dict[str, Any]]:
     """格式化检索结果
     
     Args:
         results: 检索结果列表
         include_metadata: 是否包含元数据
+        mode: 返回内容，full 为全文，snippet 为摘要，ids 只返回文档下标和相似度（全文通过 /documents/{id} 获取）
+        snippet_chars: snippet 模式下摘要的最大字符数
+        start_rank: 第一条结果的排名（分页时为偏移量加一）
     
     Returns:
         格式化后的结果列表
     """
+    if mode not in RESPONSE_MODES:
+        raise ValueError(f"不支持的返回模式：{mode}，可选 {', '.join(RESPONSE_MODES)}")
     formatted_results = []
-    for idx, result in enumerate(results, 1):
-        formatted_result = {
-            "rank": idx,
-            "text": result["text"],
-            "score": round(float(result["score"]), 4)
-        }
+    for idx, result in enumerate(results, start_rank):
+        formatted_result = {"rank": idx}
+        if "index" in result:
+            formatted_result["id"] = result["index"]
+        if mode == "full":
+            formatted_result["text"] = result["text"]
+        elif mode == "snippet":
+            formatted_result["snippet"] = make_snippet(result["text"], snippet_chars)
+        formatted_result["score"] = round(float(result["score"]), 4)
         if include_metadata and "metadata" in result:
             formatted_result["metadata"] = result["metadata"]
         formatted_results.append(formatted_result)
     return formatted_results
 
+def dedupe_documents(formatted: List[List[Dict[str, Any]]]) -> Dict[str, str]:
+    """把多组格式化结果中的文本（或摘要）移到按文档下标索引的共享表中
+    
+    批量检索的不同查询常命中同一条文档，去重后每条文本在响应中只出现一次。
+    结果条目原地修改，只保留 id；没有 id 的条目保持不变。
+    
+    Returns:
+        文档表 {文档下标: 文本}
+    """
+    documents = {}
+    for results in formatted:
+        for result in results:
+            if "id" not in result:
+                continue
+            for field in ("text", "snippet"):
+                if field in result:
+                    documents.setdefault(str(result["id"]), result.pop(field))
+    return documents
+
 def save_results(results: List[Dict[str, Any]], output_file: str):
     """保存结果到文件
     
@@ -87,4 +128,73 @@ def load_jsonl(file_path: str) -> List[Dict[str, Any]]:
         return data
     except Exception as e:
         logger.error(f"加载JSONL文件失败：{str(e)}")
-        raise 
\ No newline at end of file
+        raise 
+
+def iter_jsonl(file_path: str) -> Iterator[Dict[str, Any]]:
+    """逐行读取JSONL文件，不把整个文件载入内存
+    
+    空行和末尾写了一半的行（进程中断时可能出现）会被跳过。
+    
+    Args:
+        file_path: JSONL文件路径
+    
+    Yields:
+        每行解析后的数据
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"跳过无法解析的行：{file_path}:{line_no}")
+
+# 向前查找换行符时每次读取的字节数
+_TAIL_CHUNK_SIZE = 64 * 1024
+
+def truncate_partial_line(file_path: str) -> bool:
+    """截掉JSONL文件末尾写了一半的行（进程中断时可能出现），续写前调用
+    
+    Args:
+        file_path: JSONL文件路径
+    
+    Returns:
+        是否截断了内容
+    """
+    if not os.path.exists(file_path):
+        return False
+    with open(file_path, "rb+") as f:
+        # 从文件末尾按块向前查找最后一个换行符，不读入整个文件
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return False
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return False
+        position = end
+        while position > 0:
+            start = max(0, position - _TAIL_CHUNK_SIZE)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return True
+            position = start
+        f.truncate(0)
+    return True
+
+def append_jsonl(records: List[Dict[str, Any]], output_file: str):
+    """追加写入JSONL文件，写完立即落盘
+    
+    Args:
+        records: 数据列表
+        output_file: 输出文件路径
+    """
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    with open(output_file, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
@@ -0,0 +1,88 @@
+from typing import Dict, List, Optional, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# prometheus_client 为可选依赖，未安装时只记录请求内的耗时明细
+try:
+    from prometheus_client import Histogram, generate_latest, CONTENT_TYPE_LATEST
+except ImportError:  # pragma: no cover
+    Histogram = None
+    generate_latest = None
+    CONTENT_TYPE_LATEST = "text/plain"
+
+# RAG 各阶段耗时直方图，桶覆盖从亚毫秒级的向量检索到数十秒的 LLM 调用
+STAGE_LATENCY = Histogram(
+    "rag_stage_latency_seconds",
+    "RAG 流程各阶段耗时（秒）",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+) if Histogram else None
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("rag_trace", default=None)
+
+class Trace:
+    """单个请求内的阶段耗时记录"""
+
+    def __init__(self):
+        self.spans: List[Tuple[str, float]] = []
+
+    def record(self, name: str, seconds: float):
+        self.spans.append((name, seconds))
+
+    def as_dict(self) -> Dict[str, float]:
+        """按阶段汇总耗时（毫秒），同名阶段累加"""
+        timings: Dict[str, float] = {}
+        for name, seconds in self.spans:
+            timings[name] = timings.get(name, 0.0) + seconds * 1000
+        return {name: round(ms, 3) for name, ms in timings.items()}
+
+@contextmanager
+def start_trace():
+    """开始记录当前请求的耗时明细
+
+    Yields:
+        Trace 对象，退出后可通过 as_dict() 读取各阶段耗时
+    """
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+@contextmanager
+def span(name: str):
+    """记录一个阶段的耗时（单调时钟）
+
+    耗时写入 Prometheus 直方图；若当前处于 start_trace 范围内，同时记录到请求的 Trace。
+
+    Args:
+        name: 阶段名称
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if STAGE_LATENCY is not None:
+            STAGE_LATENCY.labels(stage=name).observe(elapsed)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.record(name, elapsed)
+
+def metrics_payload() -> Tuple[bytes, str]:
+    """生成 Prometheus 文本格式的指标
+
+    Returns:
+        (响应内容, Content-Type)
+
+    Raises:
+        RuntimeError: 未安装 prometheus_client
+    """
+    if generate_latest is None:
+        raise RuntimeError("未安装 prometheus_client，无法导出指标")
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,571 @@
+from typing import Any, Dict, Iterator, List, Optional
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+import re
+import threading
+import time
+import logging
+from src.config import Config
+from src.vectorstore import storage
+from src.vectorstore.query_cache import QueryEmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+# 集合名称只允许字母、数字、下划线和连字符，避免路径穿越
+COLLECTION_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_\-]{1,64}$")
+
+class CollectionNotFoundError(KeyError):
+    """集合不存在"""
+
+class DocumentNotFoundError(KeyError):
+    """文档下标超出集合范围"""
+
+class InvalidCollectionNameError(ValueError):
+    """集合名称不合法"""
+
+class CandidateNotFoundError(KeyError):
+    """集合没有候选版本"""
+
+class StaleCandidateError(RuntimeError):
+    """候选版本重新向量化后集合已更新，候选版本的记录与当前版本不一致"""
+
+def _model_bytes(model) -> int:
+    """向量模型参数占用的内存（字节），无法获取参数时为 0"""
+    try:
+        return sum(parameter.numel() * parameter.element_size() for parameter in model.parameters())
+    except AttributeError:
+        return 0
+
+class CollectionManager:
+    """多集合向量存储管理
+
+    每个集合是一个独立的索引包目录：默认集合为 VECTOR_DB_PATH，其他集合位于 COLLECTIONS_DIR/<名称>。
+    集合在首次使用时加载，常驻内存总量超过 COLLECTION_MEMORY_BUDGET_MB 时按最近最少使用淘汰；
+    集合按索引记录的向量模型加载（未记录时使用 EMBEDDING_MODEL），同一模型的集合共用模型实例和查询向量缓存；
+    常驻集合使用的模型计入内存预算，没有常驻、候选或在途集合使用的模型随即释放（如切换向量模型后的旧模型）。
+    集合目录的 CURRENT 指针被入库任务切换后，常驻集合在后台加载新版本并原子替换，加载期间查询继续使用旧版本。
+    查询通过 lease 持有集合；被淘汰或替换的版本在最后一个持有者释放后关闭（释放分片进程）。
+
+    重新向量化任务写入的候选版本（CANDIDATE）按需加载，用于影子比较，不计入内存预算；
+    cutover 把候选版本切换为当前版本。
+    """
+
+    def __init__(self, config: Optional[Config] = None, model: Optional[Any] = None):
+        """初始化集合管理器
+
+        Args:
+            config: 配置对象，如果为None则创建新的配置对象
+            model: EMBEDDING_MODEL 对应的已加载模型，如果为None则在首次使用时加载
+        """
+        self.config = config or Config()
+        self._models: Dict[str, Any] = {self.config.EMBEDDING_MODEL: model} if model is not None else {}
+        self._model_sizes: Dict[str, int] = {self.config.EMBEDDING_MODEL: _model_bytes(model)} if model is not None else {}
+        self._opening: Dict[str, int] = {}  # 模型名称 -> 正在用该模型加载的版本数，加载期间不释放
+        self.query_cache = self._new_query_cache()
+        self._query_caches: Dict[str, Optional[QueryEmbeddingCache]] = {self.config.EMBEDDING_MODEL: self.query_cache}
+        self._candidates: Dict[str, Any] = {}  # 集合名称 -> (候选版本 id, 向量存储)
+        self.memory_budget = self.config.COLLECTION_MEMORY_BUDGET_MB * 2**20
+        self._stores: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._versions: Dict[str, Optional[str]] = {}  # 本管理器从磁盘加载的集合及其版本
+        self._version_checked: Dict[str, float] = {}
+        self._failed_versions: Dict[str, Optional[str]] = {}
+        self._refreshing = set()
+        self._leases: Dict[Any, int] = {}  # 向量存储 -> 在途使用者数
+        self._retired = set()  # 已不再常驻、等待在途使用者释放后关闭的向量存储
+        self.stats = {"hits": 0, "loads": 0, "evictions": 0, "reloads": 0}
+
+    def _new_query_cache(self) -> Optional[QueryEmbeddingCache]:
+        return QueryEmbeddingCache(self.config.QUERY_CACHE_SIZE) if self.config.QUERY_CACHE_SIZE > 0 else None
+
+    @property
+    def model(self):
+        """EMBEDDING_MODEL 对应的向量模型"""
+        return self.model_for(self.config.EMBEDDING_MODEL)
+
+    def model_for(self, model_name: str):
+        """按名称获取向量模型，首次使用时加载，之后由使用该模型的集合共用"""
+        model = self._models.get(model_name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(model_name)
+                if model is None:
+                    from sentence_transformers import SentenceTransformer
+                    logger.info(f"加载向量模型：{model_name}")
+                    model = self._models[model_name] = SentenceTransformer(model_name)
+                    self._model_sizes[model_name] = _model_bytes(model)
+                    self._query_caches.setdefault(model_name, self._new_query_cache())
+        return model
+
+    def _release_models(self):
+        """释放没有集合使用的向量模型（常驻、候选、在途和正在加载的版本都算使用）"""
+        with self._lock:
+            stores = list(self._stores.values()) + [store for _, store in self._candidates.values()]
+            stores += list(self._leases) + list(self._retired)
+            used = {store.model_name for store in stores} | {name for name, count in self._opening.items() if count}
+            for model_name in [name for name in self._models if name not in used]:
+                del self._models[model_name]
+                size = self._model_sizes.pop(model_name, 0)
+                # 默认模型的查询缓存由 self.query_cache 引用，保留
+                if model_name != self.config.EMBEDDING_MODEL:
+                    self._query_caches.pop(model_name, None)
+                logger.info(f"向量模型 {model_name} 已无集合使用，释放（约 {size / 2**20:.1f}MB）")
+
+    def _resident_bytes(self) -> int:
+        """常驻集合及其向量模型的内存（持有 _lock 时调用）；多个集合共用的模型只计一次"""
+        models = {store.model_name for store in self._stores.values()}
+        return sum(self._sizes.values()) + sum(self._model_sizes.get(name, 0) for name in models)
+
+    def path_for(self, name: str) -> Path:
+        """集合名称对应的索引目录
+
+        Raises:
+            InvalidCollectionNameError: 名称不合法
+        """
+        if name == self.config.DEFAULT_COLLECTION:
+            return Path(self.config.VECTOR_DB_PATH)
+        if not COLLECTION_NAME_PATTERN.match(name):
+            raise InvalidCollectionNameError(f"集合名称不合法：{name}")
+        return Path(self.config.COLLECTIONS_DIR) / name
+
+    def exists(self, name: str) -> bool:
+        """集合是否有可加载的索引；旧格式（pickle）索引只在 ALLOW_LEGACY_INDEX 时算作可加载"""
+        path = storage.resolve_version(self.path_for(name))
+        if storage.is_bundle(path) or storage.is_sharded(path):
+            return True
+        return self.config.ALLOW_LEGACY_INDEX and storage.is_legacy_bundle(path)
+
+    def list_collections(self) -> List[str]:
+        """磁盘上所有可加载的集合名称"""
+        names = []
+        if self.exists(self.config.DEFAULT_COLLECTION):
+            names.append(self.config.DEFAULT_COLLECTION)
+        collections_dir = Path(self.config.COLLECTIONS_DIR)
+        if collections_dir.is_dir():
+            names.extend(sorted(
+                path.name for path in collections_dir.iterdir()
+                if COLLECTION_NAME_PATTERN.match(path.name) and self.exists(path.name)
+            ))
+        return names
+
+    def get(self, name: Optional[str] = None):
+        """获取集合，首次使用时加载
+
+        Args:
+            name: 集合名称，为None时使用默认集合
+
+        Returns:
+            集合的向量存储
+
+        Raises:
+            CollectionNotFoundError: 集合不存在
+            InvalidCollectionNameError: 名称不合法
+        """
+        name = name or self.config.DEFAULT_COLLECTION
+        with self._lock:
+            store = self._stores.get(name)
+            if store is not None:
+                self._stores.move_to_end(name)
+                self.stats["hits"] += 1
+        if store is not None:
+            self._check_version(name)
+            return store
+        with self._lock:
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # 同一集合只加载一次，其他集合的查询不受阻塞
+        with load_lock:
+            with self._lock:
+                store = self._stores.get(name)
+                if store is not None:
+                    self._stores.move_to_end(name)
+                    self.stats["hits"] += 1
+                    return store
+            store = self._load(name)
+            self.add(name, store)
+            return store
+
+    @contextmanager
+    def lease(self, name: Optional[str] = None) -> Iterator[Any]:
+        """获取集合并在使用期间持有：期间被淘汰或替换的版本等到释放后再关闭
+
+        Raises:
+            CollectionNotFoundError: 集合不存在
+            InvalidCollectionNameError: 名称不合法
+        """
+        name = name or self.config.DEFAULT_COLLECTION
+        while True:
+            store = self.get(name)
+            with self._lock:
+                # get 返回后可能已被淘汰（并关闭），只持有仍常驻的版本
+                if self._stores.get(name) is store:
+                    self._leases[store] = self._leases.get(store, 0) + 1
+                    break
+        try:
+            yield store
+        finally:
+            self._release(store)
+
+    @contextmanager
+    def lease_candidate(self, name: Optional[str] = None) -> Iterator[Optional[Any]]:
+        """获取并持有集合的候选版本，没有候选版本时为 None；期间被切换或删除的候选版本等到释放后再关闭"""
+        name = name or self.config.DEFAULT_COLLECTION
+        while True:
+            store = self.candidate(name)
+            if store is None:
+                yield None
+                return
+            with self._lock:
+                cached = self._candidates.get(name)
+                if cached is not None and cached[1] is store:
+                    self._leases[store] = self._leases.get(store, 0) + 1
+                    break
+        try:
+            yield store
+        finally:
+            self._release(store)
+
+    def _release(self, store):
+        with self._lock:
+            count = self._leases[store] - 1
+            if count:
+                self._leases[store] = count
+                return
+            del self._leases[store]
+            if store not in self._retired:
+                return
+            self._retired.discard(store)
+        store.close()
+        self._release_models()
+
+    def _retire(self, store) -> bool:
+        """登记不再常驻的版本（持有 _lock 时调用）；没有在途使用者时返回 True，由调用方在锁外关闭"""
+        if self._leases.get(store, 0) > 0:
+            self._retired.add(store)
+            return False
+        return True
+
+    def _load(self, name: str):
+        path = self.path_for(name)
+        if not self.exists(name):
+            if storage.is_legacy_bundle(storage.resolve_version(path)):
+                raise storage.LegacyIndexError(storage.resolve_version(path))
+            raise CollectionNotFoundError(name)
+        version = storage.current_version(path)
+        store = self._open(storage.resolve_version(path) if version is None else path / storage.VERSIONS_DIR / version)
+        with self._lock:
+            self._versions[name] = version
+            self._version_checked[name] = time.monotonic()
+        logger.info(
+            f"集合 {name} 加载完成，约 {store.memory_bytes() / 2**20:.1f}MB，向量模型 {store.model_name}"
+            + (f"，版本 {version}" if version else "")
+        )
+        return store
+
+    def _open(self, version_dir: Path):
+        """用索引记录的向量模型加载一个版本目录"""
+        # 向量模型相关依赖按需导入，只使用远程检索的进程不需要加载
+        from src.vectorstore.embeddings import EMBEDDING_METADATA
+        recorded = storage.read_metadata(version_dir).get(EMBEDDING_METADATA) or {}
+        model_name = recorded.get("model") or self.config.EMBEDDING_MODEL
+        with self._lock:
+            self._opening[model_name] = self._opening.get(model_name, 0) + 1
+        try:
+            store = self._open_with(version_dir, model_name)
+        except Exception:
+            with self._lock:
+                self._opening[model_name] -= 1
+            # 加载失败时模型可能没有其他集合使用
+            self._release_models()
+            raise
+        with self._lock:
+            self._opening[model_name] -= 1
+        return store
+
+    def _open_with(self, version_dir: Path, model_name: str):
+        """用指定的向量模型加载一个版本目录"""
+        from src.vectorstore.embeddings import VectorStore
+        from src.document_processor.normalizer import QueryNormalizer
+        model = self.model_for(model_name)
+        store = VectorStore(
+            model_name,
+            model=model,
+            index_type=self.config.INDEX_TYPE,
+            index_params={
+                "M": self.config.HNSW_M,
+                "ef_search": self.config.HNSW_EF_SEARCH,
+                "nlist": self.config.IVF_NLIST,
+                "nprobe": self.config.IVF_NPROBE
+            },
+            collapse_duplicates=self.config.COLLAPSE_DUPLICATES,
+            query_normalizer=QueryNormalizer(to_simplified=self.config.QUERY_TO_SIMPLIFIED),
+            query_cache=self._query_caches.get(model_name),
+            citation_fast_path=self.config.CITATION_FAST_PATH
+        )
+        store.load(version_dir, verify=self.config.VERIFY_INDEX, allow_legacy=self.config.ALLOW_LEGACY_INDEX)
+        return store
+
+    def loaded_version(self, name: str) -> Optional[str]:
+        """本管理器常驻的集合版本"""
+        with self._lock:
+            return self._versions.get(name)
+
+    def candidate(self, name: Optional[str] = None):
+        """集合的候选版本（重新向量化任务写入），首次使用时加载；没有候选版本时返回 None
+
+        Raises:
+            InvalidCollectionNameError: 名称不合法
+        """
+        name = name or self.config.DEFAULT_COLLECTION
+        path = self.path_for(name)
+        version = storage.candidate_version(path)
+        with self._lock:
+            cached = self._candidates.get(name)
+            load_lock = self._load_locks.setdefault(f"{name}:candidate", threading.Lock())
+        if version is None:
+            self._drop_candidate(name)
+            return None
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        with load_lock:
+            with self._lock:
+                cached = self._candidates.get(name)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            store = self._open(path / storage.VERSIONS_DIR / version)
+            with self._lock:
+                self._candidates[name] = (version, store)
+            logger.info(f"集合 {name} 的候选版本 {version} 加载完成，向量模型 {store.model_name}")
+            return store
+
+    def _drop_candidate(self, name: str):
+        with self._lock:
+            cached = self._candidates.pop(name, None)
+            close = cached is not None and self._retire(cached[1])
+        if close:
+            cached[1].close()
+        self._release_models()
+
+    def embedding_status(self, name: Optional[str] = None) -> Dict[str, Any]:
+        """集合当前版本与候选版本的向量模型、维度和版本 id（只读元数据，不加载集合）
+
+        Raises:
+            CollectionNotFoundError: 集合不存在
+            InvalidCollectionNameError: 名称不合法
+        """
+        from src.vectorstore.embeddings import EMBEDDING_METADATA
+        name = name or self.config.DEFAULT_COLLECTION
+        path = self.path_for(name)
+        if not self.exists(name):
+            raise CollectionNotFoundError(name)
+        current = storage.current_version(path)
+        metadata = storage.read_metadata(storage.resolve_version(path))
+        status = {
+            "collection": name,
+            "current": {"version": current, **(metadata.get(EMBEDDING_METADATA) or {"model": None, "dimension": None})},
+            "candidate": None
+        }
+        candidate = storage.candidate_version(path)
+        if candidate is not None:
+            metadata = storage.read_metadata(path / storage.VERSIONS_DIR / candidate)
+            source = metadata.get("reembedded_from") or {}
+            status["candidate"] = {
+                "version": candidate,
+                **(metadata.get(EMBEDDING_METADATA) or {}),
+                "source_version": source.get("version"),
+                # 候选版本生成后集合又有入库时，两个版本的记录不再一一对应
+                "stale": source.get("version") != current
+            }
+        return status
+
+    def cutover(self, name: Optional[str] = None) -> Dict[str, Any]:
+        """把候选版本切换为集合的当前版本（新向量模型上线）
+
+        本管理器常驻该集合时直接换上已加载的候选版本；其他进程在检查 CURRENT 指针时加载新版本，
+        并按其记录的向量模型编码查询。旧版本按 INGEST_KEEP_VERSIONS 保留，可重新登记为候选版本后切回。
+
+        Returns:
+            切换结果：集合、新旧版本 id 和向量模型
+
+        Raises:
+            CandidateNotFoundError: 没有候选版本
+            StaleCandidateError: 候选版本生成后集合已更新，需要重新向量化
+        """
+        name = name or self.config.DEFAULT_COLLECTION
+        status = self.embedding_status(name)
+        candidate = status["candidate"]
+        if candidate is None:
+            raise CandidateNotFoundError(name)
+        if candidate["stale"]:
+            raise StaleCandidateError(
+                f"候选版本 {candidate['version']} 基于版本 {candidate['source_version']}，"
+                f"集合当前版本已是 {status['current']['version']}，请重新运行重新向量化任务"
+            )
+        # 先加载候选版本，加载失败时不切换
+        store = self.candidate(name)
+        path = self.path_for(name)
+        version = storage.publish_version(path / storage.VERSIONS_DIR / candidate["version"], keep=self.config.INGEST_KEEP_VERSIONS)
+        storage.clear_candidate(path)
+        with self._lock:
+            self._candidates.pop(name, None)
+            resident = name in self._stores
+        if resident:
+            self.add(name, store)
+            with self._lock:
+                self._versions[name] = version
+                self._version_checked[name] = time.monotonic()
+        else:
+            with self._lock:
+                close = self._retire(store)
+            if close:
+                store.close()
+        self._release_models()
+        logger.info(
+            f"集合 {name} 已切换到版本 {version}，向量模型 {status['current']['model']} -> {candidate.get('model')}"
+        )
+        return {
+            "collection": name,
+            "version": version,
+            "previous_version": status["current"]["version"],
+            "model": candidate.get("model"),
+            "previous_model": status["current"]["model"]
+        }
+
+    def discard_candidate(self, name: Optional[str] = None) -> str:
+        """取消并删除候选版本
+
+        Returns:
+            被删除的候选版本 id
+
+        Raises:
+            CandidateNotFoundError: 没有候选版本
+        """
+        name = name or self.config.DEFAULT_COLLECTION
+        version = storage.clear_candidate(self.path_for(name), remove=True)
+        self._drop_candidate(name)
+        if version is None:
+            raise CandidateNotFoundError(name)
+        logger.info(f"集合 {name} 的候选版本 {version} 已删除")
+        return version
+
+    def _check_version(self, name: str):
+        """按 COLLECTION_RELOAD_INTERVAL 检查 CURRENT 指针，版本变化时在后台加载新版本"""
+        now = time.monotonic()
+        with self._lock:
+            if name not in self._versions or name in self._refreshing:
+                return
+            if now - self._version_checked.get(name, 0) < self.config.COLLECTION_RELOAD_INTERVAL:
+                return
+            self._version_checked[name] = now
+            loaded = self._versions[name]
+        version = storage.current_version(self.path_for(name))
+        if version == loaded or version == self._failed_versions.get(name):
+            return
+        with self._lock:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+        threading.Thread(target=self.refresh, args=(name,), name=f"reload-{name}", daemon=True).start()
+
+    def refresh(self, name: str) -> bool:
+        """加载集合的当前版本并替换常驻的旧版本；加载失败时保留旧版本
+
+        Returns:
+            是否完成替换
+        """
+        previous = self._versions.get(name)
+        try:
+            store = self._load(name)
+        except Exception as e:
+            version = storage.current_version(self.path_for(name))
+            with self._lock:
+                self._failed_versions[name] = version
+                self._versions[name] = previous
+            logger.error(f"集合 {name} 的版本 {version} 加载失败，继续使用当前版本：{e}")
+            return False
+        finally:
+            with self._lock:
+                self._refreshing.discard(name)
+        # 旧版本在 add 中退役，在途查询释放后关闭（分片进程随之结束）
+        self.add(name, store)
+        with self._lock:
+            self.stats["reloads"] += 1
+        logger.info(f"集合 {name} 已切换到版本 {self._versions.get(name)}")
+        return True
+
+    def add(self, name: str, store):
+        """登记已加载的集合，并在超出内存预算时淘汰最久未使用的集合"""
+        size = store.memory_bytes()
+        with self._lock:
+            previous = self._stores.get(name)
+            self._stores[name] = store
+            self._stores.move_to_end(name)
+            self._sizes[name] = size
+            self.stats["loads"] += 1
+            retired = [previous] if previous is not None and previous is not store else []
+            retired += self._evict(keep=name)
+            to_close = [old for old in retired if self._retire(old)]
+        for old in to_close:
+            old.close()
+        if retired:
+            self._release_models()
+
+    def _evict(self, keep: str) -> List[Any]:
+        """淘汰最久未使用的集合直到满足内存预算（持有 _lock 时调用），返回被淘汰的向量存储"""
+        # 刚加载的集合即使单独超出预算也保留；正在使用被淘汰集合的查询持有 lease，释放后才关闭
+        evicted = []
+        while self._resident_bytes() > self.memory_budget and len(self._stores) > 1:
+            name = next(iter(self._stores))
+            if name == keep:
+                break
+            evicted.append(self._stores.pop(name))
+            self._versions.pop(name, None)
+            size = self._sizes.pop(name)
+            self.stats["evictions"] += 1
+            logger.info(f"内存预算不足，淘汰集合 {name}（{size / 2**20:.1f}MB）")
+        return evicted
+
+    def evict(self, name: str) -> bool:
+        """主动卸载集合，返回是否曾经驻留；在途查询释放后关闭"""
+        with self._lock:
+            self._sizes.pop(name, None)
+            self._versions.pop(name, None)
+            store = self._stores.pop(name, None)
+            close = store is not None and self._retire(store)
+        if close:
+            store.close()
+        if store is not None:
+            self._release_models()
+        return store is not None
+
+    def status(self) -> Dict[str, Any]:
+        """驻留集合、内存占用和命中统计"""
+        with self._lock:
+            return {
+                "resident": [
+                    {
+                        "name": name,
+                        "documents": len(store.texts),
+                        "memory_mb": round(self._sizes[name] / 2**20, 2),
+                        "version": self._versions.get(name),
+                        "model": store.model_name
+                    }
+                    for name, store in self._stores.items()
+                ],
+                "candidates": [
+                    {"name": name, "version": version, "model": store.model_name}
+                    for name, (version, store) in self._candidates.items()
+                ],
+                "models": [
+                    {"name": model_name, "memory_mb": round(self._model_sizes.get(model_name, 0) / 2**20, 2)}
+                    for model_name in self._models
+                ],
+                # 常驻集合及其向量模型，按内存预算计
+                "memory_mb": round(self._resident_bytes() / 2**20, 2),
+                "memory_budget_mb": self.config.COLLECTION_MEMORY_BUDGET_MB,
+                "query_cache": self.query_cache.stats() if self.query_cache is not None else None,
+                **self.stats
+            }
@@ -1,111 +1,512 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Callable
+import logging
 import numpy as np
 from pathlib import Path
-import faiss
 from sentence_transformers import SentenceTransformer
-import pickle
 from tqdm import tqdm
-from src.document_processor.loader import DocumentLoader
+from src.document_processor.dedup import MinHasher, SIGNATURE_ARRAY, SOURCE_INDEX_ARRAY
+from src.document_processor.citations import CitationIndex, CITATION_ARRAY, build_citation_keys
+from src.document_processor.normalizer import QueryNormalizer
+from src.vectorstore import storage
+from src.vectorstore.faiss_index import build_faiss_index
+from src.vectorstore.mmr import mmr_select
+from src.vectorstore.query_cache import QueryEmbeddingCache
+from src.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# 索引元数据中记录向量模型和维度的键，加载时据此检查与当前模型是否一致
+EMBEDDING_METADATA = "embedding"
+# 索引元数据中记录文档规范化参数的键，加载时查询按同样的参数规范化
+NORMALIZER_METADATA = "normalizer"
+
+class EmbeddingModelMismatchError(ValueError):
+    """索引的向量模型或维度与加载它的模型不一致"""
 
 class VectorStore:
-    def __init__(self, model_name: str):
-        print(f"正在加载模型: {model_name}")
-        self.model = SentenceTransformer(model_name)
+    def __init__(
+        self,
+        model_name: str,
+        model: Optional[Any] = None,
+        index_type: str = "flat",
+        index_params: Optional[Dict[str, Any]] = None,
+        collapse_duplicates: bool = True,
+        query_normalizer: Optional[QueryNormalizer] = None,
+        query_cache: Optional[QueryEmbeddingCache] = None,
+        citation_fast_path: bool = True
+    ):
+        """初始化向量存储
+        
+        Args:
+            model_name: 向量模型名称
+            model: 已加载的模型（需提供与 SentenceTransformer 相同的 encode 接口），为None时按名称加载
+            index_type: 索引类型，见 build_faiss_index
+            index_params: 索引参数，见 build_faiss_index
+            collapse_duplicates: 索引带 MinHash 签名时，是否在检索结果中折叠近重复文本
+            query_normalizer: 查询规范化器，为None时使用默认参数的 QueryNormalizer；
+                文档编码前按同样的参数规范化（保留句末标点），加载索引时改用索引记录的参数
+            query_cache: 以规范化查询为键的查询向量缓存，为None时不缓存
+            citation_fast_path: 索引带法条引用键时，法条引用查询是否直接查表返回（不做向量检索）
+        """
+        if model is None:
+            print(f"正在加载模型: {model_name}")
+            model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self.model = model
+        self.index_type = index_type
+        self.index_params = index_params or {}
         self.index = None
         self.texts = []
+        self.vectors = None
+        self.metadata = {}
+        self.token_counts = None  # 每条文本的 LLM token 数，入库时预计算
+        self.signatures = None  # 每条文本的 MinHash 签名，入库去重时计算
+        self.source_index = None  # 每条记录对应的知识库位置，入库去重时记录
+        self.citation_keys = None  # 每条记录引用的法条键，入库时解析
+        self.citations = None  # 法条引用到记录下标的哈希表
+        self.citation_fast_path = citation_fast_path
+        self.collapse_duplicates = collapse_duplicates
+        self._hasher = None
+        self.query_normalizer = query_normalizer or QueryNormalizer()
+        self.document_normalizer = self._document_normalizer(self.query_normalizer)
+        self.query_cache = query_cache
+    
+    @staticmethod
+    def _document_normalizer(query_normalizer: QueryNormalizer) -> QueryNormalizer:
+        """与查询规范化参数相同、但保留句末标点的文档规范化器"""
+        return QueryNormalizer(
+            to_simplified=query_normalizer.to_simplified,
+            strip_trailing=False,
+            lowercase=query_normalizer.lowercase
+        )
     
-    def encode_texts(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
-        """将文本批量编码为向量"""
+    def normalizer_params(self) -> Optional[Dict[str, Any]]:
+        """文档规范化参数（随 save 写入索引元数据），文档未做规范化时为None"""
+        if self.document_normalizer is None:
+            return None
+        return {
+            "to_simplified": self.document_normalizer.to_simplified,
+            "lowercase": self.document_normalizer.lowercase
+        }
+    
+    def use_normalizer(self, params: Optional[Dict[str, Any]]):
+        """按索引记录的规范化参数设置查询和文档规范化器
+        
+        Args:
+            params: normalizer_params 的返回值；为None（旧索引的文档未做规范化）时文档保持原样编码，
+                查询规范化器不变
+        """
+        if params is None:
+            self.document_normalizer = None
+            return
+        self.query_normalizer = QueryNormalizer(**params)
+        self.document_normalizer = self._document_normalizer(self.query_normalizer)
+    
+    def encode_texts(
+        self,
+        texts: List[str],
+        batch_size: int = 32,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> np.ndarray:
+        """将文本批量编码为向量（编码前按文档规范化器规范化，保存的文本不变）
+        
+        Args:
+            texts: 文本列表
+            batch_size: 每批编码的文本数
+            progress: 每批完成后以已编码条数调用，用于进度上报
+        """
         embeddings = []
         for i in tqdm(range(0, len(texts), batch_size), desc="文本向量化"):
             batch = texts[i:i + batch_size]
+            if self.document_normalizer is not None:
+                batch = [self.document_normalizer(text) for text in batch]
             batch_embeddings = self.model.encode(batch, normalize_embeddings=True)  # 添加向量归一化
             embeddings.append(batch_embeddings)
+            if progress is not None:
+                progress(i + len(batch))
+        if not embeddings:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
         return np.vstack(embeddings)
     
-    def create_index(self, texts: List[str]):
-        """创建新的向量索引"""
+    def create_index(self, texts: List[str], token_counts: Optional[np.ndarray] = None):
+        """创建新的向量索引
+        
+        Args:
+            texts: 文本列表
+            token_counts: 每条文本的 LLM token 数，用于提示词预算，可选
+        """
         print(f"开始处理 {len(texts)} 条文本...")
         self.texts = texts
+        self.token_counts = token_counts
         
         # 向量化文本
-        embeddings = self.encode_texts(texts)
-        dimension = embeddings.shape[1]
+        self.vectors = self.encode_texts(texts).astype('float32')
+        self._build_index()
+        self.index_citations()
         
-        # 创建FAISS索引（使用余弦相似度）
-        self.index = faiss.IndexFlatIP(dimension)  # 内积用于计算余弦相似度
-        self.index.add(embeddings.astype('float32'))
+        print(f"向量索引创建完成，维度: {self.vectors.shape[1]}")
+    
+    def index_citations(self, progress: Optional[Callable[[int, int], None]] = None):
+        """解析每条文本法律依据中的法条引用，建立法条引用索引（随 save 保存）
         
-        print(f"向量索引创建完成，维度: {dimension}")
+        Args:
+            progress: 进度回调 progress(已处理条数, 总条数)
+        """
+        self.citation_keys, self.metadata["citations"] = build_citation_keys(self.texts, progress)
+        self.citations = CitationIndex(self.citation_keys, self.metadata["citations"]["laws"])
     
-    def save(self, save_dir: Path):
-        """保存向量索引和原始文本"""
-        save_dir.mkdir(parents=True, exist_ok=True)
+    def embedding_identity(self) -> Dict[str, Any]:
+        """向量模型名称和向量维度（随 save 写入索引元数据）"""
+        if self.vectors is not None:
+            dimension = int(self.vectors.shape[1])
+        else:
+            dimension = self.model.get_sentence_embedding_dimension()
+        return {"model": self.model_name, "dimension": dimension}
+    
+    def _check_embedding(self, dimension: int):
+        """检查索引记录的向量模型和维度与当前模型一致，不一致时拒绝加载
         
-        # 保存FAISS索引
-        faiss.write_index(self.index, str(save_dir / "index.faiss"))
+        Raises:
+            EmbeddingModelMismatchError: 模型名称或维度不一致
+        """
+        recorded = self.metadata.get(EMBEDDING_METADATA)
+        if recorded is None:
+            logger.warning(f"索引未记录向量模型，无法确认与 {self.model_name} 一致，重新入库后会记录")
+        elif recorded.get("model") != self.model_name:
+            raise EmbeddingModelMismatchError(
+                f"索引由向量模型 {recorded.get('model')} 构建，与当前模型 {self.model_name} 不一致"
+            )
+        expected = self.model.get_sentence_embedding_dimension()
+        if expected is not None and int(dimension) != int(expected):
+            raise EmbeddingModelMismatchError(
+                f"索引向量维度 ({dimension}) 与模型 {self.model_name} 的维度 ({expected}) 不一致"
+            )
+    
+    def _build_index(self):
+        """根据向量矩阵构建FAISS索引（内积，向量已归一化即为余弦相似度）
         
-        # 保存原始文本
-        with open(save_dir / "texts.pkl", "wb") as f:
-            pickle.dump(self.texts, f)
+        FAISS 把向量复制进索引自己的内存，内存映射的向量不再被检索访问；这一份副本的耗时和内存
+        在 src.benchmark.storage 中与索引包加载分开统计。
+        """
+        self.index = build_faiss_index(self.vectors, self.index_type, self.index_params)
+    
+    def save(self, save_dir: Path, num_shards: int = 1):
+        """保存向量、原始文本和元数据（二进制索引包格式，见 storage 模块）
         
+        Args:
+            save_dir: 保存目录
+            num_shards: 分片数，大于 1 时按连续区间切分保存为分片索引
+        """
+        arrays = {}
+        if self.token_counts is not None:
+            arrays["token_counts"] = np.asarray(self.token_counts, dtype=np.uint32)
+        if self.signatures is not None:
+            arrays[SIGNATURE_ARRAY] = np.asarray(self.signatures, dtype=np.uint32)
+        if self.source_index is not None:
+            arrays[SOURCE_INDEX_ARRAY] = np.asarray(self.source_index, dtype=np.uint32)
+        if self.citation_keys is not None:
+            arrays[CITATION_ARRAY] = np.asarray(self.citation_keys, dtype=np.int64)
+        self.metadata[EMBEDDING_METADATA] = self.embedding_identity()
+        self.metadata.pop(NORMALIZER_METADATA, None)
+        if self.document_normalizer is not None:
+            self.metadata[NORMALIZER_METADATA] = self.normalizer_params()
+        if num_shards > 1:
+            storage.save_sharded(save_dir, self.vectors, self.texts, num_shards, metadata=self.metadata, arrays=arrays)
+        else:
+            storage.save_bundle(save_dir, self.vectors, self.texts, metadata=self.metadata, arrays=arrays)
         print(f"索引和文本已保存到: {save_dir}")
     
-    def load(self, save_dir: Path):
-        """加载已存在的向量索引和原始文本"""
-        print(f"从 {save_dir} 加载索引和文本...")
+    def load(self, save_dir: Path, verify: bool = False, allow_legacy: bool = False):
+        """加载已存在的向量索引和原始文本
         
-        # 加载FAISS索引
-        self.index = faiss.read_index(str(save_dir / "index.faiss"))
+        Args:
+            save_dir: 索引目录（带 CURRENT 指针时加载其指向的版本）
+            verify: 是否校验索引包文件的校验和（需完整读取文件，默认不校验）
+            allow_legacy: 是否加载旧格式（pickle）索引，仅用于本机生成的可信文件
         
-        # 加载原始文本
-        with open(save_dir / "texts.pkl", "rb") as f:
-            self.texts = pickle.load(f)
+        Raises:
+            storage.LegacyIndexError: 目录中只有旧格式索引且未允许加载
+        """
+        save_dir = storage.resolve_version(save_dir)
+        print(f"从 {save_dir} 加载索引和文本...")
+        
+        if storage.is_sharded(save_dir):
+            # 分片索引：向量由各分片进程加载和检索，本进程只保留文本和 token 数
+            from src.vectorstore.shards import ShardCoordinator
+            manifest = storage.read_shard_manifest(save_dir)
+            self.metadata = dict(manifest.get("metadata", {}))
+            self._check_embedding(manifest["dimension"])
+            self.index = ShardCoordinator(save_dir, verify=verify)
+            self.vectors = None
+            self.texts = self.index.texts
+            self.metadata = self.index.metadata
+            self._load_arrays(self.index.arrays)
+            self._load_normalizer()
+            print(f"加载完成，共有 {len(self.texts)} 条文本，{self.index.num_shards} 个分片")
+            return
+        elif storage.is_bundle(save_dir):
+            bundle = storage.load_bundle(save_dir, verify=verify)
+            self.vectors = bundle.vectors
+            self.texts = bundle.texts
+            self.metadata = bundle.metadata
+            self._check_embedding(bundle.vectors.shape[1])
+            self._load_arrays(bundle.arrays)
+        elif storage.is_legacy_bundle(save_dir):
+            # 旧格式依赖 pickle，只在显式允许时加载本机生成的可信文件
+            if not allow_legacy:
+                raise storage.LegacyIndexError(save_dir)
+            logger.warning(f"{save_dir} 是旧格式索引 (texts.pkl)，请运行 python src/convert_index.py 转换为新格式")
+            self.vectors, self.texts = storage.load_legacy_bundle(save_dir)
+            self.metadata = {}
+            self._check_embedding(self.vectors.shape[1])
+            self._load_arrays({})
+        else:
+            raise FileNotFoundError(f"{save_dir} 中没有可加载的向量索引")
         
+        self._load_normalizer()
+        self._build_index()
         print(f"加载完成，共有 {len(self.texts)} 条文本")
     
+    def _load_normalizer(self):
+        """查询按索引记录的文档规范化参数规范化，两边的写法保持一致"""
+        recorded = self.metadata.get(NORMALIZER_METADATA)
+        if recorded is None:
+            logger.warning("索引文档编码前未做规范化，查询与文档的写法（标点、繁简体、大小写）可能不一致，重新入库后会统一")
+        self.use_normalizer(recorded)
+    
+    def _load_arrays(self, arrays: Dict[str, np.ndarray]):
+        """读取逐条记录数组；索引带去重签名时按入库参数重建 MinHasher，带法条引用键时建立引用索引"""
+        self.token_counts = arrays.get("token_counts")
+        self.signatures = arrays.get(SIGNATURE_ARRAY)
+        self.source_index = arrays.get(SOURCE_INDEX_ARRAY)
+        self._hasher = None
+        if self.signatures is not None and "dedup" in self.metadata:
+            self._hasher = MinHasher.from_metadata(self.metadata["dedup"])
+        self.citation_keys = arrays.get(CITATION_ARRAY)
+        self.citations = None
+        if self.citation_keys is not None and "citations" in self.metadata:
+            self.citations = CitationIndex(self.citation_keys, self.metadata["citations"]["laws"])
+    
+    def memory_bytes(self) -> int:
+        """估算常驻内存（字节）：索引中的向量副本、HNSW 邻接表、文本和 token 数数组
+        
+        分片索引的向量在分片进程中，不计入本进程。
+        """
+        total = 0
+        if self.vectors is not None:
+            total += self.vectors.nbytes
+            if self.index_type == "hnsw":
+                total += len(self.vectors) * int(self.index_params.get("M", 32)) * 2 * 4
+        total += getattr(self.texts, "nbytes", None) or sum(len(text.encode("utf-8")) for text in self.texts)
+        for array in (self.token_counts, self.signatures, self.source_index, self.citation_keys):
+            if array is not None:
+                total += array.nbytes
+        return total
+    
+    def close(self):
+        """释放索引占用的外部资源（分片进程）"""
+        if hasattr(self.index, "close"):
+            self.index.close()
+    
     def enhance_query(self, query: str) -> str:
-        """增强查询文本"""
-        # 预处理查询文本
-        query = DocumentLoader.preprocess_text(query)
-        return query
+        """增强查询文本：规范化为标准形式（全角/半角、标点、繁简体、空白、句末标点）"""
+        return self.query_normalizer(query)
+    
+    def encode_query(self, query: str) -> np.ndarray:
+        """预处理并编码查询文本，返回归一化的一维 float32 向量"""
+        return self.encode_queries([query])[0]
     
-    def search(self, query: str, k: int = 3, min_score: float = 0.5) -> List[Dict[str, Any]]:
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """批量预处理并编码查询文本，返回 (n, d) 的归一化 float32 矩阵
+        
+        规范形式相同的查询只编码一次，已缓存的查询不再编码。
+        """
+        with span("query_enhance"):
+            enhanced = [self.enhance_query(query) for query in queries]
+        vectors: Dict[str, np.ndarray] = {}
+        missing = []
+        for query in dict.fromkeys(enhanced):
+            vector = self.query_cache.get(query) if self.query_cache is not None else None
+            if vector is None:
+                missing.append(query)
+            else:
+                vectors[query] = vector
+        if missing:
+            with span("embedding_encode"):
+                encoded = np.asarray(self.model.encode(missing, normalize_embeddings=True), dtype=np.float32)
+            for query, vector in zip(missing, encoded.reshape(len(missing), -1)):
+                vectors[query] = vector
+                if self.query_cache is not None:
+                    self.query_cache.put(query, vector)
+        if not enhanced:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.stack([vectors[query] for query in enhanced])
+    
+    def get_document(self, idx: int) -> Dict[str, Any]:
+        """按下标获取文档文本（及 token 数）
+        
+        Raises:
+            IndexError: 下标超出范围
+        """
+        if not 0 <= idx < len(self.texts):
+            raise IndexError(f"文档下标越界：{idx}")
+        document = {"index": int(idx), "text": self.texts[idx]}
+        if self.token_counts is not None:
+            document["tokens"] = int(self.token_counts[idx])
+        return document
+    
+    def search(
+        self,
+        query: str,
+        k: int = 3,
+        min_score: float = 0.5,
+        candidate_factor: int = 3,
+        max_candidates: Optional[int] = 10,
+        mmr_lambda: Optional[float] = None,
+        mmr_fetch_k: int = 50
+    ) -> List[Dict[str, Any]]:
         """搜索最相似的文档
         
         Args:
             query: 查询文本
             k: 返回的结果数量
             min_score: 最小相似度阈值，低于此值的结果将被过滤
+            candidate_factor: 候选数为 k 的倍数
+            max_candidates: 候选数上限，None 表示不限制
+            mmr_lambda: 设置时用 MMR 从候选中选出多样化的 k 个（见 mmr_select），None 表示按相似度排序
+            mmr_fetch_k: MMR 的候选数（不受 max_candidates 限制）
         
         Returns:
-            包含文本内容和相似度分数的字典列表
+            包含文本内容和相似度分数的字典列表；法条引用查询直接命中时相似度为 1.0
         """
-        # 增强查询
-        enhanced_query = self.enhance_query(query)
+        rows = self.match_citation(query)
+        if rows is not None:
+            return self.search_by_citation(rows, k, candidate_factor, max_candidates, mmr_lambda, mmr_fetch_k)
+        return self.search_by_vector(
+            self.encode_query(query), k, min_score, candidate_factor, max_candidates, mmr_lambda, mmr_fetch_k
+        )
+    
+    def batch_search(
+        self,
+        queries: List[str],
+        k: int = 3,
+        min_score: float = 0.5,
+        candidate_factor: int = 3,
+        max_candidates: Optional[int] = 10,
+        mmr_lambda: Optional[float] = None,
+        mmr_fetch_k: int = 50
+    ) -> List[List[Dict[str, Any]]]:
+        """批量检索：法条引用查询直接查表，其余查询一次编码（参数同 search）"""
+        if not queries:
+            return []
+        matched = [self.match_citation(query) for query in queries]
+        dense = [query for query, rows in zip(queries, matched) if rows is None]
+        query_vectors = iter(self.encode_queries(dense) if dense else [])
+        return [
+            self.search_by_vector(next(query_vectors), k, min_score, candidate_factor, max_candidates, mmr_lambda, mmr_fetch_k)
+            if rows is None else
+            self.search_by_citation(rows, k, candidate_factor, max_candidates, mmr_lambda, mmr_fetch_k)
+            for rows in matched
+        ]
+    
+    def match_citation(self, query: str) -> Optional[np.ndarray]:
+        """查询是索引中已收录法条的引用时返回引用该条的记录下标（按该条在法律依据中的位置排序），否则返回 None"""
+        if not self.citation_fast_path or self.citations is None:
+            return None
+        # 不含「条」（或繁体「條」）的查询不是法条引用，无需规范化
+        if "条" not in query and "條" not in query:
+            return None
+        with span("citation_lookup"):
+            return self.citations.match(self.enhance_query(query))
+    
+    def get_vectors(self, ids: np.ndarray) -> np.ndarray:
+        """按下标取回归一化向量 (n, d)；分片索引从各分片进程取回"""
+        ids = np.asarray(ids, dtype=np.int64)
+        if self.vectors is not None:
+            return np.asarray(self.vectors[ids], dtype=np.float32)
+        return self.index.reconstruct_batch(ids)
+    
+    def search_by_vector(
+        self,
+        query_vector: np.ndarray,
+        k: int = 3,
+        min_score: float = 0.5,
+        candidate_factor: int = 3,
+        max_candidates: Optional[int] = 10,
+        mmr_lambda: Optional[float] = None,
+        mmr_fetch_k: int = 50
+    ) -> List[Dict[str, Any]]:
+        """用已编码的查询向量检索（参数同 search）"""
+        k_candidates = self._candidate_count(k, candidate_factor, max_candidates, mmr_lambda, mmr_fetch_k)
+        with span("index_search"):
+            distances, indices = self.index.search(query_vector.reshape(1, -1).astype('float32'), k_candidates)
         
-        # 编码查询文本
-        query_vector = self.model.encode([enhanced_query], normalize_embeddings=True)
-        query_vector = np.squeeze(query_vector)  # 移除多余的维度
+        # 先只保留下标和相似度，后处理确定最终结果后再读取文本
+        # 由于使用内积，距离就是余弦相似度（向量已归一化）；近似索引候选不足时下标为 -1
+        candidates = [
+            (float(dist), int(idx))
+            for dist, idx in zip(distances[0], indices[0])
+            if idx >= 0 and dist >= min_score
+        ]
+        candidates.sort(key=lambda pair: pair[0], reverse=True)
+        return self._select(candidates, k, mmr_lambda)
+    
+    def search_by_citation(
+        self,
+        rows: np.ndarray,
+        k: int = 3,
+        candidate_factor: int = 3,
+        max_candidates: Optional[int] = 10,
+        mmr_lambda: Optional[float] = None,
+        mmr_fetch_k: int = 50
+    ) -> List[Dict[str, Any]]:
+        """法条引用命中的记录作为候选（相似度记为 1.0），后处理与向量检索相同"""
+        k_candidates = self._candidate_count(k, candidate_factor, max_candidates, mmr_lambda, mmr_fetch_k)
+        return self._select([(1.0, int(idx)) for idx in rows[:k_candidates]], k, mmr_lambda)
+    
+    @staticmethod
+    def _candidate_count(k: int, candidate_factor: int, max_candidates: Optional[int],
+                         mmr_lambda: Optional[float], mmr_fetch_k: int) -> int:
+        """获取更多候选结果用于后处理"""
+        k_candidates = k * candidate_factor
+        if max_candidates:
+            k_candidates = min(k_candidates, max_candidates)
+        # 上限只限制额外的候选，不截断调用方要求的 k 个结果
+        k_candidates = max(k_candidates, k, 1)
+        if mmr_lambda is not None:
+            k_candidates = max(k_candidates, mmr_fetch_k)
+        return k_candidates
+    
+    def _select(self, candidates: List[Tuple[float, int]], k: int, mmr_lambda: Optional[float]) -> List[Dict[str, Any]]:
+        """候选 (相似度, 下标) 按相似度降序：折叠近重复、可选 MMR 重排后取前 k 个并读取文本"""
+        if self.collapse_duplicates and self._hasher is not None and len(candidates) > 1:
+            # 折叠近重复文本，空出的名额由后续候选补上
+            with span("collapse_duplicates"):
+                keep = self._hasher.collapse(self.signatures[[idx for _, idx in candidates]])
+                candidates = [pair for pair, kept in zip(candidates, keep) if kept]
         
-        # 获取更多候选结果用于后处理
-        k_candidates = min(k * 3, 10)
-        distances, indices = self.index.search(query_vector.reshape(1, -1).astype('float32'), k_candidates)
+        if mmr_lambda is not None and len(candidates) > k:
+            with span("mmr_rerank"):
+                candidates = self._mmr(candidates, k, mmr_lambda)
         
-        # 处理结果
         results = []
-        for dist, idx in zip(distances[0], indices[0]):
-            # 由于使用内积，距离就是余弦相似度（向量已归一化）
-            score = float(dist)
-            
-            if score >= min_score:
-                results.append({
-                    "text": self.texts[idx],
-                    "score": score,
-                    "index": int(idx)
-                })
-        
-        # 按相似度排序并返回前k个结果
-        results = sorted(results, key=lambda x: x['score'], reverse=True)[:k]
-        
-        return results 
\ No newline at end of file
+        for score, idx in candidates[:k]:
+            result = {
+                "text": self.texts[idx],
+                "score": score,
+                "index": idx
+            }
+            if self.token_counts is not None:
+                result["tokens"] = int(self.token_counts[idx])
+            results.append(result)
+        return results
+    
+    def _mmr(self, candidates: List[Tuple[float, int]], k: int, mmr_lambda: float) -> List[Tuple[float, int]]:
+        """MMR 重排；分片不可用而取不到候选向量时退回按相似度排序"""
+        try:
+            vectors = self.get_vectors([idx for _, idx in candidates])
+        except RuntimeError as e:
+            logger.warning(f"MMR 重排跳过：{e}")
+            return candidates
+        selected = mmr_select(np.asarray([score for score, _ in candidates]), vectors, k, mmr_lambda)
+        return [candidates[i] for i in selected]
@@ -0,0 +1,38 @@
+from typing import Any, Dict, Optional
+import numpy as np
+import faiss
+
+# 不依赖向量模型，分片进程只需导入本模块即可构建索引
+INDEX_TYPES = ("flat", "hnsw", "ivf")
+
+def build_faiss_index(vectors: np.ndarray, index_type: str = "flat", params: Optional[Dict[str, Any]] = None):
+    """按类型构建内积（余弦相似度）索引
+    
+    Args:
+        vectors: 归一化后的 float32 向量矩阵
+        index_type: flat（精确检索）、hnsw 或 ivf（近似检索）
+        params: 索引参数：hnsw 支持 M、ef_construction、ef_search；ivf 支持 nlist、nprobe
+    
+    Returns:
+        已添加向量的 FAISS 索引
+    """
+    params = params or {}
+    dimension = vectors.shape[1]
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dimension)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, int(params.get("M", 32)), faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = int(params.get("ef_construction", 200))
+        index.hnsw.efSearch = int(params.get("ef_search", 64))
+    elif index_type == "ivf":
+        # 聚类中心数默认取 4*sqrt(N)，且每个中心至少有约 39 个训练样本（FAISS 的建议下限）
+        nlist = int(params.get("nlist") or 4 * np.sqrt(len(vectors)))
+        nlist = max(1, min(nlist, len(vectors) // 39))
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.nprobe = min(int(params.get("nprobe", 8)), nlist)
+    else:
+        raise ValueError(f"未知的索引类型：{index_type}，可选值：{', '.join(INDEX_TYPES)}")
+    index.add(vectors)
+    return index
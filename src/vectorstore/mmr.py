@@ -0,0 +1,41 @@
+"""最大边际相关性（MMR）重排
+
+在候选结果中逐个选取 λ·相关度 − (1−λ)·与已选结果的最大相似度 最高的文档，
+使 top-k 既与查询相关、彼此又不重复引用同一内容。候选向量之间的相似度矩阵一次性计算。
+"""
+from typing import List
+import numpy as np
+
+
+def mmr_select(relevance: np.ndarray, vectors: np.ndarray, k: int, lambda_: float = 0.5) -> List[int]:
+    """用 MMR 从候选中选出 k 个
+
+    Args:
+        relevance: (m,) 候选与查询的相似度
+        vectors: (m, d) 候选的归一化向量
+        k: 选取数量
+        lambda_: 相关度权重，1 等价于按相似度排序，越小越偏向多样性
+
+    Returns:
+        选中候选在输入中的位置，按选取顺序排列
+    """
+    count = len(relevance)
+    if count == 0 or k <= 0:
+        return []
+    relevance = np.asarray(relevance, dtype=np.float32)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    similarity = vectors @ vectors.T
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    available = np.ones(count, dtype=bool)
+    available[first] = False
+    max_similarity = similarity[first].copy()
+    for _ in range(min(k, count) - 1):
+        scores = lambda_ * relevance - (1 - lambda_) * max_similarity
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        np.maximum(max_similarity, similarity[pick], out=max_similarity)
+    return selected
@@ -0,0 +1,61 @@
+"""查询向量缓存
+
+以规范化后的查询为键缓存查询向量（LRU），命中时跳过向量模型编码。
+CollectionManager 的所有集合共用同一个向量模型，因此也共用同一个缓存。
+"""
+from typing import Any, Dict, Optional
+from collections import OrderedDict
+import threading
+import numpy as np
+
+
+class QueryEmbeddingCache:
+    """线程安全的 LRU 查询向量缓存"""
+
+    def __init__(self, max_size: int = 1024):
+        """初始化
+
+        Args:
+            max_size: 最多缓存的查询条数
+        """
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(query)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(query)
+            self.hits += 1
+            return vector
+
+    def put(self, query: str, vector: np.ndarray):
+        # 缓存的向量被多个请求共享，设为只读
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        with self._lock:
+            self._entries[query] = vector
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """条数与命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None
+            }
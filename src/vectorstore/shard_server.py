@@ -0,0 +1,133 @@
+"""分片检索进程：加载一个分片索引包，通过本地 Unix 套接字提供向量检索
+
+由 ShardCoordinator 以子进程方式启动，也可以单独运行::
+
+    RAG_SHARD_AUTHKEY=<hex> python -m src.vectorstore.shard_server --dir data/vectors/faiss_index/shard_000 \
+        --address /tmp/rag-shards/shard_000.sock
+
+请求与响应均为元组（multiprocessing.connection，带 authkey 认证）：
+    ("search", 查询向量 float32 (nq, d), k)  ->  ("ok", 相似度 (nq, k), 全局下标 (nq, k))，不足 k 个时下标为 -1
+    ("vectors", 分片内下标 (n,))             ->  ("ok", 向量 float32 (n, d))
+    ("ping",)                               ->  ("ok", 分片记录数)
+出错时返回 ("error", 错误信息)。
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from multiprocessing.connection import Listener
+
+import faiss
+import numpy as np
+
+from src.config import Config
+from src.vectorstore import storage
+from src.vectorstore.faiss_index import build_faiss_index
+
+logger = logging.getLogger(__name__)
+
+AUTHKEY_ENV = "RAG_SHARD_AUTHKEY"
+
+
+class ShardServer:
+    """单个分片的检索服务"""
+
+    def __init__(self, shard_dir, index_type: str = "flat", index_params=None, verify: bool = True):
+        bundle = storage.load_bundle(shard_dir, verify=verify)
+        self.offset = int(bundle.metadata.get("shard", {}).get("offset", 0))
+        self.count = len(bundle.vectors)
+        self.vectors = bundle.vectors
+        self.index = build_faiss_index(np.asarray(bundle.vectors, dtype=np.float32), index_type, index_params)
+
+    def handle(self, request):
+        op = request[0]
+        if op == "search":
+            _, queries, k = request
+            distances, indices = self.index.search(np.ascontiguousarray(queries, dtype=np.float32), int(k))
+            # 分片内下标转换为全局下标
+            indices = np.where(indices >= 0, indices + self.offset, -1)
+            return "ok", distances, indices
+        if op == "vectors":
+            _, ids = request
+            return "ok", np.asarray(self.vectors[np.asarray(ids, dtype=np.int64)], dtype=np.float32)
+        if op == "ping":
+            return "ok", self.count
+        return "error", f"未知请求：{op}"
+
+    def serve_connection(self, conn):
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    break
+                try:
+                    response = self.handle(request)
+                except Exception as e:
+                    response = ("error", f"{type(e).__name__}: {e}")
+                try:
+                    conn.send(response)
+                except OSError:
+                    # 协调器已因超时关闭连接
+                    break
+        finally:
+            conn.close()
+
+    def serve_forever(self, address: str, authkey: bytes):
+        with Listener(address, family="AF_UNIX", authkey=authkey) as listener:
+            logger.info(f"分片已就绪：{address}，{self.count} 条记录，起始下标 {self.offset}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # 认证失败等单个连接的错误不影响服务
+                    logger.warning(f"拒绝连接：{e}")
+                    continue
+                threading.Thread(target=self.serve_connection, args=(conn,), daemon=True).start()
+
+
+def _exit_with_parent(parent_pid: int):
+    """父进程（协调器）退出后自行退出，避免遗留分片进程"""
+    while True:
+        if os.getppid() != parent_pid:
+            os._exit(0)
+        time.sleep(1)
+
+
+def main():
+    config = Config()
+    parser = argparse.ArgumentParser(description="分片检索进程")
+    parser.add_argument("--dir", required=True, help="分片索引包目录")
+    parser.add_argument("--address", required=True, help="Unix 套接字路径")
+    parser.add_argument("--threads", type=int, default=config.SHARD_THREADS, help="FAISS 检索线程数")
+    parser.add_argument("--no-verify", action="store_true", help="跳过索引包校验")
+    parser.add_argument("--exit-with-parent", action="store_true", help="父进程退出时自行退出")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - shard - %(levelname)s - %(message)s")
+
+    authkey = os.environ.get(AUTHKEY_ENV)
+    if not authkey:
+        sys.exit(f"需要通过环境变量 {AUTHKEY_ENV} 提供认证密钥")
+    if args.exit_with_parent:
+        threading.Thread(target=_exit_with_parent, args=(os.getppid(),), daemon=True).start()
+
+    faiss.omp_set_num_threads(args.threads)
+    server = ShardServer(
+        args.dir,
+        index_type=config.INDEX_TYPE,
+        index_params={
+            "M": config.HNSW_M,
+            "ef_search": config.HNSW_EF_SEARCH,
+            "nlist": config.IVF_NLIST,
+            "nprobe": config.IVF_NPROBE
+        },
+        verify=not args.no_verify
+    )
+    server.serve_forever(args.address, bytes.fromhex(authkey))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""分片检索协调器
+
+每个分片由一个 shard_server 子进程提供检索，协调器把查询向量并发分发到各分片，
+用堆合并各分片的 top-k；单个分片超时或出错时跳过该分片，返回其余分片的结果。
+协调器提供与 FAISS 索引相同的 search(x, k) 接口，可直接作为 VectorStore.index 使用。
+"""
+from typing import List, Optional, Sequence, Iterator, Union
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, answer_challenge, deliver_challenge
+from pathlib import Path
+import bisect
+import heapq
+import itertools
+import logging
+import os
+import queue
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import weakref
+import numpy as np
+from src.config import Config
+from src.vectorstore import storage
+from src.vectorstore.shard_server import AUTHKEY_ENV
+from src.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class ShardedTexts(Sequence):
+    """把各分片的文本表拼接为一个按全局下标访问的只读序列"""
+
+    def __init__(self, tables: List[Sequence[str]], offsets: List[int]):
+        self._tables = tables
+        self._offsets = offsets
+        self._count = offsets[-1] + len(tables[-1]) if tables else 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("文本下标越界")
+        shard = bisect.bisect_right(self._offsets, idx) - 1
+        return self._tables[shard][idx - self._offsets[shard]]
+
+    def __iter__(self) -> Iterator[str]:
+        for table in self._tables:
+            yield from table
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(table, "nbytes", 0) for table in self._tables)
+
+
+def _terminate(processes: List[subprocess.Popen], socket_dir: str):
+    for process in processes:
+        if process.poll() is None:
+            process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+class ShardCoordinator:
+    """分片检索协调器"""
+
+    def __init__(self, save_dir: Path, config: Optional[Config] = None, verify: bool = False):
+        """加载分片清单，启动各分片进程并等待就绪
+
+        Args:
+            save_dir: 分片索引目录（含 shards.json）
+            config: 配置对象，如果为None则创建新的配置对象
+            verify: 是否校验各分片索引包的校验和
+        """
+        self.config = config or Config()
+        self.timeout = self.config.SHARD_TIMEOUT
+        save_dir = Path(save_dir)
+        manifest = storage.read_shard_manifest(save_dir)
+        self.ntotal = manifest["count"]
+        self.d = manifest["dimension"]
+        self.metadata = manifest.get("metadata", {})
+        self.num_shards = manifest["num_shards"]
+
+        # 协调器只映射文本和逐条记录数组（token 数、去重签名等）用于组装结果，向量由各分片进程加载
+        bundles = [storage.load_bundle(save_dir / shard["path"], verify=verify) for shard in manifest["shards"]]
+        offsets = [shard["offset"] for shard in manifest["shards"]]
+        self.texts = ShardedTexts([bundle.texts for bundle in bundles], offsets)
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+        self.arrays = {
+            name: np.concatenate([bundle.arrays[name] for bundle in bundles])
+            for name in bundles[0].arrays
+            if all(name in bundle.arrays for bundle in bundles)
+        }
+        self.token_counts = self.arrays.get("token_counts")
+
+        self._authkey = secrets.token_bytes(32)
+        self._socket_dir = tempfile.mkdtemp(prefix="rag-shards-")
+        self.addresses = [os.path.join(self._socket_dir, f"{shard['path']}.sock") for shard in manifest["shards"]]
+        self._processes = [
+            self._spawn(save_dir / shard["path"], address)
+            for shard, address in zip(manifest["shards"], self.addresses)
+        ]
+        # 协调器被回收或进程退出时结束分片进程
+        self._finalizer = weakref.finalize(self, _terminate, self._processes, self._socket_dir)
+
+        self._pools = [queue.LifoQueue() for _ in self.addresses]
+        self._executor = ThreadPoolExecutor(max_workers=self.num_shards * self.config.SHARD_CONNECTIONS)
+        self._stats_lock = threading.Lock()
+        self.stats = {"searches": 0, "timeouts": 0, "errors": 0}
+
+        self._wait_ready()
+        logger.info(f"分片索引就绪：{self.num_shards} 个分片，共 {self.ntotal} 条记录")
+
+    def _spawn(self, shard_dir: Path, address: str) -> subprocess.Popen:
+        env = {**os.environ, AUTHKEY_ENV: self._authkey.hex()}
+        return subprocess.Popen(
+            [sys.executable, "-m", "src.vectorstore.shard_server",
+             "--dir", str(shard_dir), "--address", address, "--no-verify", "--exit-with-parent"],
+            cwd=str(self.config.BASE_DIR),
+            env=env
+        )
+
+    def _connect(self, shard: int, timeout: Optional[float] = None):
+        """连接分片进程；指定 timeout 时认证握手同样受超时限制
+
+        分片进程停顿时操作系统仍会接受连接，但认证挑战要等进程恢复才发出，不加限制时会一直阻塞。
+
+        Raises:
+            TimeoutError: 分片在 timeout 秒内未发出认证挑战
+        """
+        if timeout is None:
+            return Client(self.addresses[shard], family="AF_UNIX", authkey=self._authkey)
+        conn = Client(self.addresses[shard], family="AF_UNIX")
+        if not conn.poll(timeout):
+            conn.close()
+            raise TimeoutError(f"分片 {shard} 在 {timeout} 秒内未完成连接")
+        answer_challenge(conn, self._authkey)
+        deliver_challenge(conn, self._authkey)
+        return conn
+
+    def _wait_ready(self):
+        deadline = time.monotonic() + self.config.SHARD_START_TIMEOUT
+        for shard, process in enumerate(self._processes):
+            while True:
+                if process.poll() is not None:
+                    self.close()
+                    raise RuntimeError(f"分片进程 {shard} 启动失败，退出码 {process.returncode}")
+                try:
+                    conn = self._connect(shard)
+                    break
+                except (FileNotFoundError, ConnectionRefusedError):
+                    if time.monotonic() > deadline:
+                        self.close()
+                        raise TimeoutError(f"分片进程 {shard} 在 {self.config.SHARD_START_TIMEOUT} 秒内未就绪")
+                    time.sleep(0.05)
+            conn.send(("ping",))
+            conn.recv()
+            self._pools[shard].put(conn)
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _call_shard(self, shard: int, request: tuple):
+        """向单个分片发送请求，超时（含新建连接的握手）或出错时返回 None"""
+        deadline = time.monotonic() + self.timeout
+        try:
+            conn = self._pools[shard].get_nowait()
+        except queue.Empty:
+            conn = None
+        try:
+            if conn is None:
+                conn = self._connect(shard, timeout=self.timeout)
+            conn.send(request)
+            if not conn.poll(max(0.0, deadline - time.monotonic())):
+                # 迟到的响应会错位，连接不再复用
+                conn.close()
+                self._count("timeouts")
+                logger.warning(f"分片 {shard} 在 {self.timeout} 秒内未响应，本次请求跳过该分片")
+                return None
+            status, *payload = conn.recv()
+        except TimeoutError:
+            self._count("timeouts")
+            logger.warning(f"分片 {shard} 在 {self.timeout} 秒内未接受连接，本次请求跳过该分片")
+            return None
+        except (OSError, EOFError) as e:
+            if conn is not None:
+                conn.close()
+            self._count("errors")
+            logger.error(f"分片 {shard} 通信失败：{e}")
+            return None
+        self._pools[shard].put(conn)
+        if status != "ok":
+            self._count("errors")
+            logger.error(f"分片 {shard} 请求失败：{payload[0]}")
+            return None
+        return payload
+
+    def search(self, queries: np.ndarray, k: int):
+        """分发到所有分片并合并结果（与 faiss.Index.search 的返回格式相同）
+
+        Args:
+            queries: 查询向量矩阵 (nq, d)
+            k: 每个查询返回的结果数
+
+        Returns:
+            (相似度 (nq, k), 全局下标 (nq, k))，不足 k 个时相似度为 -inf、下标为 -1
+
+        Raises:
+            RuntimeError: 所有分片均不可用
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        self._count("searches")
+        with span("shard_search"):
+            futures = [
+                self._executor.submit(self._call_shard, shard, ("search", queries, k))
+                for shard in range(self.num_shards)
+            ]
+            results = [result for result in (future.result() for future in futures) if result is not None]
+        if not results:
+            raise RuntimeError("所有分片均不可用")
+
+        with span("shard_merge"):
+            distances = np.full((len(queries), k), -np.inf, dtype=np.float32)
+            indices = np.full((len(queries), k), -1, dtype=np.int64)
+            for row in range(len(queries)):
+                # 各分片结果已按相似度降序排列，堆合并后取前 k 个
+                merged = heapq.merge(
+                    *(zip(shard_distances[row], shard_indices[row]) for shard_distances, shard_indices in results),
+                    key=lambda pair: -pair[0]
+                )
+                for col, (distance, index) in enumerate(itertools.islice(
+                    (pair for pair in merged if pair[1] >= 0), k
+                )):
+                    distances[row, col] = distance
+                    indices[row, col] = index
+        return distances, indices
+
+    def reconstruct_batch(self, ids: np.ndarray) -> np.ndarray:
+        """按全局下标从各分片取回向量（与 faiss.Index.reconstruct_batch 的返回格式相同）
+
+        Raises:
+            RuntimeError: 有分片超时或出错，无法取齐向量
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        shards = np.searchsorted(self._offsets, ids, side="right") - 1
+        vectors = np.empty((len(ids), self.d), dtype=np.float32)
+        requests = {
+            int(shard): np.flatnonzero(shards == shard)
+            for shard in np.unique(shards)
+        }
+        futures = {
+            shard: self._executor.submit(self._call_shard, shard, ("vectors", ids[positions] - self._offsets[shard]))
+            for shard, positions in requests.items()
+        }
+        for shard, future in futures.items():
+            result = future.result()
+            if result is None:
+                raise RuntimeError(f"分片 {shard} 不可用，无法取回向量")
+            vectors[requests[shard]] = result[0]
+        return vectors
+
+    def close(self):
+        """关闭连接并结束分片进程"""
+        for pool in self._pools:
+            while not pool.empty():
+                pool.get_nowait().close()
+        self._executor.shutdown(wait=False)
+        self._finalizer()
@@ -0,0 +1,553 @@
+"""向量索引包（bundle）的二进制存储格式
+
+目录布局（所有二进制文件均为小端序）::
+
+    <bundle_dir>/
+        manifest.json    清单：格式名称、格式版本、记录数、向量维度、各文件的 dtype/shape/sha256
+        vectors.f32      float32 向量矩阵，形状 (count, dimension)，行优先
+        texts.bin        所有文本的 UTF-8 编码按顺序拼接
+        texts.offsets    uint64 偏移数组，长度 count + 1，第 i 条文本为 texts.bin[off[i]:off[i+1]]
+        metadata.json    索引级元数据（任意 JSON 对象）
+        <name>.bin       可选的逐条记录数组（如 token 数），dtype/shape 记录在清单中
+
+加载时向量与文本均通过 np.memmap 只读映射，不做整体拷贝；文本按需解码。
+清单最后写入，作为整个包的提交点：各文件先落盘（fsync）再写清单，写入过程中断不会产生半成品包。
+覆盖已有的包时先删除并落盘旧清单，中断后目录中没有可加载的包（需重新保存），但不会加载到新旧文件混合的包；
+覆盖保存不是原子切换，服务中的索引应写入新的版本目录再切换 CURRENT（见下文）。
+
+分片索引把语料按顺序切分为 N 个连续区间，每个分片是一个独立的索引包::
+
+    <sharded_dir>/
+        shards.json      分片清单：分片数、总记录数、向量维度、各分片目录与全局起始下标
+        shard_000/       第 0 个分片的索引包（布局同上）
+        shard_001/
+        ...
+
+后台入库任务把每次构建写入独立的版本目录，完成后原子替换 CURRENT 指针切换到新版本::
+
+    <collection_dir>/
+        CURRENT          当前版本 id（单行文本）
+        CANDIDATE        候选版本 id（可选）：用新向量模型重新向量化、尚未切换的版本
+        versions/<id>/   每个版本是一个索引包或分片索引
+
+加载时先按 CURRENT 解析到版本目录；没有 CURRENT 的目录按原布局直接加载。候选版本不会被清理。
+"""
+from typing import List, Dict, Any, Optional, Sequence, Iterator, Union
+from dataclasses import dataclass, field
+from pathlib import Path
+from datetime import datetime
+import hashlib
+import json
+import os
+import shutil
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT_NAME = "ragkb-bundle"
+FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.f32"
+TEXTS_FILE = "texts.bin"
+OFFSETS_FILE = "texts.offsets"
+METADATA_FILE = "metadata.json"
+SHARDS_FILE = "shards.json"
+CURRENT_FILE = "CURRENT"
+CANDIDATE_FILE = "CANDIDATE"
+VERSIONS_DIR = "versions"
+
+# 旧格式（pickle）文件名
+LEGACY_INDEX_FILE = "index.faiss"
+LEGACY_TEXTS_FILE = "texts.pkl"
+
+_CHUNK_SIZE = 1 << 20
+
+
+class BundleFormatError(ValueError):
+    """索引包格式错误（版本不兼容、文件缺失或校验和不匹配）"""
+
+
+class LegacyIndexError(BundleFormatError):
+    """旧格式（index.faiss + texts.pkl）索引，需先用 src/convert_index.py 转换"""
+
+    def __init__(self, save_dir: Path):
+        super().__init__(
+            f"{save_dir} 是旧格式索引 ({LEGACY_TEXTS_FILE})，pickle 反序列化可以执行任意代码，默认拒绝加载；"
+            f"请运行 python src/convert_index.py --src {save_dir} 转换为索引包，"
+            f"确认文件可信且暂时无法转换时可设置 ALLOW_LEGACY_INDEX=true"
+        )
+
+
+class TextTable(Sequence):
+    """基于内存映射的只读文本表，按下标访问时才解码对应文本"""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def _get(self, idx: int) -> str:
+        start, end = int(self._offsets[idx]), int(self._offsets[idx + 1])
+        return self._data[start:end].tobytes().decode("utf-8")
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(idx, slice):
+            return [self._get(i) for i in range(*idx.indices(len(self)))]
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("文本下标越界")
+        return self._get(idx)
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self._get(i)
+
+    @property
+    def nbytes(self) -> int:
+        """文本数据与偏移数组占用的字节数"""
+        return int(self._data.nbytes + self._offsets.nbytes)
+
+
+@dataclass
+class IndexBundle:
+    """加载后的索引包"""
+    vectors: np.ndarray
+    texts: TextTable
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    arrays: Dict[str, np.ndarray] = field(default_factory=dict)
+    manifest: Dict[str, Any] = field(default_factory=dict)
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_file(path: Path, payload: Union[bytes, np.ndarray]) -> None:
+    """先写临时文件并落盘，再原子替换"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        if isinstance(payload, np.ndarray):
+            payload.tofile(f)
+        else:
+            f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _sync_dir(path: Path) -> None:
+    """把目录项的变更（文件的替换和删除）落盘"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _retract(manifest_path: Path) -> None:
+    """覆盖已有的包之前删除其清单并落盘，写入中断时目录不再被识别为可加载的包"""
+    if manifest_path.exists():
+        manifest_path.unlink()
+        _sync_dir(manifest_path.parent)
+
+
+def _file_entry(path: Path, dtype: str, shape: List[int]) -> Dict[str, Any]:
+    return {
+        "path": path.name,
+        "dtype": dtype,
+        "shape": shape,
+        "sha256": _sha256(path),
+    }
+
+
+def _encode_texts(texts: Sequence[str]):
+    """将文本编码为拼接的 UTF-8 字节与偏移数组"""
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    if encoded:
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return b"".join(encoded), offsets
+
+
+def is_bundle(save_dir: Path) -> bool:
+    """目录中是否存在新格式索引包"""
+    return (Path(save_dir) / MANIFEST_FILE).exists()
+
+
+def is_sharded(save_dir: Path) -> bool:
+    """目录中是否存在分片索引"""
+    return (Path(save_dir) / SHARDS_FILE).exists()
+
+
+def is_legacy_bundle(save_dir: Path) -> bool:
+    """目录中是否存在旧的 index.faiss + texts.pkl 格式"""
+    save_dir = Path(save_dir)
+    return (save_dir / LEGACY_INDEX_FILE).exists() and (save_dir / LEGACY_TEXTS_FILE).exists()
+
+
+def save_bundle(
+    save_dir: Path,
+    vectors: np.ndarray,
+    texts: Sequence[str],
+    metadata: Optional[Dict[str, Any]] = None,
+    arrays: Optional[Dict[str, np.ndarray]] = None,
+) -> Dict[str, Any]:
+    """保存索引包
+
+    Args:
+        save_dir: 保存目录
+        vectors: 形状为 (count, dimension) 的向量矩阵
+        texts: 与向量一一对应的文本
+        metadata: 索引级元数据，需可 JSON 序列化
+        arrays: 逐条记录的附加数组，第一维长度须等于记录数
+
+    Returns:
+        写入的清单
+    """
+    save_dir = Path(save_dir)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    _retract(save_dir / MANIFEST_FILE)
+
+    vectors = np.ascontiguousarray(vectors, dtype="<f4")
+    if vectors.ndim != 2:
+        raise BundleFormatError("向量矩阵必须是二维的")
+    count, dimension = vectors.shape
+    if len(texts) != count:
+        raise BundleFormatError(f"文本数量 ({len(texts)}) 与向量数量 ({count}) 不一致")
+
+    files = {}
+
+    vectors_path = save_dir / VECTORS_FILE
+    _write_file(vectors_path, vectors)
+    files["vectors"] = _file_entry(vectors_path, "<f4", [count, dimension])
+
+    text_data, offsets = _encode_texts(texts)
+    texts_path = save_dir / TEXTS_FILE
+    _write_file(texts_path, text_data)
+    files["texts"] = _file_entry(texts_path, "|u1", [len(text_data)])
+
+    offsets_path = save_dir / OFFSETS_FILE
+    _write_file(offsets_path, offsets)
+    files["text_offsets"] = _file_entry(offsets_path, "<u8", [count + 1])
+
+    metadata_path = save_dir / METADATA_FILE
+    _write_file(metadata_path, json.dumps(metadata or {}, ensure_ascii=False).encode("utf-8"))
+    files["metadata"] = _file_entry(metadata_path, "json", [])
+
+    array_names = []
+    for name, values in (arrays or {}).items():
+        values = np.ascontiguousarray(values)
+        if values.shape[0] != count:
+            raise BundleFormatError(f"数组 {name} 的长度 ({values.shape[0]}) 与记录数 ({count}) 不一致")
+        values = values.astype(values.dtype.newbyteorder("<"), copy=False)
+        array_path = save_dir / f"{name}.bin"
+        _write_file(array_path, values)
+        files[f"array:{name}"] = _file_entry(array_path, values.dtype.str, list(values.shape))
+        array_names.append(name)
+
+    manifest = {
+        "format": FORMAT_NAME,
+        "format_version": FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "count": count,
+        "dimension": dimension,
+        "arrays": array_names,
+        "files": files,
+    }
+    # 数据文件的替换先落盘，清单再提交
+    _sync_dir(save_dir)
+    _write_file(save_dir / MANIFEST_FILE, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+    _sync_dir(save_dir)
+    logger.info(f"索引包已保存到 {save_dir}，共 {count} 条记录")
+    return manifest
+
+
+def _map_file(save_dir: Path, entry: Dict[str, Any], verify: bool) -> np.ndarray:
+    """以只读内存映射方式打开清单中的一个文件"""
+    path = save_dir / entry["path"]
+    if not path.exists():
+        raise BundleFormatError(f"索引包缺少文件: {path}")
+    if verify and _sha256(path) != entry["sha256"]:
+        raise BundleFormatError(f"文件校验和不匹配: {path}")
+
+    dtype = np.dtype(entry["dtype"])
+    shape = tuple(entry["shape"])
+    expected_size = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+    if path.stat().st_size != expected_size:
+        raise BundleFormatError(f"文件大小与清单不一致: {path}")
+    if expected_size == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+def read_manifest(save_dir: Path) -> Dict[str, Any]:
+    """读取并检查索引包清单"""
+    with open(Path(save_dir) / MANIFEST_FILE, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_NAME:
+        raise BundleFormatError(f"未知的索引包格式: {manifest.get('format')}")
+    if manifest.get("format_version", 0) > FORMAT_VERSION:
+        raise BundleFormatError(
+            f"索引包格式版本 {manifest['format_version']} 高于当前支持的版本 {FORMAT_VERSION}"
+        )
+    return manifest
+
+
+def load_bundle(save_dir: Path, verify: bool = False) -> IndexBundle:
+    """加载索引包
+
+    Args:
+        save_dir: 索引包目录
+        verify: 是否校验各文件的 sha256；校验需要完整读取每个文件，只在转换、入库和显式要求（VERIFY_INDEX）时开启
+
+    Returns:
+        IndexBundle，其中向量和文本均为内存映射的只读视图
+    """
+    save_dir = Path(save_dir)
+    manifest = read_manifest(save_dir)
+    files = manifest["files"]
+
+    vectors = _map_file(save_dir, files["vectors"], verify)
+    text_data = _map_file(save_dir, files["texts"], verify)
+    offsets = _map_file(save_dir, files["text_offsets"], verify)
+    if len(offsets) != manifest["count"] + 1:
+        raise BundleFormatError("文本偏移数组与记录数不一致")
+
+    metadata_entry = files["metadata"]
+    metadata_path = save_dir / metadata_entry["path"]
+    if verify and _sha256(metadata_path) != metadata_entry["sha256"]:
+        raise BundleFormatError(f"文件校验和不匹配: {metadata_path}")
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+
+    arrays = {
+        name: _map_file(save_dir, files[f"array:{name}"], verify)
+        for name in manifest.get("arrays", [])
+    }
+
+    return IndexBundle(
+        vectors=vectors,
+        texts=TextTable(text_data, offsets),
+        metadata=metadata,
+        arrays=arrays,
+        manifest=manifest,
+    )
+
+
+def read_metadata(save_dir: Path) -> Dict[str, Any]:
+    """只读取索引级元数据（不映射向量和文本），旧格式返回空字典"""
+    save_dir = Path(save_dir)
+    if is_sharded(save_dir):
+        return dict(read_shard_manifest(save_dir)["metadata"])
+    if is_bundle(save_dir):
+        entry = read_manifest(save_dir)["files"]["metadata"]
+        with open(save_dir / entry["path"], "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def load_legacy_bundle(save_dir: Path):
+    """加载旧格式（index.faiss + texts.pkl）
+
+    注意：pickle 反序列化可以执行任意代码，只能用于本机生成的可信文件。
+
+    Returns:
+        (向量矩阵, 文本列表)
+    """
+    import pickle
+    import faiss
+
+    save_dir = Path(save_dir)
+    index = faiss.read_index(str(save_dir / LEGACY_INDEX_FILE))
+    with open(save_dir / LEGACY_TEXTS_FILE, "rb") as f:
+        texts = pickle.load(f)
+    vectors = index.reconstruct_n(0, index.ntotal)
+    return np.asarray(vectors, dtype="float32"), texts
+
+
+def convert_legacy_bundle(src_dir: Path, dst_dir: Optional[Path] = None) -> Dict[str, Any]:
+    """将旧格式索引转换为新格式索引包
+
+    Args:
+        src_dir: 旧格式所在目录
+        dst_dir: 新格式输出目录，默认与 src_dir 相同（旧文件保留不动）
+
+    Returns:
+        新索引包的清单
+    """
+    src_dir = Path(src_dir)
+    if not is_legacy_bundle(src_dir):
+        raise FileNotFoundError(f"{src_dir} 中没有旧格式索引 ({LEGACY_INDEX_FILE}, {LEGACY_TEXTS_FILE})")
+    vectors, texts = load_legacy_bundle(src_dir)
+    return save_bundle(
+        dst_dir or src_dir,
+        vectors,
+        texts,
+        metadata={"converted_from": LEGACY_TEXTS_FILE},
+    )
+
+
+def save_sharded(
+    save_dir: Path,
+    vectors: np.ndarray,
+    texts: Sequence[str],
+    num_shards: int,
+    metadata: Optional[Dict[str, Any]] = None,
+    arrays: Optional[Dict[str, np.ndarray]] = None,
+) -> Dict[str, Any]:
+    """按连续区间把索引切分为 num_shards 个分片并分别保存为索引包
+
+    Args:
+        save_dir: 保存目录
+        vectors: 形状为 (count, dimension) 的向量矩阵
+        texts: 与向量一一对应的文本
+        num_shards: 分片数
+        metadata: 索引级元数据，写入每个分片
+        arrays: 逐条记录的附加数组，按相同区间切分
+
+    Returns:
+        写入的分片清单
+    """
+    save_dir = Path(save_dir)
+    count = len(vectors)
+    if not 1 <= num_shards <= max(count, 1):
+        raise BundleFormatError(f"分片数 ({num_shards}) 必须在 1 到记录数 ({count}) 之间")
+    save_dir.mkdir(parents=True, exist_ok=True)
+    _retract(save_dir / SHARDS_FILE)
+
+    bounds = np.linspace(0, count, num_shards + 1).astype(int)
+    shards = []
+    for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+        start, end = int(start), int(end)
+        shard_dir = f"shard_{i:03d}"
+        save_bundle(
+            save_dir / shard_dir,
+            vectors[start:end],
+            texts[start:end],
+            metadata={**(metadata or {}), "shard": {"index": i, "offset": start, "num_shards": num_shards}},
+            arrays={name: values[start:end] for name, values in (arrays or {}).items()},
+        )
+        shards.append({"path": shard_dir, "offset": start, "count": end - start})
+
+    manifest = {
+        "format": FORMAT_NAME,
+        "format_version": FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "count": count,
+        "dimension": int(vectors.shape[1]),
+        "num_shards": num_shards,
+        "shards": shards,
+        "metadata": metadata or {},
+    }
+    # 分片清单最后写入，作为整个分片索引的提交点
+    _write_file(save_dir / SHARDS_FILE, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+    _sync_dir(save_dir)
+    logger.info(f"分片索引已保存到 {save_dir}，共 {count} 条记录，{num_shards} 个分片")
+    return manifest
+
+
+def read_shard_manifest(save_dir: Path) -> Dict[str, Any]:
+    """读取并检查分片清单"""
+    with open(Path(save_dir) / SHARDS_FILE, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_NAME:
+        raise BundleFormatError(f"未知的索引包格式: {manifest.get('format')}")
+    if manifest.get("format_version", 0) > FORMAT_VERSION:
+        raise BundleFormatError(
+            f"索引包格式版本 {manifest['format_version']} 高于当前支持的版本 {FORMAT_VERSION}"
+        )
+    return manifest
+
+
+def current_version(collection_dir: Path) -> Optional[str]:
+    """CURRENT 指向的版本 id，没有版本目录时返回 None"""
+    try:
+        return (Path(collection_dir) / CURRENT_FILE).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def resolve_version(collection_dir: Path) -> Path:
+    """集合目录解析为实际加载的目录：CURRENT 指向的版本目录，没有 CURRENT 时为集合目录本身"""
+    version = current_version(collection_dir)
+    if version is None:
+        return Path(collection_dir)
+    return Path(collection_dir) / VERSIONS_DIR / version
+
+
+def new_version_dir(collection_dir: Path) -> Path:
+    """为新版本分配目录（按时间排序的 id），不创建目录"""
+    version = datetime.now().strftime("%Y%m%d%H%M%S") + "-" + os.urandom(3).hex()
+    return Path(collection_dir) / VERSIONS_DIR / version
+
+
+def publish_version(version_dir: Path, keep: int = 2) -> str:
+    """原子切换 CURRENT 到指定版本，并清理更早的版本（保留最近 keep 个，含新版本）
+
+    已加载旧版本的进程通过内存映射持有文件，删除目录不影响其完成在途查询。
+
+    Returns:
+        新版本 id
+    """
+    version_dir = Path(version_dir)
+    collection_dir = version_dir.parent.parent
+    if not (is_bundle(version_dir) or is_sharded(version_dir)):
+        raise BundleFormatError(f"{version_dir} 不是完整的索引包，拒绝切换")
+    _write_file(collection_dir / CURRENT_FILE, (version_dir.name + "\n").encode("utf-8"))
+    logger.info(f"{collection_dir} 已切换到版本 {version_dir.name}")
+
+    candidate = candidate_version(collection_dir)
+    versions = sorted(path for path in (collection_dir / VERSIONS_DIR).iterdir() if path.is_dir())
+    for path in versions[:-keep] if keep > 0 else []:
+        if path.name not in (version_dir.name, candidate):
+            shutil.rmtree(path, ignore_errors=True)
+    return version_dir.name
+
+
+def candidate_version(collection_dir: Path) -> Optional[str]:
+    """CANDIDATE 指向的候选版本 id，没有候选版本时返回 None"""
+    try:
+        return (Path(collection_dir) / CANDIDATE_FILE).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_candidate(version_dir: Path) -> str:
+    """把已写入的版本登记为集合的候选版本（不切换 CURRENT）
+
+    Returns:
+        候选版本 id
+    """
+    version_dir = Path(version_dir)
+    if not (is_bundle(version_dir) or is_sharded(version_dir)):
+        raise BundleFormatError(f"{version_dir} 不是完整的索引包，拒绝登记")
+    _write_file(version_dir.parent.parent / CANDIDATE_FILE, (version_dir.name + "\n").encode("utf-8"))
+    return version_dir.name
+
+
+def clear_candidate(collection_dir: Path, remove: bool = False) -> Optional[str]:
+    """取消候选版本
+
+    Args:
+        collection_dir: 集合目录
+        remove: 是否同时删除候选版本目录（已切换为当前版本时不删除）
+
+    Returns:
+        被取消的候选版本 id
+    """
+    collection_dir = Path(collection_dir)
+    candidate = candidate_version(collection_dir)
+    (collection_dir / CANDIDATE_FILE).unlink(missing_ok=True)
+    if remove and candidate and candidate != current_version(collection_dir):
+        shutil.rmtree(collection_dir / VERSIONS_DIR / candidate, ignore_errors=True)
+    return candidate
@@ -8,110 +8,315 @@ document.addEventListener('DOMContentLoaded', function() {
     const referencesContainer = document.getElementById('references-container');
     const directAnswerContainer = document.getElementById('direct-answer-container');
     const directAnswer = document.getElementById('direct-answer');
+    const precomputedBadge = document.getElementById('precomputed-badge');
 
     // API 端点
     const API_ENDPOINT = '/api/ask';
+    const STREAM_ENDPOINT = '/api/ask/stream';
+    // 浏览器能否流式读取响应体；不能时直接使用普通接口，避免同一问题请求两次
+    const STREAMING_SUPPORTED = Boolean(
+        window.ReadableStream && window.TextDecoder && window.Response && 'body' in window.Response.prototype
+    );
+
+    // 最近回答的客户端缓存（LRU + 过期时间）
+    const CACHE_MAX_ENTRIES = 50;
+    const CACHE_TTL_MS = 10 * 60 * 1000;
+    const answerCache = new Map();
+
+    // 当前在途请求：{ key, controller }
+    let inFlight = null;
+
+    // 同一问题的不同写法（首尾空白、连续空白、句末问号）使用同一个缓存键
+    function cacheKey(question, compare) {
+        const normalized = question.replace(/\s+/g, ' ').replace(/[?？\s]+$/, '');
+        return JSON.stringify([normalized, compare]);
+    }
+
+    function getCached(key) {
+        const entry = answerCache.get(key);
+        if (!entry) {
+            return null;
+        }
+        answerCache.delete(key);
+        if (Date.now() - entry.time > CACHE_TTL_MS) {
+            return null;
+        }
+        // 重新插入，Map 的插入顺序即最近使用顺序
+        answerCache.set(key, entry);
+        return entry.data;
+    }
+
+    function putCached(key, data) {
+        answerCache.delete(key);
+        answerCache.set(key, { data: data, time: Date.now() });
+        while (answerCache.size > CACHE_MAX_ENTRIES) {
+            answerCache.delete(answerCache.keys().next().value);
+        }
+    }
 
     // 提交问题
     questionForm.addEventListener('submit', async function(e) {
         e.preventDefault();
-        
+
         const question = questionInput.value.trim();
         if (!question) {
             alert('请输入问题');
             return;
         }
-        
+
+        const compare = compareMode.checked;
+        const key = cacheKey(question, compare);
+
+        // 同一问题正在处理中（如重复点击），不再发起请求
+        if (inFlight && inFlight.key === key) {
+            return;
+        }
+        // 新问题取代旧请求：中止旧请求，服务端随之停止生成
+        if (inFlight) {
+            inFlight.controller.abort();
+            inFlight = null;
+        }
+
+        const cached = getCached(key);
+        if (cached) {
+            loadingIndicator.classList.add('d-none');
+            displayResults(cached, compare);
+            return;
+        }
+
+        const controller = new AbortController();
+        const request = { key: key, controller: controller };
+        inFlight = request;
+
         // 显示加载指示器
         loadingIndicator.classList.remove('d-none');
         resultsContainer.classList.add('d-none');
-        
+
         try {
-            const response = await fetch(API_ENDPOINT, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    query: question,
-                    compare: compareMode.checked
-                }),
-            });
-            
-            if (!response.ok) {
-                throw new Error('API 请求失败');
-            }
-            
-            const data = await response.json();
-            displayResults(data);
-            
+            const data = STREAMING_SUPPORTED
+                ? await askStream(question, compare, controller.signal)
+                : await askOnce(question, compare, controller.signal);
+            putCached(key, data);
         } catch (error) {
+            if (error.name === 'AbortError') {
+                return;
+            }
             console.error('Error:', error);
             alert('处理请求时出错: ' + error.message);
         } finally {
-            // 隐藏加载指示器
-            loadingIndicator.classList.add('d-none');
+            if (inFlight === request) {
+                inFlight = null;
+                // 隐藏加载指示器
+                loadingIndicator.classList.add('d-none');
+            }
         }
     });
-    
+
+    // 流式问答：收到参考文档后立即显示，回答逐段追加（仅在 STREAMING_SUPPORTED 时使用）
+    async function askStream(question, compare, signal) {
+        const response = await fetch(STREAM_ENDPOINT, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
+            },
+            body: JSON.stringify({
+                query: question,
+                compare: compare
+            }),
+            signal: signal,
+        });
+
+        if (!response.ok) {
+            throw new Error('API 请求失败');
+        }
+
+        if (!response.body) {
+            throw new Error('浏览器不支持流式读取响应');
+        }
+
+        const data = {
+            rag_response: { query: question, answer: '', references: [] },
+        };
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let finished = false;
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            // SSE 消息以空行分隔
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+                const message = parseEvent(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+                if (message && handleEvent(message, data, compare)) {
+                    finished = true;
+                }
+            }
+        }
+
+        if (!finished) {
+            throw new Error('回答未完整返回');
+        }
+        return data;
+    }
+
+    // 非流式接口
+    async function askOnce(question, compare, signal) {
+        const response = await fetch(API_ENDPOINT, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                query: question,
+                compare: compare
+            }),
+            signal: signal,
+        });
+
+        if (!response.ok) {
+            throw new Error('API 请求失败');
+        }
+
+        const data = await response.json();
+        displayResults(data, compare);
+        return data;
+    }
+
+    function parseEvent(block) {
+        let event = 'message';
+        const lines = [];
+        block.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                event = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                lines.push(line.slice(5).trim());
+            }
+        });
+        if (!lines.length) {
+            return null;
+        }
+        return { event: event, data: JSON.parse(lines.join('\n')) };
+    }
+
+    // 处理一条流式事件，返回回答是否已全部收到
+    function handleEvent(message, data, compare) {
+        switch (message.event) {
+            case 'references':
+                data.rag_response.references = message.data.references;
+                loadingIndicator.classList.add('d-none');
+                ragAnswer.textContent = '';
+                togglePrecomputed(false);
+                renderReferences(data.rag_response.references);
+                directAnswer.textContent = compare ? '正在生成...' : '';
+                toggleDirectAnswer(compare);
+                showResults();
+                return false;
+            case 'token':
+                data.rag_response.answer += message.data.text;
+                ragAnswer.textContent = data.rag_response.answer;
+                return false;
+            case 'done':
+                data.rag_response.answer = message.data.answer;
+                data.rag_response.precomputed = Boolean(message.data.precomputed);
+                ragAnswer.textContent = data.rag_response.answer;
+                togglePrecomputed(data.rag_response.precomputed);
+                // 对比模式还需等待直接 LLM 回答
+                return !compare;
+            case 'direct':
+                data.direct_response = { answer: message.data.answer };
+                directAnswer.textContent = message.data.answer;
+                return true;
+            case 'error':
+                throw new Error(message.data.detail);
+            default:
+                return false;
+        }
+    }
+
     // 显示结果
-    function displayResults(data) {
+    function displayResults(data, compare) {
         // 显示 RAG 回答
         ragAnswer.textContent = data.rag_response.answer;
-        
+        togglePrecomputed(Boolean(data.rag_response.precomputed));
+
         // 显示参考文档
+        renderReferences(data.rag_response.references);
+
+        // 显示直接 LLM 回答（如果启用了对比模式）
+        if (compare && data.direct_response) {
+            directAnswer.textContent = data.direct_response.answer;
+            toggleDirectAnswer(true);
+        } else {
+            toggleDirectAnswer(false);
+        }
+
+        showResults();
+    }
+
+    function renderReferences(references) {
         referencesContainer.innerHTML = '';
-        data.rag_response.references.forEach((ref, index) => {
+        references.forEach((ref, index) => {
             const referenceItem = document.createElement('div');
             referenceItem.className = 'reference-item';
-            
+
             const score = Math.round(ref.score * 100) / 100;
-            
+
             referenceItem.innerHTML = `
                 <div class="d-flex justify-content-between align-items-center mb-2">
                     <h4 class="h6 mb-0">参考文档 ${index + 1}</h4>
                     <span class="reference-score">相关度: ${score}</span>
                 </div>
-                <p>${formatReferenceText(ref.text)}</p>
+                <p></p>
             `;
-            
+            referenceItem.querySelector('p').textContent = formatReferenceText(ref.text);
+
             referencesContainer.appendChild(referenceItem);
         });
-        
-        // 显示直接 LLM 回答（如果启用了对比模式）
-        if (compareMode.checked && data.direct_response) {
-            directAnswer.textContent = data.direct_response.answer;
+    }
+
+    function toggleDirectAnswer(visible) {
+        if (visible) {
             directAnswerContainer.classList.remove('d-none');
         } else {
             directAnswerContainer.classList.add('d-none');
         }
-        
+    }
+
+    // 回答来自知识库的预计算回答（未调用 LLM）时显示标记
+    function togglePrecomputed(visible) {
+        precomputedBadge.classList.toggle('d-none', !visible);
+    }
+
+    function showResults() {
         // 显示结果容器
         resultsContainer.classList.remove('d-none');
-        
+
         // 滚动到结果
         resultsContainer.scrollIntoView({ behavior: 'smooth' });
     }
-    
+
     // 格式化参考文本（截断长文本并突出显示关键部分）
     function formatReferenceText(text) {
         const maxLength = 300;
         if (text.length <= maxLength) {
             return text;
         }
-        
+
         return text.substring(0, maxLength) + '...';
     }
-    
+
     // 对比模式切换
     compareMode.addEventListener('change', function() {
-        if (this.checked) {
-            directAnswerContainer.classList.remove('d-none');
-        } else {
-            directAnswerContainer.classList.add('d-none');
-        }
+        toggleDirectAnswer(this.checked);
     });
-    
+
     // 预填充示例问题
     const exampleQuestions = [
         "在不定期合伙的情况下，一个合伙人突然退出并清偿了其应当承担份额的合伙债务后，是否有权向其他合伙人追偿？",
@@ -119,6 +324,6 @@ document.addEventListener('DOMContentLoaded', function() {
         "什么是民事诉讼？",
         "行政诉讼中被告的举证责任是什么？"
     ];
-    
+
     questionInput.placeholder = exampleQuestions[Math.floor(Math.random() * exampleQuestions.length)];
 });